@@ -0,0 +1,106 @@
+"""
+Negotiated gzip/brotli compression for API responses.
+
+JSON (and other text) bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are sent with the best
+encoding the client accepts: br when brotli is installed, then gzip. Unlike the pre-compressed
+frontend files (static_assets.py), these bodies are compressed per request, so fast levels are
+used (see config.py). Large bodies are compressed in a worker thread so the event loop keeps
+serving other requests.
+
+Streamed bodies (server-sent events, downloads), responses that already carry a
+Content-Encoding (the frontend mount) and HEAD requests pass through untouched.
+"""
+import gzip
+import asyncio
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+
+from backend.config import config
+from backend.static_assets import COMPRESSIBLE_TYPES, brotli, negotiate_encoding, identity_acceptable
+
+# Compressing more than this takes around a millisecond: do it off the event loop
+OFFLOAD_SIZE = 256 * 1024
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=config.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=config.RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+def _compressible(headers: MutableHeaders, status: int) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        status not in (204, 304)
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith("text/event-stream")
+        and "content-encoding" not in headers
+    )
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size: Optional[int] = None):
+        self.app = app
+        self.min_size = config.RESPONSE_COMPRESSION_MIN_BYTES if min_size is None else min_size
+        self.available = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = negotiate_encoding(accept_encoding, self.available) or "identity"
+        # A client that refused identity gets every body encoded, however small
+        identity_refused = not identity_acceptable(accept_encoding)
+        min_size = 0 if identity_refused else self.min_size
+
+        start = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                if not _compressible(headers, message["status"]):
+                    passthrough = True
+                    await send(message)
+                    return
+                # The representation now depends on Accept-Encoding, compressed or not
+                headers.add_vary_header("Accept-Encoding")
+                start = {**message, "headers": headers.raw}
+                return # Held until the body shows whether it is worth compressing
+
+            body = message.get("body", b"")
+            if encoding == "identity" or message.get("more_body", False) or len(body) < min_size:
+                # Small, not accepted, or streamed: forward as is
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= OFFLOAD_SIZE:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+
+            headers = MutableHeaders(raw=start["headers"])
+            if len(compressed) < len(body) or identity_refused:
+                body = compressed
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # Each representation gets its own validator, as for static assets
+                    headers["etag"] = f'{etag[:-1]}-{encoding}"'
+            await send(start)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, compressing_send)
@@ -18,7 +18,117 @@ class Config:
     MODEL_IMAGE_FAST = os.getenv("MODEL_IMAGE_FAST", "gemini-2.5-flash-image")
     MODEL_IMAGE_HIGH_QUALITY = os.getenv("MODEL_IMAGE_HIGH_QUALITY", "publishers/google/models/gemini-3-pro-image-preview")
     
+    # Models - Video
+    MODEL_VIDEO_FAST = os.getenv("MODEL_VIDEO_FAST", "veo-3.1-fast-generate-preview")
+    MODEL_VIDEO_HIGH_QUALITY = os.getenv("MODEL_VIDEO_HIGH_QUALITY", "veo-3.1-generate-preview")
+    VIDEO_MODEL_CONCURRENCY = int(os.getenv("VIDEO_MODEL_CONCURRENCY", "4")) # In-flight video operations per process
+    VIDEO_POLL_SECONDS = float(os.getenv("VIDEO_POLL_SECONDS", "10"))
+
+    # Latency-aware model routing (services/model_router.py) for callers that send a latency
+    # budget or ask for "auto" instead of pinning a model; stats are per process
+    ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50")) # Recent calls per model behind its p95 and error rate
+    ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5")) # Below this, a model's prior latency is assumed
+    ROUTER_QUEUE_CAPACITY = int(os.getenv("ROUTER_QUEUE_CAPACITY", "8")) # In-flight calls per model before latency grows with queue depth
+    ROUTER_TIMEOUT_FACTOR = float(os.getenv("ROUTER_TIMEOUT_FACTOR", "2")) # Routed attempts slower than this x their p95 fall back
+    ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5")) # Above it, a model is tried last
+    ROUTER_WORKERS = int(os.getenv("ROUTER_WORKERS", "32")) # Threads for routed image calls, abandoned attempts included
+
+    # Database (database.py). SQLite file by default; point every instance at the same
+    # PostgreSQL to share state, e.g. postgresql+psycopg://user:pass@/creative_studio?host=/cloudsql/PROJECT:REGION:INSTANCE
+    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5")) # Per engine; the sync and async engines each keep a pool
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")) # Below the server's idle timeout
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True") == "True" # Replace connections the server dropped
+
     # GCS
     GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "creative-studio-assets")
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs") # gcs or local
+    LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "./local_storage")
+    SIGNED_URL_TTL_SECONDS = int(os.getenv("SIGNED_URL_TTL_SECONDS", "3600"))
+
+    # Emulated endpoints for load tests (benchmarks/emulator.py); unset in production
+    MODEL_API_BASE_URL = os.getenv("MODEL_API_BASE_URL") # Vertex AI / Gemini API requests go here instead
+    STORAGE_API_ENDPOINT = os.getenv("STORAGE_API_ENDPOINT") # GCS JSON API, also the host of signed URLs
+
+    # Orphaned blob garbage collection
+    GC_GRACE_HOURS = float(os.getenv("GC_GRACE_HOURS", "24"))
+    GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "100"))
+    GC_WORK_DIR = os.getenv("GC_WORK_DIR", "./gc_state")
+
+    # Reference image preprocessing (services/reference_images.py)
+    REFERENCE_MAX_EDGE = int(os.getenv("REFERENCE_MAX_EDGE", "1536"))
+    REFERENCE_QUALITY = int(os.getenv("REFERENCE_QUALITY", "85"))
+    REFERENCE_CACHE_MAX_BYTES = int(os.getenv("REFERENCE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    REFERENCE_USE_GCS_URI = os.getenv("REFERENCE_USE_GCS_URI", "True") == "True"
+
+    # Upload limits per request body (upload_limits.py) and spooling of uploaded files
+    UPLOAD_LIMIT_DEFAULT_BYTES = int(os.getenv("UPLOAD_LIMIT_DEFAULT_BYTES", str(25 * 1024 * 1024)))
+    UPLOAD_LIMIT_IMAGE_BYTES = int(os.getenv("UPLOAD_LIMIT_IMAGE_BYTES", str(100 * 1024 * 1024)))
+    UPLOAD_LIMIT_VIDEO_BYTES = int(os.getenv("UPLOAD_LIMIT_VIDEO_BYTES", str(1024 * 1024 * 1024)))
+    UPLOAD_LIMIT_DOCUMENT_BYTES = int(os.getenv("UPLOAD_LIMIT_DOCUMENT_BYTES", str(50 * 1024 * 1024)))
+    UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+    UPLOAD_INLINE_MAX_BYTES = int(os.getenv("UPLOAD_INLINE_MAX_BYTES", str(8 * 1024 * 1024))) # Larger files go to the model by reference
+
+    # Model-side context caching (services/context_cache.py)
+    CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "True") == "True"
+    CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024")) # Model minimum for explicit caching
+    CONTEXT_CACHE_RETRY_SECONDS = int(os.getenv("CONTEXT_CACHE_RETRY_SECONDS", "600")) # After a failed create
+    CONTEXT_CACHE_DISCOUNT = float(os.getenv("CONTEXT_CACHE_DISCOUNT", "0.75")) # Price reduction on cached input tokens
+    CONTEXT_CACHE_METRICS_WINDOW = int(os.getenv("CONTEXT_CACHE_METRICS_WINDOW", "500"))
+
+    # Idempotency-Key handling for generation/save endpoints (idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "1800")) # At most half of SIGNED_URL_TTL_SECONDS
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "900")) # How long a repeat waits on the in-flight request
+    IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "1")) # For requests in flight in another process
+    IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(10 * 1024 * 1024)))
+
+    # Negotiated gzip/brotli for API responses (compression.py)
+    RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    # Per-request levels: signed URLs (random signatures) make up most of a project payload, and
+    # higher levels spend 3-5x the CPU for bodies a few percent smaller
+    RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "1"))
+    RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "1"))
+
+    # Opt-in request profiling (profiling.py); off, and not installed, without a token
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") # Callers sending it as X-Profile-Token get profiled
+    PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "2"))
+    PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60")) # Sampling stops after this (SSE, video jobs)
+    PROFILING_MAX_CONCURRENT = int(os.getenv("PROFILING_MAX_CONCURRENT", "2")) # Per process; further requests run unprofiled
+
+    # Event loop lag monitor (loop_monitor.py)
+    LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "True") == "True"
+    LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100")) # Heartbeat period; lag is how late each one wakes
+    LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "250")) # Blocks longer than this are logged with their stack
+    LOOP_LAG_SHED_MS = float(os.getenv("LOOP_LAG_SHED_MS", "0")) # 503 new requests while recent lag exceeds this; 0 disables
+
+    # Renditions (thumbnails / video previews)
+    RENDITION_WORKERS = int(os.getenv("RENDITION_WORKERS", "2"))
+    FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+    # Video stitching (services/video_stitching.py)
+    STITCH_WORKERS = int(os.getenv("STITCH_WORKERS", "2"))
+    STITCH_MAX_CLIPS = int(os.getenv("STITCH_MAX_CLIPS", "50"))
+
+    # Bulk operations
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500")) # Ids or blob names per batch delete/sign
+    # Base64 images per /image-creation/save/batch: at ~2.5 MB each (a 1K PNG) a full batch fits
+    # the UPLOAD_LIMIT_IMAGE_BYTES body limit on that route
+    BATCH_SAVE_MAX_ITEMS = int(os.getenv("BATCH_SAVE_MAX_ITEMS", str(max(1, UPLOAD_LIMIT_IMAGE_BYTES // (5 * 1024 * 1024 // 2)))))
+    STORAGE_PARALLELISM = int(os.getenv("STORAGE_PARALLELISM", "16"))
+
+    # Storyboards (services/video_magic/storyboard.py)
+    STORYBOARD_MAX_SCENES = int(os.getenv("STORYBOARD_MAX_SCENES", "20"))
+    STORYBOARD_SCENE_MAX_ATTEMPTS = int(os.getenv("STORYBOARD_SCENE_MAX_ATTEMPTS", "3"))
+    STORYBOARD_KEYFRAME_CONCURRENCY = int(os.getenv("STORYBOARD_KEYFRAME_CONCURRENCY", "4")) # Keyframes generated at once per process
+
+    # Batch generation jobs
+    BATCH_JOB_MAX_ITEMS = int(os.getenv("BATCH_JOB_MAX_ITEMS", "10000"))
+    BATCH_JOB_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_JOB_DEFAULT_CONCURRENCY", "4"))
+    BATCH_JOB_MAX_CONCURRENCY = int(os.getenv("BATCH_JOB_MAX_CONCURRENCY", "16"))
+    BATCH_JOB_MAX_ATTEMPTS = int(os.getenv("BATCH_JOB_MAX_ATTEMPTS", "3"))
+    BATCH_JOB_LEASE_SECONDS = float(os.getenv("BATCH_JOB_LEASE_SECONDS", "60")) # A dead instance's jobs are resumed elsewhere after this
 
 config = Config()
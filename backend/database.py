@@ -1,19 +1,62 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+from backend.config import config
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+# asyncio driver per dialect, for the async session layer
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg", # psycopg 3 serves both engines; create_async_engine picks its asyncio mode
+    "mysql": "mysql+aiomysql",
+}
+
+def async_database_url(url: str) -> str:
+    """The same database with its asyncio driver, e.g. sqlite:///./app.db -> sqlite+aiosqlite:///./app.db"""
+    scheme, separator, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {dialect} databases")
+    return f"{ASYNC_DRIVERS[dialect]}{separator}{rest}"
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    create_engine arguments for the database: pool sizing, pre-ping and recycle for server
+    databases. SQLite keeps SQLAlchemy's defaults (a local file has no connections to manage).
+    """
+    if url.startswith("sqlite"):
+        return {} if is_async else {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async endpoints use these so queries and commits (SQLite fsyncs included) don't block the
+# event loop. Objects stay loaded after commit: lazy loads aren't possible outside the session.
+ASYNC_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
+    """Session for sync (def) endpoints, which FastAPI runs in its threadpool."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Session for async endpoints."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,333 @@
+"""
+Idempotency-Key support for generation and save endpoints.
+
+The first POST carrying a given Idempotency-Key claims it in the idempotency_keys table and
+runs; its response is stored and replayed (with an Idempotent-Replayed header) to any repeat
+with the same key until the key expires. Responses carry signed URLs, so they are replayed for
+at most half of the URLs' lifetime and replayed links stay usable for at least the other half.
+A repeat that arrives while the first request is still running waits for it instead of
+starting a second model run. Failed requests (5xx, 429, errors, disconnects) release the key
+so a retry executes again.
+
+Reusing a key for a different request (method, path, query or body) is rejected with 422.
+"""
+import json
+import time
+import asyncio
+import hashlib
+import datetime
+import tempfile
+from typing import Dict, Optional
+from sqlalchemy.exc import IntegrityError
+
+from backend import models
+from backend.config import config
+from backend.database import SessionLocal
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# Endpoints that honor the header (prefix match)
+IDEMPOTENT_PREFIXES = (
+    "/image-creation/generate",
+    "/image-creation/edit",
+    "/image-creation/save",
+    "/video-creation/generate",
+    "/video-creation/save",
+    "/video-magic/",
+    "/virtual-try-on/",
+    "/batch-jobs/",
+)
+
+TIMED_OUT = object()
+PURGE_INTERVAL_SECONDS = 300
+
+# Requests executing in this process: key -> set when the key is completed or released
+_in_flight: Dict[str, asyncio.Event] = {}
+_last_purge = 0.0
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _purge_expired(db):
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    deleted = db.query(models.IdempotencyKey).filter(models.IdempotencyKey.expires_at < _now()).delete(synchronize_session=False)
+    if deleted:
+        print(f"DEBUG: Purged {deleted} expired idempotency keys")
+
+
+def claim(key: str) -> bool:
+    """
+    Claims a key for execution. False if another request holds it or has completed it. Blocking.
+    In-flight claims expire after IDEMPOTENCY_WAIT_SECONDS so a crashed worker can't hold a key.
+    """
+    with SessionLocal() as db:
+        _purge_expired(db)
+        existing = db.get(models.IdempotencyKey, key)
+        if existing is not None:
+            if existing.expires_at >= _now():
+                db.commit()
+                return False
+            db.delete(existing)
+        db.commit()
+        db.add(models.IdempotencyKey(
+            key=key,
+            status="in_progress",
+            expires_at=_now() + datetime.timedelta(seconds=config.IDEMPOTENCY_WAIT_SECONDS),
+        ))
+        try:
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+
+
+def _response_ttl() -> int:
+    return min(config.IDEMPOTENCY_TTL_SECONDS, config.SIGNED_URL_TTL_SECONDS // 2)
+
+
+def complete(key: str, fingerprint: str, status: int, headers, body: bytes):
+    """Stores the response of a claimed key for replay. Blocking."""
+    with SessionLocal() as db:
+        record = db.get(models.IdempotencyKey, key)
+        if record is None:
+            return
+        record.fingerprint = fingerprint
+        record.status = "completed"
+        record.response_status = status
+        record.response_headers = json.dumps([[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers])
+        record.response_body = body
+        record.expires_at = _now() + datetime.timedelta(seconds=_response_ttl())
+        db.commit()
+
+
+def release(key: str):
+    """Drops a claimed key without storing a response, so the next request executes. Blocking."""
+    with SessionLocal() as db:
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.key == key, models.IdempotencyKey.status == "in_progress"
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+def load(key: str) -> Optional[dict]:
+    with SessionLocal() as db:
+        record = db.get(models.IdempotencyKey, key)
+        if record is None or record.expires_at < _now():
+            return None
+        return {
+            "status": record.status,
+            "fingerprint": record.fingerprint,
+            "response_status": record.response_status,
+            "response_headers": record.response_headers,
+            "response_body": record.response_body,
+        }
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for header_name, value in scope.get("headers", []):
+        if header_name == name:
+            return value.decode("latin-1")
+    return None
+
+
+class RequestFingerprint:
+    """
+    SHA-256 of the request line and body. Multipart boundaries are random per request, so they
+    are left out: the same form submitted twice gets the same fingerprint.
+    """
+
+    def __init__(self, scope):
+        self.digest = hashlib.sha256()
+        self.digest.update(f"{scope['method']} {scope['path']}?{scope.get('query_string', b'').decode('latin-1')}\n".encode("utf-8"))
+        content_type = _header(scope, b"content-type") or ""
+        boundary = content_type.partition("boundary=")[2].split(";")[0].strip().strip('"')
+        self.boundary = boundary.encode("latin-1") if content_type.startswith("multipart/") and boundary else None
+        self.pending = b""
+
+    def update(self, chunk: bytes):
+        if self.boundary is None:
+            self.digest.update(chunk)
+            return
+        data = (self.pending + chunk).replace(self.boundary, b"")
+        # A boundary split across chunks starts within the last len(boundary) - 1 bytes
+        keep = len(self.boundary) - 1
+        self.pending = data[-keep:] if keep else b""
+        self.digest.update(data[:len(data) - len(self.pending)])
+
+    def hexdigest(self) -> str:
+        self.digest.update(self.pending)
+        self.pending = b""
+        return self.digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(IDEMPOTENT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = _header(scope, HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._respond(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+            return
+
+        body = None  # This request's body, read only when it has to wait on another request
+        fingerprint = None
+        try:
+            while True:
+                if await asyncio.to_thread(claim, key):
+                    await self._execute(key, scope, self._replay_body(body, receive) if body is not None else receive, send)
+                    return
+
+                if body is None:
+                    body, fingerprint = await self._read_body(scope, receive)
+                record = await self._wait(key)
+                if record is None:
+                    continue  # The first request failed and released the key: run this one
+                if record is TIMED_OUT:
+                    await self._respond(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"})
+                    return
+                if record["fingerprint"] != fingerprint:
+                    await self._respond(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+                    return
+                await self._replay(send, record)
+                return
+        finally:
+            if body is not None:
+                body.close()
+
+    async def _execute(self, key: str, scope, receive, send):
+        digest = RequestFingerprint(scope)
+        body_complete = False
+        response = {"status": None, "headers": [], "chunks": [], "size": 0}
+
+        async def hashing_receive():
+            nonlocal body_complete
+            message = await receive()
+            if message["type"] == "http.request":
+                digest.update(message.get("body", b""))
+                body_complete = not message.get("more_body", False)
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response["size"] += len(chunk)
+                if response["size"] <= config.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    response["chunks"].append(chunk)
+            await send(message)
+
+        event = _in_flight[key] = asyncio.Event()
+        stored = False
+        try:
+            await self.app(scope, hashing_receive, capturing_send)
+            status = response["status"]
+            if status is not None and status < 500 and status != 429 and response["size"] <= config.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                while not body_complete:
+                    # The handler didn't read the whole body: finish it for the fingerprint
+                    message = await hashing_receive()
+                    if message["type"] == "http.disconnect":
+                        break
+                if body_complete:
+                    await asyncio.to_thread(complete, key, digest.hexdigest(), status, response["headers"], b"".join(response["chunks"]))
+                    stored = True
+            elif response["size"] > config.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                print(f"DEBUG: Response for idempotency key on {scope['path']} too large to store ({response['size']} bytes)")
+        finally:
+            try:
+                if not stored:
+                    # Shielded so a cancelled request still frees its key
+                    await asyncio.shield(asyncio.to_thread(release, key))
+            finally:
+                _in_flight.pop(key, None)
+                event.set()
+
+    async def _wait(self, key: str):
+        """Waits for the request holding the key. Returns its record, None if it was released, or TIMED_OUT."""
+        deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            event = _in_flight.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=config.IDEMPOTENCY_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(config.IDEMPOTENCY_POLL_SECONDS)
+            record = await asyncio.to_thread(load, key)
+            if record is None or record["status"] == "completed":
+                return record
+            if time.monotonic() > deadline:
+                return TIMED_OUT
+
+    @staticmethod
+    async def _read_body(scope, receive):
+        """Reads a waiting request's body into a spool, hashing it for the fingerprint."""
+        digest = RequestFingerprint(scope)
+        body = tempfile.SpooledTemporaryFile(max_size=config.UPLOAD_SPOOL_MEMORY_BYTES)
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            digest.update(chunk)
+            body.write(chunk)
+            if not message.get("more_body", False):
+                break
+        body.seek(0)
+        return body, digest.hexdigest()
+
+    @staticmethod
+    def _replay_body(body, receive):
+        """Feeds a spooled body to the app, then hands over to the client's receive (disconnects)."""
+        chunk_size = 1024 * 1024
+        done = False
+
+        async def replay_receive():
+            nonlocal done
+            if done:
+                return await receive()
+            chunk = body.read(chunk_size)
+            done = len(chunk) < chunk_size
+            return {"type": "http.request", "body": chunk, "more_body": not done}
+
+        return replay_receive
+
+    @staticmethod
+    async def _replay(send, record: dict):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(record["response_headers"] or "[]")]
+        await send({
+            "type": "http.response.start",
+            "status": record["response_status"],
+            "headers": headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": record["response_body"] or b""})
+
+    @staticmethod
+    async def _respond(send, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,242 @@
+"""
+Event loop lag monitor and blocking detector.
+
+A heartbeat task sleeps LOOP_MONITOR_INTERVAL_MS at a time on the loop; how late each wakeup
+is (the scheduling delay every coroutine sees at that moment) goes into a histogram. A
+watchdog thread notices when the heartbeat is overdue by more than LOOP_BLOCK_THRESHOLD_MS
+and captures the loop thread's stack at that moment: the sync call that holds the loop (a
+model call, a GCS upload, urlopen, a DB commit), along with the request it was serving.
+Both are exported at /metrics/event-loop (JSON, or Prometheus text with ?format=prometheus).
+
+With LOOP_LAG_SHED_MS set, new requests get 503 while the recent lag is above it, so a
+saturated worker stops taking on work it can't schedule; health and metrics stay reachable.
+Each worker process monitors its own loop.
+"""
+import sys
+import time
+import asyncio
+import datetime
+import threading
+import traceback
+from collections import deque
+from typing import Dict, Optional
+
+from backend.config import config
+
+# Histogram bucket upper bounds in milliseconds
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MAX_STACK_FRAMES = 30
+RECENT_BLOCKS = 50
+# Heartbeats that make up the "recent lag" used for shedding
+RECENT_BEATS = 5
+SHED_EXEMPT_PREFIXES = ("/health", "/metrics/")
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms: float = None, threshold_ms: float = None):
+        self.interval = (interval_ms or config.LOOP_MONITOR_INTERVAL_MS) / 1000
+        self.threshold_ms = threshold_ms or config.LOOP_BLOCK_THRESHOLD_MS
+        self.loop = None
+        self.requests = {} # Task -> "METHOD /path" while it serves a request (LoopLagMiddleware)
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bucket_counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+            self.count = 0
+            self.sum_ms = 0.0
+            self.max_ms = 0.0
+            self.blocks = 0
+            self.shed = 0
+            self.recent_blocks = deque(maxlen=RECENT_BLOCKS)
+            self._recent_lags = deque(maxlen=RECENT_BEATS)
+            self._current_block = None
+        self._last_beat = time.monotonic()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts monitoring the running loop (call from it, e.g. at app startup)."""
+        if self._heartbeat is not None and not self._heartbeat.done():
+            return
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = self.loop.create_task(self._beat(), name="loop-monitor-heartbeat")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    # --- Measuring ---
+
+    def observe(self, lag_ms: float):
+        with self._lock:
+            index = next((i for i, bound in enumerate(LAG_BUCKETS_MS) if lag_ms <= bound), len(LAG_BUCKETS_MS))
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum_ms += lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            self._recent_lags.append(lag_ms)
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag_ms = max(0.0, now - expected) * 1000
+            self.observe(lag_ms)
+            if lag_ms >= self.threshold_ms or self._current_block is not None:
+                self._end_block(lag_ms)
+
+    def _end_block(self, lag_ms: float):
+        with self._lock:
+            self.blocks += 1
+            block = self._current_block
+            self._current_block = None
+            if block is None:
+                # Shorter than the watchdog's check period: no stack, but still counted
+                block = {"at": datetime.datetime.utcnow().isoformat() + "Z", "request": None, "task": None, "stack": None}
+                self.recent_blocks.append(block)
+            block["blocked_ms"] = round(lag_ms, 1)
+        print(f"WARNING: Event loop blocked for {lag_ms:.0f} ms" + (f" serving {block['request']}" if block["request"] else ""))
+
+    def _watch(self):
+        # Checks often enough to catch the loop mid-block, without spinning
+        period = max(self.threshold_ms / 4, 5) / 1000
+        while not self._stopped.wait(period):
+            overdue_ms = (time.monotonic() - self._last_beat - self.interval) * 1000
+            if overdue_ms < self.threshold_ms or self._current_block is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self.loop)
+            stack = traceback.format_stack(frame)[-MAX_STACK_FRAMES:]
+            block = {
+                "at": datetime.datetime.utcnow().isoformat() + "Z",
+                "request": self.requests.get(task) if task is not None else None,
+                "task": task.get_name() if task is not None else None,
+                "stack": [line.rstrip() for line in stack],
+                "blocked_ms": None, # Filled in when the loop comes back
+            }
+            with self._lock:
+                if self._last_beat + self.interval + self.threshold_ms / 1000 > time.monotonic():
+                    continue # The loop came back while the stack was being taken
+                self._current_block = block
+                self.recent_blocks.append(block)
+            print(f"WARNING: Event loop blocked for over {overdue_ms:.0f} ms"
+                  + (f" serving {block['request']}" if block["request"] else "") + ". Blocking stack:\n" + "".join(stack))
+
+    # --- Reading ---
+
+    def recent_lag_ms(self) -> float:
+        """Worst lag of the last few heartbeats, or the current stall if the loop is overdue now."""
+        overdue_ms = (time.monotonic() - self._last_beat - self.interval) * 1000
+        return max([overdue_ms, *self._recent_lags], default=0.0)
+
+    def percentile_ms(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (coarse, like any histogram quantile)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, bucket in zip(LAG_BUCKETS_MS + (None,), self.bucket_counts):
+            seen += bucket
+            if seen >= rank:
+                return float(bound) if bound is not None else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def stats(self, include_stacks: bool = False) -> Dict:
+        """
+        Lag histogram and counters. Recent blocks only carry their stack and request (source
+        paths, request paths) with include_stacks, for callers holding the profiling token.
+        """
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, bucket in zip(LAG_BUCKETS_MS, self.bucket_counts):
+                cumulative += bucket
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self.count
+            recent_blocks = [
+                dict(block) if include_stacks else {k: v for k, v in block.items() if k not in ("stack", "request")}
+                for block in self.recent_blocks
+            ]
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold_ms,
+            "lag_ms": {
+                "count": self.count, "sum": round(self.sum_ms, 1), "max": round(self.max_ms, 1),
+                "mean": round(self.sum_ms / self.count, 2) if self.count else None,
+                "p50": self.percentile_ms(0.5), "p99": self.percentile_ms(0.99),
+                "recent": round(self.recent_lag_ms(), 1),
+                "buckets": buckets, # Cumulative: heartbeats with lag <= bound
+            },
+            "blocks": self.blocks,
+            "shed_requests": self.shed,
+            "recent_blocks": recent_blocks,
+        }
+
+    def prometheus(self) -> str:
+        stats = self.stats()
+        lines = ["# HELP event_loop_lag_seconds Scheduling delay of the event loop heartbeat.", "# TYPE event_loop_lag_seconds histogram"]
+        for bound, cumulative in stats["lag_ms"]["buckets"].items():
+            le = bound if bound == "+Inf" else f"{float(bound) / 1000:g}"
+            lines.append(f'event_loop_lag_seconds_bucket{{le="{le}"}} {cumulative}')
+        lines += [
+            f"event_loop_lag_seconds_sum {self.sum_ms / 1000:.6f}",
+            f"event_loop_lag_seconds_count {self.count}",
+            "# HELP event_loop_blocks_total Heartbeats later than the blocking threshold.",
+            "# TYPE event_loop_blocks_total counter",
+            f"event_loop_blocks_total {self.blocks}",
+            "# HELP event_loop_shed_requests_total Requests rejected while the loop lagged.",
+            "# TYPE event_loop_shed_requests_total counter",
+            f"event_loop_shed_requests_total {self.shed}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMiddleware:
+    """
+    Tags each request's task with its method and path, for the blocking reports, and sheds new
+    requests with 503 while the loop lags more than LOOP_LAG_SHED_MS (when set).
+    """
+
+    def __init__(self, app, monitor: Optional[LoopMonitor] = None, shed_ms: Optional[float] = None):
+        self.app = app
+        self.monitor = monitor or loop_monitor
+        self.shed_ms = config.LOOP_LAG_SHED_MS if shed_ms is None else shed_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.shed_ms and not scope["path"].startswith(SHED_EXEMPT_PREFIXES):
+            lag_ms = self.monitor.recent_lag_ms()
+            if lag_ms > self.shed_ms:
+                self.monitor.shed += 1
+                await send({"type": "http.response.start", "status": 503, "headers": [
+                    (b"content-type", b"application/json"), (b"retry-after", b"1"),
+                ]})
+                await send({"type": "http.response.body", "body": f'{{"detail":"Server busy (event loop lag {lag_ms:.0f} ms), retry shortly"}}'.encode()})
+                return
+
+        task = asyncio.current_task()
+        self.monitor.requests[task] = f"{scope['method']} {scope['path']}"
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.requests.pop(task, None)
+
+
+loop_monitor = LoopMonitor()
@@ -1,7 +1,7 @@
 import os
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,6 +9,21 @@ load_dotenv()
 
 app = FastAPI(title="Creative Studio")
 
+# Idempotency-Key replay for generation/save endpoints (innermost: oversized bodies are rejected first)
+from backend.idempotency import IdempotencyMiddleware
+app.add_middleware(IdempotencyMiddleware)
+
+# Per-endpoint upload size limits (added first so CORS headers still wrap 413 responses)
+from backend.upload_limits import UploadLimitMiddleware
+app.add_middleware(UploadLimitMiddleware)
+
+# Event loop lag monitor: tags requests for blocking reports and optionally sheds load while
+# the loop lags (inside CORS, so 503s still carry CORS headers)
+from backend.config import config
+if config.LOOP_MONITOR_ENABLED:
+    from backend.loop_monitor import LoopLagMiddleware
+    app.add_middleware(LoopLagMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -18,12 +33,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for API payloads (outermost: idempotent replays are stored uncompressed and
+# negotiated per request)
+from backend.compression import CompressionMiddleware
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in per-request profiling (outermost, so the whole request is sampled); only installed
+# when PROFILING_TOKEN is set
+if config.PROFILING_TOKEN:
+    from backend.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
 from backend.routers import virtual_tryon, image_creation, video_creation, projects, context, video_magic
 from backend import models
 from backend.database import engine
 
 models.Base.metadata.create_all(bind=engine)
 
+# Content-addressed asset context (services/context_snapshots.py); existing rows are moved
+# over in the background while the app serves
+import threading
+from backend.services.context_snapshots import ensure_context_hash_column, backfill_context_snapshots
+ensure_context_hash_column(engine)
+threading.Thread(target=backfill_context_snapshots, args=(engine,), daemon=True).start()
+
+# Rendition blob names (services/renditions.py), for databases created before renditions
+from backend.services.renditions import ensure_renditions_column
+ensure_renditions_column(engine)
+
+# Unique script version numbers (services/video_magic/script_store.py)
+from backend.services.video_magic.script_store import ensure_script_version_unique
+ensure_script_version_unique(engine)
+
+# Batch job lease columns (services/batch_jobs.py)
+from backend.services.batch_jobs import ensure_batch_job_lease_columns
+ensure_batch_job_lease_columns(engine)
+
+# Full-text search tables and sync triggers (services/search.py)
+from backend.services.search import ensure_search_index
+ensure_search_index(engine)
+
+# Build maintained project summaries for databases created before they existed
+from backend.database import SessionLocal
+from backend.services.project_summary import backfill_project_summaries
+with SessionLocal() as db:
+    backfill_project_summaries(db)
+
 app.include_router(virtual_tryon.router)
 app.include_router(image_creation.router)
 app.include_router(video_creation.router)
@@ -32,12 +87,66 @@ from backend.routers import assets
 app.include_router(assets.router)
 app.include_router(context.router)
 app.include_router(video_magic.router)
+from backend.routers import batch_jobs
+app.include_router(batch_jobs.router)
+from backend.routers import search
+app.include_router(search.router)
+if config.PROFILING_TOKEN:
+    from backend.routers import profiles
+    app.include_router(profiles.router)
+
+# Coalesced duplicate model calls (services/single_flight.py); registered before the frontend mount at "/"
+@app.get("/metrics/single-flight")
+async def single_flight_stats():
+    from backend.services.single_flight import single_flight
+    return single_flight.stats()
+
+# Model routing decisions, fallbacks and live per-model latency (services/model_router.py)
+@app.get("/metrics/model-router")
+async def model_router_stats():
+    from backend.services.model_router import model_router
+    return model_router.stats()
+
+# Event loop lag histogram (loop_monitor.py); ?format=prometheus for scraping. Blocking stacks
+# and the requests they held are only included with the profiling token (X-Profile-Token)
+@app.get("/metrics/event-loop")
+async def event_loop_stats(format: str = "json", x_profile_token: Optional[str] = Header(None), profile_token: Optional[str] = None):
+    from backend.loop_monitor import loop_monitor
+    if format == "prometheus":
+        from fastapi.responses import PlainTextResponse
+        return PlainTextResponse(loop_monitor.prometheus(), media_type="text/plain; version=0.0.4")
+    from backend.profiling import token_matches
+    return loop_monitor.stats(include_stacks=token_matches(x_profile_token or profile_token))
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if config.LOOP_MONITOR_ENABLED:
+        from backend.loop_monitor import loop_monitor
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    from backend.loop_monitor import loop_monitor
+    loop_monitor.stop()
+
+@app.on_event("startup")
+async def resume_batch_jobs():
+    # Jobs interrupted by a crash or redeploy pick up where their checkpoint left off, on
+    # whichever instance claims them first
+    from backend.services.batch_jobs import resume_interrupted_jobs
+    resume_interrupted_jobs()
 
 # Serve frontend static files
-# Mount the frontend directory to serve static files
+# Files are fingerprinted, pre-compressed and cached once at startup (see backend/static_assets.py)
 # We use absolute path relative to this file to ensure it works regardless of CWD
+from backend.static_assets import FrontendAssets
+if config.STORAGE_BACKEND == "local":
+    # Signed URLs from the local storage stand-in point here
+    from fastapi.staticfiles import StaticFiles
+    os.makedirs(config.LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount("/local-storage", StaticFiles(directory=config.LOCAL_STORAGE_DIR), name="local-storage")
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
-app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
+app.mount("/", FrontendAssets(frontend_path), name="static")
 
 @app.get("/health")
 async def health_check():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -30,22 +30,32 @@ class Asset(Base):
     __tablename__ = "assets"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     type = Column(String) # image, video, tryon
     url = Column(String)
     prompt = Column(Text, nullable=True)
     model_type = Column(String, nullable=True)
     context_version = Column(String, nullable=True)
-    context_data = Column(Text, nullable=True)
+    context_data = Column(Text, nullable=True) # Moved to context_snapshots on write (see services/context_snapshots.py)
+    context_hash = Column(String, ForeignKey("context_snapshots.hash"), nullable=True, index=True)
+    renditions = Column(Text, nullable=True) # JSON: rendition name -> blob name (see services/renditions.py)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     project = relationship("Project", back_populates="assets")
 
+class ContextSnapshot(Base):
+    __tablename__ = "context_snapshots"
+
+    # Context text assets were generated with, stored once per distinct content
+    hash = Column(String, primary_key=True) # SHA-256 of content
+    content = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class ContextVersion(Base):
     __tablename__ = "context_versions"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     name = Column(String)
     description = Column(String, nullable=True)
     
@@ -66,5 +76,122 @@ class ContextVersion(Base):
 
     project = relationship("Project", back_populates="context_versions")
 
+class ProjectSummary(Base):
+    __tablename__ = "project_summaries"
+
+    # Maintained incrementally on asset insert/delete (see services/project_summary.py)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    asset_count = Column(Integer, default=0, nullable=False)
+    image_count = Column(Integer, default=0, nullable=False)
+    video_count = Column(Integer, default=0, nullable=False)
+    tryon_count = Column(Integer, default=0, nullable=False)
+    last_activity_at = Column(DateTime, nullable=True)
+    cover_asset_id = Column(Integer, nullable=True)
+    cover_asset_url = Column(String, nullable=True) # Blob name of the cover asset
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    status = Column(String, default="pending", index=True) # pending, running, completed, failed, cancelled
+    model_name = Column(String, nullable=True)
+    style = Column(Text, nullable=True)
+    references = Column(Text, nullable=True) # JSON: group (style/product/scene/reference) -> [{blob_name, mime_type}]
+    context_version = Column(String, nullable=True)
+    context_data = Column(Text, nullable=True)
+    concurrency = Column(Integer, default=4)
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    # Process running the job, until its lease expires (see services/batch_jobs.py)
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    items = relationship("BatchJobItem", back_populates="job")
+
+class BatchJobItem(Base):
+    __tablename__ = "batch_job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("batch_jobs.id", ondelete="CASCADE"), index=True)
+    position = Column(Integer) # Row number in the uploaded file
+    prompt = Column(Text)
+    item_metadata = Column(Text, nullable=True) # JSON: extra CSV/JSONL columns (e.g. sku, scene)
+    status = Column(String, default="pending", index=True) # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    asset_id = Column(Integer, ForeignKey("assets.id", ondelete="SET NULL"), nullable=True)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    job = relationship("BatchJob", back_populates="items")
+
+class Script(Base):
+    __tablename__ = "scripts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True, index=True)
+    prompt = Column(Text)
+    context = Column(Text, nullable=True) # Brand context the script was written against
+    current_version = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    versions = relationship("ScriptVersion", back_populates="script", order_by="ScriptVersion.version")
+
+class ScriptVersion(Base):
+    __tablename__ = "script_versions"
+    # Concurrent edits can't both take the next version number (see services/video_magic/script_store.py)
+    __table_args__ = (UniqueConstraint("script_id", "version", name="uq_script_versions_script_id_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    script_id = Column(Integer, ForeignKey("scripts.id", ondelete="CASCADE"), index=True)
+    version = Column(Integer)
+    global_elements = Column(Text, nullable=True) # JSON: element name -> description
+    instructions = Column(Text, nullable=True) # Edit instructions that produced this version (none for the first)
+    edit_mode = Column(String, nullable=True) # patch, full
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    script = relationship("Script", back_populates="versions")
+    scenes = relationship("Scene", back_populates="script_version", order_by="Scene.position")
+
+class Scene(Base):
+    __tablename__ = "scenes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    script_version_id = Column(Integer, ForeignKey("script_versions.id", ondelete="CASCADE"), index=True)
+    position = Column(Integer)
+    visual = Column(Text)
+    audio = Column(Text, nullable=True)
+    content_hash = Column(String, index=True) # Scene text + global elements (see services/video_magic/script_store.py)
+
+    script_version = relationship("ScriptVersion", back_populates="scenes")
+
+class SceneRender(Base):
+    __tablename__ = "scene_renders"
+
+    # Rendered clip for a scene content hash under specific render settings
+    render_key = Column(String, primary_key=True)
+    content_hash = Column(String, index=True)
+    blob_name = Column(String)
+    keyframe_blob_name = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Idempotency-Key header value; the stored response is replayed to repeats (see idempotency.py)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=True) # Method, path, query and body hash of the first request
+    status = Column(String, default="in_progress") # in_progress, completed
+    response_status = Column(Integer, nullable=True)
+    response_headers = Column(Text, nullable=True) # JSON: [[name, value], ...]
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
 # Update Project relationship
 Project.context_versions = relationship("ContextVersion", back_populates="project")
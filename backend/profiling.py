@@ -0,0 +1,224 @@
+"""
+Opt-in sampling profiler for single requests.
+
+A request carrying X-Profile-Token (or ?profile_token=) equal to PROFILING_TOKEN is profiled:
+a sampler thread snapshots the interpreter's stacks every PROFILING_INTERVAL_MS until the
+response is sent. The profile is stored as a speedscope file under profiles/ in the bucket
+(any instance can serve it; blob_gc removes it after its grace period) and the response
+carries X-Profile-Id to fetch it from /debug/profiles/{id} (routers/profiles.py).
+
+Samples are wall-clock. On the event loop thread they are split by what the loop was running:
+this request's task, "(other tasks)" (the stacks of requests that held the loop meanwhile) or
+"(idle: awaiting I/O)". Worker threads (sync endpoints, asyncio.to_thread, the storage pool)
+get a profile each if they did anything during the request; with concurrent traffic these can
+include other requests' work. Without PROFILING_TOKEN the middleware is not installed at all.
+"""
+import sys
+import hmac
+import json
+import time
+import uuid
+import asyncio
+import datetime
+import threading
+from typing import List, Optional
+
+from backend.config import config
+
+PROFILE_PREFIX = "profiles/"
+MAX_STACK_DEPTH = 200
+# Innermost frames of a thread that is parked, not working
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "concurrent/futures/thread.py")
+IDLE = "(idle: awaiting I/O)"
+OTHER_TASKS = "(other tasks)"
+NO_TASK = "(event loop callbacks)"
+
+
+def token_matches(token: Optional[str]) -> bool:
+    return bool(config.PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, config.PROFILING_TOKEN)
+
+
+def profile_blob_name(profile_id: str) -> str:
+    return f"{PROFILE_PREFIX}{profile_id}.speedscope.json"
+
+
+def _is_idle(frame) -> bool:
+    return frame.f_code.co_filename.replace("\\", "/").endswith(IDLE_FILES)
+
+
+class Sampler(threading.Thread):
+    """Samples every thread's stack until stopped. Frames are interned as speedscope frames."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: Optional[asyncio.Task], interval: float, max_seconds: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop = loop
+        self.task = task
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.frames = []
+        self._frame_index = {}
+        self.threads = {} # Thread id -> {"samples": [...], "weights": [...], "busy": bool}
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self._stopped = threading.Event()
+
+    def halt(self):
+        self._stopped.set()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def _frame(self, name: str, file: str = None, line: int = None) -> int:
+        key = (name, file, line)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            frame = {"name": name}
+            if file:
+                frame.update(file=file, line=line)
+            self.frames.append(frame)
+        return index
+
+    def _stack(self, frame) -> List[int]:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(self._frame(getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse() # Outermost first
+        return stack
+
+    def _record(self, thread_id: int, stack: List[int], weight: float, busy: bool):
+        thread = self.threads.setdefault(thread_id, {"samples": [], "weights": [], "busy": False})
+        thread["samples"].append(stack)
+        thread["weights"].append(weight)
+        thread["busy"] = thread["busy"] or busy
+
+    def run(self):
+        own_id = threading.get_ident()
+        last = self.started
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = (now - last) * 1000, now
+            current = asyncio.current_task(self.loop)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id == self.loop_thread_id:
+                    if current is self.task:
+                        stack = self._stack(frame)
+                    elif current is not None:
+                        stack = [self._frame(OTHER_TASKS)] + self._stack(frame)
+                    elif _is_idle(frame):
+                        stack = [self._frame(IDLE)]
+                    else:
+                        stack = [self._frame(NO_TASK)] + self._stack(frame)
+                    self._record(thread_id, stack, weight, True)
+                else:
+                    self._record(thread_id, self._stack(frame), weight, not _is_idle(frame))
+            if now - self.started > self.max_seconds:
+                break
+        self.duration = (time.perf_counter() - self.started) * 1000
+
+    def speedscope(self, name: str, metadata: dict) -> dict:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        profiles = []
+        for thread_id, thread in self.threads.items():
+            if not thread["busy"]:
+                continue
+            label = "event loop" if thread_id == self.loop_thread_id else names.get(thread_id, f"thread {thread_id}")
+            profiles.append({
+                "type": "sampled", "name": label, "unit": "milliseconds", "startValue": 0,
+                "endValue": round(sum(thread["weights"]), 3),
+                "samples": thread["samples"], "weights": [round(weight, 3) for weight in thread["weights"]],
+            })
+        # The event loop first: speedscope opens the first profile
+        profiles.sort(key=lambda profile: profile["name"] != "event loop")
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "creative-studio",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+            "metadata": metadata,
+        }
+
+
+def collapsed(profile: dict) -> str:
+    """Folded stacks ("thread;outer;inner microseconds"), for flamegraph.pl and similar tools."""
+    frames = profile["shared"]["frames"]
+    totals = {}
+    for thread in profile["profiles"]:
+        for stack, weight in zip(thread["samples"], thread["weights"]):
+            line = ";".join([thread["name"]] + [frames[index]["name"] for index in stack])
+            totals[line] = totals.get(line, 0) + weight
+    return "".join(f"{line} {round(total * 1000)}\n" for line, total in sorted(totals.items()))
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+
+    def _requested_token(self, scope) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key == b"x-profile-token":
+                return value.decode("latin-1")
+        if b"profile_token=" in scope.get("query_string", b""):
+            from urllib.parse import parse_qs
+            return parse_qs(scope["query_string"].decode("latin-1")).get("profile_token", [None])[0]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not token_matches(self._requested_token(scope)):
+            await self.app(scope, receive, send)
+            return
+        if self.active >= config.PROFILING_MAX_CONCURRENT:
+            print(f"DEBUG: Not profiling {scope['path']}: {self.active} profiles already running")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        sampler = Sampler(asyncio.get_running_loop(), asyncio.current_task(), config.PROFILING_INTERVAL_MS / 1000, config.PROFILING_MAX_SECONDS)
+        status = None
+        finished = False
+
+        async def profiled_send(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+            await send(message)
+            if finished:
+                # Background tasks after the response are not part of it
+                sampler.halt()
+
+        self.active += 1
+        started_at = datetime.datetime.utcnow()
+        sampler.start()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            # Stopped before the upload, so storing the profile isn't part of it
+            await asyncio.to_thread(sampler.stop)
+            self.active -= 1
+            metadata = {
+                "id": profile_id, "method": scope["method"], "path": scope["path"], "status": status,
+                "completed": finished, "started_at": started_at.isoformat() + "Z",
+                "duration_ms": round(sampler.duration, 1), "interval_ms": config.PROFILING_INTERVAL_MS,
+            }
+            await asyncio.to_thread(self._store, sampler, profile_id, metadata)
+
+    def _store(self, sampler: Sampler, profile_id: str, metadata: dict):
+        from backend.services.storage import upload_bytes
+        try:
+            profile = sampler.speedscope(f"{metadata['method']} {metadata['path']}", metadata)
+            upload_bytes(json.dumps(profile).encode(), profile_blob_name(profile_id), content_type="application/json")
+            print(f"DEBUG: Stored profile {profile_id} for {metadata['method']} {metadata['path']} ({metadata['duration_ms']} ms)")
+        except Exception as e:
+            print(f"Error storing profile {profile_id}: {e}")
@@ -14,3 +14,23 @@ VIDEO_SCRIPT_EDITOR_PROMPT = """
     Please modify the script according to the instructions. Maintain the same JSON structure (array of objects with "visual" and "audio").
     Return ONLY the JSON array.
 """
+
+VIDEO_SCRIPT_PATCH_PROMPT = """
+    You are an expert video script editor. Apply the user's instructions to the script below by
+    returning ONLY the changes, never the unchanged parts.
+
+    Current Script (JSON; scenes are numbered by "index", starting at 0):
+    {current_script_json}
+
+    User Instructions for Edit:
+    {instructions}
+
+    Return ONLY a JSON object with these keys:
+    - "global_elements": an object with only the global element keys whose value changes (empty object if none).
+    - "scenes": a list of scene operations (empty list if no scene changes). Each operation is an object with:
+        - "op": "update", "insert" or "delete"
+        - "index": the index of the scene in the CURRENT script. For "insert", the new scene is placed before
+          this index (use the number of scenes to append at the end).
+        - "visual" / "audio": the new text, only for fields that change ("update") or for the new scene ("insert").
+    Only touch scenes the instructions actually affect.
+"""
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
+from pydantic import BaseModel
 
-from .. import models, schemas, database
+from .. import models, schemas
+from ..database import get_db
+from ..config import config
+from ..services.assets import delete_assets, referenced_blob_names
 
 router = APIRouter(
     prefix="/assets",
@@ -10,19 +14,45 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class BatchDeleteRequest(BaseModel):
+    asset_ids: List[int]
+
+class BatchSignRequest(BaseModel):
+    blob_names: List[str]
+
+def check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {config.BATCH_MAX_ITEMS} items")
+
+@router.post("/batch/delete")
+def delete_assets_batch(request: BatchDeleteRequest, db: Session = Depends(get_db)):
+    """
+    Deletes many assets and their blobs in one call. Reports a result per asset id.
+    """
+    check_batch_size(request.asset_ids)
+    results = delete_assets(db, request.asset_ids)
+    return {"results": results}
+
+@router.post("/batch/sign")
+def sign_blobs_batch(request: BatchSignRequest, db: Session = Depends(get_db)):
+    """
+    Returns signed URLs for many blobs in one call. Only blobs of an asset (its original or a
+    rendition) are signed; anything else in the bucket (e.g. profiles/) gets "not_found".
+    """
+    from backend.services.storage import generate_signed_urls
+    check_batch_size(request.blob_names)
+    referenced = referenced_blob_names(db, request.blob_names)
+    signed = generate_signed_urls(sorted(referenced), max_workers=config.STORAGE_PARALLELISM)
+    return {"results": [
+        {"blob_name": name, "url": signed.get(name), "status": "signed" if name in referenced else "not_found"}
+        for name in request.blob_names
+    ]}
 
 @router.delete("/{asset_id}")
 def delete_asset(asset_id: int, db: Session = Depends(get_db)):
-    asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
-    if asset is None:
+    result = delete_assets(db, [asset_id])[0]
+    if result["status"] == "not_found":
         raise HTTPException(status_code=404, detail="Asset not found")
-    
-    db.delete(asset)
-    db.commit()
     return {"status": "success"}
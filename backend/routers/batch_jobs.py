@@ -0,0 +1,149 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+import json
+
+from backend import models
+from backend.config import config
+from backend.database import get_db, get_async_db, AsyncSessionLocal
+from backend.services import batch_jobs
+
+router = APIRouter(
+    prefix="/batch-jobs",
+    tags=["Batch Jobs"]
+)
+
+def get_job_or_404(db: Session, job_id: int) -> models.BatchJob:
+    job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+@router.post("/")
+async def create_batch_job(
+    prompts_file: UploadFile = File(...), # CSV with a "prompt" column, or JSONL
+    project_id: int = Form(...),
+    model_name: Optional[str] = Form(config.MODEL_IMAGE_FAST),
+    style: Optional[str] = Form(None),
+    concurrency: int = Form(config.BATCH_JOB_DEFAULT_CONCURRENCY),
+    context_version: Optional[str] = Form(None),
+    context_data: Optional[str] = Form(None),
+    reference_images: List[UploadFile] = File(None),
+    style_images: List[UploadFile] = File(None),
+    product_images: List[UploadFile] = File(None),
+    scene_images: List[UploadFile] = File(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Creates a catalog-scale generation job: every prompt row is rendered against the same
+    shared reference images and saved as an Asset. Runs in the background; poll or stream progress.
+    """
+    try:
+        rows = batch_jobs.parse_prompt_rows(await prompts_file.read(), prompts_file.filename)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid prompts file: {e}")
+    if not rows:
+        raise HTTPException(status_code=400, detail="Prompts file is empty")
+    if len(rows) > config.BATCH_JOB_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch job exceeds {config.BATCH_JOB_MAX_ITEMS} prompts")
+    if not await db.get(models.Project, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    try:
+        job = await batch_jobs.create_job(
+            db,
+            project_id,
+            rows,
+            references={
+                "style": style_images,
+                "product": product_images,
+                "scene": scene_images,
+                "reference": reference_images,
+            },
+            model_name=model_name,
+            style=style,
+            concurrency=concurrency,
+            context_version=context_version,
+            context_data=context_data,
+        )
+        batch_jobs.start_job(job.id)
+        return batch_jobs.job_snapshot(db, job)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{job_id}")
+def read_batch_job(job_id: int, db: Session = Depends(get_db)):
+    return batch_jobs.job_snapshot(db, get_job_or_404(db, job_id))
+
+@router.get("/{job_id}/items")
+def read_batch_job_items(job_id: int, status: Optional[str] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    get_job_or_404(db, job_id)
+    query = db.query(models.BatchJobItem).filter(models.BatchJobItem.job_id == job_id)
+    if status:
+        query = query.filter(models.BatchJobItem.status == status)
+    items = query.order_by(models.BatchJobItem.position).offset(skip).limit(limit).all()
+    return [
+        {
+            "position": item.position,
+            "prompt": item.prompt,
+            "metadata": json.loads(item.item_metadata) if item.item_metadata else {},
+            "status": item.status,
+            "attempts": item.attempts,
+            "asset_id": item.asset_id,
+            "error": item.error,
+        }
+        for item in items
+    ]
+
+@router.get("/{job_id}/events")
+async def stream_batch_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-sent events with job progress until the job reaches a terminal state.
+    Reads progress from the DB, so it works from any instance and across restarts.
+    """
+    await db.run_sync(get_job_or_404, job_id)
+
+    async def events():
+        last_snapshot = None
+        while True:
+            async with AsyncSessionLocal() as session:
+                snapshot = batch_jobs.job_snapshot(session, await session.run_sync(get_job_or_404, job_id))
+            if snapshot != last_snapshot:
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+                last_snapshot = snapshot
+            if snapshot["status"] in batch_jobs.TERMINAL_STATUSES:
+                yield f"event: done\ndata: {json.dumps(snapshot)}\n\n"
+                return
+            await asyncio.sleep(1)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/{job_id}/cancel")
+def cancel_batch_job(job_id: int, db: Session = Depends(get_db)):
+    job = get_job_or_404(db, job_id)
+    if job.status not in batch_jobs.TERMINAL_STATUSES:
+        job.status = "cancelled"
+        db.commit()
+    return batch_jobs.job_snapshot(db, job)
+
+@router.post("/{job_id}/resume")
+async def resume_batch_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Restarts a cancelled or failed job; failed items get a fresh set of attempts.
+    """
+    job = await db.run_sync(get_job_or_404, job_id)
+    retried = (await db.execute(
+        update(models.BatchJobItem)
+        .where(models.BatchJobItem.job_id == job_id, models.BatchJobItem.status == "failed")
+        .values(status="pending", attempts=0, error=None)
+    )).rowcount
+    job.failed = max(0, job.failed - retried)
+    job.status = "pending"
+    job.error = None
+    await db.commit()
+    batch_jobs.start_job(job.id)
+    return batch_jobs.job_snapshot(db, job)
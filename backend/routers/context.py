@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from pydantic import BaseModel
-from backend.database import get_db
+from pydantic import BaseModel, ConfigDict
+from backend.database import get_async_db
 from backend import models
 from google import genai
 from google.genai import types
@@ -11,6 +12,10 @@ import json
 from datetime import datetime
 
 from backend.services.image_creation import get_client
+from backend.services.uploads import file_part, upload_digest
+from backend.services.context_cache import context_cache, context_key
+from backend.services.single_flight import single_flight, flight_key
+import asyncio
 from backend.config import config
 
 router = APIRouter(
@@ -45,8 +50,7 @@ class ContextVersionResponse(ContextVersionBase):
     project_id: int
     created_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 @router.post("/generate")
 async def generate_context(request: GenerateRequest):
@@ -69,14 +73,23 @@ async def generate_context(request: GenerateRequest):
     
     try:
         client = get_client()
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
+
+        async def generate():
+            response = await asyncio.to_thread(
+                client.models.generate_content,
+                model="gemini-2.5-flash",
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json"
+                )
             )
+            return json.loads(response.text)
+
+        # Identical goals submitted at the same time share one model call
+        result = await single_flight.run(
+            flight_key("/context/generate", "gemini-2.5-flash", prompt), generate, operation="context_generate"
         )
-        return json.loads(response.text)
+        return dict(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -166,11 +179,11 @@ async def analyze_brand(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/versions", response_model=ContextVersionResponse)
-def create_version(version: ContextVersionCreate, db: Session = Depends(get_db)):
-    db_version = models.ContextVersion(**version.dict())
+async def create_version(version: ContextVersionCreate, db: AsyncSession = Depends(get_async_db)):
+    db_version = models.ContextVersion(**version.model_dump())
     db.add(db_version)
-    db.commit()
-    db.refresh(db_version)
+    await db.commit()
+    await db.refresh(db_version)
     return db_version
 
 class ContextVersionUpdate(BaseModel):
@@ -187,48 +200,59 @@ class ContextVersionUpdate(BaseModel):
     context: Optional[str] = None
 
 @router.get("/versions/{project_id}", response_model=List[ContextVersionResponse])
-def get_versions(project_id: int, db: Session = Depends(get_db)):
-    return db.query(models.ContextVersion).filter(models.ContextVersion.project_id == project_id).order_by(models.ContextVersion.created_at.desc()).all()
+async def get_versions(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.scalars(
+        select(models.ContextVersion).where(models.ContextVersion.project_id == project_id).order_by(models.ContextVersion.created_at.desc())
+    )
+    return result.all()
 
 @router.get("/version/{version_id}", response_model=ContextVersionResponse)
-def get_version_details(version_id: int, db: Session = Depends(get_db)):
-    version = db.query(models.ContextVersion).filter(models.ContextVersion.id == version_id).first()
+async def get_version_details(version_id: int, db: AsyncSession = Depends(get_async_db)):
+    version = await db.get(models.ContextVersion, version_id)
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
     return version
 
 @router.put("/versions/{version_id}", response_model=ContextVersionResponse)
-def update_version(version_id: int, version_update: ContextVersionUpdate, db: Session = Depends(get_db)):
-    db_version = db.query(models.ContextVersion).filter(models.ContextVersion.id == version_id).first()
+async def update_version(version_id: int, version_update: ContextVersionUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_version = await db.get(models.ContextVersion, version_id)
     if not db_version:
         raise HTTPException(status_code=404, detail="Version not found")
     
-    update_data = version_update.dict(exclude_unset=True)
+    update_data = version_update.model_dump(exclude_unset=True)
+    if any(getattr(db_version, key) != value for key, value in update_data.items()):
+        await asyncio.to_thread(context_cache.invalidate_version, version_id, get_client)
     for key, value in update_data.items():
         setattr(db_version, key, value)
     
-    db.commit()
-    db.refresh(db_version)
+    await db.commit()
+    await db.refresh(db_version)
     return db_version
 
 @router.delete("/versions/{version_id}")
-def delete_version(version_id: int, db: Session = Depends(get_db)):
-    version = db.query(models.ContextVersion).filter(models.ContextVersion.id == version_id).first()
+async def delete_version(version_id: int, db: AsyncSession = Depends(get_async_db)):
+    version = await db.get(models.ContextVersion, version_id)
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
     
-    db.delete(version)
-    db.commit()
+    await asyncio.to_thread(context_cache.invalidate_version, version_id, get_client)
+    await db.delete(version)
+    await db.commit()
     return {"message": "Version deleted successfully"}
 
+@router.get("/cache/stats")
+def get_context_cache_stats():
+    """
+    Context cache usage: cached vs inline calls, token counts and latency.
+    """
+    return context_cache.stats()
+
 @router.post("/analyze-file")
 async def analyze_file(
     file: UploadFile = File(...),
     analysis_type: str = Form(...)
 ):
     try:
-        content = await file.read()
-        
         # Determine prompt based on analysis type
         if analysis_type == "brand":
             prompt = """
@@ -254,19 +278,22 @@ async def analyze_file(
             - context (Overall context/guidelines)
             """
 
-        # Determine mime type
-        mime_type = file.content_type or "application/octet-stream"
-        
         client = get_client()
-        response = client.models.generate_content(
-            model=config.MODEL_TEXT_FAST,
-            contents=[
-                types.Part.from_bytes(data=content, mime_type=mime_type),
-                prompt
-            ],
-            config=types.GenerateContentConfig(
+        # The document is cached model-side by content hash, so analyzing the same brand PDF
+        # again (e.g. brand then project analysis) doesn't re-send it. Large documents stream
+        # from the upload spool to storage / the Files API, only when the cache needs them.
+        digest = await asyncio.to_thread(upload_digest, file)
+        response = await asyncio.to_thread(
+            context_cache.generate_content,
+            client,
+            config.MODEL_TEXT_FAST,
+            lambda: [file_part(client, file)],
+            [prompt],
+            types.GenerateContentConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            key=context_key(config.MODEL_TEXT_FAST, f"file-{digest}"),
+            operation="analyze_file",
         )
         
         return json.loads(response.text)
@@ -3,8 +3,8 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import List, Optional
 from pydantic import BaseModel
 from backend.services.image_creation import generate_image, edit_image, optimize_prompt_text, save_image_asset
-from backend.database import get_db
-from sqlalchemy.orm import Session
+from backend.database import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend import models
 from fastapi import Depends
 from backend.config import config
@@ -23,11 +23,13 @@ async def generate(
     product_images: List[UploadFile] = File(None),
     scene_images: List[UploadFile] = File(None),
     project_id: Optional[int] = Form(None),
-    model_name: Optional[str] = Form(config.MODEL_IMAGE_FAST),
+    model_name: Optional[str] = Form(None), # A pinned model, "auto" (best-effort quality), or unset: speed unless a budget is sent
     num_images: int = Form(1),
-    db: Session = Depends(get_db)
+    latency_budget_ms: Optional[float] = Form(None), # Lets the model router pick fast vs high quality
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
+        served_models = []
         # Call
         # image_url here is now the blob name from storage.upload_bytes
         blob_names = await generate_image(
@@ -38,14 +40,17 @@ async def generate(
             product_images=product_images,
             scene_images=scene_images,
             model_name=model_name,
-            num_images=num_images
+            num_images=num_images,
+            latency_budget_ms=latency_budget_ms,
+            served_models=served_models
         )
         
         # Generate signed URLs for immediate display
         from backend.services.storage import generate_signed_url
         signed_urls = [generate_signed_url(blob_name) for blob_name in blob_names]
             
-        return {"images": signed_urls}
+        # The model behind each image, for the save call's model_type
+        return {"images": signed_urls, "models": served_models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -56,10 +61,12 @@ async def edit(
     instruction: str = Form(...),
     style: Optional[str] = Form(None),
     reference_images: List[UploadFile] = File(None),
-    model_name: Optional[str] = Form(config.MODEL_IMAGE_FAST),
-    num_images: int = Form(1)
+    model_name: Optional[str] = Form(None), # A pinned model, "auto" (best-effort quality), or unset: speed unless a budget is sent
+    num_images: int = Form(1),
+    latency_budget_ms: Optional[float] = Form(None)
 ):
     try:
+        served_models = []
         if image:
             image_bytes = await image.read()
         elif image_url:
@@ -79,9 +86,11 @@ async def edit(
             style=style, 
             reference_images=reference_images, 
             model_name=model_name,
-            num_images=num_images
+            num_images=num_images,
+            latency_budget_ms=latency_budget_ms,
+            served_models=served_models
         )
-        return {"images": images_b64}
+        return {"images": images_b64, "models": served_models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -97,7 +106,7 @@ class SaveRequest(BaseModel):
 @router.post("/save")
 async def save(
     request: SaveRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         from backend.services.image_creation import save_image_asset
@@ -135,6 +144,40 @@ async def save(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchSaveRequest(BaseModel):
+    items: List[SaveRequest]
+
+@router.post("/save/batch")
+async def save_batch(
+    request: BatchSaveRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Saves many generated drafts in one call with a single DB transaction.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(request.items) > config.BATCH_SAVE_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {config.BATCH_SAVE_MAX_ITEMS} items")
+
+    try:
+        from backend.services.image_creation import save_image_assets_batch
+        from backend.services.storage import generate_signed_urls
+
+        results = await save_image_assets_batch([item.model_dump() for item in request.items], db)
+
+        signed = generate_signed_urls(
+            [r["blob_name"] for r in results if r["status"] == "saved"],
+            max_workers=config.STORAGE_PARALLELISM
+        )
+        for r in results:
+            if r["status"] == "saved":
+                r["image_url"] = signed.get(r.pop("blob_name"))
+
+        return {"results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class OptimizeRequest(BaseModel):
     prompt: str
     model_name: Optional[str] = config.MODEL_TEXT_FAST
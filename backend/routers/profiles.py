@@ -0,0 +1,39 @@
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from google.api_core.exceptions import NotFound
+
+from ..profiling import token_matches, profile_blob_name, collapsed
+from ..services.storage import download_bytes
+
+router = APIRouter(
+    prefix="/debug/profiles",
+    tags=["debug"],
+)
+
+@router.get("/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    x_profile_token: Optional[str] = Header(None),
+    profile_token: Optional[str] = Query(None)
+):
+    """
+    The profile of a request sent with X-Profile-Token, by the X-Profile-Id it returned.
+    speedscope: open in https://www.speedscope.app; collapsed: folded stacks for flamegraph.pl.
+    """
+    if not token_matches(x_profile_token or profile_token):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    if not profile_id.isalnum():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    try:
+        data = download_bytes(profile_blob_name(profile_id))
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "collapsed":
+        return PlainTextResponse(collapsed(json.loads(data)))
+    return Response(data, media_type="application/json", headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'
+    })
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from .. import models, schemas, database
+from .. import models, schemas
+from ..database import get_db
+from ..services import project_summary, context_snapshots
 
 router = APIRouter(
     prefix="/projects",
@@ -10,13 +12,6 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=schemas.ProjectBrief)
 def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)):
     db_project = models.Project(
@@ -38,30 +33,64 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
     return db_project
 
 @router.get("/", response_model=List[schemas.ProjectBrief])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    projects = db.query(models.Project).offset(skip).limit(limit).all()
-    return projects
+def read_projects(skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: Session = Depends(get_db)):
+    query = db.query(models.Project).order_by(models.Project.id)
+    if after_id is not None:
+        # Keyset paging: pass the last id of the previous page instead of an offset
+        query = query.filter(models.Project.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+@router.get("/summary", response_model=List[schemas.ProjectSummary])
+def read_project_summaries(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Asset counts, last activity and cover thumbnail for the project list, without loading assets.
+    """
+    from backend.services.storage import generate_signed_url
+    from concurrent.futures import ThreadPoolExecutor
+
+    summaries = project_summary.list_project_summaries(db, skip=skip, limit=limit)
+
+    def sign_cover(summary):
+        url = summary["cover_url"]
+        if url and not url.startswith("http") and not url.startswith("blob:"):
+            summary["cover_url"] = generate_signed_url(url)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(sign_cover, summaries))
+
+    return summaries
 
 @router.get("/{project_id}", response_model=schemas.Project)
 def read_project(project_id: int, db: Session = Depends(get_db)):
     from sqlalchemy.orm import joinedload
     from backend.services.storage import generate_signed_url
+    from backend.services.renditions import sign_renditions
     from concurrent.futures import ThreadPoolExecutor
     
     project = db.query(models.Project).options(joinedload(models.Project.assets)).filter(models.Project.id == project_id).first()
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Sign Asset URLs for frontend access in parallel
+    # Each distinct context once; assets reference it by context_hash
+    context = context_snapshots.load_snapshots(db, (asset.context_hash for asset in project.assets))
+    response = schemas.Project.model_validate(project).model_copy(update={"context_snapshots": context})
+
+    # Sign Asset URLs for frontend access in parallel, on the response models: the ORM objects
+    # keep their blob names
     def sign_asset(asset):
         if asset.url and not asset.url.startswith("http") and not asset.url.startswith("blob:"):
             asset.url = generate_signed_url(asset.url)
-        return asset
+        asset.renditions = sign_renditions(asset.renditions)
 
     with ThreadPoolExecutor(max_workers=10) as executor:
-        list(executor.map(sign_asset, project.assets))
-            
-    return project
+        list(executor.map(sign_asset, response.assets))
+
+    # Dumped straight to JSON bytes here, in the threadpool. Returning the ORM object would
+    # leave FastAPI to serialize every asset on the event loop.
+    return Response(response.model_dump_json(), media_type="application/json")
 
 @router.delete("/{project_id}")
 def delete_project(project_id: int, db: Session = Depends(get_db)):
@@ -69,12 +98,27 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    from backend.services.assets import asset_blob_names
+    from backend.services.storage import delete_blobs
+    from backend.config import config
+
+    # Collect blobs before the rows go away so storage is cleaned up too
+    blob_names = []
+    for asset in db.query(models.Asset).filter(models.Asset.project_id == project_id).all():
+        blob_names.extend(asset_blob_names(asset))
+
     # Delete associated assets first (optional if cascade delete is set up, but safe to do explicit)
     db.query(models.Asset).filter(models.Asset.project_id == project_id).delete()
+    project_summary.delete_project_summary(db, project_id)
     
     db.delete(project)
     db.commit()
-    return {"status": "success"}
+
+    blob_errors = delete_blobs(blob_names, max_workers=config.STORAGE_PARALLELISM)
+    failed = [name for name, error in blob_errors.items() if error]
+    if failed:
+        return {"status": "success", "blobs_deleted": len(blob_errors) - len(failed), "blobs_failed": failed}
+    return {"status": "success", "blobs_deleted": len(blob_errors)}
 
 @router.put("/{project_id}", response_model=schemas.ProjectBrief)
 def update_project(project_id: int, project_update: schemas.ProjectCreate, db: Session = Depends(get_db)):
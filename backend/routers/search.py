@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+
+from backend.database import get_db
+from backend.services import search as search_service
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"],
+)
+
+@router.get("/")
+def search(
+    q: str,
+    kinds: str = ",".join(search_service.KINDS), # Comma-separated: asset, project, context_version
+    project_id: Optional[int] = None,
+    type: Optional[str] = None,
+    model_type: Optional[str] = None,
+    context_version: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None, # next_cursor of the previous page
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked full-text search across asset prompts/context, projects and context versions.
+    """
+    from backend.services.storage import generate_signed_url
+
+    requested = [kind.strip() for kind in kinds.split(",") if kind.strip()]
+    unknown = [kind for kind in requested if kind not in search_service.KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kinds: {', '.join(unknown)}")
+
+    try:
+        page = search_service.search(
+            db, q, requested,
+            project_id=project_id, type=type, model_type=model_type, context_version=context_version,
+            created_after=created_after, created_before=created_before,
+            limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    for result in page["results"]:
+        url = result["url"]
+        if url and not url.startswith("http") and not url.startswith("blob:"):
+            result["url"] = generate_signed_url(url)
+    return page
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Form, HTTPException, Depends
-from backend.database import get_db
-from sqlalchemy.orm import Session
+from backend.database import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend import models
 from typing import Optional
 from backend.services.video_creation import generate_video
+from backend.services.renditions import schedule_renditions
 
 router = APIRouter(
     prefix="/video-creation",
@@ -14,13 +15,15 @@ router = APIRouter(
 async def generate(
     prompt: str = Form(...),
     aspect_ratio: str = Form("16:9"),
-    quality: str = Form("speed"), # speed or quality
+    quality: Optional[str] = Form(None), # speed, quality, auto (best-effort quality), or unset: speed unless a budget is sent
     num_videos: int = Form(1),
     project_id: Optional[int] = Form(None),
-    db: Session = Depends(get_db)
+    latency_budget_ms: Optional[float] = Form(None), # Lets the model router pick fast vs high quality
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        results = await generate_video(prompt, aspect_ratio=aspect_ratio, quality=quality, num_videos=num_videos)
+        results = await generate_video(prompt, aspect_ratio=aspect_ratio, quality=quality, num_videos=num_videos,
+                                       latency_budget_ms=latency_budget_ms)
         
         return {"videos": results}
 
@@ -35,7 +38,7 @@ async def save_video_asset(
     context_data: Optional[str] = Form(None),
     context_version: Optional[str] = Form(None),
     model_type: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         asset = models.Asset(
@@ -48,7 +51,8 @@ async def save_video_asset(
             model_type=model_type
         )
         db.add(asset)
-        db.commit()
+        await db.commit()
+        schedule_renditions(asset.id)
         return {"message": "Video saved successfully", "asset_id": asset.id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
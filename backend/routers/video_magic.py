@@ -1,9 +1,22 @@
 
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, BackgroundTasks
-from typing import List, Optional
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, BackgroundTasks, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
 from backend.services.video_magic import generate_script, edit_script, generate_image_to_video, optimize_image_prompt, generate_video_first_last, generate_video_reference, extend_video, optimize_video_prompt
 from backend.services.storage import upload_bytes
+from backend.services.video_magic.storyboard import render_storyboard, RENDER_MODES
+from backend.services.video_magic import script_store
+from backend.services.video_magic.script import SCRIPT_EDIT_MODES
+from backend.services.video_stitching import stitch_to_asset
+from backend.services.storage import generate_signed_url
+from backend.database import get_db, get_async_db
+from backend import models
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.schemas import AssetCreate
+from backend.config import config
 import json
 
 router = APIRouter(
@@ -15,10 +28,13 @@ router = APIRouter(
 @router.post("/script/generate")
 async def create_video_script(
     prompt: str = Form(...),
-    context: Optional[str] = Form(None)
+    context: Optional[str] = Form(None),
+    context_version_id: Optional[int] = Form(None), # ContextVersion the context was applied from
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        script = await generate_script(prompt, context)
+        version_id = await script_store.cacheable_context_version(db, context, context_version_id)
+        script = await generate_script(prompt, context, version_id)
         return {"script": script}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -26,12 +42,77 @@ async def create_video_script(
 @router.post("/script/edit")
 async def edit_video_script(
     current_script: str = Form(...), # JSON string
-    instructions: str = Form(...)
+    instructions: str = Form(...),
+    mode: str = Form("patch") # patch (only changed scenes are regenerated) or full
 ):
     try:
         script_json = json.loads(current_script)
-        script = await edit_script(script_json, instructions)
-        return {"script": script}
+        return await edit_script(script_json, instructions, mode=mode)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class ScriptCreate(BaseModel):
+    prompt: str
+    context: Optional[str] = None
+    context_version_id: Optional[int] = None # ContextVersion the context was applied from
+    project_id: Optional[int] = None
+
+class ScriptEdit(BaseModel):
+    instructions: str
+    mode: str = "patch" # patch (only changed scenes are regenerated) or full
+
+def get_version_or_404(db: Session, script_id: int, version: Optional[int] = None) -> models.ScriptVersion:
+    script_version = script_store.get_version(db, script_id, version)
+    if script_version is None:
+        raise HTTPException(status_code=404, detail="Script version not found" if version else "Script not found")
+    return script_version
+
+@router.post("/scripts")
+async def create_stored_script(request: ScriptCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Generates a script and stores it server-side as version 1. Edit it by id afterwards.
+    """
+    if request.project_id and not await db.get(models.Project, request.project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        return await script_store.create_script(db, request.prompt, request.context, request.project_id, request.context_version_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/scripts/{script_id}")
+def read_stored_script(script_id: int, version: Optional[int] = None, db: Session = Depends(get_db)):
+    script_version = get_version_or_404(db, script_id, version)
+    return script_store.serialize_version(script_version.script, script_version)
+
+@router.get("/scripts/{script_id}/versions")
+def list_script_versions(script_id: int, db: Session = Depends(get_db)):
+    script = db.query(models.Script).filter(models.Script.id == script_id).first()
+    if script is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+    return [
+        {
+            "version": version.version,
+            "instructions": version.instructions,
+            "edit_mode": version.edit_mode,
+            "scenes": len(version.scenes),
+            "created_at": version.created_at,
+        }
+        for version in script.versions
+    ]
+
+@router.post("/scripts/{script_id}/edit")
+async def edit_stored_script(script_id: int, request: ScriptEdit, db: AsyncSession = Depends(get_async_db)):
+    """
+    Edits the current version of a stored script with just the instructions; the result is
+    saved as a new version.
+    """
+    if request.mode not in SCRIPT_EDIT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(SCRIPT_EDIT_MODES)}")
+    await db.run_sync(get_version_or_404, script_id)
+    try:
+        return await script_store.edit_stored_script(db, script_id, request.instructions, request.mode)
+    except script_store.ScriptEditConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -117,3 +198,109 @@ async def optimize_video_prompt_endpoint(
         return {"optimized_prompt": optimized_prompt}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+class StoryboardRequest(BaseModel):
+    script: Optional[Dict[str, Any]] = None # Output of /script/generate: global_elements + scenes...
+    script_id: Optional[int] = None # ...or a stored script (current version unless version is given)
+    version: Optional[int] = None
+    mode: str = "keyframe" # keyframe (image, then image-to-video) or direct (text-to-video)
+    context: Optional[str] = None
+    aspect_ratio: str = "16:9"
+    quality: str = "speed"
+    image_model: str = config.MODEL_IMAGE_FAST
+    use_cache: bool = True # Reuse earlier renders of identical scenes
+
+@router.post("/storyboard")
+async def create_storyboard(request: StoryboardRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Renders every scene of a script concurrently. Server-sent events: one "scene" event per
+    scene as it finishes (with its index), then "done" with all scenes in script order.
+    """
+    if (request.script is None) == (request.script_id is None):
+        raise HTTPException(status_code=400, detail="Provide either script or script_id")
+    script = request.script
+    if request.script_id is not None:
+        script = await db.run_sync(
+            lambda session: script_store.version_script(get_version_or_404(session, request.script_id, request.version))
+        )
+    scenes = script.get("scenes")
+    if not isinstance(scenes, list) or not scenes:
+        raise HTTPException(status_code=400, detail="Script has no scenes")
+    if len(scenes) > config.STORYBOARD_MAX_SCENES:
+        raise HTTPException(status_code=400, detail=f"Storyboard exceeds {config.STORYBOARD_MAX_SCENES} scenes")
+    if any(not isinstance(scene, dict) or not scene.get("visual") for scene in scenes):
+        raise HTTPException(status_code=400, detail="Every scene needs a 'visual' description")
+    if request.mode not in RENDER_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(RENDER_MODES)}")
+
+    async def events():
+        results = [None] * len(scenes)
+        async for result in render_storyboard(
+            script,
+            mode=request.mode,
+            context=request.context,
+            aspect_ratio=request.aspect_ratio,
+            quality=request.quality,
+            image_model=request.image_model,
+            use_cache=request.use_cache,
+        ):
+            results[result["index"]] = result
+            yield f"event: scene\ndata: {json.dumps(result)}\n\n"
+        summary = {
+            "scenes": results,
+            "completed": sum(1 for r in results if r["status"] == "done"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "cached": sum(1 for r in results if r.get("cached")),
+        }
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+class StitchRequest(BaseModel):
+    project_id: int
+    blob_names: List[str] = [] # Clips in playback order...
+    asset_ids: List[int] = [] # ...or saved video assets in playback order
+    prompt: Optional[str] = None
+    context_version: Optional[str] = None
+    context_data: Optional[str] = None
+
+@router.post("/stitch")
+async def stitch_videos(request: StitchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Concatenates clips (e.g. storyboard scenes or an extend-video chain) in order into one
+    video, saved as a new Asset. Stream copy is used wherever the clips' codecs match.
+    """
+    if bool(request.blob_names) == bool(request.asset_ids):
+        raise HTTPException(status_code=400, detail="Provide either blob_names or asset_ids")
+    if not await db.get(models.Project, request.project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    blob_names = request.blob_names
+    if request.asset_ids:
+        assets = {
+            asset.id: asset for asset in
+            await db.scalars(select(models.Asset).where(models.Asset.id.in_(request.asset_ids), models.Asset.type == "video"))
+        }
+        missing = [asset_id for asset_id in request.asset_ids if asset_id not in assets]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Video assets not found: {missing}")
+        blob_names = [assets[asset_id].url for asset_id in request.asset_ids]
+
+    if len(blob_names) < 2:
+        raise HTTPException(status_code=400, detail="Need at least two clips to stitch")
+    if len(blob_names) > config.STITCH_MAX_CLIPS:
+        raise HTTPException(status_code=400, detail=f"Stitching is limited to {config.STITCH_MAX_CLIPS} clips")
+
+    try:
+        report = await stitch_to_asset(
+            request.project_id,
+            blob_names,
+            prompt=request.prompt,
+            context_version=request.context_version,
+            context_data=request.context_data,
+        )
+        report["video_url"] = generate_signed_url(report["blob_name"])
+        report["download_url"] = generate_signed_url(report["blob_name"], download_name="stitched-video.mp4")
+        return report
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
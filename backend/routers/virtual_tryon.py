@@ -1,6 +1,6 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Depends
-from sqlalchemy.orm import Session
-from backend.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import get_async_db
 from backend import models
 from fastapi.responses import JSONResponse
 from backend.services.virtual_tryon import process_virtual_try_on
@@ -9,6 +9,7 @@ import os
 import uuid
 from typing import Optional
 from backend.services.storage import generate_signed_url
+from backend.services.renditions import schedule_renditions
 
 router = APIRouter(
     prefix="/virtual-try-on",
@@ -22,7 +23,7 @@ async def virtual_try_on(
     person_image: UploadFile = File(...), 
     clothing_images: List[UploadFile] = File(...),
     project_id: Optional[int] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint for virtual try-on.
@@ -39,7 +40,8 @@ async def virtual_try_on(
                 prompt="Virtual Try-on"
             )
             db.add(asset)
-            db.commit()
+            await db.commit()
+            schedule_renditions(asset.id)
         
         signed_url = generate_signed_url(blob_name)
 
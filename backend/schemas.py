@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, field_validator
+from typing import Dict, List, Optional
 from datetime import datetime
+import json
 
 class AssetBase(BaseModel):
     type: str
@@ -17,9 +18,18 @@ class Asset(AssetBase):
     id: int
     project_id: int
     created_at: datetime
+    context_hash: Optional[str] = None # Key into Project.context_snapshots (context_data is then empty)
+    renditions: Optional[Dict[str, str]] = None # e.g. thumb_256/thumb_512/thumb_1024, poster, preview
 
-    class Config:
-        from_attributes = True
+    @field_validator("renditions", mode="before")
+    @classmethod
+    def parse_renditions(cls, value):
+        # Stored as a JSON string on the model
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    model_config = ConfigDict(from_attributes=True)
 
 class ProjectBase(BaseModel):
     name: str
@@ -43,13 +53,25 @@ class ProjectBrief(ProjectBase):
     id: int
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Project(ProjectBase):
     id: int
     created_at: datetime
     assets: List[Asset] = []
+    context_snapshots: Dict[str, str] = {} # Context hash -> text, once per distinct context
+
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        from_attributes = True
+class ProjectSummary(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    created_at: datetime
+    asset_count: int = 0
+    image_count: int = 0
+    video_count: int = 0
+    tryon_count: int = 0
+    last_activity_at: Optional[datetime] = None
+    cover_asset_id: Optional[int] = None
+    cover_url: Optional[str] = None
@@ -0,0 +1,83 @@
+import json
+from typing import Dict, List, Set
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.config import config
+from backend.services.storage import delete_blobs
+
+
+def asset_blob_names(asset: models.Asset) -> List[str]:
+    """
+    All blobs owned by an asset: the original plus any renditions.
+    """
+    names = []
+    if asset.url and not asset.url.startswith("http") and not asset.url.startswith("blob:"):
+        names.append(asset.url)
+    if asset.renditions:
+        try:
+            names.extend(json.loads(asset.renditions).values())
+        except ValueError:
+            pass
+    return names
+
+
+# Roots per LIKE query, well within SQLite's expression depth limit
+LIKE_CHUNK = 100
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def referenced_blob_names(db: Session, blob_names: List[str]) -> Set[str]:
+    """
+    The subset of blob_names that belong to an asset, as its original or one of its renditions.
+    """
+    wanted = set(blob_names)
+    found = set(db.execute(select(models.Asset.url).where(models.Asset.url.in_(wanted))).scalars())
+
+    # Renditions sit next to their original (abc.png -> abc.thumb_512.webp): look up assets by
+    # that root, then check their recorded renditions
+    roots = sorted({name.rsplit(".", 2)[0] for name in wanted - found if name.count(".") >= 2})
+    for start in range(0, len(roots), LIKE_CHUNK):
+        candidates = db.query(models.Asset).filter(
+            models.Asset.renditions.is_not(None),
+            or_(*(models.Asset.url.like(f"{_escape_like(root)}.%", escape="\\") for root in roots[start:start + LIKE_CHUNK])),
+        )
+        for asset in candidates:
+            found.update(wanted.intersection(asset_blob_names(asset)))
+    return found
+
+
+def delete_assets(db: Session, asset_ids: List[int]) -> List[Dict]:
+    """
+    Deletes asset rows in a single transaction, then removes their blobs in parallel.
+    Returns one result per requested id, in request order.
+    """
+    assets = db.query(models.Asset).filter(models.Asset.id.in_(asset_ids)).all()
+    found = {asset.id: asset for asset in assets}
+    blobs_by_asset = {asset.id: asset_blob_names(asset) for asset in assets}
+
+    for asset in assets:
+        db.delete(asset)
+    db.commit()
+
+    blob_errors = delete_blobs(
+        [name for names in blobs_by_asset.values() for name in names],
+        max_workers=config.STORAGE_PARALLELISM,
+    )
+
+    results = []
+    for asset_id in asset_ids:
+        if asset_id not in found:
+            results.append({"asset_id": asset_id, "status": "not_found"})
+            continue
+        errors = [blob_errors[name] for name in blobs_by_asset[asset_id] if blob_errors.get(name)]
+        if errors:
+            # The row is gone either way; report the blobs that could not be removed
+            results.append({"asset_id": asset_id, "status": "deleted", "blob_errors": errors})
+        else:
+            results.append({"asset_id": asset_id, "status": "deleted"})
+    return results
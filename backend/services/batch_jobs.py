@@ -0,0 +1,425 @@
+import io
+import csv
+import json
+import os
+import uuid
+import socket
+import asyncio
+import datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import UploadFile
+from sqlalchemy import inspect, or_, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import models
+from backend.config import config
+from backend.database import SessionLocal
+from backend.services.image_creation import generate_image_bytes, REFERENCE_INSTRUCTIONS
+from backend.services.storage import upload_bytes, delete_blobs
+from backend.services.reference_images import prepare_reference, stored_reference_part, cache_blob_name
+
+# Reference groups in the order generate_image adds them to the prompt
+REFERENCE_GROUPS = ("style", "product", "scene", "reference")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Runner tasks for jobs executing in this process
+_running: Dict[int, asyncio.Task] = {}
+# Periodic resume of unclaimed jobs, see resume_interrupted_jobs
+_sweeper: Optional[asyncio.Task] = None
+# Lease holder name of this process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def parse_prompt_rows(content: bytes, filename: str) -> List[dict]:
+    """
+    Parses a CSV (with a "prompt" column) or JSONL (objects with a "prompt" key) upload.
+    Any other columns/keys are kept as item metadata.
+    """
+    text = content.decode("utf-8-sig")
+    rows = []
+    if (filename or "").lower().endswith((".jsonl", ".ndjson", ".json")):
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict) or not record.get("prompt"):
+                raise ValueError(f"Line {line_number}: expected an object with a 'prompt'")
+            rows.append(record)
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "prompt" not in reader.fieldnames:
+            raise ValueError("CSV must have a 'prompt' column")
+        for line_number, record in enumerate(reader, start=2):
+            if not (record.get("prompt") or "").strip():
+                raise ValueError(f"Row {line_number}: empty prompt")
+            rows.append(record)
+
+    return [
+        {"prompt": row["prompt"].strip(), "metadata": {k: v for k, v in row.items() if k != "prompt" and v not in (None, "")}}
+        for row in rows
+    ]
+
+
+async def create_job(
+    db: AsyncSession,
+    project_id: int,
+    rows: List[dict],
+    references: Dict[str, List[UploadFile]],
+    model_name: str = config.MODEL_IMAGE_FAST,
+    style: Optional[str] = None,
+    concurrency: int = config.BATCH_JOB_DEFAULT_CONCURRENCY,
+    context_version: Optional[str] = None,
+    context_data: Optional[str] = None,
+) -> models.BatchJob:
+    """
+    Stores shared reference images once (preprocessed, see reference_images.py)
+    and records the job with one item per prompt row.
+    """
+    stored_references = {}
+    for group in REFERENCE_GROUPS:
+        for upload in references.get(group) or []:
+            data = await upload.read()
+            digest, _, mime_type = await asyncio.to_thread(prepare_reference, data, upload.content_type)
+            stored_references.setdefault(group, []).append(
+                {"blob_name": cache_blob_name(digest, mime_type), "mime_type": mime_type}
+            )
+
+    job = models.BatchJob(
+        project_id=project_id,
+        status="pending",
+        model_name=model_name,
+        style=style,
+        references=json.dumps(stored_references),
+        context_version=context_version,
+        context_data=context_data,
+        concurrency=max(1, min(concurrency, config.BATCH_JOB_MAX_CONCURRENCY)),
+        total=len(rows),
+    )
+    db.add(job)
+    await db.flush()
+    db.add_all([
+        models.BatchJobItem(
+            job_id=job.id,
+            position=position,
+            prompt=row["prompt"],
+            item_metadata=json.dumps(row["metadata"]) if row["metadata"] else None,
+        )
+        for position, row in enumerate(rows)
+    ])
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+def _shared_contents(job: models.BatchJob) -> List:
+    """
+    Reference image parts, downloaded once and reused for every prompt in the job.
+    """
+    references = json.loads(job.references or "{}")
+    contents = []
+    for group in REFERENCE_GROUPS:
+        if references.get(group):
+            contents.append(f"\n{REFERENCE_INSTRUCTIONS[group]}")
+            for ref in references[group]:
+                contents.append(stored_reference_part(ref["blob_name"], ref["mime_type"]))
+    return contents
+
+
+def _retry_delay(attempts: int) -> float:
+    return 2 ** attempts
+
+
+def ensure_batch_job_lease_columns(engine: Engine):
+    """Adds the job lease columns to databases created before them (create_all doesn't alter tables)."""
+    columns = {column["name"] for column in inspect(engine).get_columns("batch_jobs")}
+    with engine.begin() as connection:
+        if "worker_id" not in columns:
+            connection.execute(text("ALTER TABLE batch_jobs ADD COLUMN worker_id VARCHAR"))
+        if "lease_expires_at" not in columns:
+            connection.execute(text("ALTER TABLE batch_jobs ADD COLUMN lease_expires_at TIMESTAMP"))
+
+
+# --- Job leases ---
+# A job runs in the one process holding its lease: claimed with a conditional UPDATE, renewed
+# while it runs and released when it stops. Jobs whose holder died are claimed by whichever
+# instance's sweeper finds the lease expired. All of these run in worker threads.
+
+def _lease_expiry() -> datetime.datetime:
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=config.BATCH_JOB_LEASE_SECONDS)
+
+
+def _claim_job(job_id: int, worker_id: str = WORKER_ID) -> Optional[Tuple[models.BatchJob, List[int]]]:
+    """
+    Takes the job's lease if nobody else holds a live one. Returns the job and its pending
+    item ids (items a dead holder left "running" are pending again), or None if not claimed.
+    """
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(models.BatchJob)
+            .where(
+                models.BatchJob.id == job_id,
+                models.BatchJob.status.in_(("pending", "running")),
+                or_(
+                    models.BatchJob.worker_id.is_(None),
+                    models.BatchJob.worker_id == worker_id,
+                    models.BatchJob.lease_expires_at < datetime.datetime.utcnow(),
+                ),
+            )
+            .values(status="running", worker_id=worker_id, lease_expires_at=_lease_expiry())
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return None
+        db.query(models.BatchJobItem).filter(
+            models.BatchJobItem.job_id == job_id,
+            models.BatchJobItem.status == "running",
+        ).update({"status": "pending"})
+        db.commit()
+        job = db.query(models.BatchJob).filter(models.BatchJob.id == job_id).first()
+        db.expunge(job)
+        item_ids = [
+            item_id for (item_id,) in db.query(models.BatchJobItem.id)
+            .filter(models.BatchJobItem.job_id == job_id, models.BatchJobItem.status == "pending")
+            .order_by(models.BatchJobItem.position)
+        ]
+        return job, item_ids
+
+
+def _renew_lease(job_id: int, worker_id: str = WORKER_ID) -> bool:
+    with SessionLocal() as db:
+        renewed = db.execute(
+            update(models.BatchJob)
+            .where(models.BatchJob.id == job_id, models.BatchJob.worker_id == worker_id)
+            .values(lease_expires_at=_lease_expiry())
+        ).rowcount
+        db.commit()
+        return bool(renewed)
+
+
+def _release_job(job_id: int, status: Optional[str] = None, error: Optional[str] = None, worker_id: str = WORKER_ID):
+    """Drops the lease; with status, also finishes the job unless it was cancelled or resumed meanwhile."""
+    with SessionLocal() as db:
+        values = {"worker_id": None, "lease_expires_at": None}
+        if status:
+            db.execute(
+                update(models.BatchJob)
+                .where(models.BatchJob.id == job_id, models.BatchJob.worker_id == worker_id, models.BatchJob.status == "running")
+                .values(status=status, error=error)
+            )
+        db.execute(
+            update(models.BatchJob)
+            .where(models.BatchJob.id == job_id, models.BatchJob.worker_id == worker_id)
+            .values(**values)
+        )
+        db.commit()
+
+
+def _claimable_job_ids() -> List[int]:
+    """Unfinished jobs with no live lease: new, resumed, or orphaned by a dead process."""
+    with SessionLocal() as db:
+        return [
+            job_id for (job_id,) in db.query(models.BatchJob.id).filter(
+                models.BatchJob.status.in_(("pending", "running")),
+                or_(models.BatchJob.worker_id.is_(None), models.BatchJob.lease_expires_at < datetime.datetime.utcnow()),
+            )
+        ]
+
+
+# --- Items (worker threads) ---
+
+def _item_runnable(job_id: int, worker_id: str = WORKER_ID) -> bool:
+    """False once the job is cancelled or its lease has passed to another process."""
+    with SessionLocal() as db:
+        row = db.query(models.BatchJob.status, models.BatchJob.worker_id).filter(models.BatchJob.id == job_id).first()
+        return row is not None and row.status == "running" and row.worker_id == worker_id
+
+
+def _load_item(item_id: int) -> Tuple[str, int]:
+    with SessionLocal() as db:
+        item = db.query(models.BatchJobItem).filter(models.BatchJobItem.id == item_id).first()
+        return item.prompt, item.attempts
+
+
+def _start_attempt(item_id: int, attempts: int):
+    with SessionLocal() as db:
+        db.query(models.BatchJobItem).filter(models.BatchJobItem.id == item_id).update(
+            {"status": "running", "attempts": attempts}
+        )
+        db.commit()
+
+
+def _bump_job(db: Session, job_id: int, worker_id: str = WORKER_ID, **increments) -> bool:
+    """Counts towards the job only while this process holds it, so a result can't be counted twice."""
+    return bool(db.execute(
+        update(models.BatchJob)
+        .where(models.BatchJob.id == job_id, models.BatchJob.worker_id == worker_id)
+        .values(**{name: getattr(models.BatchJob, name) + amount for name, amount in increments.items()})
+    ).rowcount)
+
+
+def _record_success(job: models.BatchJob, item_id: int, prompt: str, blob_name: str) -> Optional[int]:
+    """
+    Asset, item and job counters commit together: a crash can't double count. Returns the
+    asset id, or None when the lease was lost and the result discarded.
+    """
+    with SessionLocal() as db:
+        if not _bump_job(db, job.id, completed=1):
+            db.rollback()
+            return None
+        asset = models.Asset(
+            project_id=job.project_id,
+            type="image",
+            url=blob_name,
+            prompt=prompt,
+            model_type=job.model_name,
+            context_version=job.context_version,
+            context_data=job.context_data,
+        )
+        db.add(asset)
+        db.flush()
+        db.query(models.BatchJobItem).filter(models.BatchJobItem.id == item_id).update(
+            {"status": "done", "asset_id": asset.id, "error": None}
+        )
+        db.commit()
+        return asset.id
+
+
+def _record_failure(job_id: int, item_id: int, error: str):
+    with SessionLocal() as db:
+        if not _bump_job(db, job_id, failed=1):
+            db.rollback()
+            return
+        db.query(models.BatchJobItem).filter(models.BatchJobItem.id == item_id).update(
+            {"status": "failed", "error": error}
+        )
+        db.commit()
+
+
+async def _process_item(job: models.BatchJob, item_id: int, shared_contents: List, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        if not await asyncio.to_thread(_item_runnable, job.id):
+            return
+
+        prompt, attempts = await asyncio.to_thread(_load_item, item_id)
+        full_prompt = f"Style: {job.style}. {prompt}" if job.style else prompt
+        contents = [full_prompt] + shared_contents
+
+        while attempts < config.BATCH_JOB_MAX_ATTEMPTS:
+            attempts += 1
+            await asyncio.to_thread(_start_attempt, item_id, attempts)
+
+            try:
+                image_bytes = await asyncio.to_thread(generate_image_bytes, contents, job.model_name)
+                blob_name = await asyncio.to_thread(
+                    upload_bytes, image_bytes, f"{uuid.uuid4().hex}.png", "image/png"
+                )
+            except Exception as e:
+                print(f"Error in batch job {job.id} item {item_id} (attempt {attempts}): {e}")
+                if attempts >= config.BATCH_JOB_MAX_ATTEMPTS:
+                    await asyncio.to_thread(_record_failure, job.id, item_id, str(e))
+                    return
+                await asyncio.sleep(_retry_delay(attempts))
+                if not await asyncio.to_thread(_item_runnable, job.id):
+                    return
+                continue
+
+            asset_id = await asyncio.to_thread(_record_success, job, item_id, prompt, blob_name)
+            if asset_id is None:
+                print(f"DEBUG: Batch job {job.id} is no longer held by this process; discarding item {item_id}")
+                await asyncio.to_thread(delete_blobs, [blob_name])
+                return
+            from backend.services.renditions import schedule_renditions
+            schedule_renditions(asset_id)
+            return
+
+
+async def _keep_lease(job_id: int, runner: asyncio.Task):
+    while True:
+        await asyncio.sleep(config.BATCH_JOB_LEASE_SECONDS / 3)
+        if not await asyncio.to_thread(_renew_lease, job_id):
+            print(f"DEBUG: Lost the lease on batch job {job_id}; stopping here")
+            runner.cancel()
+            return
+
+
+async def run_job(job_id: int):
+    """
+    Executes (or resumes) a job if this process can claim it: every item that isn't done or
+    failed is generated, with at most job.concurrency model calls in flight.
+    """
+    claimed = await asyncio.to_thread(_claim_job, job_id)
+    if claimed is None:
+        _running.pop(job_id, None)
+        return
+    job, item_ids = claimed
+    keeper = None
+    try:
+        print(f"DEBUG: Running batch job {job_id}: {len(item_ids)} items pending, concurrency {job.concurrency}")
+        shared_contents = await asyncio.to_thread(_shared_contents, job)
+        semaphore = asyncio.Semaphore(job.concurrency)
+        items = asyncio.ensure_future(asyncio.gather(*(_process_item(job, item_id, shared_contents, semaphore) for item_id in item_ids)))
+        keeper = asyncio.ensure_future(_keep_lease(job_id, items))
+        try:
+            await items
+        except asyncio.CancelledError:
+            if not items.cancelled():
+                raise
+            return # Lease lost: another process owns the job now
+        await asyncio.to_thread(_release_job, job_id, "completed")
+    except Exception as e:
+        print(f"Error running batch job {job_id}: {e}")
+        await asyncio.to_thread(_release_job, job_id, "failed", str(e))
+    finally:
+        if keeper is not None:
+            keeper.cancel()
+        # Cancelled (or lost) jobs keep their status; only the lease goes
+        await asyncio.shield(asyncio.to_thread(_release_job, job_id))
+        _running.pop(job_id, None)
+
+
+def start_job(job_id: int):
+    """Schedules a job on the running event loop unless it is already executing here."""
+    if job_id in _running and not _running[job_id].done():
+        return
+    _running[job_id] = asyncio.get_running_loop().create_task(run_job(job_id))
+
+
+async def _sweep_jobs():
+    while True:
+        try:
+            for job_id in await asyncio.to_thread(_claimable_job_ids):
+                if job_id not in _running:
+                    print(f"DEBUG: Resuming batch job {job_id}")
+                    start_job(job_id)
+        except Exception as e:
+            print(f"Error sweeping batch jobs: {e}")
+        await asyncio.sleep(config.BATCH_JOB_LEASE_SECONDS)
+
+
+def resume_interrupted_jobs() -> asyncio.Task:
+    """
+    Starts the sweeper that resumes unfinished jobs nobody holds: now (jobs interrupted when
+    this process last stopped) and periodically (jobs whose instance died, resumed jobs).
+    """
+    global _sweeper
+    if _sweeper is None or _sweeper.done():
+        _sweeper = asyncio.get_running_loop().create_task(_sweep_jobs())
+    return _sweeper
+
+
+def job_snapshot(db: Session, job: models.BatchJob) -> dict:
+    return {
+        "id": job.id,
+        "project_id": job.project_id,
+        "status": job.status,
+        "model_name": job.model_name,
+        "total": job.total,
+        "completed": job.completed,
+        "failed": job.failed,
+        "pending": job.total - job.completed - job.failed,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
@@ -0,0 +1,257 @@
+"""
+Orphaned blob garbage collector.
+
+Streams the bucket listing and set-diffs it against every blob referenced by the assets
+table. Referenced names are held in an on-disk SQLite index so memory stays flat for large
+buckets. Orphans older than a grace period are deleted in parallel batches; progress is
+checkpointed after each batch so a run can stop at any point and the next one resumes.
+
+Usage:
+    python -m backend.services.blob_gc [--grace-hours 24] [--max-blobs N] [--dry-run]
+"""
+import os
+import json
+import sqlite3
+import datetime
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.config import config
+from backend.services.storage import storage_client, BUCKET_NAME, delete_blobs
+
+CHECKPOINT_FILE = "checkpoint.json"
+INDEX_FILE = "referenced.db"
+REPORT_FILE = "last_report.json"
+
+
+def referenced_blob_names(db: Session, after_id: int = 0) -> Iterator[str]:
+    """
+    Every blob name the database still points at (originals and renditions).
+    """
+    assets = models.Asset.__table__
+    rows = db.execute(
+        select(assets.c.url, assets.c.renditions)
+        .where(assets.c.id > after_id)
+        .execution_options(yield_per=1000)
+    )
+    for url, renditions in rows:
+        if url and not url.startswith("http") and not url.startswith("blob:"):
+            yield url
+        if renditions:
+            try:
+                yield from json.loads(renditions).values()
+            except ValueError:
+                pass
+
+    if after_id == 0:
+        # Shared references of batch jobs that may still run
+        jobs = models.BatchJob.__table__
+        for (references,) in db.execute(
+            select(jobs.c.references).where(jobs.c.status.in_(("pending", "running")))
+        ):
+            for refs in json.loads(references or "{}").values():
+                for ref in refs:
+                    yield ref["blob_name"]
+
+        # Cached storyboard scene renders (see services/video_magic/script_store.py)
+        renders = models.SceneRender.__table__
+        for blob_name, keyframe_blob_name in db.execute(
+            select(renders.c.blob_name, renders.c.keyframe_blob_name).execution_options(yield_per=1000)
+        ):
+            yield blob_name
+            if keyframe_blob_name:
+                yield keyframe_blob_name
+
+
+class ReferenceIndex:
+    """On-disk set of referenced blob names."""
+
+    def __init__(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE refs (name TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def build(self, names: Iterator[str], chunk_size: int = 5000) -> int:
+        chunk = []
+        for name in names:
+            chunk.append((name,))
+            if len(chunk) >= chunk_size:
+                self.conn.executemany("INSERT OR IGNORE INTO refs VALUES (?)", chunk)
+                chunk = []
+        if chunk:
+            self.conn.executemany("INSERT OR IGNORE INTO refs VALUES (?)", chunk)
+        self.conn.commit()
+        return self.conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+
+    def __contains__(self, name: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM refs WHERE name = ?", (name,)).fetchone() is not None
+
+    def close(self):
+        self.conn.close()
+
+
+def _load_checkpoint(work_dir: str) -> Optional[str]:
+    path = os.path.join(work_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get("last_blob")
+
+
+def _save_checkpoint(work_dir: str, last_blob: Optional[str]):
+    path = os.path.join(work_dir, CHECKPOINT_FILE)
+    if last_blob is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"last_blob": last_blob, "saved_at": datetime.datetime.utcnow().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def _prefix_of(name: str) -> str:
+    return name.split("/", 1)[0] + "/" if "/" in name else "(root)"
+
+
+def _max_asset_id(db: Session) -> int:
+    return db.execute(select(func.max(models.Asset.__table__.c.id))).scalar() or 0
+
+
+def collect_orphans(
+    db: Session,
+    work_dir: str = config.GC_WORK_DIR,
+    grace_hours: float = config.GC_GRACE_HOURS,
+    batch_size: int = config.GC_BATCH_SIZE,
+    max_blobs: Optional[int] = None,
+    dry_run: bool = False,
+    bucket=None,
+    now: Optional[datetime.datetime] = None,
+) -> Dict:
+    """
+    Runs one (possibly partial) GC pass. Returns a report of what was scanned and reclaimed.
+    max_blobs bounds the number of listed blobs in this run; the next run resumes from the checkpoint.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    bucket = bucket or storage_client.bucket(BUCKET_NAME)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    cutoff = now - datetime.timedelta(hours=grace_hours)
+
+    index = ReferenceIndex(os.path.join(work_dir, INDEX_FILE))
+    indexed_up_to = _max_asset_id(db)
+    report = {
+        "started_at": now.isoformat(),
+        "dry_run": dry_run,
+        "grace_hours": grace_hours,
+        "resumed_from": _load_checkpoint(work_dir),
+        "referenced": index.build(referenced_blob_names(db)),
+        "scanned": 0,
+        "kept_referenced": 0,
+        "kept_recent": 0,
+        "orphans": 0,
+        "deleted": 0,
+        "failed": 0,
+        "bytes_reclaimed": 0,
+        "by_prefix": {},
+        "completed_cycle": False,
+    }
+
+    batch: List = []
+
+    def flush(last_name: Optional[str]):
+        if batch:
+            # Assets saved since the index was built may point at old blobs: never delete those
+            db.rollback()  # Start a fresh read transaction to see recent commits
+            protected = set(referenced_blob_names(db, after_id=indexed_up_to))
+            targets = [(name, size) for name, size in batch if name not in protected]
+            report["kept_referenced"] += len(batch) - len(targets)
+
+            errors = {} if dry_run else delete_blobs(
+                [name for name, _ in targets], max_workers=config.STORAGE_PARALLELISM, bucket=bucket
+            )
+            for name, size in targets:
+                if errors.get(name):
+                    report["failed"] += 1
+                    continue
+                stats = report["by_prefix"].setdefault(_prefix_of(name), {"deleted": 0, "bytes": 0})
+                stats["deleted"] += 1
+                stats["bytes"] += size
+                report["deleted"] += 1
+                report["bytes_reclaimed"] += size
+            batch.clear()
+        if not dry_run:
+            _save_checkpoint(work_dir, last_name)
+
+    try:
+        start_offset = report["resumed_from"]
+        last_name = None
+        exhausted = True
+        for blob in bucket.list_blobs(start_offset=start_offset):
+            if start_offset and blob.name == start_offset:
+                continue  # Already handled by the previous run
+            if max_blobs is not None and report["scanned"] >= max_blobs:
+                exhausted = False
+                break
+
+            report["scanned"] += 1
+            last_name = blob.name
+
+            if blob.name in index:
+                report["kept_referenced"] += 1
+                continue
+
+            updated = blob.updated or blob.time_created
+            if updated is not None and updated > cutoff:
+                report["kept_recent"] += 1
+                continue
+
+            report["orphans"] += 1
+            batch.append((blob.name, blob.size or 0))
+            if len(batch) >= batch_size:
+                flush(last_name)
+
+        if exhausted:
+            # Full pass done: the next run starts from the beginning of the bucket
+            flush(None)
+            report["completed_cycle"] = True
+        else:
+            flush(last_name)
+    finally:
+        index.close()
+
+    report["finished_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    with open(os.path.join(work_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(
+        f"DEBUG: Blob GC scanned {report['scanned']} blobs, deleted {report['deleted']} orphans "
+        f"({report['bytes_reclaimed']} bytes){' [dry run]' if dry_run else ''}"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Delete blobs that no asset references.")
+    parser.add_argument("--grace-hours", type=float, default=config.GC_GRACE_HOURS)
+    parser.add_argument("--batch-size", type=int, default=config.GC_BATCH_SIZE)
+    parser.add_argument("--max-blobs", type=int, default=None, help="Stop after listing this many blobs (resumes next run)")
+    parser.add_argument("--work-dir", default=config.GC_WORK_DIR)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        result = collect_orphans(
+            session,
+            work_dir=args.work_dir,
+            grace_hours=args.grace_hours,
+            batch_size=args.batch_size,
+            max_blobs=args.max_blobs,
+            dry_run=args.dry_run,
+        )
+    print(json.dumps(result, indent=2))
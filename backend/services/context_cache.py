@@ -0,0 +1,288 @@
+"""
+Model-side context caching for brand/project context.
+
+The same long context (a project's active ContextVersion text, or an uploaded brand document)
+is sent with every generation. ContextCacheManager creates a Gemini cached content for it once,
+keyed by model + SHA-256 of the context, and later calls reference it by name instead of
+re-sending it. Context from a saved ContextVersion is rebuilt on the server (version_context_text)
+and keyed by version id + content: editing any field of the version stops using the old cache,
+and update/delete of a version also deletes its caches explicitly.
+
+When caching is disabled, the context is too short for the model's minimum, or the backend
+rejects it, calls fall back to sending the context inline. Every call records latency and token
+usage (prompt, cached, output) for GET /context/cache/stats.
+"""
+import time
+import hashlib
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+from google.genai import types
+
+from backend.config import config
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def context_key(model: str, digest: str) -> str:
+    return f"{model}:{digest}"
+
+
+def version_marker(version_id: int) -> str:
+    return f"version-{version_id}-"
+
+
+def version_context_key(model: str, version_id: int, text: str) -> str:
+    return context_key(model, f"{version_marker(version_id)}{text_digest(text)}")
+
+
+# ContextVersion fields in the order (and with the labels) the context accordion
+# (frontend/js/modules/context.js) composes them
+CONTEXT_FIELDS = (
+    ("brand_vibe", "Brand Vibe"), ("brand_lighting", "Brand Lighting"),
+    ("brand_colors", "Brand Colors"), ("brand_subject", "Brand Subject"),
+    ("project_vibe", "Project Vibe"), ("project_lighting", "Project Lighting"),
+    ("project_colors", "Project Colors"), ("project_subject", "Project Subject"),
+    ("context", "Overall Context"),
+)
+
+
+def version_context_text(version) -> str:
+    """The context text of a ContextVersion with every field applied."""
+    return "\n".join(
+        f"{label}: {getattr(version, field)}." for field, label in CONTEXT_FIELDS
+        if (getattr(version, field) or "").strip()
+    )
+
+
+def matching_version_id(version, context: Optional[str]) -> Optional[int]:
+    """
+    version.id if context is exactly that version's text, so the cache can be keyed by (and
+    invalidated with) the version. None for drafts, subsets of fields or edited text.
+    """
+    if version is None or not context:
+        return None
+    return version.id if version_context_text(version) == context.strip() else None
+
+
+class ContextCacheManager:
+    def __init__(self):
+        self.entries: Dict[str, dict] = {}  # key -> {"name", "expires_at"}
+        self.unsupported: Dict[str, float] = {}  # key -> retry after (monotonic)
+        self.key_locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.calls = deque(maxlen=config.CONTEXT_CACHE_METRICS_WINDOW)
+        self.totals = {
+            "calls": 0,
+            "cached_calls": 0,
+            "fallback_calls": 0,
+            "caches_created": 0,
+            "cache_create_errors": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _get_or_create(self, client, model: str, key: str, context_parts: Callable[[], List], display_name: str) -> Optional[str]:
+        """Name of a live cached content for key, creating it if needed. None means send inline."""
+        now = time.monotonic()
+        with self._key_lock(key):
+            with self.lock:
+                entry = self.entries.get(key)
+            # Recreate a little before expiry so no call races the TTL
+            if entry and entry["expires_at"] - now > 60:
+                return entry["name"]
+            if self.unsupported.get(key, 0) > now:
+                return None
+
+            started = time.perf_counter()
+            try:
+                cached = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[types.Content(role="user", parts=context_parts())],
+                        display_name=display_name[:120],
+                        ttl=f"{config.CONTEXT_CACHE_TTL_SECONDS}s",
+                    ),
+                )
+            except Exception as e:
+                # e.g. below the model's minimum token count, or caching unsupported for the model
+                print(f"DEBUG: Context cache not created for {key}: {e}")
+                with self.lock:
+                    self.unsupported[key] = now + config.CONTEXT_CACHE_RETRY_SECONDS
+                    self.totals["cache_create_errors"] += 1
+                return None
+
+            with self.lock:
+                self.entries[key] = {"name": cached.name, "expires_at": now + config.CONTEXT_CACHE_TTL_SECONDS}
+                self.totals["caches_created"] += 1
+            print(f"DEBUG: Created context cache {cached.name} in {time.perf_counter() - started:.2f}s")
+            return cached.name
+
+    def _record(self, model: str, cache_name: Optional[str], latency: float, response, operation: str):
+        usage = getattr(response, "usage_metadata", None)
+        record = {
+            "operation": operation,
+            "model": model,
+            "cached": cache_name is not None,
+            "latency_ms": round(latency * 1000, 1),
+            "prompt_tokens": (usage.prompt_token_count if usage else None) or 0,
+            "cached_tokens": (usage.cached_content_token_count if usage else None) or 0,
+            "output_tokens": (usage.candidates_token_count if usage else None) or 0,
+        }
+        # Cached input tokens are billed at a discount; report the saving in input-token terms
+        record["billed_input_tokens"] = round(
+            record["prompt_tokens"] - record["cached_tokens"] * config.CONTEXT_CACHE_DISCOUNT
+        )
+        with self.lock:
+            self.calls.append(record)
+            self.totals["calls"] += 1
+            self.totals["cached_calls" if record["cached"] else "fallback_calls"] += 1
+            self.totals["prompt_tokens"] += record["prompt_tokens"]
+            self.totals["cached_tokens"] += record["cached_tokens"]
+            self.totals["output_tokens"] += record["output_tokens"]
+        print(
+            f"DEBUG: {operation} on {model}: {record['latency_ms']}ms, "
+            f"{record['prompt_tokens']} prompt tokens ({record['cached_tokens']} cached)"
+        )
+
+    def generate_content(
+        self,
+        client,
+        model: str,
+        context_parts: Union[List, Callable[[], List]],
+        contents: List,
+        generation_config: Optional[types.GenerateContentConfig] = None,
+        key: Optional[str] = None,
+        estimated_tokens: Optional[int] = None,
+        operation: str = "generate_content",
+    ):
+        """
+        generate_content with context_parts placed ahead of contents, served from a cached
+        content when possible. key defaults to the hash of the context text parts.
+        context_parts may be a callable so expensive parts (e.g. uploading a document) are
+        only built when the cache has to be created or the call falls back to inline.
+        """
+        generation_config = generation_config or types.GenerateContentConfig()
+        if callable(context_parts):
+            build_parts = context_parts
+            built = []
+
+            def context_parts():
+                if not built:
+                    built.extend(build_parts())
+                return built
+        else:
+            parts = list(context_parts)
+            key = key or context_key(model, text_digest("".join(p.text or "" for p in parts)))
+            context_parts = lambda: parts
+
+        cache_name = None
+        if config.CONTEXT_CACHE_ENABLED and (estimated_tokens is None or estimated_tokens >= config.CONTEXT_CACHE_MIN_TOKENS):
+            cache_name = self._get_or_create(client, model, key, context_parts, operation)
+
+        started = time.perf_counter()
+        if cache_name:
+            try:
+                response = client.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=generation_config.model_copy(update={"cached_content": cache_name}),
+                )
+                self._record(model, cache_name, time.perf_counter() - started, response, operation)
+                return response
+            except Exception as e:
+                # Expired or deleted server-side: forget it and answer inline this time
+                print(f"DEBUG: Cached content {cache_name} failed ({e}), sending context inline")
+                with self.lock:
+                    self.entries.pop(key, None)
+                started = time.perf_counter()
+                cache_name = None
+
+        response = client.models.generate_content(
+            model=model,
+            contents=[types.Content(role="user", parts=context_parts() + [types.Part(text=c) if isinstance(c, str) else c for c in contents])],
+            config=generation_config,
+        )
+        self._record(model, None, time.perf_counter() - started, response, operation)
+        return response
+
+    def invalidate_version(self, version_id: int, get_client: Callable):
+        """
+        Deletes the cached contents built from a context version (any model, any revision of its
+        text). get_client is only called when there is something to delete.
+        """
+        marker = f":{version_marker(version_id)}"
+        with self.lock:
+            entries = [self.entries.pop(key) for key in [k for k in self.entries if marker in k]]
+        if not entries:
+            return
+        try:
+            client = get_client()
+        except Exception as e:
+            print(f"DEBUG: Could not delete context caches of version {version_id}: {e}")
+            return
+        for entry in entries:
+            try:
+                client.caches.delete(name=entry["name"])
+                print(f"DEBUG: Deleted context cache {entry['name']}")
+            except Exception as e:
+                print(f"DEBUG: Could not delete context cache {entry['name']}: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            calls = list(self.calls)
+            totals = dict(self.totals)
+
+        def average(records, field):
+            return round(sum(r[field] for r in records) / len(records), 1) if records else None
+
+        cached = [r for r in calls if r["cached"]]
+        inline = [r for r in calls if not r["cached"]]
+        return {
+            **totals,
+            "active_caches": len(self.entries),
+            "recent": {
+                "window": len(calls),
+                "cached_avg_latency_ms": average(cached, "latency_ms"),
+                "inline_avg_latency_ms": average(inline, "latency_ms"),
+                "cached_avg_billed_input_tokens": average(cached, "billed_input_tokens"),
+                "inline_avg_billed_input_tokens": average(inline, "billed_input_tokens"),
+            },
+        }
+
+
+context_cache = ContextCacheManager()
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; only used to skip caching obviously short context
+    return len(text) // 4
+
+
+def generate_with_brand_context(
+    client, model: str, context: str, contents: List, generation_config=None,
+    operation: str = "generate_content", version_id: Optional[int] = None,
+):
+    """
+    generate_content with a project's brand/project context as cached prefix. With version_id
+    (see matching_version_id) the cache is keyed by that ContextVersion, so
+    ContextCacheManager.invalidate_version finds it; other context is keyed by its text.
+    """
+    key = version_context_key(model, version_id, context) if version_id else context_key(model, text_digest(context))
+    return context_cache.generate_content(
+        client,
+        model,
+        [types.Part(text=f"Context / Brand Guidelines:\n{context}")],
+        contents,
+        generation_config,
+        key=key,
+        estimated_tokens=estimate_tokens(context),
+        operation=operation,
+    )
@@ -0,0 +1,150 @@
+"""
+Content-addressed context snapshots.
+
+Assets record the context they were generated with. Instead of a Text copy per asset, the
+text is stored once in context_snapshots under its SHA-256 and assets reference the hash.
+Every ORM write path keeps setting Asset.context_data as before: a before_flush hook moves
+the text into a snapshot and swaps it for the hash.
+
+Existing rows are migrated online in small batches (each its own transaction), so the app
+keeps serving while it runs; readers handle both forms meanwhile.
+
+Usage:
+    python -m backend.services.context_snapshots [--batch-size 500] [--vacuum]
+"""
+import os
+import hashlib
+import argparse
+from typing import Dict, Iterable
+
+from sqlalchemy import event, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from backend import models
+
+snapshots = models.ContextSnapshot.__table__
+assets = models.Asset.__table__
+
+
+def snapshot_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _insert_ignore(connection: Connection, rows: Iterable[Dict]) -> int:
+    """Inserts snapshots that don't exist yet. Concurrent writers of the same content are fine."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        # RETURNING yields only the rows actually inserted (rowcount isn't reliable for executemany)
+        result = connection.execute(
+            insert(snapshots).on_conflict_do_nothing(index_elements=["hash"]).returning(snapshots.c.hash), rows
+        )
+        return len(result.all())
+    existing = set(connection.execute(
+        select(snapshots.c.hash).where(snapshots.c.hash.in_([row["hash"] for row in rows]))
+    ).scalars())
+    missing = [row for row in rows if row["hash"] not in existing]
+    if missing:
+        connection.execute(snapshots.insert(), missing)
+    return len(missing)
+
+
+def store_snapshot(connection: Connection, content: str) -> str:
+    """Stores content (once) and returns its hash."""
+    digest = snapshot_hash(content)
+    _insert_ignore(connection, [{"hash": digest, "content": content}])
+    return digest
+
+
+def load_snapshots(db: Session, hashes: Iterable[str]) -> Dict[str, str]:
+    hashes = {digest for digest in hashes if digest}
+    if not hashes:
+        return {}
+    return dict(db.execute(select(snapshots.c.hash, snapshots.c.content).where(snapshots.c.hash.in_(hashes))).all())
+
+
+@event.listens_for(Session, "before_flush")
+def _snapshot_asset_context(session, flush_context, instances):
+    """
+    Moves Asset.context_data into a snapshot for every new or changed asset in the flush.
+    """
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, models.Asset) and obj.context_data is not None:
+            if obj.context_data:
+                obj.context_hash = store_snapshot(session.connection(), obj.context_data)
+            obj.context_data = None
+
+
+def ensure_context_hash_column(engine: Engine):
+    """Adds assets.context_hash to databases created before snapshots (create_all doesn't alter tables)."""
+    columns = {column["name"] for column in inspect(engine).get_columns("assets")}
+    if "context_hash" in columns:
+        return
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE assets ADD COLUMN context_hash VARCHAR REFERENCES context_snapshots (hash)"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_assets_context_hash ON assets (context_hash)"))
+    print("DEBUG: Added assets.context_hash")
+
+
+def backfill_context_snapshots(engine: Engine, batch_size: int = 500) -> Dict:
+    """
+    Moves inline context_data of existing assets into snapshots, one batch per transaction.
+    Safe to interrupt and re-run. Returns counts and the inline bytes moved.
+    """
+    report = {"assets": 0, "snapshots_created": 0, "inline_bytes": 0}
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(assets.c.id, assets.c.context_data)
+                .where(assets.c.context_data.is_not(None))
+                .order_by(assets.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            hashes = {}
+            for asset_id, content in rows:
+                if content:
+                    hashes[asset_id] = snapshot_hash(content)
+                    report["inline_bytes"] += len(content.encode("utf-8"))
+            report["snapshots_created"] += _insert_ignore(connection, {
+                hashes[asset_id]: {"hash": hashes[asset_id], "content": content}
+                for asset_id, content in rows if asset_id in hashes
+            }.values())
+            for asset_id, _ in rows:
+                connection.execute(
+                    update(assets).where(assets.c.id == asset_id).values(context_hash=hashes.get(asset_id), context_data=None)
+                )
+            report["assets"] += len(rows)
+    if report["assets"]:
+        print(f"DEBUG: Moved context of {report['assets']} assets into {report['snapshots_created']} snapshots")
+    return report
+
+
+if __name__ == "__main__":
+    from backend.database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim the freed space afterwards (locks the database while it runs)")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    ensure_context_hash_column(engine)
+    database_path = engine.url.database if engine.dialect.name == "sqlite" else None
+    size_before = os.path.getsize(database_path) if database_path and os.path.exists(database_path) else None
+    report = backfill_context_snapshots(engine, batch_size=args.batch_size)
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    if size_before is not None:
+        report["db_bytes_before"] = size_before
+        report["db_bytes_after"] = os.path.getsize(database_path)
+    print(report)
@@ -6,36 +6,122 @@ from typing import List, Optional
 from backend.services.storage import upload_bytes
 import uuid
 import base64
+import asyncio
 from backend.services.storage import upload_bytes
 from backend import models
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.config import config
+from backend.services.reference_images import upload_reference_part
+from backend.services.single_flight import single_flight, flight_key
+from backend.services.model_router import model_router, run_blocking
 
-def get_client(location=None):
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
+def model_http_options() -> Optional[types.HttpOptions]:
+    """Sends model requests to MODEL_API_BASE_URL (the load-test emulator) when it is set."""
+    if config.MODEL_API_BASE_URL:
+        return types.HttpOptions(base_url=config.MODEL_API_BASE_URL)
+    return None
+
+def get_client(location=None, vertexai=None):
+    if vertexai is None:
+        vertexai = os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True"
+    if vertexai:
         return genai.Client(
             vertexai=True,
             project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=location or os.getenv("GOOGLE_CLOUD_LOCATION")
+            location=location or os.getenv("GOOGLE_CLOUD_LOCATION"),
+            http_options=model_http_options()
         )
     else:
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise Exception("GEMINI_API_KEY not found")
-        return genai.Client(api_key=api_key)
+        return genai.Client(api_key=api_key, http_options=model_http_options())
+
+def generate_image_bytes(contents: list, model_name: str = config.MODEL_IMAGE_FAST) -> bytes:
+    """
+    Runs one image generation call and returns the raw image bytes.
+    """
+    current_model_name = model_name
+    client_location = None 
+    
+    # Model Specific Logic
+    if model_name == "gemini-3-pro-image-preview":
+         client_location = "global" # User specified global location for this model
+         current_model_name = config.MODEL_IMAGE_HIGH_QUALITY
+    
+    client = get_client(location=client_location)
+    
+    # Configuration
+    gen_config = types.GenerateContentConfig(
+        temperature=1,
+        top_p=0.95,
+        max_output_tokens=8192,
+        response_modalities=["IMAGE"],
+    )
+
+    # Specific config for Gemini 3
+    if model_name == "gemini-3-pro-image-preview":
+         gen_config = types.GenerateContentConfig(
+            temperature=1,
+            top_p=0.95,
+            max_output_tokens=32768,
+            response_modalities=["TEXT", "IMAGE"], # Gemini 3 is multimodal output often
+            image_config=types.ImageConfig(
+                 aspect_ratio="1:1",
+                 image_size="1K",
+                 output_mime_type="image/png"
+            )
+         )
+    
+    response = client.models.generate_content(
+        model=current_model_name,
+        contents=contents,
+        config=gen_config
+    )
+    
+    print(f"DEBUG: Response candidates: {response.candidates}")
+    if response.candidates and response.candidates[0].content:
+         print(f"DEBUG: First candidate content parts: {response.candidates[0].content.parts}")
+    
+    # Extract image from response
+    generated_image_bytes = None
+    
+    # Check candidates
+    if response.candidates and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data and part.inline_data.data:
+                generated_image_bytes = part.inline_data.data
+                break
+    
+    if not generated_image_bytes:
+        raise ValueError("No image data found in response")
+
+    return generated_image_bytes
+
+# Instructions placed in front of each group of reference images
+REFERENCE_INSTRUCTIONS = {
+    "style": "Follow the artistic style, color palette, and visual texture of these reference images:",
+    "product": "Incorporate the product shown in these images. Ensure the key features and appearance are maintained:",
+    "scene": "Place the subject or product within the environment shown in these images. Match the lighting, perspective, and background details:",
+    "reference": "Use these images as general visual references:",
+}
 
 async def generate_image(
     prompt: str,
-    model_name: str = config.MODEL_IMAGE_FAST, # Default to speed
+    model_name: Optional[str] = None, # Pinned model or "auto"; unset: the router's choice for the budget, else speed
     style: Optional[str] = None,
     reference_images: Optional[List[UploadFile]] = None,
     style_images: Optional[List[UploadFile]] = None,
     product_images: Optional[List[UploadFile]] = None,
     scene_images: Optional[List[UploadFile]] = None,
-    num_images: int = 1
+    num_images: int = 1,
+    latency_budget_ms: Optional[float] = None,
+    served_models: Optional[List[str]] = None
 ) -> List[str]:
     """
     Generates an image based on prompt and optional reference images.
+    With model_name="auto" or a latency budget the model is chosen per image by the model
+    router; the model behind each image is appended to served_models when given.
     """
     
     # Construct the full prompt with style
@@ -49,80 +135,26 @@ async def generate_image(
         if images:
             contents.append(f"\n{instruction}")
             for img in images:
-                img_bytes = await img.read()
                 print(f"DEBUG: Processing image {img.filename} with type {img.content_type}")
-                contents.append(types.Part(
-                    inline_data=types.Blob(
-                        data=img_bytes, 
-                        mime_type=img.content_type or "image/jpeg"
-                    )
-                ))
-                await img.seek(0)
-
-    await process_images(style_images, "Follow the artistic style, color palette, and visual texture of these reference images:")
-    await process_images(product_images, "Incorporate the product shown in these images. Ensure the key features and appearance are maintained:")
-    await process_images(scene_images, "Place the subject or product within the environment shown in these images. Match the lighting, perspective, and background details:")
-    await process_images(reference_images, "Use these images as general visual references:")
+                # Downscaled, re-encoded and cached by content hash
+                contents.append(await upload_reference_part(img))
+
+    await process_images(style_images, REFERENCE_INSTRUCTIONS["style"])
+    await process_images(product_images, REFERENCE_INSTRUCTIONS["product"])
+    await process_images(scene_images, REFERENCE_INSTRUCTIONS["scene"])
+    await process_images(reference_images, REFERENCE_INSTRUCTIONS["reference"])
 
     generated_urls = []
     
     # Loop for multiple images
     for _ in range(num_images):
         try:
-            current_model_name = model_name
-            client_location = None 
-            
-            # Model Specific Logic
-            if model_name == "gemini-3-pro-image-preview":
-                 client_location = "global" # User specified global location for this model
-                 current_model_name = config.MODEL_IMAGE_HIGH_QUALITY
-            
-            client = get_client(location=client_location)
-            
-            # Configuration
-            gen_config = types.GenerateContentConfig(
-                temperature=1,
-                top_p=0.95,
-                max_output_tokens=8192,
-                response_modalities=["IMAGE"],
-            )
-
-            # Specific config for Gemini 3
-            if model_name == "gemini-3-pro-image-preview":
-                 gen_config = types.GenerateContentConfig(
-                    temperature=1,
-                    top_p=0.95,
-                    max_output_tokens=32768,
-                    response_modalities=["TEXT", "IMAGE"], # Gemini 3 is multimodal output often
-                    image_config=types.ImageConfig(
-                         aspect_ratio="1:1",
-                         image_size="1K",
-                         output_mime_type="image/png"
-                    )
-                 )
-            
-            response = client.models.generate_content(
-                model=current_model_name,
-                contents=contents,
-                config=gen_config
+            generated_image_bytes, served_model = await model_router.call(
+                "image", lambda model: run_blocking(generate_image_bytes, contents, model),
+                model=model_name, latency_budget_ms=latency_budget_ms,
             )
-            
-            print(f"DEBUG: Response candidates: {response.candidates}")
-            if response.candidates and response.candidates[0].content:
-                 print(f"DEBUG: First candidate content parts: {response.candidates[0].content.parts}")
-            
-            # Extract image from response
-            generated_image_bytes = None
-            
-            # Check candidates
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if part.inline_data and part.inline_data.data:
-                        generated_image_bytes = part.inline_data.data
-                        break
-            
-            if not generated_image_bytes:
-                raise ValueError("No image data found in response")
+            if served_models is not None:
+                served_models.append(served_model)
 
             # Generate unique filename
             filename = f"{uuid.uuid4().hex}.png"
@@ -139,16 +171,80 @@ async def generate_image(
     return generated_urls
         
 
+def edit_image_bytes(contents: list, model_name: str = config.MODEL_IMAGE_FAST) -> bytes:
+    """
+    Runs one image edit call and returns the raw image bytes.
+    """
+    current_model_name = model_name
+    client_location = None
+
+    if model_name == "gemini-3-pro-image-preview":
+        client_location = "global"
+        current_model_name = config.MODEL_IMAGE_HIGH_QUALITY
+
+    client = get_client(location=client_location)
+
+    # Configuration
+    gen_config = types.GenerateContentConfig(
+        response_modalities=["IMAGE"],
+        temperature=1
+    )
+
+    if model_name == "gemini-3-pro-image-preview":
+        gen_config = types.GenerateContentConfig(
+            temperature=1,
+            top_p=0.95,
+            max_output_tokens=32768,
+            response_modalities=["TEXT", "IMAGE"],
+            image_config=types.ImageConfig(
+                aspect_ratio="1:1",
+                image_size="1K",
+                output_mime_type="image/png",
+            )
+        )
+
+    response = client.models.generate_content(
+        model=current_model_name,
+        contents=contents,
+        config=gen_config
+    )
+
+    print(f"DEBUG: Edit Response: {response}")
+
+    generated_image_bytes = None
+
+    if not response.candidates:
+        raise ValueError("No candidates returned from model.")
+
+    candidate = response.candidates[0]
+    if not candidate.content:
+        print(f"DEBUG: Finish Reason: {candidate.finish_reason}")
+        raise ValueError(f"Model returned no content. Finish reason: {candidate.finish_reason}")
+
+    if candidate.content.parts:
+        for part in candidate.content.parts:
+            if part.inline_data and part.inline_data.data:
+                generated_image_bytes = part.inline_data.data
+                break
+
+    if not generated_image_bytes:
+        raise ValueError("No image data found in response")
+
+    return generated_image_bytes
+
 async def edit_image(
     image_data: bytes,
     instruction: str,
     style: Optional[str] = None,
     reference_images: Optional[List[UploadFile]] = None,
-    model_name: str = config.MODEL_IMAGE_FAST,
-    num_images: int = 1
+    model_name: Optional[str] = None,
+    num_images: int = 1,
+    latency_budget_ms: Optional[float] = None,
+    served_models: Optional[List[str]] = None
 ) -> List[str]:
     """
     Edits an existing image based on instructions. Returns List of Base64 strings.
+    Model routing and served_models work as in generate_image.
     """
     try:
         full_instruction = instruction
@@ -161,14 +257,7 @@ async def edit_image(
         if reference_images:
             contents.append("\nReference Images:")
             for img in reference_images:
-                img_bytes = await img.read()
-                contents.append(types.Part(
-                    inline_data=types.Blob(
-                        data=img_bytes, 
-                        mime_type=img.content_type or "image/jpeg"
-                    )
-                ))
-                await img.seek(0)
+                contents.append(await upload_reference_part(img))
 
         # Add Image to Edit
         contents.append(types.Part(
@@ -182,60 +271,12 @@ async def edit_image(
     
         for _ in range(num_images):
             try:
-                current_model_name = model_name
-                client_location = None
-
-                if model_name == "gemini-3-pro-image-preview":
-                    client_location = "global"
-                    current_model_name = config.MODEL_IMAGE_HIGH_QUALITY
-
-                client = get_client(location=client_location)
-
-                # Configuration
-                gen_config = types.GenerateContentConfig(
-                     response_modalities=["IMAGE"],
-                     temperature=1
-                )
-                
-                if model_name == "gemini-3-pro-image-preview":
-                        gen_config = types.GenerateContentConfig(
-                        temperature=1,
-                        top_p=0.95,
-                        max_output_tokens=32768,
-                        response_modalities=["TEXT", "IMAGE"],
-                        image_config=types.ImageConfig(
-                            aspect_ratio="1:1",
-                            image_size="1K",
-                            output_mime_type="image/png",
-                        )
-                        )
-
-                response = client.models.generate_content(
-                    model=current_model_name,
-                    contents=contents,
-                    config=gen_config
+                generated_image_bytes, served_model = await model_router.call(
+                    "image", lambda model: run_blocking(edit_image_bytes, contents, model),
+                    model=model_name, latency_budget_ms=latency_budget_ms,
                 )
-                
-                print(f"DEBUG: Edit Response: {response}")
-                
-                generated_image_bytes = None
-                
-                if not response.candidates:
-                     raise ValueError("No candidates returned from model.")
-                     
-                candidate = response.candidates[0]
-                if not candidate.content:
-                     print(f"DEBUG: Finish Reason: {candidate.finish_reason}")
-                     raise ValueError(f"Model returned no content. Finish reason: {candidate.finish_reason}")
-
-                if candidate.content.parts:
-                    for part in candidate.content.parts:
-                        if part.inline_data and part.inline_data.data:
-                            generated_image_bytes = part.inline_data.data
-                            break
-                
-                if not generated_image_bytes:
-                    raise ValueError("No image data found in response")
+                if served_models is not None:
+                    served_models.append(served_model)
 
                 # Return as Base64 string
                 generated_images_b64.append(base64.b64encode(generated_image_bytes).decode('utf-8'))
@@ -254,7 +295,7 @@ async def save_image_asset(
     image_data_b64: str,
     project_id: int,
     prompt: str,
-    db: Session,
+    db: AsyncSession,
     model_type: Optional[str] = None,
     context_version: Optional[str] = None,
     context_data: Optional[str] = None
@@ -281,13 +322,84 @@ async def save_image_asset(
             context_data=context_data
         )
         db.add(asset)
-        db.commit()
+        await db.commit()
+
+        # Thumbnails are rendered in the background so the save returns immediately
+        from backend.services.renditions import schedule_renditions
+        schedule_renditions(asset.id)
         
         return blob_name
     except Exception as e:
         print(f"Error saving image asset: {e}")
         raise e
 
+async def save_image_assets_batch(items: List[dict], db: AsyncSession) -> List[dict]:
+    """
+    Saves many draft images at once: downloads/decodes and uploads in parallel,
+    then creates all DB assets in a single transaction. Returns a result per item, in order.
+    """
+    import asyncio
+    import httpx
+    from backend.services.storage import delete_blobs
+
+    results = [{"index": i, "status": "pending"} for i in range(len(items))]
+    semaphore = asyncio.Semaphore(config.STORAGE_PARALLELISM)
+    loop = asyncio.get_running_loop()
+
+    async def prepare(i, item, client):
+        try:
+            async with semaphore:
+                if item.get("image_url"):
+                    resp = await client.get(item["image_url"])
+                    resp.raise_for_status()
+                    image_bytes = resp.content
+                elif item.get("image_data"):
+                    image_bytes = base64.b64decode(item["image_data"])
+                else:
+                    raise ValueError("Either image_data or image_url must be provided")
+
+                filename = f"{uuid.uuid4().hex}.png"
+                return await loop.run_in_executor(None, lambda: upload_bytes(image_bytes, filename, content_type="image/png"))
+        except Exception as e:
+            print(f"Error preparing batch item {i}: {e}")
+            results[i] = {"index": i, "status": "error", "error": str(e)}
+            return None
+
+    async with httpx.AsyncClient() as client:
+        blob_names = await asyncio.gather(*(prepare(i, item, client) for i, item in enumerate(items)))
+
+    assets = {}
+    try:
+        for i, (item, blob_name) in enumerate(zip(items, blob_names)):
+            if blob_name is None:
+                continue
+            asset = models.Asset(
+                project_id=item["project_id"],
+                type="image",
+                url=blob_name,
+                prompt=item.get("prompt"),
+                model_type=item.get("model_type"),
+                context_version=item.get("context_version"),
+                context_data=item.get("context_data")
+            )
+            db.add(asset)
+            assets[i] = asset
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"Error committing batch save: {e}")
+        # Nothing was recorded, so don't leave the uploads behind
+        delete_blobs([blob_names[i] for i in assets], max_workers=config.STORAGE_PARALLELISM)
+        for i in assets:
+            results[i] = {"index": i, "status": "error", "error": str(e)}
+        return results
+
+    from backend.services.renditions import schedule_renditions
+    for i, asset in assets.items():
+        schedule_renditions(asset.id)
+        results[i] = {"index": i, "status": "saved", "asset_id": asset.id, "blob_name": asset.url}
+    return results
+
 async def optimize_prompt_text(
     prompt: str,
     model_name: str = config.MODEL_TEXT_FAST
@@ -306,13 +418,19 @@ async def optimize_prompt_text(
         )
         
         client = get_client()
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.7
-            )
+        # Concurrent requests to optimize the same prompt share one model call
+        response = await single_flight.run(
+            flight_key("/image-creation/optimize", model_name, prompt),
+            lambda: asyncio.to_thread(
+                client.models.generate_content,
+                model=model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    system_instruction=system_instruction,
+                    temperature=0.7
+                )
+            ),
+            operation="image_optimize",
         )
         
         if response.text:
@@ -0,0 +1,151 @@
+"""
+Filesystem stand-in for the subset of the google-cloud-storage client this app uses.
+Enabled with STORAGE_BACKEND=local; blobs live under LOCAL_STORAGE_DIR/<bucket>/<blob name>.
+"""
+import os
+import shutil
+import datetime
+from typing import Iterator, Optional
+from google.api_core.exceptions import NotFound
+
+
+class LocalBlob:
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.metadata = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.path, *self.name.split("/"))
+
+    @property
+    def size(self) -> Optional[int]:
+        return os.path.getsize(self.path) if os.path.isfile(self.path) else None
+
+    @property
+    def updated(self) -> Optional[datetime.datetime]:
+        if not os.path.isfile(self.path):
+            return None
+        return datetime.datetime.fromtimestamp(os.path.getmtime(self.path), tz=datetime.timezone.utc)
+
+    time_created = updated
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def reload(self):
+        if not self.exists():
+            raise NotFound(f"Blob {self.name} not found")
+
+    def patch(self):
+        # Like GCS, a metadata change moves "updated"
+        self.reload()
+        os.utime(self.path)
+
+    def upload_from_file(self, file_obj, content_type: str = None, **kwargs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "wb") as f:
+            shutil.copyfileobj(file_obj, f)
+        self.content_type = content_type
+
+    def upload_from_filename(self, filename: str, content_type: str = None, **kwargs):
+        with open(filename, "rb") as f:
+            self.upload_from_file(f, content_type=content_type)
+
+    def upload_from_string(self, data, content_type: str = None, **kwargs):
+        import io
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.upload_from_file(io.BytesIO(data), content_type=content_type)
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        self.reload()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def download_to_file(self, file_obj, **kwargs):
+        self.reload()
+        with open(self.path, "rb") as f:
+            shutil.copyfileobj(f, file_obj)
+
+    def download_to_filename(self, filename: str, **kwargs):
+        self.reload()
+        shutil.copyfile(self.path, filename)
+
+    def open(self, mode: str = "rb"):
+        if "w" in mode:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        else:
+            self.reload()
+        return open(self.path, mode if "b" in mode else mode + "b")
+
+    def delete(self):
+        self.bucket.delete_blob(self.name)
+
+    def generate_signed_url(self, **kwargs) -> str:
+        # Served by the /local-storage mount in main.py
+        return f"/local-storage/{self.bucket.name}/{self.name}"
+
+
+class LocalBucket:
+    def __init__(self, client: "LocalStorageClient", name: str):
+        self.client = client
+        self.name = name
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.client.root, self.name)
+
+    def blob(self, blob_name: str) -> LocalBlob:
+        return LocalBlob(self, blob_name)
+
+    def get_blob(self, blob_name: str) -> Optional[LocalBlob]:
+        blob = self.blob(blob_name)
+        return blob if blob.exists() else None
+
+    def list_blobs(self, prefix: str = None, start_offset: str = None, max_results: int = None, **kwargs) -> Iterator[LocalBlob]:
+        """Yields blobs in lexicographic name order, like GCS."""
+        names = []
+        for root, _, files in os.walk(self.path):
+            for filename in files:
+                rel_path = os.path.relpath(os.path.join(root, filename), self.path)
+                names.append(rel_path.replace(os.sep, "/"))
+
+        count = 0
+        for name in sorted(names):
+            if prefix and not name.startswith(prefix):
+                continue
+            if start_offset and name < start_offset:
+                continue
+            if max_results is not None and count >= max_results:
+                return
+            count += 1
+            yield self.blob(name)
+
+    def delete_blob(self, blob_name: str, **kwargs):
+        path = self.blob(blob_name).path
+        if not os.path.isfile(path):
+            raise NotFound(f"Blob {blob_name} not found")
+        os.remove(path)
+
+    def copy_blob(self, blob: LocalBlob, destination_bucket: "LocalBucket", new_name: str = None, **kwargs) -> LocalBlob:
+        target = destination_bucket.blob(new_name or blob.name)
+        os.makedirs(os.path.dirname(target.path), exist_ok=True)
+        shutil.copyfile(blob.path, target.path)
+        return target
+
+    def rename_blob(self, blob: LocalBlob, new_name: str, **kwargs) -> LocalBlob:
+        target = self.copy_blob(blob, self, new_name)
+        self.delete_blob(blob.name)
+        return target
+
+
+class LocalStorageClient:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def bucket(self, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self, bucket_name)
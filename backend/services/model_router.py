@@ -0,0 +1,210 @@
+"""
+Latency- and load-aware choice between the fast and high-quality image/video models.
+
+Callers that pin a model (model_name / quality="speed"|"quality") get exactly that model, as
+before, even if they also send a budget; their calls still feed the live stats. Callers can
+instead leave the model unset (or "auto") and state a policy:
+
+- latency_budget_ms: the highest-quality model whose expected latency fits the budget, or
+  else the fastest one. Expected latency is the model's recent p95, stretched by its queue
+  depth (in-flight calls beyond ROUTER_QUEUE_CAPACITY) in this process.
+- "auto" (best-effort quality): the high-quality model unless it is failing (error rate
+  above ROUTER_MAX_ERROR_RATE) or backed up.
+
+A routed call that fails, or runs past ROUTER_TIMEOUT_FACTOR x its model's p95 (or past the
+point where the next model could still meet the budget), falls back to the next model. The
+last attempt runs without a timeout: the budget is a target, not a deadline. A timed-out
+attempt can't be cancelled upstream (threads and Veo operations keep running), so it is
+abandoned but left to finish, and counts as in flight for its model until it does. Blocking
+image calls run on their own thread pool (run_blocking), so abandoned attempts can't starve
+the default executor. Decisions, fallbacks and per-model stats are served at /metrics/model-router.
+"""
+import time
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.config import config
+
+AUTO = "auto"
+# The image services map this alias to MODEL_IMAGE_HIGH_QUALITY and its global endpoint
+IMAGE_HIGH_QUALITY_ALIAS = "gemini-3-pro-image-preview"
+# Latency assumed until a model has ROUTER_MIN_SAMPLES successful calls
+PRIOR_LATENCY_MS = {
+    ("image", "fast"): 10000,
+    ("image", "high_quality"): 30000,
+    ("video", "fast"): 60000,
+    ("video", "high_quality"): 150000,
+}
+# Failures older than this stop counting, so a model skipped for errors gets retried
+ERROR_HORIZON_SECONDS = 120
+
+_executor = ThreadPoolExecutor(max_workers=config.ROUTER_WORKERS, thread_name_prefix="model-router")
+
+
+async def run_blocking(func: Callable, *args) -> Any:
+    """Runs a blocking model call on the router's thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(func, *args))
+
+
+def tiers(kind: str) -> List[Tuple[str, str]]:
+    """(tier, model) pairs from fastest to highest quality."""
+    if kind == "image":
+        return [("fast", config.MODEL_IMAGE_FAST), ("high_quality", IMAGE_HIGH_QUALITY_ALIAS)]
+    if kind == "video":
+        return [("fast", config.MODEL_VIDEO_FAST), ("high_quality", config.MODEL_VIDEO_HIGH_QUALITY)]
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+class ModelStats:
+    def __init__(self, prior_ms: float):
+        self.prior_ms = prior_ms
+        self.in_flight = 0
+        self.latencies = deque(maxlen=config.ROUTER_WINDOW) # Successful calls, ms
+        self.outcomes = deque(maxlen=config.ROUTER_WINDOW) # (monotonic time, "ok" | "error" | "timeout")
+        self.calls = 0
+
+    def percentile_ms(self, q: float) -> float:
+        if len(self.latencies) < config.ROUTER_MIN_SAMPLES:
+            return self.prior_ms
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def expected_ms(self) -> float:
+        """p95, stretched by however far the queue is past the capacity assumed to run in parallel."""
+        return self.percentile_ms(0.95) * max(1.0, (self.in_flight + 1) / config.ROUTER_QUEUE_CAPACITY)
+
+    def error_rate(self) -> float:
+        horizon = time.monotonic() - ERROR_HORIZON_SECONDS
+        recent = [outcome for at, outcome in self.outcomes if at >= horizon]
+        if len(recent) < config.ROUTER_MIN_SAMPLES:
+            return 0.0
+        return sum(outcome != "ok" for outcome in recent) / len(recent)
+
+    def healthy(self) -> bool:
+        return self.error_rate() <= config.ROUTER_MAX_ERROR_RATE and self.in_flight < 2 * config.ROUTER_QUEUE_CAPACITY
+
+
+class ModelRouter:
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], ModelStats] = {}
+        self._decisions: Dict[Tuple[str, str, str, str], int] = {}
+        self._fallbacks: Dict[Tuple[str, str, str, str], int] = {}
+
+    def _stats(self, kind: str, model: str) -> ModelStats:
+        stats = self._models.get((kind, model))
+        if stats is None:
+            tier = next((tier for tier, tier_model in tiers(kind) if tier_model == model), "fast")
+            stats = self._models[(kind, model)] = ModelStats(PRIOR_LATENCY_MS[(kind, tier)])
+        return stats
+
+    def plan(self, kind: str, model: Optional[str] = None, latency_budget_ms: Optional[float] = None) -> Tuple[List[str], str, str]:
+        """
+        Returns (models to try in order, policy, reason for the first choice).
+        """
+        if model != AUTO and (model is not None or latency_budget_ms is None):
+            return [model or tiers(kind)[0][1]], "pinned", "pinned"
+
+        by_quality = [tier_model for _, tier_model in reversed(tiers(kind))] # Highest quality first
+        healthy = [candidate for candidate in by_quality if self._stats(kind, candidate).healthy()]
+
+        if latency_budget_ms is None:
+            order = healthy + [candidate for candidate in by_quality if candidate not in healthy]
+            reason = "preferred" if order[0] == by_quality[0] else "high_quality_degraded"
+            return order, "best_quality", reason
+
+        fitting = [candidate for candidate in healthy if self._stats(kind, candidate).expected_ms() <= latency_budget_ms]
+        if fitting:
+            first, reason = fitting[0], "fits_budget"
+        else:
+            first = min(healthy or by_quality, key=lambda candidate: self._stats(kind, candidate).expected_ms())
+            reason = "over_budget_fastest"
+        # Fallbacks by expected latency: after a failure, whatever answers soonest
+        rest = sorted((candidate for candidate in by_quality if candidate != first), key=lambda candidate: self._stats(kind, candidate).expected_ms())
+        return [first] + rest, "latency_budget", reason
+
+    def _timeout(self, kind: str, model: str, next_model: Optional[str], started: float, latency_budget_ms: Optional[float]) -> Optional[float]:
+        if next_model is None:
+            return None
+        timeout_ms = config.ROUTER_TIMEOUT_FACTOR * self._stats(kind, model).percentile_ms(0.95)
+        if latency_budget_ms is not None:
+            # Leave the next model time to land within the budget, when it still can
+            remaining_ms = latency_budget_ms - (time.monotonic() - started) * 1000 - self._stats(kind, next_model).expected_ms()
+            if remaining_ms > 0:
+                timeout_ms = min(timeout_ms, remaining_ms)
+        return timeout_ms / 1000
+
+    async def call(self, kind: str, call: Callable[[str], Awaitable[Any]], model: Optional[str] = None,
+                   latency_budget_ms: Optional[float] = None) -> Tuple[Any, str]:
+        """
+        Runs call(model) on the model chosen for this policy, falling back on errors and
+        timeouts. Returns (result, model that produced it).
+        """
+        order, policy, reason = self.plan(kind, model, latency_budget_ms)
+        key = (kind, policy, order[0], reason)
+        self._decisions[key] = self._decisions.get(key, 0) + 1
+        if policy != "pinned":
+            print(f"DEBUG: Routing {kind} call to {order[0]} ({policy}: {reason})")
+
+        started = time.monotonic()
+        for index, candidate in enumerate(order):
+            next_model = order[index + 1] if index + 1 < len(order) else None
+            timeout = self._timeout(kind, candidate, next_model, started, latency_budget_ms) if policy != "pinned" else None
+            stats = self._stats(kind, candidate)
+            stats.in_flight += 1
+            stats.calls += 1
+            attempt_started = time.monotonic()
+            attempt = asyncio.ensure_future(call(candidate))
+            attempt.add_done_callback(functools.partial(self._attempt_finished, stats))
+            try:
+                done, _ = await asyncio.wait({attempt}, timeout=timeout)
+                if not done:
+                    raise asyncio.TimeoutError() # Abandoned, not cancelled: it keeps its in-flight slot
+                result = attempt.result()
+            except asyncio.CancelledError:
+                attempt.cancel()
+                raise
+            except Exception as e:
+                cause = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                stats.outcomes.append((time.monotonic(), cause))
+                if next_model is None or policy == "pinned":
+                    raise
+                fallback = (kind, candidate, next_model, cause)
+                self._fallbacks[fallback] = self._fallbacks.get(fallback, 0) + 1
+                print(f"DEBUG: {kind} call to {candidate} failed ({cause}: {e or 'no response in time'}); falling back to {next_model}")
+                continue
+            stats.latencies.append((time.monotonic() - attempt_started) * 1000)
+            stats.outcomes.append((time.monotonic(), "ok"))
+            return result, candidate
+
+    @staticmethod
+    def _attempt_finished(stats: ModelStats, attempt: asyncio.Future):
+        stats.in_flight -= 1
+        if not attempt.cancelled():
+            attempt.exception() # Retrieved: a failed attempt was handled, or abandoned
+
+    def stats(self) -> Dict:
+        return {
+            "models": [
+                {
+                    "kind": kind, "model": model, "in_flight": stats.in_flight, "calls": stats.calls,
+                    "samples": len(stats.latencies), "p50_ms": round(stats.percentile_ms(0.5)),
+                    "p95_ms": round(stats.percentile_ms(0.95)), "expected_ms": round(stats.expected_ms()),
+                    "error_rate": round(stats.error_rate(), 3), "healthy": stats.healthy(),
+                }
+                for (kind, model), stats in self._models.items()
+            ],
+            "decisions": [
+                {"kind": kind, "policy": policy, "model": model, "reason": reason, "count": count}
+                for (kind, policy, model, reason), count in self._decisions.items()
+            ],
+            "fallbacks": [
+                {"kind": kind, "from": source, "to": target, "cause": cause, "count": count}
+                for (kind, source, target, cause), count in self._fallbacks.items()
+            ],
+        }
+
+
+model_router = ModelRouter()
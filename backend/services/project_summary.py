@@ -0,0 +1,235 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event, func, select, update, insert, inspect
+from sqlalchemy.orm import Session
+
+from backend import models
+
+# Asset types that have their own counter column. Anything else only counts towards asset_count.
+TYPE_COUNT_COLUMNS = {
+    "image": "image_count",
+    "video": "video_count",
+    "tryon": "tryon_count",
+}
+
+# Asset types that can be shown as a project thumbnail
+COVER_ASSET_TYPES = ("image", "tryon")
+
+summaries = models.ProjectSummary.__table__
+assets = models.Asset.__table__
+
+
+def _latest_cover(connection, project_id: int) -> Optional[tuple]:
+    return connection.execute(
+        select(assets.c.id, assets.c.url)
+        .where(assets.c.project_id == project_id, assets.c.type.in_(COVER_ASSET_TYPES))
+        .order_by(assets.c.id.desc())
+        .limit(1)
+    ).first()
+
+
+def _apply_changes(connection, project_id: int, change: Dict):
+    values = {
+        "asset_count": summaries.c.asset_count + change["asset_count"],
+        "last_activity_at": change["last_activity_at"],
+    }
+    for column in TYPE_COUNT_COLUMNS.values():
+        if change.get(column):
+            values[column] = summaries.c[column] + change[column]
+
+    cover = change.get("cover")
+    if change.get("cover_removed"):
+        cover = _latest_cover(connection, project_id)
+        values["cover_asset_id"] = cover[0] if cover else None
+        values["cover_asset_url"] = cover[1] if cover else None
+    elif cover:
+        values["cover_asset_id"] = cover[0]
+        values["cover_asset_url"] = cover[1]
+
+    result = connection.execute(
+        update(summaries).where(summaries.c.project_id == project_id).values(**values)
+    )
+    if result.rowcount == 0:
+        # First change for this project (or the summary was never built): rebuild from source
+        rebuild_project_summary(connection, project_id)
+
+
+def rebuild_project_summary(connection, project_id: int):
+    """
+    Recomputes one project's summary from the assets table. Used for backfill and repair.
+    """
+    counts = {column: 0 for column in TYPE_COUNT_COLUMNS.values()}
+    total = 0
+    for asset_type, count in connection.execute(
+        select(assets.c.type, func.count()).where(assets.c.project_id == project_id).group_by(assets.c.type)
+    ):
+        total += count
+        if asset_type in TYPE_COUNT_COLUMNS:
+            counts[TYPE_COUNT_COLUMNS[asset_type]] = count
+
+    last_asset_at = connection.execute(
+        select(func.max(assets.c.created_at)).where(assets.c.project_id == project_id)
+    ).scalar()
+    if last_asset_at is None:
+        last_asset_at = connection.execute(
+            select(models.Project.__table__.c.created_at).where(models.Project.__table__.c.id == project_id)
+        ).scalar()
+    cover = _latest_cover(connection, project_id)
+
+    connection.execute(summaries.delete().where(summaries.c.project_id == project_id))
+    connection.execute(
+        insert(summaries).values(
+            project_id=project_id,
+            asset_count=total,
+            last_activity_at=last_asset_at or datetime.utcnow(),
+            cover_asset_id=cover[0] if cover else None,
+            cover_asset_url=cover[1] if cover else None,
+            **counts,
+        )
+    )
+
+
+def backfill_project_summaries(db: Session) -> int:
+    """
+    Builds summaries for projects that don't have one yet (e.g. existing databases).
+    Returns the number of summaries created.
+    """
+    connection = db.connection()
+    missing = connection.execute(
+        select(models.Project.__table__.c.id).where(
+            ~models.Project.__table__.c.id.in_(select(summaries.c.project_id))
+        )
+    ).scalars().all()
+    for project_id in missing:
+        rebuild_project_summary(connection, project_id)
+    db.commit()
+    if missing:
+        print(f"DEBUG: Backfilled {len(missing)} project summaries")
+    return len(missing)
+
+
+def delete_project_summary(db: Session, project_id: int):
+    db.query(models.ProjectSummary).filter(models.ProjectSummary.project_id == project_id).delete()
+
+
+@event.listens_for(models.Asset.project_id, "set", active_history=True)
+@event.listens_for(models.Asset.type, "set", active_history=True)
+def _keep_previous_value(target, value, oldvalue, initiator):
+    # active_history loads the old value even on expired objects, so a move can be counted
+    # against the project and type the asset leaves
+    pass
+
+
+@event.listens_for(Session, "after_flush")
+def _track_asset_changes(session, flush_context):
+    """
+    Keeps project_summaries in step with every Asset insert, delete and update (type, project
+    or url) going through the ORM, in the same transaction as the change itself.
+    """
+    changes: Dict[int, Dict] = {}
+    now = datetime.utcnow()
+
+    def change_for(project_id):
+        return changes.setdefault(project_id, {"asset_count": 0, "last_activity_at": now})
+
+    # New projects start with an empty summary, so their first assets only need the atomic
+    # increments below; concurrent first saves can't both try to create the row
+    new_projects = [obj for obj in session.new if isinstance(obj, models.Project)]
+    if new_projects:
+        session.connection().execute(insert(summaries), [
+            {"project_id": project.id, "asset_count": 0, "last_activity_at": project.created_at or now}
+            for project in new_projects
+        ])
+
+    for obj in session.new:
+        if isinstance(obj, models.Asset) and obj.project_id is not None:
+            change = change_for(obj.project_id)
+            change["asset_count"] += 1
+            column = TYPE_COUNT_COLUMNS.get(obj.type)
+            if column:
+                change[column] = change.get(column, 0) + 1
+            if obj.type in COVER_ASSET_TYPES and (not change.get("cover") or obj.id > change["cover"][0]):
+                change["cover"] = (obj.id, obj.url)
+
+    for obj in session.deleted:
+        if isinstance(obj, models.Asset) and obj.project_id is not None:
+            change = change_for(obj.project_id)
+            change["asset_count"] -= 1
+            column = TYPE_COUNT_COLUMNS.get(obj.type)
+            if column:
+                change[column] = change.get(column, 0) - 1
+            if obj.type in COVER_ASSET_TYPES:
+                change["cover_removed"] = True
+
+    renamed_covers = []
+    for obj in session.dirty:
+        if not isinstance(obj, models.Asset):
+            continue
+        state = inspect(obj)
+        moved = {}
+        for attribute in ("project_id", "type"):
+            history = state.attrs[attribute].history
+            moved[attribute] = history.deleted[0] if history.deleted else getattr(obj, attribute)
+        if (moved["project_id"], moved["type"]) != (obj.project_id, obj.type):
+            # Counted as leaving its old project/type and joining the new one
+            if moved["project_id"] is not None:
+                change = change_for(moved["project_id"])
+                change["asset_count"] -= 1
+                column = TYPE_COUNT_COLUMNS.get(moved["type"])
+                if column:
+                    change[column] = change.get(column, 0) - 1
+                change["cover_removed"] = True
+            if obj.project_id is not None:
+                change = change_for(obj.project_id)
+                change["asset_count"] += 1
+                column = TYPE_COUNT_COLUMNS.get(obj.type)
+                if column:
+                    change[column] = change.get(column, 0) + 1
+                change["cover_removed"] = True # Recomputed: the moved asset may now be the newest
+        elif state.attrs["url"].history.added:
+            renamed_covers.append((obj.id, obj.url))
+
+    if not changes and not renamed_covers:
+        return
+
+    connection = session.connection()
+    for project_id, change in changes.items():
+        _apply_changes(connection, project_id, change)
+    for asset_id, url in renamed_covers:
+        connection.execute(update(summaries).where(summaries.c.cover_asset_id == asset_id).values(cover_asset_url=url))
+
+
+def list_project_summaries(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+    """
+    Returns project summaries for the project list in a single query.
+    """
+    projects = models.Project.__table__
+    rows = db.execute(
+        select(
+            projects.c.id,
+            projects.c.name,
+            projects.c.description,
+            projects.c.created_at,
+            summaries.c.asset_count,
+            summaries.c.image_count,
+            summaries.c.video_count,
+            summaries.c.tryon_count,
+            summaries.c.last_activity_at,
+            summaries.c.cover_asset_id,
+            summaries.c.cover_asset_url,
+        )
+        .select_from(projects.outerjoin(summaries, summaries.c.project_id == projects.c.id))
+        .order_by(projects.c.id)
+        .offset(skip)
+        .limit(limit)
+    ).mappings().all()
+
+    results = []
+    for row in rows:
+        item = dict(row)
+        for column in ("asset_count", *TYPE_COUNT_COLUMNS.values()):
+            item[column] = item[column] or 0
+        item["last_activity_at"] = item["last_activity_at"] or item["created_at"]
+        item["cover_url"] = item.pop("cover_asset_url")
+        results.append(item)
+    return results
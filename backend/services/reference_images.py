@@ -0,0 +1,171 @@
+"""
+Reference image preprocessing and caching.
+
+Uploaded style/product/scene references are normalized once (EXIF orientation applied,
+downscaled to what the image models actually use, re-encoded compactly) and cached by the
+SHA-256 of the original upload: in memory for this process and in storage under
+reference_cache/ for every instance. With Vertex AI the cached blob is passed to the model
+as a gs:// reference instead of inline bytes.
+"""
+import io
+import time
+import hashlib
+import datetime
+import threading
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import UploadFile
+from google.genai import types
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: references are sent as uploaded without Pillow
+    Image = None
+
+from backend.config import config
+from backend.services.storage import storage_client, BUCKET_NAME, upload_bytes
+
+CACHE_PREFIX = "reference_cache/"
+# Cached blobs are only trusted (and re-touched in storage) for this long, which keeps every blob
+# in use well inside the orphan collector's grace period (GC_GRACE_HOURS)
+CACHE_TTL_SECONDS = config.GC_GRACE_HOURS * 3600 / 4
+
+
+class ReferenceCache:
+    """Byte-bounded in-process LRU with TTL: content hash -> (compact bytes, mime type)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, Tuple[bytes, str, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > CACHE_TTL_SECONDS:
+                del self.entries[key]
+                self.size -= len(entry[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key: str, data: bytes, mime_type: str):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = (data, mime_type, time.monotonic())
+            self.size += len(data)
+            while self.size > self.max_bytes and self.entries:
+                _, (evicted, _, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+cache = ReferenceCache(config.REFERENCE_CACHE_MAX_BYTES)
+
+
+def normalize_image(data: bytes, mime_type: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    Applies EXIF orientation, downsizes to REFERENCE_MAX_EDGE and re-encodes
+    (JPEG for opaque images, WebP when there is transparency).
+    Keeps the original bytes when nothing had to change and they are already smaller.
+    """
+    if Image is None:
+        return data, mime_type or "image/jpeg"
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:  # Formats Pillow can't decode are left for the model to handle
+        print(f"DEBUG: Reference image not normalized ({e})")
+        return data, mime_type or "image/jpeg"
+    oriented = ImageOps.exif_transpose(image)
+    changed = oriented is not image and image.getexif().get(0x0112, 1) != 1
+    image = oriented
+    if max(image.size) > config.REFERENCE_MAX_EDGE:
+        image.thumbnail((config.REFERENCE_MAX_EDGE, config.REFERENCE_MAX_EDGE), Image.LANCZOS)
+        changed = True
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    buffer = io.BytesIO()
+    if has_alpha:
+        image.convert("RGBA").save(buffer, format="WEBP", quality=config.REFERENCE_QUALITY)
+        encoded, encoded_type = buffer.getvalue(), "image/webp"
+    else:
+        image.convert("RGB").save(buffer, format="JPEG", quality=config.REFERENCE_QUALITY, optimize=True)
+        encoded, encoded_type = buffer.getvalue(), "image/jpeg"
+
+    if not changed and len(encoded) >= len(data) and mime_type:
+        return data, mime_type
+    return encoded, encoded_type
+
+
+def cache_blob_name(digest: str, mime_type: str) -> str:
+    extension = {"image/webp": "webp", "image/png": "png"}.get(mime_type, "jpg")
+    return f"{CACHE_PREFIX}{digest}.{extension}"
+
+
+def _load_from_storage(digest: str) -> Optional[Tuple[bytes, str]]:
+    bucket = storage_client.bucket(BUCKET_NAME)
+    for mime_type in ("image/jpeg", "image/webp", "image/png"):
+        blob = bucket.get_blob(cache_blob_name(digest, mime_type))
+        if blob is None:
+            continue
+        age = datetime.datetime.now(datetime.timezone.utc) - blob.updated if blob.updated else None
+        if age is None or age.total_seconds() > CACHE_TTL_SECONDS:
+            # A metadata patch bumps "updated" so the orphan collector keeps treating it as recent
+            blob.metadata = {"touched_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+            blob.patch()
+        return blob.download_as_bytes(), mime_type
+    return None
+
+
+def prepare_reference(data: bytes, mime_type: Optional[str] = None) -> Tuple[str, bytes, str]:
+    """
+    Returns (content hash, compact bytes, mime type) for a reference image, using the caches.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    cached = cache.get(digest)
+    if cached is None:
+        cached = _load_from_storage(digest)
+        if cached is None:
+            cached = normalize_image(data, mime_type)
+            upload_bytes(cached[0], cache_blob_name(digest, cached[1]), content_type=cached[1])
+        cache.put(digest, *cached)
+    return digest, cached[0], cached[1]
+
+
+def reference_part(data: bytes, mime_type: Optional[str] = None) -> types.Part:
+    """
+    Model content part for a reference image: a gs:// reference on Vertex AI, compact inline bytes otherwise.
+    """
+    digest, compact, compact_type = prepare_reference(data, mime_type)
+    if config.GOOGLE_GENAI_USE_VERTEXAI and config.REFERENCE_USE_GCS_URI and config.STORAGE_BACKEND == "gcs":
+        return types.Part.from_uri(file_uri=f"gs://{BUCKET_NAME}/{cache_blob_name(digest, compact_type)}", mime_type=compact_type)
+    return types.Part(inline_data=types.Blob(data=compact, mime_type=compact_type))
+
+
+def stored_reference_part(blob_name: str, mime_type: str) -> types.Part:
+    """
+    Model content part for a reference image already stored in the bucket.
+    """
+    if config.GOOGLE_GENAI_USE_VERTEXAI and config.REFERENCE_USE_GCS_URI and config.STORAGE_BACKEND == "gcs":
+        return types.Part.from_uri(file_uri=f"gs://{BUCKET_NAME}/{blob_name}", mime_type=mime_type)
+    data = storage_client.bucket(BUCKET_NAME).blob(blob_name).download_as_bytes()
+    return types.Part(inline_data=types.Blob(data=data, mime_type=mime_type))
+
+
+async def upload_reference_part(upload: UploadFile) -> types.Part:
+    """
+    Reads an uploaded reference image and returns its (cached) model content part.
+    """
+    data = await upload.read()
+    await upload.seek(0)
+    return await asyncio.to_thread(reference_part, data, upload.content_type)
@@ -0,0 +1,181 @@
+import io
+import os
+import json
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: image thumbnails are skipped without Pillow
+    Image = None
+
+from backend import models
+from backend.config import config
+from backend.database import SessionLocal
+from backend.services.storage import upload_bytes, download_bytes, download_to_filename, generate_signed_url
+
+# Longest edge in pixels for each WebP thumbnail
+THUMBNAIL_SIZES = {
+    "thumb_256": 256,
+    "thumb_512": 512,
+    "thumb_1024": 1024,
+}
+THUMBNAIL_QUALITY = 80
+
+# Video renditions: a poster frame (WebP) and a short, silent, low-bitrate preview clip
+POSTER_SIZE = 1024
+POSTER_OFFSET_SECONDS = 0.5
+PREVIEW_SECONDS = 4
+PREVIEW_HEIGHT = 360
+PREVIEW_BITRATE = "300k"
+
+# Background pool so rendering never delays the save request
+_executor = ThreadPoolExecutor(max_workers=config.RENDITION_WORKERS, thread_name_prefix="renditions")
+
+
+def rendition_blob_name(blob_name: str, rendition: str, extension: str) -> str:
+    """
+    Renditions are stored next to the original, e.g. abc.png -> abc.thumb_512.webp
+    """
+    root, _ = os.path.splitext(blob_name)
+    return f"{root}.{rendition}.{extension}"
+
+
+def render_thumbnails(image_bytes: bytes) -> Dict[str, bytes]:
+    """
+    Renders WebP thumbnails for every size in THUMBNAIL_SIZES. Sizes larger than the source are skipped.
+    """
+    if Image is None:
+        print("WARNING: Pillow not installed, skipping thumbnails")
+        return {}
+
+    source = Image.open(io.BytesIO(image_bytes))
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+    thumbnails = {}
+    for name, size in THUMBNAIL_SIZES.items():
+        if max(source.size) < size and thumbnails:
+            continue
+        thumb = source.copy()
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        thumb.save(buffer, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        thumbnails[name] = buffer.getvalue()
+    return thumbnails
+
+
+def _run_ffmpeg(args):
+    subprocess.run(
+        [config.FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+def render_video_renditions(video_path: str) -> Dict[str, bytes]:
+    """
+    Renders a WebP poster frame and a short low-bitrate MP4 preview using ffmpeg.
+    """
+    renditions = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        poster_path = os.path.join(work_dir, "poster.png")
+        preview_path = os.path.join(work_dir, "preview.mp4")
+
+        try:
+            _run_ffmpeg(["-ss", str(POSTER_OFFSET_SECONDS), "-i", video_path, "-frames:v", "1", poster_path])
+        except subprocess.CalledProcessError:
+            # Clips shorter than the offset: take the very first frame
+            _run_ffmpeg(["-i", video_path, "-frames:v", "1", poster_path])
+
+        with open(poster_path, "rb") as f:
+            poster = render_thumbnails(f.read())
+        poster_name = f"thumb_{POSTER_SIZE}"
+        if poster:
+            renditions["poster"] = poster.get(poster_name) or list(poster.values())[-1]
+
+        _run_ffmpeg([
+            "-i", video_path,
+            "-t", str(PREVIEW_SECONDS),
+            "-an",
+            "-vf", f"scale=-2:{PREVIEW_HEIGHT}",
+            "-c:v", "libx264", "-preset", "veryfast", "-b:v", PREVIEW_BITRATE,
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            preview_path,
+        ])
+        with open(preview_path, "rb") as f:
+            renditions["preview"] = f.read()
+
+    return renditions
+
+
+def generate_renditions(asset_id: int) -> Dict[str, str]:
+    """
+    Renders, uploads and records renditions for one asset. Returns rendition name -> blob name.
+    """
+    db = SessionLocal()
+    try:
+        asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
+        if asset is None or not asset.url or asset.url.startswith("http"):
+            return {}
+
+        stored = {}
+        if asset.type == "video":
+            with tempfile.NamedTemporaryFile(suffix=".mp4") as source:
+                download_to_filename(asset.url, source.name)
+                for name, data in render_video_renditions(source.name).items():
+                    if name == "preview":
+                        blob_name = rendition_blob_name(asset.url, name, "mp4")
+                        upload_bytes(data, blob_name, content_type="video/mp4")
+                    else:
+                        blob_name = rendition_blob_name(asset.url, name, "webp")
+                        upload_bytes(data, blob_name, content_type="image/webp")
+                    stored[name] = blob_name
+        else:
+            for name, data in render_thumbnails(download_bytes(asset.url)).items():
+                blob_name = rendition_blob_name(asset.url, name, "webp")
+                upload_bytes(data, blob_name, content_type="image/webp")
+                stored[name] = blob_name
+
+        asset.renditions = json.dumps(stored)
+        db.commit()
+        print(f"DEBUG: Generated renditions for asset {asset_id}: {list(stored)}")
+        return stored
+    except Exception as e:
+        print(f"Error generating renditions for asset {asset_id}: {e}")
+        return {}
+    finally:
+        db.close()
+
+
+def schedule_renditions(asset_id: Optional[int]):
+    """
+    Queues rendition generation for a saved asset on the background worker pool.
+    """
+    if asset_id is not None:
+        _executor.submit(generate_renditions, asset_id)
+
+
+def sign_renditions(renditions: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """
+    Returns rendition name -> signed URL for a rendition name -> blob name mapping.
+    """
+    if not renditions:
+        return renditions
+    return {name: generate_signed_url(blob_name) for name, blob_name in renditions.items()}
+
+
+def ensure_renditions_column(engine: Engine):
+    """Adds assets.renditions to databases created before renditions (create_all doesn't alter tables)."""
+    columns = {column["name"] for column in inspect(engine).get_columns("assets")}
+    if "renditions" in columns:
+        return
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE assets ADD COLUMN renditions TEXT"))
+    print("DEBUG: Added assets.renditions")
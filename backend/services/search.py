@@ -0,0 +1,227 @@
+"""
+Full-text search over assets (prompt, context), projects and context versions.
+
+On SQLite the index is a set of FTS5 tables over the existing rows (external content), kept in
+sync by triggers on insert, delete and update of the indexed columns, so every write path is
+covered without touching it. Results are ranked with bm25 across all three kinds and paged
+with an opaque keyset cursor (rank, kind, id), so deep pages cost the same as the first.
+
+Other databases fall back to unranked substring matching with the same result shape.
+"""
+import re
+import json
+import base64
+import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+KINDS = ("asset", "project", "context_version")
+BRAND_FIELDS = (
+    "brand_vibe", "brand_lighting", "brand_colors", "brand_subject",
+    "project_vibe", "project_lighting", "project_colors", "project_subject",
+)
+
+# Per kind: source table, indexed columns with their bm25 weights, and result columns.
+# Asset context lives in context_snapshots (see context_snapshots.py): the index reads it
+# through a view, and the triggers resolve it the same way.
+ASSET_CONTEXT = "COALESCE((SELECT content FROM context_snapshots WHERE hash = {row}.context_hash), {row}.context_data)"
+INDEXES = {
+    "asset": {
+        "table": "assets",
+        "fts": "assets_fts",
+        "columns": {"prompt": 10.0, "context_data": 2.0, "context_version": 1.0},
+        "select": "t.project_id, t.prompt, t.type, t.model_type, t.url",
+        "content": "assets_search",
+        "view": (
+            "CREATE VIEW assets_search AS SELECT a.id, a.prompt, COALESCE(s.content, a.context_data) AS context_data, "
+            "a.context_version FROM assets a LEFT JOIN context_snapshots s ON s.hash = a.context_hash"
+        ),
+        "expressions": {"context_data": ASSET_CONTEXT},
+        "watch": ("context_hash",),
+    },
+    "project": {
+        "table": "projects",
+        "fts": "projects_fts",
+        "columns": {"name": 10.0, "description": 5.0, "context": 2.0, **{field: 1.0 for field in BRAND_FIELDS}},
+        "select": "t.id, t.name, NULL, NULL, NULL",
+    },
+    "context_version": {
+        "table": "context_versions",
+        "fts": "context_versions_fts",
+        "columns": {"name": 10.0, "description": 5.0, "context": 2.0, **{field: 1.0 for field in BRAND_FIELDS}},
+        "select": "t.project_id, t.name, NULL, NULL, NULL",
+    },
+}
+ASSET_FILTERS = ("type", "model_type", "context_version")
+
+
+def _index_ddl(spec: Dict) -> List[str]:
+    table, fts, columns = spec["table"], spec["fts"], list(spec["columns"])
+    names = ", ".join(columns)
+    expressions = spec.get("expressions", {})
+    new = ", ".join(expressions.get(column, "{row}." + column).format(row="new") for column in columns)
+    old = ", ".join(expressions.get(column, "{row}." + column).format(row="old") for column in columns)
+    watched = ", ".join(columns + list(spec.get("watch", ())))
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{spec.get('content', table)}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        # Only the indexed columns: e.g. rendition updates on assets don't touch the index
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {watched} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def uses_fts(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """
+    Creates the FTS5 tables and triggers that don't exist yet and indexes existing rows.
+    Returns False on databases without FTS5, where search uses the fallback.
+    """
+    if not uses_fts(engine):
+        return False
+    with engine.begin() as connection:
+        existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger', 'view')"))}
+        for spec in INDEXES.values():
+            if spec["fts"] in existing and spec.get("content", spec["table"]) in existing:
+                continue
+            print(f"DEBUG: Building search index {spec['fts']}")
+            # Indexes from before the content view was introduced are rebuilt from scratch
+            for suffix in ("_ai", "_ad", "_au"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {spec['fts']}{suffix}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {spec['fts']}"))
+            if "view" in spec:
+                connection.execute(text(spec["view"]))
+            for statement in _index_ddl(spec):
+                connection.execute(text(statement))
+    return True
+
+
+def rebuild_search_index(engine: Engine):
+    """Re-indexes every row, e.g. after rows were written with the triggers missing."""
+    with engine.begin() as connection:
+        for spec in INDEXES.values():
+            connection.execute(text(f"INSERT INTO {spec['fts']}({spec['fts']}) VALUES ('rebuild')"))
+
+
+def query_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+def fts_query(terms: Sequence[str]) -> str:
+    # Every term must match, each as a prefix ("sneak" finds "sneakers"); quoting keeps FTS5 syntax out
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row["rank"], row["kind"], row["id"]]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    rank, kind, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return float(rank), str(kind), int(row_id)
+
+
+def search(
+    db: Session,
+    query: str,
+    kinds: Sequence[str] = KINDS,
+    project_id: Optional[int] = None,
+    type: Optional[str] = None,
+    model_type: Optional[str] = None,
+    context_version: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Dict:
+    """
+    Ranked search across the given kinds. Asset filters (type, model_type, context_version)
+    limit results to assets. Returns {"results", "next_cursor"}.
+    """
+    terms = query_terms(query)
+    if not terms:
+        raise ValueError("Search query has no searchable words")
+    asset_filters = {"type": type, "model_type": model_type, "context_version": context_version}
+    if any(asset_filters.values()):
+        kinds = [kind for kind in kinds if kind == "asset"]
+    if not kinds:
+        return {"results": [], "next_cursor": None}
+
+    fts = uses_fts(db.get_bind())
+    params = {"match": fts_query(terms), "limit": limit + 1}
+    selects = []
+    for kind in kinds:
+        spec = INDEXES[kind]
+        conditions = []
+        if fts:
+            weights = ", ".join(str(weight) for weight in spec["columns"].values())
+            rank = f"bm25({spec['fts']}, {weights})"
+            snippet = f"snippet({spec['fts']}, -1, '[', ']', '…', 12)"
+            source = f"{spec['fts']} JOIN {spec['table']} t ON t.id = {spec['fts']}.rowid"
+            conditions.append(f"{spec['fts']} MATCH :match")
+        else:
+            rank, snippet, source = "CAST(0 AS FLOAT)", "NULL", f"{spec['table']} t"
+            columns = [spec.get("expressions", {}).get(column, "{row}." + column).format(row="t") for column in spec["columns"]]
+            for index, term in enumerate(terms):
+                params[f"term_{index}"] = f"%{term}%"
+                conditions.append("(" + " OR ".join(f"LOWER({column}) LIKE :term_{index}" for column in columns) + ")")
+
+        if project_id is not None:
+            conditions.append("t.id = :project_id" if kind == "project" else "t.project_id = :project_id")
+            params["project_id"] = project_id
+        if created_after is not None:
+            conditions.append("t.created_at >= :created_after")
+            params["created_after"] = created_after
+        if created_before is not None:
+            conditions.append("t.created_at < :created_before")
+            params["created_before"] = created_before
+        if kind == "asset":
+            for column, value in asset_filters.items():
+                if value:
+                    conditions.append(f"t.{column} = :{column}")
+                    params[column] = value
+
+        selects.append(
+            f"SELECT '{kind}' AS kind, t.id AS id, {rank} AS rank, {snippet} AS snippet, t.created_at AS created_at, "
+            f"{spec['select']} FROM {source} WHERE {' AND '.join(conditions)}"
+        )
+
+    keyset = ""
+    if cursor:
+        params["after_rank"], params["after_kind"], params["after_id"] = decode_cursor(cursor)
+        keyset = "WHERE (rank, kind, id) > (:after_rank, :after_kind, :after_id)"
+    statement = text(
+        f"SELECT * FROM ({' UNION ALL '.join(selects)}) {keyset} ORDER BY rank, kind, id LIMIT :limit"
+    )
+    rows = db.execute(statement, params).all()
+
+    results = []
+    for row in rows[:limit]:
+        kind, row_id, rank, snippet, created_at, project, title, asset_type, asset_model_type, url = row
+        results.append({
+            "kind": kind,
+            "id": row_id,
+            "project_id": project,
+            "rank": rank,
+            "title": title,
+            "snippet": snippet,
+            "type": asset_type,
+            "model_type": asset_model_type,
+            "url": url,
+            "created_at": created_at,
+        })
+    return {
+        "results": results,
+        "next_cursor": encode_cursor(results[-1]) if len(rows) > limit else None,
+    }
@@ -0,0 +1,63 @@
+"""
+In-flight request coalescing ("single flight") for model calls.
+
+Identical calls (same endpoint, model, prompt and input content hashes) that overlap in time
+share one upstream call: the first starts it, later ones await the same result. Nothing is
+cached once the call finishes; this only collapses concurrent duplicates, e.g. several tabs
+optimizing the same prompt. The upstream call runs as its own task, so a caller that goes
+away doesn't cancel it for the others.
+"""
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+
+def flight_key(endpoint: str, model: str, prompt: str, *content_hashes: str) -> str:
+    """Canonical hash of everything that determines the upstream call's result."""
+    payload = json.dumps([endpoint, model, prompt, list(content_hashes)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, operation: str, field: str):
+        metrics = self._metrics.setdefault(operation, {"requests": 0, "upstream_calls": 0, "coalesced": 0, "errors": 0})
+        metrics[field] += 1
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]], operation: str = "default") -> Any:
+        """
+        Returns the result of call(), sharing it with any identical call already in flight.
+        """
+        self._count(operation, "requests")
+        task = self._calls.get(key)
+        if task is None:
+            self._count(operation, "upstream_calls")
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+
+            def done(finished: asyncio.Task):
+                if self._calls.get(key) is finished:
+                    del self._calls[key]
+                if not finished.cancelled() and finished.exception() is not None:
+                    self._count(operation, "errors")
+
+            task.add_done_callback(done)
+        else:
+            self._count(operation, "coalesced")
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        operations = {}
+        for operation, metrics in self._metrics.items():
+            operations[operation] = {
+                **metrics,
+                "coalesced_ratio": round(metrics["coalesced"] / metrics["requests"], 3) if metrics["requests"] else 0.0,
+            }
+        return {"in_flight": len(self._calls), "operations": operations}
+
+
+single_flight = SingleFlight()
@@ -1,11 +1,24 @@
 import os
 from google.cloud import storage
+from google.api_core.exceptions import NotFound
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import uuid
 import datetime
 
+from backend.config import config
+
 # Initialize client
 # We assume GOOGLE_APPLICATION_CREDENTIALS is set or we are in an environment with default credentials
-storage_client = storage.Client()
+# STORAGE_BACKEND=local swaps in a filesystem stand-in (local development, tests)
+if config.STORAGE_BACKEND == "local":
+    from backend.services.local_storage import LocalStorageClient
+    storage_client = LocalStorageClient(config.LOCAL_STORAGE_DIR)
+elif config.STORAGE_API_ENDPOINT:
+    # Same client against another endpoint (the load-test emulator); signed URLs point there too
+    storage_client = storage.Client(client_options={"api_endpoint": config.STORAGE_API_ENDPOINT})
+else:
+    storage_client = storage.Client()
 
 BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "creative-studio-assets")
 
@@ -41,7 +54,7 @@ def generate_signed_url(blob_name: str, download_name: str = None) -> str:
         
         kwargs = {
             "version": "v4",
-            "expiration": datetime.timedelta(hours=1),
+            "expiration": datetime.timedelta(seconds=config.SIGNED_URL_TTL_SECONDS),
             "method": "GET"
         }
         
@@ -58,3 +71,46 @@ def upload_bytes(data: bytes, destination_blob_name: str, content_type: str = No
     """Uploads bytes to the bucket."""
     import io
     return upload_file(io.BytesIO(data), destination_blob_name, content_type)
+
+def download_bytes(blob_name: str) -> bytes:
+    """Downloads a blob's contents as bytes."""
+    bucket = storage_client.bucket(BUCKET_NAME)
+    blob = bucket.blob(blob_name)
+    return blob.download_as_bytes()
+
+def download_to_filename(blob_name: str, filename: str):
+    """Downloads a blob to a local file without holding it in memory."""
+    bucket = storage_client.bucket(BUCKET_NAME)
+    blob = bucket.blob(blob_name)
+    blob.download_to_filename(filename)
+
+def delete_blobs(blob_names: List[str], max_workers: int = 16, bucket=None) -> Dict[str, Optional[str]]:
+    """
+    Deletes blobs in parallel. Returns blob name -> error message (None on success).
+    Blobs that are already gone count as deleted.
+    """
+    bucket = bucket or storage_client.bucket(BUCKET_NAME)
+
+    def delete_one(blob_name):
+        try:
+            bucket.delete_blob(blob_name)
+        except NotFound:
+            pass
+        except Exception as e:
+            print(f"Error deleting blob {blob_name}: {e}")
+            return blob_name, str(e)
+        return blob_name, None
+
+    unique_names = list(dict.fromkeys(b for b in blob_names if b))
+    if not unique_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_names))) as executor:
+        return dict(executor.map(delete_one, unique_names))
+
+def generate_signed_urls(blob_names: List[str], max_workers: int = 16) -> Dict[str, str]:
+    """Signs many blobs in parallel. Returns blob name -> signed URL."""
+    unique_names = list(dict.fromkeys(b for b in blob_names if b))
+    if not unique_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_names))) as executor:
+        return dict(zip(unique_names, executor.map(generate_signed_url, unique_names)))
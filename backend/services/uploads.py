@@ -0,0 +1,81 @@
+"""
+Streaming helpers for uploaded files.
+
+Starlette spools each multipart file to a temp file (in memory up to UPLOAD_SPOOL_MEMORY_BYTES,
+on disk beyond). These helpers move it on to storage or the model in chunks, so large video and
+document uploads never sit in Python memory as a single bytes object.
+"""
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import Optional
+from fastapi import UploadFile
+from google.genai import types
+
+from backend.config import config
+from backend.services.storage import BUCKET_NAME, upload_file
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def upload_size(upload: UploadFile) -> int:
+    if upload.size is not None:
+        return upload.size
+    position = upload.file.tell()
+    upload.file.seek(0, os.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(position)
+    return size
+
+
+def upload_digest(upload: UploadFile) -> str:
+    """SHA-256 of an uploaded file, read from the spool in chunks."""
+    digest = hashlib.sha256()
+    upload.file.seek(0)
+    for chunk in iter(lambda: upload.file.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    upload.file.seek(0)
+    return digest.hexdigest()
+
+
+async def spool_to_storage(upload: UploadFile, blob_name: str, content_type: Optional[str] = None) -> str:
+    """
+    Streams an uploaded file from its spool to the bucket. Returns the blob name.
+    """
+    await upload.seek(0)
+    return await asyncio.to_thread(upload_file, upload.file, blob_name, content_type or upload.content_type)
+
+
+def file_part(client, upload: UploadFile) -> types.Part:
+    """
+    Model content part for an uploaded file. Small files are sent inline; larger ones are
+    streamed to the bucket and passed as a gs:// reference (Vertex AI), or streamed to the
+    Gemini Files API. Blocking: call from a worker thread.
+    """
+    mime_type = upload.content_type or "application/octet-stream"
+    upload.file.seek(0)
+    if upload_size(upload) <= config.UPLOAD_INLINE_MAX_BYTES:
+        return types.Part.from_bytes(data=upload.file.read(), mime_type=mime_type)
+
+    if config.GOOGLE_GENAI_USE_VERTEXAI:
+        extension = os.path.splitext(upload.filename or "")[1]
+        blob_name = upload_file(upload.file, f"temp_inputs/{uuid.uuid4()}{extension}", mime_type)
+        return types.Part.from_uri(file_uri=f"gs://{BUCKET_NAME}/{blob_name}", mime_type=mime_type)
+
+    uploaded_file = client.files.upload(
+        file=upload.file,
+        config=types.UploadFileConfig(mime_type=mime_type, display_name=upload.filename),
+    )
+    while uploaded_file.state and uploaded_file.state.name == "PROCESSING":
+        print(f"DEBUG: Waiting for {upload.filename} to be processed by the Files API...")
+        time.sleep(2)
+        uploaded_file = client.files.get(name=uploaded_file.name)
+    if uploaded_file.state and uploaded_file.state.name == "FAILED":
+        raise Exception(f"File processing failed for {upload.filename}")
+    return types.Part.from_uri(file_uri=uploaded_file.uri, mime_type=uploaded_file.mime_type or mime_type)
+
+
+async def model_file_part(client, upload: UploadFile) -> types.Part:
+    return await asyncio.to_thread(file_part, client, upload)
@@ -4,37 +4,42 @@ import uuid
 from google import genai
 from google.genai.types import GenerateVideosConfig
 from backend.services.storage import BUCKET_NAME
-from typing import List
+from backend.services.image_creation import get_client
+from typing import List, Optional
 import asyncio
+from backend.config import config
+from backend.services.model_router import model_router, AUTO
 
 from google.genai.types import GenerateVideosConfig
 from backend.services.storage import BUCKET_NAME
 
-async def generate_video(prompt: str, aspect_ratio: str = "16:9", quality: str = "speed", num_videos: int = 1) -> List[dict]:
+async def generate_video(prompt: str, aspect_ratio: str = "16:9", quality: Optional[str] = None, num_videos: int = 1,
+                         latency_budget_ms: Optional[float] = None) -> List[dict]:
     """
     Generates videos using Veo model concurrently.
-    Returns a list of dicts with 'video_url' and 'blob_name'.
+    Returns a list of dicts with 'video_url', 'blob_name' and the 'model' that made it.
+    quality="auto" or a latency budget lets the model router choose (and fall back) per video;
+    quality="speed"|"quality" pins the model. Unset with no budget means speed.
     """
+    client = get_client()
     if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(
-            vertexai=True,
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION")
-        )
         print("DEBUG: Using Vertex AI for video generation")
     else:
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
         print("DEBUG: Using Gemini API for video generation")
     
     # Select model based on quality preference
-    if quality == "quality":
-        model_name = "veo-3.1-generate-preview"
+    if quality == AUTO:
+        model_name = AUTO
+    elif quality == "quality":
+        model_name = config.MODEL_VIDEO_HIGH_QUALITY
+    elif quality is None:
+        model_name = None # The router's choice for the budget, else its fastest model
     else:
-        model_name = "veo-3.1-fast-generate-preview" # Default to speed/fast
+        model_name = config.MODEL_VIDEO_FAST # Default to speed/fast
     
     print(f"DEBUG: Using model: {model_name} for quality: {quality}")
 
-    async def _generate_single_video():
+    async def _generate_single_video(model_name: str):
         try:
             # Generate a unique filename for the output
             filename = f"generated_videos/{uuid.uuid4()}.mp4"
@@ -68,7 +73,7 @@ async def generate_video(prompt: str, aspect_ratio: str = "16:9", quality: str =
             
             # Poll for completion
             while not operation.done:
-                await asyncio.sleep(10)
+                await asyncio.sleep(config.VIDEO_POLL_SECONDS)
                 # Wrap blocking call
                 operation = await loop.run_in_executor(None, lambda: client.operations.get(operation))
                 print("DEBUG: Waiting for video generation...")
@@ -176,8 +181,12 @@ async def generate_video(prompt: str, aspect_ratio: str = "16:9", quality: str =
             print(f"Error generating video: {e}")
             raise e
 
+    async def _routed_single_video():
+        result, served_model = await model_router.call("video", _generate_single_video, model=model_name, latency_budget_ms=latency_budget_ms)
+        return {**result, "model": served_model}
+
     # Run concurrently
-    tasks = [_generate_single_video() for _ in range(num_videos)]
+    tasks = [_routed_single_video() for _ in range(num_videos)]
     results = await asyncio.gather(*tasks)
     
     return results
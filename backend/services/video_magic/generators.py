@@ -8,14 +8,12 @@ from fastapi import UploadFile
 from google import genai
 from google.genai import types
 from backend.services.storage import BUCKET_NAME, upload_bytes, generate_signed_url, storage_client
+from backend.services.uploads import spool_to_storage
+from backend.services.image_creation import get_client
 
 async def generate_image_to_video(image: UploadFile, prompt: str, context: str = None, num_videos: int = 1) -> List[dict]:
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(vertexai=True, project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
-    else:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key: raise Exception("GEMINI_API_KEY not found")
-        client = genai.Client(api_key=api_key)
+    api_key = os.getenv("GEMINI_API_KEY")
+    client = get_client()
 
     image_bytes = await image.read()
     input_filename = f"temp_inputs/{uuid.uuid4()}.png"
@@ -93,10 +91,8 @@ async def generate_image_to_video(image: UploadFile, prompt: str, context: str =
     return results
 
 async def generate_video_first_last(first_image: UploadFile, last_image: UploadFile, prompt: str, context: str = None, num_videos: int = 1) -> Dict[str, List[Dict[str, str]]]:
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(vertexai=True, project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
-    else:
-        api_key = os.getenv("GEMINI_API_KEY"); client = genai.Client(api_key=api_key)
+    api_key = os.getenv("GEMINI_API_KEY")
+    client = get_client()
 
     first_image_bytes = await first_image.read()
     last_image_bytes = await last_image.read()
@@ -161,8 +157,8 @@ async def generate_video_first_last(first_image: UploadFile, last_image: UploadF
     return {"videos": results}
 
 async def generate_video_reference(image: UploadFile, prompt: str, context: Optional[str] = None, num_videos: int = 1) -> Dict[str, List[Dict[str, str]]]:
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True": client = genai.Client(vertexai=True, project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
-    else: api_key = os.getenv("GEMINI_API_KEY"); client = genai.Client(api_key=api_key)
+    api_key = os.getenv("GEMINI_API_KEY")
+    client = get_client()
 
     image_bytes = await image.read()
     input_filename = f"temp_inputs/{uuid.uuid4()}_ref.png"
@@ -218,12 +214,11 @@ async def generate_video_reference(image: UploadFile, prompt: str, context: Opti
     return {"videos": results}
 
 async def extend_video(video: UploadFile, prompt: str, context: Optional[str] = None, num_videos: int = 1) -> Dict[str, List[Dict[str, str]]]:
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True": client = genai.Client(vertexai=True, project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION"))
-    else: api_key = os.getenv("GEMINI_API_KEY"); client = genai.Client(api_key=api_key)
+    api_key = os.getenv("GEMINI_API_KEY")
+    client = get_client()
 
-    video_bytes = await video.read()
     input_filename = f"temp_inputs/{uuid.uuid4()}_extend_input.mp4"
-    upload_bytes(video_bytes, input_filename, content_type=video.content_type)
+    await spool_to_storage(video, input_filename)
     input_gcs_uri = f"gs://{BUCKET_NAME}/{input_filename}"
     full_prompt = prompt
     if context: full_prompt += f"\n\nContext / Brand Guidelines:\n{context}\n\nPlease ensure the extension aligns with these guidelines."
@@ -1,28 +1,22 @@
 
 import os
-import time
 from fastapi import UploadFile
 from google import genai
 from google.genai import types
 from backend.config import config
 from backend.prompts.prompt_optimizer import PROMPT_OPTIMIZER_PROMPT, PROMPT_OPTIMIZER_VIDEO_PROMPT
 from backend.prompts.product_motion import PRODUCT_MOTION_PROMPTS
+from backend.services.uploads import model_file_part, upload_digest
+from backend.services.single_flight import single_flight, flight_key
+from backend.services.image_creation import get_client
+import asyncio
+import hashlib
 
 async def optimize_image_prompt(image: UploadFile, instructions: str) -> str:
     """
     Optimizes a video generation prompt based on an input image and user instructions using Gemini 1.5 Flash.
     """
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(
-            vertexai=True,
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION")
-        )
-    else:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise Exception("GEMINI_API_KEY not found")
-        client = genai.Client(api_key=api_key)
+    client = get_client()
 
     image_bytes = await image.read()
     
@@ -32,12 +26,18 @@ async def optimize_image_prompt(image: UploadFile, instructions: str) -> str:
         prompt = PROMPT_OPTIMIZER_PROMPT.format(instructions=instructions)
 
     try:
-        response = client.models.generate_content(
-            model=config.MODEL_TEXT_FAST,
-            contents=[
-                prompt,
-                types.Part.from_bytes(data=image_bytes, mime_type=image.content_type)
-            ]
+        # Identical image + instructions requested concurrently share one model call
+        response = await single_flight.run(
+            flight_key("/video-magic/optimize-prompt", config.MODEL_TEXT_FAST, prompt, hashlib.sha256(image_bytes).hexdigest()),
+            lambda: asyncio.to_thread(
+                client.models.generate_content,
+                model=config.MODEL_TEXT_FAST,
+                contents=[
+                    prompt,
+                    types.Part.from_bytes(data=image_bytes, mime_type=image.content_type)
+                ]
+            ),
+            operation="video_magic_optimize_prompt",
         )
         
         return response.text.strip()
@@ -49,45 +49,25 @@ async def optimize_video_prompt(video: UploadFile, instructions: str) -> str:
     """
     Optimizes a prompt for video extension using Gemini 1.5 Pro (multimodal).
     """
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(
-            vertexai=True,
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION")
-        )
-    else:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-             raise Exception("GEMINI_API_KEY not found")
-        client = genai.Client(api_key=api_key)
-
-    video_bytes = await video.read()
-    
-    import tempfile
-    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
-        temp_video.write(video_bytes)
-        temp_video_path = temp_video.name
+    client = get_client()
 
-    try:
-        uploaded_file = client.files.upload(path=temp_video_path)
-        
-        while uploaded_file.state.name == "PROCESSING":
-             print("Waiting for video to be processed for prompt optimization...")
-             time.sleep(2)
-             uploaded_file = client.files.get(name=uploaded_file.name)
-             
-        if uploaded_file.state.name == "FAILED":
-             raise Exception("Video processing failed for optimization")
+    prompt = PROMPT_OPTIMIZER_VIDEO_PROMPT.format(instructions=instructions)
 
-        prompt = PROMPT_OPTIMIZER_VIDEO_PROMPT.format(instructions=instructions)
-        
-        response = client.models.generate_content(
+    async def optimize():
+        # Streams from the upload spool (inline only when small)
+        video_part = await model_file_part(client, video)
+        return await asyncio.to_thread(
+            client.models.generate_content,
             model=config.MODEL_TEXT_HIGH_QUALITY,
-            contents=[uploaded_file, prompt]
+            contents=[video_part, prompt]
         )
-        
-        return response.text.strip()
 
-    finally:
-        if os.path.exists(temp_video_path):
-            os.unlink(temp_video_path)
+    # The same video + instructions requested concurrently is uploaded and analyzed once
+    video_digest = await asyncio.to_thread(upload_digest, video)
+    response = await single_flight.run(
+        flight_key("/video-magic/optimize-video-prompt", config.MODEL_TEXT_HIGH_QUALITY, prompt, video_digest),
+        optimize,
+        operation="video_magic_optimize_video_prompt",
+    )
+    
+    return response.text.strip()
@@ -1,31 +1,63 @@
 import os
 import json
 import time
-from typing import List, Dict, Optional
+import asyncio
+from typing import List, Dict, Optional, Tuple
 from backend.services.image_creation import get_client
 from google import genai
 from google.genai import types
 from backend.config import config
 from backend.prompts.video_script_writer import VIDEO_SCRIPT_WRITER_PROMPT
-from backend.prompts.video_script_editor import VIDEO_SCRIPT_EDITOR_PROMPT
+from backend.prompts.video_script_editor import VIDEO_SCRIPT_EDITOR_PROMPT, VIDEO_SCRIPT_PATCH_PROMPT
+from backend.services.context_cache import generate_with_brand_context, estimate_tokens
 
-async def generate_script(prompt: str, context: str = None) -> List[Dict[str, str]]:
+SCRIPT_EDIT_MODES = ("patch", "full")
+SCENE_FIELDS = ("visual", "audio")
+
+PATCH_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "global_elements": {
+            "type": "OBJECT",
+            "properties": {
+                "character": {"type": "STRING"},
+                "visual_style": {"type": "STRING"},
+                "audio_vibe": {"type": "STRING"},
+                "costume": {"type": "STRING"},
+                "color_palette": {"type": "STRING"},
+                "set_design": {"type": "STRING"},
+                "objects_props": {"type": "STRING"},
+                "filming_techniques": {"type": "STRING"},
+                "voice": {"type": "STRING"},
+            },
+        },
+        "scenes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "op": {"type": "STRING", "enum": ["update", "insert", "delete"]},
+                    "index": {"type": "INTEGER"},
+                    "visual": {"type": "STRING"},
+                    "audio": {"type": "STRING"},
+                },
+                "required": ["op", "index"]
+            }
+        }
+    },
+    "required": ["scenes"]
+}
+
+async def generate_script(prompt: str, context: str = None, context_version_id: Optional[int] = None) -> List[Dict[str, str]]:
     """
     Generates a video script using Gemini 2.5 Flash.
     Returns a list of scenes, each with 'visual' and 'audio' keys.
+    context_version_id: the ContextVersion the context is the text of (see matching_version_id).
     """
+    client = get_client()
     if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(
-            vertexai=True,
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION")
-        )
         print("DEBUG: Using Vertex AI for script generation")
     else:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise Exception("GEMINI_API_KEY not found")
-        client = genai.Client(api_key=api_key)
         print("DEBUG: Using Gemini API for script generation")
     
     
@@ -35,44 +67,60 @@ async def generate_script(prompt: str, context: str = None) -> List[Dict[str, st
     )
     
     try:
-        response = client.models.generate_content(
-            model=config.MODEL_TEXT_FAST,
-            contents=full_prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type='application/json',
-                response_schema={
-                    "type": "OBJECT",
-                    "properties": {
-                        "global_elements": {
+        generation_config = types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema={
+                "type": "OBJECT",
+                "properties": {
+                    "global_elements": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "character": {"type": "STRING"},
+                            "visual_style": {"type": "STRING"},
+                            "audio_vibe": {"type": "STRING"},
+                            "costume": {"type": "STRING"},
+                            "color_palette": {"type": "STRING"},
+                            "set_design": {"type": "STRING"},
+                            "objects_props": {"type": "STRING"},
+                            "filming_techniques": {"type": "STRING"},
+                            "voice": {"type": "STRING"},
+                        },
+                    },
+                    "scenes": {
+                        "type": "ARRAY",
+                        "items": {
                             "type": "OBJECT",
                             "properties": {
-                                "character": {"type": "STRING"},
-                                "visual_style": {"type": "STRING"},
-                                "audio_vibe": {"type": "STRING"},
-                                "costume": {"type": "STRING"},
-                                "color_palette": {"type": "STRING"},
-                                "set_design": {"type": "STRING"},
-                                "objects_props": {"type": "STRING"},
-                                "filming_techniques": {"type": "STRING"},
-                                "voice": {"type": "STRING"},
+                                "visual": {"type": "STRING"},
+                                "audio": {"type": "STRING"},
                             },
-                        },
-                        "scenes": {
-                            "type": "ARRAY",
-                            "items": {
-                                "type": "OBJECT",
-                                "properties": {
-                                    "visual": {"type": "STRING"},
-                                    "audio": {"type": "STRING"},
-                                },
-                                "required": ["visual", "audio"]
-                            }
+                            "required": ["visual", "audio"]
                         }
-                    },
-                    "required": ["global_elements", "scenes"]
-                }
-            )
+                    }
+                },
+                "required": ["global_elements", "scenes"]
+            }
         )
+        if context:
+            # Brand context is served from the model-side context cache (sent inline if unavailable)
+            response = generate_with_brand_context(
+                client,
+                config.MODEL_TEXT_FAST,
+                context,
+                [VIDEO_SCRIPT_WRITER_PROMPT.format(
+                    prompt=prompt,
+                    context_section="Please ensure the script aligns with the Context / Brand Guidelines provided above."
+                )],
+                generation_config,
+                operation="script_generate",
+                version_id=context_version_id,
+            )
+        else:
+            response = client.models.generate_content(
+                model=config.MODEL_TEXT_FAST,
+                contents=full_prompt,
+                config=generation_config
+            )
         
         cleaned_json = clean_json_string(response.text)
         script_json = json.loads(cleaned_json)
@@ -120,32 +168,74 @@ def clean_json_string(json_string: str) -> str:
     
     return cleaned.strip()
 
-async def edit_script(current_script: List[Dict[str, str]], instructions: str) -> List[Dict[str, str]]:
+def _as_script(current_script) -> Dict:
+    """Scripts are {"global_elements", "scenes"}; older clients send just the scenes array."""
+    if isinstance(current_script, list):
+        return {"global_elements": {}, "scenes": list(current_script)}
+    return {
+        "global_elements": dict(current_script.get("global_elements") or {}),
+        "scenes": list(current_script.get("scenes") or []),
+    }
+
+
+def apply_script_patch(script: Dict, patch: Dict) -> Tuple[Dict, List[int]]:
     """
-    Edits an existing script based on user instructions.
+    Applies a patch from VIDEO_SCRIPT_PATCH_PROMPT. Scene indices refer to the current script;
+    inserts go before the given index. Returns the new script and the indices (in the new
+    script) of scenes that were inserted or updated.
     """
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") == "True":
-        client = genai.Client(
-            vertexai=True,
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION")
-        )
-        print("DEBUG: Using Vertex AI for script editing")
-    else:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise Exception("GEMINI_API_KEY not found")
-        client = genai.Client(api_key=api_key)
-        print("DEBUG: Using Gemini API for script editing")
-    
+    scenes = script["scenes"]
+    updates, inserts, deletes = {}, {}, set()
+    for operation in patch.get("scenes") or []:
+        op, index = operation.get("op"), operation.get("index")
+        fields = {field: operation[field] for field in SCENE_FIELDS if operation.get(field) is not None}
+        limit = len(scenes) if op == "insert" else len(scenes) - 1
+        if not isinstance(index, int) or not 0 <= index <= limit:
+            raise ValueError(f"Patch {op} has invalid scene index {index}")
+        if op == "update":
+            updates.setdefault(index, {}).update(fields)
+        elif op == "insert":
+            if not fields.get("visual"):
+                raise ValueError(f"Inserted scene at {index} has no visual")
+            inserts.setdefault(index, []).append({"visual": fields["visual"], "audio": fields.get("audio", "")})
+        elif op == "delete":
+            deletes.add(index)
+        else:
+            raise ValueError(f"Unknown patch op {op}")
+
+    new_scenes, changed = [], []
+    for index in range(len(scenes) + 1):
+        for scene in inserts.get(index, []):
+            changed.append(len(new_scenes))
+            new_scenes.append(scene)
+        if index == len(scenes) or index in deletes:
+            continue
+        if updates.get(index):
+            changed.append(len(new_scenes))
+            new_scenes.append({**scenes[index], **updates[index]})
+        else:
+            new_scenes.append(scenes[index])
+
+    global_elements = {**script["global_elements"], **{k: v for k, v in (patch.get("global_elements") or {}).items() if v}}
+    return {"global_elements": global_elements, "scenes": new_scenes}, changed
+
+
+def _usage(response) -> Tuple[Optional[int], Optional[int]]:
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None, None
+    return usage.prompt_token_count, usage.candidates_token_count
+
+
+def _full_rewrite(client, script: Dict, instructions: str) -> Tuple[List[Dict[str, str]], object]:
+    """Has the model rewrite every scene. Blocking."""
     full_prompt = VIDEO_SCRIPT_EDITOR_PROMPT.format(
-        current_script_json=json.dumps(current_script, indent=2),
+        current_script_json=json.dumps(script["scenes"], indent=2),
         instructions=instructions
     )
-    
     try:
         response = client.models.generate_content(
-            model='gemini-2.5-flash',
+            model=config.MODEL_TEXT_FAST,
             contents=full_prompt,
             config=types.GenerateContentConfig(
                 response_mime_type='application/json',
@@ -162,21 +252,84 @@ async def edit_script(current_script: List[Dict[str, str]], instructions: str) -
                 }
             )
         )
-        
-        cleaned_json = clean_json_string(response.text)
-        script_json = json.loads(cleaned_json)
-        return script_json
+        return json.loads(clean_json_string(response.text)), response
     except Exception as e:
+        print(f"Error rewriting script ({e}), retrying without schema...")
+        response = client.models.generate_content(
+            model=config.MODEL_TEXT_FAST,
+            contents=full_prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type='application/json'
+            )
+        )
+        return json.loads(clean_json_string(response.text)), response
+
+
+async def edit_script(current_script, instructions: str, mode: str = "patch") -> Dict:
+    """
+    Edits an existing script based on user instructions.
+    In "patch" mode the model only returns changed scenes/elements, which the server applies;
+    unchanged scenes are never regenerated. Falls back to a full rewrite if the patch is unusable.
+    Returns {"script", "changed_scenes", "metrics"}; metrics compare against a full rewrite.
+    """
+    client = get_client()
+    script = _as_script(current_script)
+    started = time.perf_counter()
+
+    result = None
+    if mode == "patch":
+        compact_script = json.dumps(
+            {
+                "global_elements": script["global_elements"],
+                "scenes": [{"index": index, **scene} for index, scene in enumerate(script["scenes"])],
+            },
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
         try:
-            response = client.models.generate_content(
-                model='gemini-1.5-flash',
-                contents=full_prompt,
+            response = await asyncio.to_thread(
+                client.models.generate_content,
+                model=config.MODEL_TEXT_FAST,
+                contents=VIDEO_SCRIPT_PATCH_PROMPT.format(current_script_json=compact_script, instructions=instructions),
                 config=types.GenerateContentConfig(
-                    response_mime_type='application/json'
+                    response_mime_type='application/json',
+                    response_schema=PATCH_SCHEMA
                 )
             )
-            cleaned_json = clean_json_string(response.text)
-            script_json = json.loads(cleaned_json)
-            return script_json
-        except Exception as e2:
-             raise Exception(f"Failed to edit script: {e2}")
+            patch = json.loads(clean_json_string(response.text))
+            new_script, changed = apply_script_patch(script, patch)
+            result = {"script": new_script, "changed_scenes": changed, "mode": "patch", "response": response}
+        except Exception as e:
+            print(f"Error applying script patch ({e}), falling back to full rewrite")
+
+    if result is None:
+        try:
+            scenes, response = await asyncio.to_thread(_full_rewrite, client, script, instructions)
+        except Exception as e:
+            raise Exception(f"Failed to edit script: {e}")
+        new_script = {"global_elements": script["global_elements"], "scenes": scenes}
+        changed = [
+            index for index, scene in enumerate(scenes)
+            if index >= len(script["scenes"]) or scene != script["scenes"][index]
+        ]
+        result = {"script": new_script, "changed_scenes": changed, "mode": "full", "response": response}
+
+    prompt_tokens, output_tokens = _usage(result.pop("response"))
+    # What a full rewrite of this edit costs: the indented script in, every scene back out
+    full_prompt_tokens = estimate_tokens(VIDEO_SCRIPT_EDITOR_PROMPT) + estimate_tokens(json.dumps(script["scenes"], indent=2))
+    full_output_tokens = estimate_tokens(json.dumps(result["script"]["scenes"], indent=2))
+    result["metrics"] = {
+        "mode": result.pop("mode"),
+        "latency_ms": round((time.perf_counter() - started) * 1000),
+        "scenes": len(result["script"]["scenes"]),
+        "scenes_regenerated": len(result["changed_scenes"]),
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "estimated_full_rewrite_prompt_tokens": full_prompt_tokens,
+        "estimated_full_rewrite_output_tokens": full_output_tokens,
+    }
+    print(f"DEBUG: Script edit metrics: {result['metrics']}")
+
+    if isinstance(current_script, list):
+        result["script"] = result["script"]["scenes"]
+    return result
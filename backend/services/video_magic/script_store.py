@@ -0,0 +1,228 @@
+"""
+Persisted scripts: every generate/edit stores a new ScriptVersion with its scenes, so edits
+reference a script id and send only the instructions.
+
+Each scene carries a content hash of its text and the script's global elements. Storyboard
+renders are cached by that hash plus the render settings (SceneRender), so scenes an edit
+left untouched are never rendered twice.
+"""
+import json
+import hashlib
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import models
+from backend.database import SessionLocal
+from backend.services.video_magic.script import generate_script, edit_script, _as_script
+from backend.services.context_cache import matching_version_id
+
+# Times an edit is re-applied when a concurrent edit of the same script took the version number first
+STORE_EDIT_ATTEMPTS = 3
+
+
+class ScriptEditConflict(Exception):
+    """The script kept changing while an edit was applied to it."""
+
+
+def scene_hash(scene: Dict[str, str], global_elements: Dict[str, str]) -> str:
+    payload = {
+        "visual": scene.get("visual") or "",
+        "audio": scene.get("audio") or "",
+        "global_elements": {key: value for key, value in (global_elements or {}).items() if value},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def render_key(content_hash: str, **settings) -> str:
+    """Cache key of a rendered scene: its content hash plus everything else that shapes the clip."""
+    payload = json.dumps({"scene": content_hash, **settings}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def version_script(version: models.ScriptVersion) -> Dict:
+    return {
+        "global_elements": json.loads(version.global_elements or "{}"),
+        "scenes": [{"visual": scene.visual, "audio": scene.audio or ""} for scene in version.scenes],
+    }
+
+
+def serialize_version(script: models.Script, version: models.ScriptVersion) -> Dict:
+    return {
+        "script_id": script.id,
+        "project_id": script.project_id,
+        "prompt": script.prompt,
+        "version": version.version,
+        "current_version": script.current_version,
+        "instructions": version.instructions,
+        "edit_mode": version.edit_mode,
+        "created_at": version.created_at.isoformat() if version.created_at else None,
+        "script": version_script(version),
+        "scene_hashes": [scene.content_hash for scene in version.scenes],
+    }
+
+
+def add_version(
+    db: Session,
+    script: models.Script,
+    content,
+    version: int,
+    instructions: Optional[str] = None,
+    edit_mode: Optional[str] = None,
+) -> models.ScriptVersion:
+    content = _as_script(content)
+    global_elements = content["global_elements"]
+    script_version = models.ScriptVersion(
+        script_id=script.id,
+        version=version,
+        global_elements=json.dumps(global_elements),
+        instructions=instructions,
+        edit_mode=edit_mode,
+    )
+    db.add(script_version)
+    db.flush()
+    for position, scene in enumerate(content["scenes"]):
+        db.add(models.Scene(
+            script_version_id=script_version.id,
+            position=position,
+            visual=scene.get("visual") or "",
+            audio=scene.get("audio") or "",
+            content_hash=scene_hash(scene, global_elements),
+        ))
+    script.current_version = version
+    db.commit()
+    db.refresh(script_version)
+    return script_version
+
+
+def get_version(db: Session, script_id: int, version: Optional[int] = None) -> Optional[models.ScriptVersion]:
+    """A version of a script (the current one by default), or None."""
+    script = db.query(models.Script).filter(models.Script.id == script_id).first()
+    if script is None:
+        return None
+    return db.query(models.ScriptVersion).filter(
+        models.ScriptVersion.script_id == script_id,
+        models.ScriptVersion.version == (version or script.current_version),
+    ).first()
+
+
+def _store_script(db: Session, prompt: str, context: Optional[str], project_id: Optional[int], content) -> Dict:
+    script = models.Script(project_id=project_id, prompt=prompt, context=context, current_version=1)
+    db.add(script)
+    db.flush()
+    version = add_version(db, script, content, 1)
+    return serialize_version(script, version)
+
+
+def _current_script(db: Session, script_id: int) -> Optional[Tuple[int, Dict]]:
+    """The current version number of a script and its content, or None."""
+    current = get_version(db, script_id)
+    return (current.version, version_script(current)) if current is not None else None
+
+
+def _store_edit(db: Session, script_id: int, base_version: int, instructions: str, result: Dict) -> Optional[Dict]:
+    """
+    Saves an edit of base_version as the version after it. Returns None if a concurrent edit
+    stored that version first.
+    """
+    script = db.get(models.Script, script_id)
+    try:
+        version = add_version(db, script, result["script"], base_version + 1, instructions, result["metrics"]["mode"])
+    except IntegrityError:
+        # Unique (script_id, version): the edit was made against a version that's no longer current
+        db.rollback()
+        return None
+    response = serialize_version(script, version)
+    response["changed_scenes"] = result["changed_scenes"]
+    response["metrics"] = result["metrics"]
+    return response
+
+
+def ensure_script_version_unique(engine: Engine):
+    """
+    Adds the (script_id, version) unique index to databases created before it (create_all
+    doesn't alter tables).
+    """
+    inspector = inspect(engine)
+    columns = ["script_id", "version"]
+    if any(constraint["column_names"] == columns for constraint in inspector.get_unique_constraints("script_versions")):
+        return
+    if any(index["unique"] and index["column_names"] == columns for index in inspector.get_indexes("script_versions")):
+        return
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE UNIQUE INDEX uq_script_versions_script_id_version ON script_versions (script_id, version)"
+            ))
+    except Exception as e:
+        # Duplicates stored before the index existed; edits still retry, they just aren't enforced
+        print(f"WARNING: Could not add the script version unique index: {e}")
+
+
+# The ORM work above runs through run_sync: scripts load their versions and scenes lazily,
+# which an AsyncSession only allows inside it.
+
+async def cacheable_context_version(db: AsyncSession, context: Optional[str], context_version_id: Optional[int]) -> Optional[int]:
+    """context_version_id if context is that ContextVersion's text (its model-side cache is keyed by it)."""
+    if not context_version_id:
+        return None
+    return matching_version_id(await db.get(models.ContextVersion, context_version_id), context)
+
+
+async def create_script(
+    db: AsyncSession, prompt: str, context: Optional[str] = None, project_id: Optional[int] = None,
+    context_version_id: Optional[int] = None,
+) -> Dict:
+    """
+    Generates a script and stores it as version 1.
+    """
+    version_id = await cacheable_context_version(db, context, context_version_id)
+    content = await generate_script(prompt, context, version_id)
+    return await db.run_sync(_store_script, prompt, context, project_id, content)
+
+
+async def edit_stored_script(db: AsyncSession, script_id: int, instructions: str, mode: str = "patch") -> Optional[Dict]:
+    """
+    Applies an edit to the current version of a stored script and saves the result as a new
+    version. Returns None if the script doesn't exist. When another edit lands first, the
+    instructions are applied again to its version; raises ScriptEditConflict if that keeps happening.
+    """
+    for attempt in range(1, STORE_EDIT_ATTEMPTS + 1):
+        current = await db.run_sync(_current_script, script_id)
+        if current is None:
+            return None
+        base_version, current_script = current
+        result = await edit_script(current_script, instructions, mode=mode)
+        stored = await db.run_sync(_store_edit, script_id, base_version, instructions, result)
+        if stored is not None:
+            return stored
+        print(f"DEBUG: Script {script_id} version {base_version + 1} taken by a concurrent edit, re-applying the edit")
+    raise ScriptEditConflict(f"Script {script_id} was edited concurrently {STORE_EDIT_ATTEMPTS} times, try again")
+
+
+def cached_renders(keys: Iterable[str]) -> Dict[str, models.SceneRender]:
+    """Stored scene renders for the given render keys. Blocking."""
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    with SessionLocal() as db:
+        renders = db.query(models.SceneRender).filter(models.SceneRender.render_key.in_(keys)).all()
+        db.expunge_all()
+    return {render.render_key: render for render in renders}
+
+
+def save_render(key: str, content_hash: str, blob_name: str, keyframe_blob_name: Optional[str] = None):
+    """Records a rendered scene clip under its render key. Blocking."""
+    with SessionLocal() as db:
+        db.merge(models.SceneRender(
+            render_key=key,
+            content_hash=content_hash,
+            blob_name=blob_name,
+            keyframe_blob_name=keyframe_blob_name,
+        ))
+        db.commit()
+
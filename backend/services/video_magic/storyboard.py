@@ -0,0 +1,251 @@
+"""
+Storyboard rendering: turns a generated script (global_elements + 8-second scenes) into one
+video clip per scene.
+
+Every scene renders concurrently, bounded by a process-wide cap on in-flight video model
+operations (VIDEO_MODEL_CONCURRENCY). A scene is either rendered directly from its prompt, or
+as a keyframe image first (image model) that is then animated (image-to-video), which keeps
+characters and sets more consistent; keyframes have their own process-wide cap
+(STORYBOARD_KEYFRAME_CONCURRENCY). The script's global elements are injected into every
+scene prompt. Scenes retry independently; results are yielded as each scene finishes.
+
+Rendered clips are cached by scene content hash and render settings (see script_store), so
+re-rendering an edited script only renders the scenes that changed.
+"""
+import os
+import uuid
+import asyncio
+import urllib.request
+from typing import AsyncIterator, Dict, List, Optional
+from google.genai import types
+
+from backend.config import config
+from backend.services.image_creation import get_client, generate_image_bytes
+from backend.services.storage import BUCKET_NAME, storage_client, upload_bytes, upload_file, generate_signed_url
+from backend.services.video_magic.script_store import scene_hash, render_key, cached_renders, save_render
+
+RENDER_MODES = ("keyframe", "direct")
+
+GLOBAL_ELEMENT_LABELS = {
+    "character": "Character",
+    "visual_style": "Visual style",
+    "audio_vibe": "Audio vibe",
+    "costume": "Costume",
+    "color_palette": "Color palette",
+    "set_design": "Set design",
+    "objects_props": "Objects / props",
+    "filming_techniques": "Filming techniques",
+    "voice": "Voice",
+}
+
+# Caps in-flight video model operations across all storyboards in this process
+_video_slots = asyncio.Semaphore(config.VIDEO_MODEL_CONCURRENCY)
+# Caps keyframe generations (image model call plus upload) across all storyboards in this process
+_keyframe_slots = asyncio.Semaphore(config.STORYBOARD_KEYFRAME_CONCURRENCY)
+
+
+def _global_elements_text(global_elements: Dict[str, str], include_audio: bool = True) -> str:
+    lines = []
+    for key, value in (global_elements or {}).items():
+        if not value or (not include_audio and key in ("audio_vibe", "voice")):
+            continue
+        lines.append(f"- {GLOBAL_ELEMENT_LABELS.get(key, key.replace('_', ' ').capitalize())}: {value}")
+    return "\n".join(lines)
+
+
+def scene_prompt(global_elements: Dict[str, str], scene: Dict[str, str], context: Optional[str] = None) -> str:
+    # No scene numbering: the prompt depends only on the scene's content, so renders stay reusable
+    prompt = f"A scene from a continuous video. {scene['visual']}"
+    if scene.get("audio"):
+        prompt += f"\nAudio: {scene['audio']}"
+    elements = _global_elements_text(global_elements)
+    if elements:
+        prompt += f"\n\nKeep these elements identical in every scene:\n{elements}"
+    if context:
+        prompt += f"\n\nContext / Brand Guidelines:\n{context}\n\nPlease ensure the video aligns with these guidelines."
+    return prompt
+
+
+def keyframe_prompt(global_elements: Dict[str, str], scene: Dict[str, str], context: Optional[str] = None) -> str:
+    prompt = f"A single photorealistic film still, the opening frame of this scene: {scene['visual']}"
+    elements = _global_elements_text(global_elements, include_audio=False)
+    if elements:
+        prompt += f"\n\n{elements}"
+    if context:
+        prompt += f"\n\nContext / Brand Guidelines:\n{context}"
+    return prompt
+
+
+def _store_video(operation, output_filename: str) -> str:
+    """Moves the generated video to output_filename in the bucket. Returns the blob name."""
+    if not (operation.result and operation.result.generated_videos):
+        raise Exception("No video generated")
+    uri = operation.result.generated_videos[0].video.uri
+    if uri.startswith("gs://"):
+        source_bucket_name, source_name = uri[5:].split("/", 1)
+        if source_bucket_name != BUCKET_NAME or source_name != output_filename:
+            source_bucket = storage_client.bucket(source_bucket_name)
+            source_bucket.copy_blob(source_bucket.blob(source_name), storage_client.bucket(BUCKET_NAME), output_filename)
+    else:
+        request = urllib.request.Request(uri)
+        if "googleapis.com" in uri and not config.GOOGLE_GENAI_USE_VERTEXAI:
+            request.add_header("x-goog-api-key", os.getenv("GEMINI_API_KEY"))
+        with urllib.request.urlopen(request) as response:
+            upload_file(response, output_filename, content_type="video/mp4")
+    return output_filename
+
+
+async def generate_clip(client, prompt: str, model_name: str, aspect_ratio: str = "16:9", image: Optional[types.Image] = None) -> str:
+    """
+    One video model operation, waited on under the process-wide cap. Returns the stored blob name.
+    """
+    output_filename = f"generated_videos/{uuid.uuid4()}.mp4"
+    config_params = {"aspect_ratio": aspect_ratio}
+    if config.GOOGLE_GENAI_USE_VERTEXAI:
+        config_params["output_gcs_uri"] = f"gs://{BUCKET_NAME}/{output_filename}"
+
+    async with _video_slots:
+        operation = await asyncio.to_thread(
+            client.models.generate_videos,
+            model=model_name,
+            prompt=prompt,
+            image=image,
+            config=types.GenerateVideosConfig(**config_params),
+        )
+        while not operation.done:
+            await asyncio.sleep(config.VIDEO_POLL_SECONDS)
+            operation = await asyncio.to_thread(client.operations.get, operation)
+    if operation.error:
+        raise Exception(f"Video generation failed: {operation.error}")
+    return await asyncio.to_thread(_store_video, operation, output_filename)
+
+
+async def render_scene(
+    client,
+    index: int,
+    scene: Dict[str, str],
+    global_elements: Dict[str, str],
+    mode: str = "keyframe",
+    context: Optional[str] = None,
+    aspect_ratio: str = "16:9",
+    video_model: str = config.MODEL_VIDEO_FAST,
+    image_model: str = config.MODEL_IMAGE_FAST,
+) -> dict:
+    """
+    Renders one scene, retrying it on its own up to STORYBOARD_SCENE_MAX_ATTEMPTS times.
+    The keyframe is kept across retries so only the failed step is repeated.
+    """
+    result = {"index": index, "status": "failed", "attempts": 0}
+    keyframe_image = None
+    prompt = scene_prompt(global_elements, scene, context)
+
+    while result["attempts"] < config.STORYBOARD_SCENE_MAX_ATTEMPTS:
+        result["attempts"] += 1
+        try:
+            if mode == "keyframe" and keyframe_image is None:
+                async with _keyframe_slots:
+                    image_bytes = await asyncio.to_thread(
+                        generate_image_bytes, [keyframe_prompt(global_elements, scene, context)], image_model
+                    )
+                    keyframe_blob = await asyncio.to_thread(
+                        upload_bytes, image_bytes, f"storyboards/{uuid.uuid4()}.png", "image/png"
+                    )
+                result["keyframe_blob_name"] = keyframe_blob
+                result["keyframe_url"] = await asyncio.to_thread(generate_signed_url, keyframe_blob)
+                keyframe_image = (
+                    types.Image(gcs_uri=f"gs://{BUCKET_NAME}/{keyframe_blob}", mime_type="image/png")
+                    if config.GOOGLE_GENAI_USE_VERTEXAI
+                    else types.Image(image_bytes=image_bytes, mime_type="image/png")
+                )
+
+            blob_name = await generate_clip(client, prompt, video_model, aspect_ratio, keyframe_image)
+            result.update({"status": "done", "error": None, **await asyncio.to_thread(_clip_urls, index, blob_name)})
+            return result
+        except Exception as e:
+            print(f"Error rendering storyboard scene {index} (attempt {result['attempts']}): {e}")
+            result["error"] = str(e)
+            if result["attempts"] < config.STORYBOARD_SCENE_MAX_ATTEMPTS:
+                await asyncio.sleep(2 ** result["attempts"])
+    return result
+
+
+def _clip_urls(index: int, blob_name: str) -> dict:
+    """Signs a scene clip's URLs. Blocking."""
+    return {
+        "blob_name": blob_name,
+        "video_url": generate_signed_url(blob_name),
+        "download_url": generate_signed_url(blob_name, download_name=f"scene-{index + 1}.mp4"),
+    }
+
+
+def _cached_results(cached: Dict, keys: List[str]) -> Dict[int, dict]:
+    """Scene results (signed URLs included) for the scenes with a cached render. Blocking."""
+    results = {}
+    for index, key in enumerate(keys):
+        render = cached.get(key)
+        if render is None:
+            continue
+        result = {"index": index, "status": "done", "attempts": 0, "cached": True, "error": None, **_clip_urls(index, render.blob_name)}
+        if render.keyframe_blob_name:
+            result["keyframe_blob_name"] = render.keyframe_blob_name
+            result["keyframe_url"] = generate_signed_url(render.keyframe_blob_name)
+        results[index] = result
+    return results
+
+
+async def _render_and_cache(key: str, content_hash: str, render) -> dict:
+    result = await render
+    if result["status"] == "done":
+        await asyncio.to_thread(save_render, key, content_hash, result["blob_name"], result.get("keyframe_blob_name"))
+    return result
+
+
+async def render_storyboard(
+    script: dict,
+    mode: str = "keyframe",
+    context: Optional[str] = None,
+    aspect_ratio: str = "16:9",
+    quality: str = "speed",
+    image_model: str = config.MODEL_IMAGE_FAST,
+    use_cache: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Renders every scene of a script concurrently and yields each scene result as it finishes
+    (each carries its scene "index"). Scenes with a cached render are yielded first without
+    rendering ("cached": True). Remaining scenes are cancelled if the consumer stops.
+    """
+    scenes: List[Dict[str, str]] = script.get("scenes") or []
+    global_elements = script.get("global_elements") or {}
+    video_model = config.MODEL_VIDEO_HIGH_QUALITY if quality == "quality" else config.MODEL_VIDEO_FAST
+    settings = {
+        "mode": mode,
+        "context": context,
+        "aspect_ratio": aspect_ratio,
+        "video_model": video_model,
+        "image_model": image_model if mode == "keyframe" else None,
+    }
+    hashes = [scene_hash(scene, global_elements) for scene in scenes]
+    keys = [render_key(content_hash, **settings) for content_hash in hashes]
+    cached = await asyncio.to_thread(cached_renders, keys) if use_cache else {}
+    cached_results = await asyncio.to_thread(_cached_results, cached, keys) if cached else {}
+
+    client = get_client() if len(cached_results) < len(scenes) else None
+    tasks = []
+    for index, scene in enumerate(scenes):
+        if index in cached_results:
+            yield cached_results[index]
+            continue
+        tasks.append(asyncio.create_task(_render_and_cache(keys[index], hashes[index], render_scene(
+            client, index, scene, global_elements,
+            mode=mode, context=context, aspect_ratio=aspect_ratio,
+            video_model=video_model, image_model=image_model,
+        ))))
+    if cached:
+        print(f"DEBUG: Storyboard reused {len(scenes) - len(tasks)} of {len(scenes)} cached scene renders")
+
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,252 @@
+"""
+Server-side stitching of video clips (storyboard scenes, extend_video chains) into one video.
+
+Clips are streamed from storage to a scratch directory and joined in the given order with
+ffmpeg's concat demuxer using stream copy, so matching clips are never re-encoded. Clips whose
+streams differ from the first clip (codec, profile, resolution, frame rate, audio format) are
+first re-encoded to match it; only if that still doesn't line up is every clip normalized.
+The result is uploaded as a new blob and recorded as a video Asset.
+"""
+import os
+import re
+import uuid
+import asyncio
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from backend import models
+from backend.config import config
+from backend.database import SessionLocal
+from backend.services.storage import download_to_filename, upload_file
+from backend.services.renditions import schedule_renditions
+
+# Stitching is CPU/disk bound: a small dedicated pool keeps it off the event loop and request threads
+_executor = ThreadPoolExecutor(max_workers=config.STITCH_WORKERS, thread_name_prefix="stitch")
+
+STREAM_PATTERN = re.compile(r"Stream #\d+:\d+\S*: (Video|Audio): (.+)")
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+# Encoder settings used when a clip has to be normalized and the first clip isn't H.264/AAC
+DEFAULT_TARGET = {"video_codec": "h264", "profile": "high", "pix_fmt": "yuv420p", "audio_codec": "aac"}
+X264_PROFILES = ("baseline", "main", "high", "high10", "high422", "high444")
+
+
+def _ffmpeg(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [config.FFMPEG_BINARY, "-hide_banner", "-nostdin", *args],
+        capture_output=True,
+        text=True,
+    )
+
+
+def probe_clip(path: str) -> Dict:
+    """
+    Stream parameters of a clip, read from ffmpeg's input summary (no ffprobe dependency).
+    """
+    output = _ffmpeg(["-i", path]).stderr
+    info = {"video": None, "audio": None, "duration": None}
+
+    duration = DURATION_PATTERN.search(output)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    for kind, description in STREAM_PATTERN.findall(output):
+        fields = [field.strip() for field in re.split(r",(?![^(]*\))", description)]
+        codec_field = fields[0].split()
+        codec = codec_field[0]
+        profile = re.match(r"\(([^)]*)\)", " ".join(codec_field[1:]))
+        profile = profile.group(1) if profile else None
+
+        if kind == "Video" and info["video"] is None:
+            size = re.search(r"\b(\d{2,5})x(\d{2,5})\b", description)
+            fps = re.search(r"([\d.]+k?) fps", description) or re.search(r"([\d.]+k?) tbr", description)
+            tbn = re.search(r"([\d.]+k?) tbn", description)
+            info["video"] = {
+                "codec": codec,
+                "profile": profile,
+                "pix_fmt": fields[1].split("(")[0] if len(fields) > 1 else None,
+                "width": int(size.group(1)) if size else None,
+                "height": int(size.group(2)) if size else None,
+                "fps": fps.group(1) if fps else None,
+                "tbn": tbn.group(1) if tbn else None,
+            }
+        elif kind == "Audio" and info["audio"] is None:
+            rate = re.search(r"(\d+) Hz", description)
+            info["audio"] = {
+                "codec": codec,
+                "profile": profile,
+                "sample_rate": int(rate.group(1)) if rate else None,
+                "layout": fields[2] if len(fields) > 2 else None,
+                "sample_fmt": fields[3] if len(fields) > 3 else None,
+            }
+
+    if info["video"] is None:
+        raise ValueError(f"No video stream found in {os.path.basename(path)}")
+    return info
+
+
+def stream_signature(info: Dict):
+    """Everything that has to be identical for a stream-copy concat to play back correctly."""
+    return (
+        tuple(sorted(info["video"].items())),
+        tuple(sorted(info["audio"].items())) if info["audio"] else None,
+    )
+
+
+def _normalize(source: str, target_path: str, reference: Dict):
+    """Re-encodes source to the reference clip's stream parameters."""
+    video, audio = reference["video"], reference["audio"]
+    profile = (video["profile"] or DEFAULT_TARGET["profile"]).lower().replace("constrained ", "").replace(" ", "")
+    fps = video["fps"] or "24"
+    width, height = video["width"], video["height"]
+
+    args = ["-y", "-i", source]
+    source_info = probe_clip(source)
+    has_audio = source_info["audio"] is not None
+    if audio and not has_audio:
+        args += ["-f", "lavfi", "-i", f"anullsrc=r={audio['sample_rate']}:cl={audio['layout'] or 'stereo'}"]
+
+    args += [
+        "-map", "0:v:0",
+        "-vf", (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps}"
+        ),
+        "-c:v", "libx264", "-pix_fmt", video["pix_fmt"] or DEFAULT_TARGET["pix_fmt"],
+        "-preset", "veryfast", "-crf", "18",
+    ]
+    if profile in X264_PROFILES:
+        args += ["-profile:v", profile]
+    if video["tbn"]:
+        args += ["-video_track_timescale", video["tbn"].replace("k", "000")]
+    if audio:
+        args += [
+            "-map", "0:a:0" if has_audio else "1:a:0",
+            "-c:a", "aac", "-ar", str(audio["sample_rate"]),
+            "-ac", "1" if audio["layout"] == "mono" else "2",
+        ]
+        if not has_audio and source_info["duration"]:
+            # Cut the generated silence at the clip's length (-shortest can overshoot by a buffer)
+            args += ["-t", f"{source_info['duration']:.3f}"]
+    else:
+        args += ["-an"]
+    args += ["-movflags", "+faststart", target_path]
+
+    result = _ffmpeg(args)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed normalizing clip: {result.stderr[-500:]}")
+
+
+def _concat(paths: List[str], output_path: str, work_dir: str):
+    list_path = os.path.join(work_dir, "clips.txt")
+    with open(list_path, "w") as f:
+        for path in paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    result = _ffmpeg([
+        "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+        "-map", "0", "-c", "copy", "-movflags", "+faststart",
+        output_path,
+    ])
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr[-500:]}")
+
+
+def stitch_files(paths: List[str], output_path: str, work_dir: str) -> Dict:
+    """
+    Concatenates local clips in order into output_path. Returns a report of what was copied vs re-encoded.
+    """
+    infos = [probe_clip(path) for path in paths]
+    reference = infos[0]
+    signature = stream_signature(reference)
+    if reference["video"]["codec"] == DEFAULT_TARGET["video_codec"]:
+        reencoded = [index for index, info in enumerate(infos) if stream_signature(info) != signature]
+    else:
+        # Other codecs can't be matched by re-encoding here: normalize every clip to H.264
+        reference = {
+            "video": {**reference["video"], "codec": DEFAULT_TARGET["video_codec"], "profile": None, "pix_fmt": DEFAULT_TARGET["pix_fmt"]},
+            "audio": reference["audio"],
+        }
+        reencoded = list(range(len(paths)))
+
+    inputs = list(paths)
+
+    for index in reencoded:
+        inputs[index] = os.path.join(work_dir, f"normalized_{index}.mp4")
+        _normalize(paths[index], inputs[index], reference)
+
+    if 0 < len(reencoded) < len(paths):
+        # Encoder output may still differ from the original (e.g. profile level): fall back to all
+        if any(stream_signature(probe_clip(inputs[i])) != signature for i in reencoded):
+            for index in range(len(paths)):
+                if index not in reencoded:
+                    inputs[index] = os.path.join(work_dir, f"normalized_{index}.mp4")
+                    _normalize(paths[index], inputs[index], reference)
+            reencoded = list(range(len(paths)))
+
+    _concat(inputs, output_path, work_dir)
+    return {
+        "clips": len(paths),
+        "stream_copied": len(paths) - len(reencoded),
+        "reencoded": len(reencoded),
+        "duration": probe_clip(output_path)["duration"],
+    }
+
+
+def stitch_clips(blob_names: List[str], output_blob_name: Optional[str] = None) -> Dict:
+    """
+    Streams clips from storage, stitches them in order and uploads the result. Blocking.
+    """
+    output_blob_name = output_blob_name or f"generated_videos/{uuid.uuid4()}_stitched.mp4"
+    with tempfile.TemporaryDirectory(prefix="stitch-") as work_dir:
+        paths = []
+        for index, blob_name in enumerate(blob_names):
+            path = os.path.join(work_dir, f"clip_{index}.mp4")
+            download_to_filename(blob_name, path)
+            paths.append(path)
+
+        output_path = os.path.join(work_dir, "stitched.mp4")
+        report = stitch_files(paths, output_path, work_dir)
+        with open(output_path, "rb") as f:
+            upload_file(f, output_blob_name, content_type="video/mp4")
+        report["blob_name"] = output_blob_name
+        report["size"] = os.path.getsize(output_path)
+
+    print(f"DEBUG: Stitched {report['clips']} clips into {output_blob_name} ({report['reencoded']} re-encoded)")
+    return report
+
+
+def _stitch_to_asset(project_id: int, blob_names: List[str], prompt: Optional[str], context_version: Optional[str], context_data: Optional[str]) -> Dict:
+    report = stitch_clips(blob_names)
+    with SessionLocal() as db:
+        asset = models.Asset(
+            project_id=project_id,
+            type="video",
+            url=report["blob_name"],
+            prompt=prompt or f"Stitched from {len(blob_names)} clips",
+            model_type="stitch",
+            context_version=context_version,
+            context_data=context_data,
+        )
+        db.add(asset)
+        db.commit()
+        report["asset_id"] = asset.id
+    schedule_renditions(report["asset_id"])
+    return report
+
+
+async def stitch_to_asset(
+    project_id: int,
+    blob_names: List[str],
+    prompt: Optional[str] = None,
+    context_version: Optional[str] = None,
+    context_data: Optional[str] = None,
+) -> Dict:
+    """
+    Stitches clips on the worker pool and saves the result as a new video Asset.
+    """
+    future = _executor.submit(_stitch_to_asset, project_id, blob_names, prompt, context_version, context_data)
+    return await asyncio.wrap_future(future)
@@ -3,6 +3,7 @@ from google import genai
 from google.genai.types import RecontextImageSource, ProductImage, Image
 from fastapi import UploadFile
 from backend.services.storage import upload_bytes
+from backend.services.image_creation import get_client
 import uuid
 
 # Initialize client
@@ -10,11 +11,7 @@ import uuid
 # but the client is usually thread safe.
 # Initialize client for Vertex AI
 # Virtual Try-on requires Vertex AI
-client = genai.Client(
-    vertexai=True,
-    project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-    location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-)
+client = get_client(location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"), vertexai=True)
 
 from typing import List
 
@@ -0,0 +1,281 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional: fall back to gzip-only when brotli isn't installed
+    brotli = None
+
+# Fingerprinted files never change under the same name, so browsers may keep them forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Entry points (index.html, original paths) must always be revalidated so new fingerprints are picked up.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 1024
+
+# ES module specifiers: `import x from './a.js'`, `export * from './a.js'`, `import './a.js'`, `import('./a.js')`
+JS_IMPORT_PATTERNS = [
+    re.compile(r"""(\b(?:import|export)\b[^'";]*?\bfrom\s*)(['"])(\.{1,2}/[^'"]+)\2"""),
+    re.compile(r"""(\bimport\s*)(['"])(\.{1,2}/[^'"]+)\2"""),
+    re.compile(r"""(\bimport\(\s*)(['"])(\.{1,2}/[^'"]+)\2"""),
+]
+HTML_REF_PATTERN = re.compile(r"""(\b(?:src|href)=)(["'])([^"'#:]+?)(\?[^"']*)?\2""")
+
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("image/svg+xml", ".svg")
+
+
+class StaticAsset:
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.encodings = {"identity": body}
+
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(body) >= MIN_COMPRESS_SIZE:
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) < len(body):
+                self.encodings["gzip"] = gzipped
+            if brotli is not None:
+                brotlied = brotli.compress(body, quality=11)
+                if len(brotlied) < len(body):
+                    self.encodings["br"] = brotlied
+
+    def etag_for(self, encoding: str) -> str:
+        # Each representation gets its own validator, as required for content-coded bodies.
+        if encoding == "identity":
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+def _fingerprinted_name(path: str, digest: str) -> str:
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{digest[:12]}{ext}"
+
+
+def _content_type(path: str) -> str:
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _js_imports(path: str, source: str) -> List[str]:
+    base = posixpath.dirname(path)
+    found = []
+    for pattern in JS_IMPORT_PATTERNS:
+        for match in pattern.finditer(source):
+            found.append(posixpath.normpath(posixpath.join(base, match.group(3))))
+    return found
+
+
+class StaticAssetManifest:
+    """
+    Build-free asset pipeline for the frontend folder.
+    At startup every file is content-hashed, pre-compressed and exposed under a fingerprinted
+    name; module imports and index.html references are rewritten to point at those names.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets: Dict[str, StaticAsset] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self._build()
+
+    def _read_sources(self) -> Dict[str, bytes]:
+        sources = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    sources[rel_path] = f.read()
+        return sources
+
+    def _build(self):
+        sources = self._read_sources()
+        digests = {path: hashlib.sha256(data).hexdigest() for path, data in sources.items()}
+
+        imports = {}
+        for path, data in sources.items():
+            if path.endswith(".js"):
+                imports[path] = [dep for dep in _js_imports(path, data.decode("utf-8")) if dep in sources]
+
+        # A module's fingerprint covers its whole import closure, so changing a leaf module
+        # also renames every module that (transitively) imports it. Cycles are fine.
+        def closure(path):
+            seen, stack = set(), [path]
+            while stack:
+                current = stack.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                stack.extend(imports.get(current, []))
+            return seen
+
+        for path in sources:
+            if path.endswith(".js"):
+                combined = "".join(sorted(digests[dep] for dep in closure(path)))
+                digest = hashlib.sha256(combined.encode()).hexdigest()
+            else:
+                digest = digests[path]
+            self.fingerprints[path] = _fingerprinted_name(path, digest)
+
+        for path, data in sources.items():
+            if path.endswith(".js"):
+                data = self._rewrite_js(path, data.decode("utf-8")).encode("utf-8")
+            elif path.endswith(".html"):
+                data = self._rewrite_html(path, data.decode("utf-8")).encode("utf-8")
+
+            content_type = _content_type(path)
+            # Original paths stay reachable (deep links, bookmarks) but must be revalidated.
+            self.assets[path] = StaticAsset(data, content_type, REVALIDATE_CACHE_CONTROL)
+            if not path.endswith(".html"):
+                self.assets[self.fingerprints[path]] = StaticAsset(data, content_type, IMMUTABLE_CACHE_CONTROL)
+
+        total = sum(len(a.encodings["identity"]) for a in self.assets.values())
+        print(f"DEBUG: Static asset manifest built: {len(sources)} files, {total} bytes (brotli={'on' if brotli else 'off'})")
+
+    def _rewrite_js(self, path: str, source: str) -> str:
+        base = posixpath.dirname(path)
+
+        def replace(match):
+            specifier = match.group(3)
+            target = posixpath.normpath(posixpath.join(base, specifier))
+            if target not in self.fingerprints:
+                return match.group(0)
+            rewritten = posixpath.relpath(self.fingerprints[target], base or ".")
+            if not rewritten.startswith("."):
+                rewritten = "./" + rewritten
+            return f"{match.group(1)}{match.group(2)}{rewritten}{match.group(2)}"
+
+        for pattern in JS_IMPORT_PATTERNS:
+            source = pattern.sub(replace, source)
+        return source
+
+    def _rewrite_html(self, path: str, source: str) -> str:
+        base = posixpath.dirname(path)
+
+        def replace(match):
+            ref = match.group(3)
+            target = posixpath.normpath(posixpath.join(base, ref.lstrip("/")))
+            if target not in self.fingerprints:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}{'/' if ref.startswith('/') else ''}{self.fingerprints[target]}{match.group(2)}"
+
+        return HTML_REF_PATTERN.sub(replace, source)
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        path = posixpath.normpath(path.lstrip("/")) if path.strip("/") else ""
+        if path in ("", "."):
+            path = "index.html"
+        asset = self.assets.get(path)
+        if asset is None and f"{path}/index.html" in self.assets:
+            asset = self.assets[f"{path}/index.html"]
+        return asset
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+    return accepted
+
+
+def identity_acceptable(accept_encoding: str) -> bool:
+    """False only when the client refused uncoded bodies: identity;q=0, or *;q=0 without identity."""
+    accepted = _accepted_encodings(accept_encoding)
+    return accepted.get("identity", accepted.get("*", 1.0)) > 0
+
+
+def negotiate_encoding(accept_encoding: str, available) -> Optional[str]:
+    """
+    Best of `available` (br preferred over gzip) allowed by an Accept-Encoding header, else
+    identity; None when the client accepts none of them and refused identity too.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity" if identity_acceptable(accept_encoding) else None
+
+
+def _negotiate_encoding(asset: StaticAsset, accept_encoding: str) -> Optional[str]:
+    return negotiate_encoding(accept_encoding, asset.encodings)
+
+
+class FrontendAssets:
+    """
+    ASGI app serving the StaticAssetManifest with ETag/304 support and
+    negotiated pre-compressed bodies. Drop-in replacement for the StaticFiles mount.
+    """
+
+    def __init__(self, directory: str):
+        self.manifest = StaticAssetManifest(directory)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        method = scope["method"]
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        asset = self.manifest.lookup(scope["path"]) if method in ("GET", "HEAD") else None
+
+        if asset is None:
+            status = 405 if method not in ("GET", "HEAD") else 404
+            body = b"Method Not Allowed" if status == 405 else b"Not Found"
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        encoding = _negotiate_encoding(asset, headers.get("accept-encoding", ""))
+        if encoding is None:
+            body = b"Not Acceptable"
+            await send({"type": "http.response.start", "status": 406,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"vary", b"Accept-Encoding")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        etag = asset.etag_for(encoding)
+        common_headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", asset.cache_control.encode()),
+            (b"vary", b"Accept-Encoding"),
+        ]
+
+        if_none_match = headers.get("if-none-match", "")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+            await send({"type": "http.response.start", "status": 304, "headers": common_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = asset.encodings[encoding]
+        response_headers = common_headers + [
+            (b"content-type", asset.content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if encoding != "identity":
+            response_headers.append((b"content-encoding", encoding.encode()))
+
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+        await send({"type": "http.response.body", "body": b"" if method == "HEAD" else body})
@@ -0,0 +1,102 @@
+"""
+Per-endpoint request body limits, enforced while the body streams in.
+
+Requests announcing a larger Content-Length are rejected before anything is read; chunked or
+mislabelled bodies are cut off with 413 as soon as the running byte count passes the limit, so
+an oversized upload never reaches the multipart parser's spool, let alone Python memory.
+"""
+import json
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from starlette.formparsers import MultiPartParser
+
+from backend.config import config
+
+# Uploaded files stay in memory up to this size, then roll over to a temp file on disk
+MultiPartParser.spool_max_size = config.UPLOAD_SPOOL_MEMORY_BYTES
+
+# Longest prefix wins
+ENDPOINT_LIMITS: List[Tuple[str, int]] = sorted([
+    ("/image-creation/", config.UPLOAD_LIMIT_IMAGE_BYTES),
+    ("/virtual-try-on/", config.UPLOAD_LIMIT_IMAGE_BYTES),
+    ("/batch-jobs/", config.UPLOAD_LIMIT_IMAGE_BYTES),
+    ("/video-magic/", config.UPLOAD_LIMIT_IMAGE_BYTES),
+    ("/video-magic/extend-video", config.UPLOAD_LIMIT_VIDEO_BYTES),
+    ("/video-magic/optimize-video-prompt", config.UPLOAD_LIMIT_VIDEO_BYTES),
+    ("/context/analyze-file", config.UPLOAD_LIMIT_DOCUMENT_BYTES),
+], key=lambda item: len(item[0]), reverse=True)
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds the {limit // (1024 * 1024)} MB limit for this endpoint")
+
+
+def limit_for(path: str) -> int:
+    for prefix, limit in ENDPOINT_LIMITS:
+        if path.startswith(prefix):
+            return limit
+    return config.UPLOAD_LIMIT_DEFAULT_BYTES
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = limit_for(scope["path"])
+        content_length = self._content_length(scope)
+        if content_length is not None and content_length > limit:
+            await self._reject(send, UploadTooLarge(limit))
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    print(f"DEBUG: Cut off upload to {scope['path']} after {received} bytes (limit {limit})")
+                    raise UploadTooLarge(limit)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadTooLarge as e:
+            # Raised outside FastAPI's body parsing (e.g. a handler reading the stream itself)
+            if response_started:
+                raise
+            await self._reject(send, e)
+
+    @staticmethod
+    def _content_length(scope) -> Optional[int]:
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    async def _reject(send, error: UploadTooLarge):
+        body = json.dumps({"detail": error.detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
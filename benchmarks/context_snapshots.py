@@ -0,0 +1,99 @@
+"""
+Context snapshot benchmark: database size and project-load payload with per-asset inline
+context (before) vs. content-addressed snapshots (after the online backfill).
+
+Usage:
+    python -m benchmarks.context_snapshots [--assets 500] [--contexts 5] [--context-bytes 4000]
+"""
+import os
+import json
+import time
+import random
+import argparse
+import datetime
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from backend import models, schemas
+from backend.services.context_snapshots import backfill_context_snapshots, load_snapshots
+from backend.services.search import ensure_search_index
+
+WORDS = ["moody", "teal", "orange", "neon", "street", "grain", "35mm", "backlit", "matte", "confident",
+         "urban", "night", "palette", "logo", "clean", "bold", "serif", "warm", "contrast", "texture"]
+
+
+def synthetic_context(rng: random.Random, size: int) -> str:
+    """A brand/project context block as the app stores it (JSON-ish text, a few KB)."""
+    words = []
+    while sum(len(word) + 1 for word in words) < size:
+        words.append(rng.choice(WORDS))
+    return json.dumps({"brand_vibe": " ".join(words[: len(words) // 2]), "project_context": " ".join(words[len(words) // 2:])})
+
+
+def project_payload(db, project_id: int) -> int:
+    """Bytes of the GET /projects/{id} response body (URL signing aside)."""
+    project = db.query(models.Project).options(joinedload(models.Project.assets)).filter(models.Project.id == project_id).first()
+    project.context_snapshots = load_snapshots(db, (asset.context_hash for asset in project.assets))
+    return len(schemas.Project.model_validate(project).model_dump_json())
+
+
+def run(num_assets: int, num_contexts: int, context_bytes: int) -> dict:
+    rng = random.Random(7)
+    contexts = [synthetic_context(rng, context_bytes) for _ in range(num_contexts)]
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        models.Base.metadata.create_all(engine)
+        ensure_search_index(engine)
+        now = datetime.datetime.utcnow()
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO projects (id, name, created_at) VALUES (1, 'Campaign', :now)"), {"now": now})
+            # Rows as written before snapshots: every asset carries its context inline
+            connection.execute(models.Asset.__table__.insert(), [
+                {
+                    "project_id": 1,
+                    "type": "image",
+                    "url": f"generated_images/{i}.png",
+                    "prompt": f"Product shot {i}",
+                    "context_data": contexts[i % num_contexts],
+                    "created_at": now,
+                }
+                for i in range(num_assets)
+            ])
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        db = sessionmaker(bind=engine)()
+        before = {"db_bytes": os.path.getsize(path), "project_payload_bytes": project_payload(db, 1)}
+        db.close()
+
+        started = time.perf_counter()
+        report = backfill_context_snapshots(engine)
+        backfill_seconds = time.perf_counter() - started
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        db = sessionmaker(bind=engine)()
+        after = {"db_bytes": os.path.getsize(path), "project_payload_bytes": project_payload(db, 1)}
+        db.close()
+        engine.dispose()
+
+    return {
+        "assets": num_assets,
+        "distinct_contexts": num_contexts,
+        "context_bytes": len(contexts[0]),
+        "backfill": {**report, "seconds": round(backfill_seconds, 2)},
+        "before": before,
+        "after": after,
+        "db_reduction": round(1 - after["db_bytes"] / before["db_bytes"], 3),
+        "payload_reduction": round(1 - after["project_payload_bytes"] / before["project_payload_bytes"], 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--contexts", type=int, default=5)
+    parser.add_argument("--context-bytes", type=int, default=4000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.assets, args.contexts, args.context_bytes), indent=2))
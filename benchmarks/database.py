@@ -0,0 +1,140 @@
+"""
+Database throughput benchmark: the project/context/save endpoints under concurrent load,
+against each database URL given (SQLite file vs. PostgreSQL), through the app's own
+sync and async session layers with the configured pool settings.
+
+Usage:
+    python -m benchmarks.database [--url postgresql+psycopg://postgres@/bench?host=/tmp/pg] [--requests 2000] [--concurrency 32]
+
+A temporary SQLite file is always included as the baseline. Each URL's schema is recreated.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import models, database
+from backend.routers import context, projects, video_creation
+
+
+def reset_schema(url: str):
+    engine = create_engine(url, **database.engine_options(url))
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+    models.Base.metadata.create_all(engine)
+    return engine
+
+
+def build_app() -> FastAPI:
+    video_creation.schedule_renditions = lambda asset_id: None # No thumbnails for fake blobs
+    app = FastAPI()
+    app.include_router(projects.router)
+    app.include_router(context.router)
+    app.include_router(video_creation.router)
+    return app
+
+
+async def drive(app: FastAPI, workload, total: int, concurrency: int) -> dict:
+    """Runs `total` requests from `workload(client, i)` with `concurrency` in flight."""
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                i = queue.get_nowait()
+                started = time.perf_counter()
+                response = await workload(client, i)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "errors": errors,
+    }
+
+
+def run_url(url: str, total: int, concurrency: int) -> dict:
+    engine = reset_schema(url)
+    async_engine = create_async_engine(database.async_database_url(url), **database.engine_options(database.async_database_url(url), is_async=True))
+    database.SessionLocal.configure(bind=engine)
+    database.AsyncSessionLocal.configure(bind=async_engine)
+    app = build_app()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            project_ids = [
+                (await client.post("/projects/", json={"name": f"Campaign {i}"})).json()["id"] for i in range(20)
+            ]
+
+        def project(i):
+            return project_ids[i % len(project_ids)]
+
+        async def writes(client, i):
+            if i % 2:
+                return await client.post("/context/versions", json={"project_id": project(i), "name": f"v{i}", "context": "Moody teal"})
+            return await client.post("/video-creation/save", data={
+                "project_id": project(i), "blob_name": f"clips/{i}.mp4", "prompt": "Spin", "context_data": "Moody teal",
+            })
+
+        async def reads(client, i):
+            if i % 3 == 0:
+                return await client.get("/projects/summary")
+            if i % 3 == 1:
+                return await client.get(f"/context/versions/{project(i)}")
+            return await client.get(f"/projects/{project(i)}")
+
+        async def mixed(client, i):
+            return await (writes if i % 5 == 0 else reads)(client, i)
+
+        return {
+            "writes": await drive(app, writes, total, concurrency),
+            "reads": await drive(app, reads, total, concurrency),
+            "mixed_20pct_writes": await drive(app, mixed, total, concurrency),
+        }
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+
+def run(urls, total: int, concurrency: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # A SQLite file (the default deployment) is always the baseline
+        for url in [f"sqlite:///{os.path.join(work_dir, 'bench.db')}", *urls]:
+            label = create_engine(url).url.render_as_string(hide_password=True)
+            results[label] = run_url(url, total, concurrency)
+    return {"requests": total, "concurrency": concurrency, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", default=[], help="Database URL to compare with SQLite; repeatable")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    print(json.dumps(run(args.url, args.requests, args.concurrency), indent=2))
@@ -0,0 +1,479 @@
+"""
+HTTP emulator of the model API (Vertex AI and the Gemini API) and Cloud Storage, for load tests
+of the whole deployed stack: uvicorn, middleware, multipart parsing, executors and the real
+google-genai and google-cloud-storage clients talking over sockets.
+
+Model calls take the latencies, failure rate and payload sizes of a profile from
+benchmarks/fakes.py. generate_videos starts a long-running operation that finishes after the
+profile's video latency; on Vertex AI the clip is written under the request's output_gcs_uri,
+as Veo does, and the backend finds it through the storage API. Objects are kept in
+--storage-dir (a temporary folder by default) and signed URLs are served without checking the
+signature. GET /emulator/stats returns call and failure counts.
+
+The backend authenticates with a service account key whose token_uri is the emulator
+(--write-credentials), so URL signing runs as in production.
+
+Usage:
+    python -m benchmarks.emulator [--port 9100] [--profile production] [--write-credentials /tmp/emulator-key.json]
+
+Then, with that key:
+    MODEL_API_BASE_URL=http://127.0.0.1:9100 STORAGE_API_ENDPOINT=http://127.0.0.1:9100 \\
+    GOOGLE_APPLICATION_CREDENTIALS=/tmp/emulator-key.json GOOGLE_CLOUD_PROJECT=emulator \\
+    uvicorn backend.main:app --port 8888
+
+benchmarks/load.py --launch starts both with these settings.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import base64
+import asyncio
+import hashlib
+import argparse
+import datetime
+import tempfile
+import threading
+from typing import Optional
+
+import google_crc32c
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+
+from benchmarks.fakes import PROFILES, Fakes
+
+API_VERSIONS = ("v1", "v1beta", "v1beta1")
+# Vertex AI: projects/P/locations/L/publishers/google/models/M:method, Gemini API: models/M:method
+MODEL_METHOD = re.compile(r"^(?P<parent>(?:projects/[^/]+/locations/[^/]+/)?(?:publishers/[^/]+/)?models/[^:/]+):(?P<method>\w+)$")
+
+
+def write_credentials(path: str, base_url: str, project: str = "emulator"):
+    """Writes a service account key (fresh RSA key) that gets its tokens from the emulator."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": project,
+            "private_key_id": "emulator",
+            "private_key": pem.decode(),
+            "client_email": f"emulator@{project}.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": f"{base_url}/token",
+        }, f)
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.datetime.fromtimestamp(seconds, tz=datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _error(code: int, message: str, status: str) -> JSONResponse:
+    return JSONResponse({"error": {"code": code, "message": message, "status": status}}, status_code=code)
+
+
+class ObjectStore:
+    """Bucket objects as files under root, with their metadata in memory."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def path(self, bucket: str, name: str) -> str:
+        # Flat file names: object names may contain anything
+        return os.path.join(self.root, bucket, hashlib.sha256(name.encode()).hexdigest())
+
+    def put(self, bucket: str, name: str, data: bytes, content_type: Optional[str] = None) -> dict:
+        path = self.path(bucket, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        now = time.time()
+        generation = str(time.time_ns())
+        metadata = {
+            "kind": "storage#object",
+            "id": f"{bucket}/{name}/{generation}",
+            "name": name,
+            "bucket": bucket,
+            "generation": generation,
+            "metageneration": "1",
+            "contentType": content_type or "application/octet-stream",
+            "size": str(len(data)),
+            "md5Hash": base64.b64encode(hashlib.md5(data).digest()).decode(),
+            "crc32c": base64.b64encode(google_crc32c.value(data).to_bytes(4, "big")).decode(),
+            "etag": generation,
+            "timeCreated": _timestamp(now),
+            "updated": _timestamp(now),
+        }
+        with self._lock:
+            self.objects[(bucket, name)] = metadata
+        return metadata
+
+    def get(self, bucket: str, name: str) -> Optional[dict]:
+        return self.objects.get((bucket, name))
+
+    def read(self, bucket: str, name: str) -> bytes:
+        with open(self.path(bucket, name), "rb") as f:
+            return f.read()
+
+    def delete(self, bucket: str, name: str) -> bool:
+        with self._lock:
+            metadata = self.objects.pop((bucket, name), None)
+        if metadata is not None:
+            os.remove(self.path(bucket, name))
+        return metadata is not None
+
+    def list(self, bucket: str, prefix: str = "", start_offset: str = "") -> list:
+        with self._lock:
+            names = sorted(name for b, name in self.objects if b == bucket)
+        return [self.objects[(bucket, name)] for name in names if name.startswith(prefix) and name >= start_offset]
+
+
+def _split_multipart(body: bytes, content_type: str):
+    """The metadata and media parts of a multipart/related upload."""
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    parts = [part for part in body.split(b"--" + boundary) if part.strip(b"\r\n-")]
+    sections = []
+    for part in parts[:2]:
+        headers, _, content = part.partition(b"\r\n\r\n")
+        sections.append(content[:-2] if content.endswith(b"\r\n") else content)
+    return json.loads(sections[0]), sections[1]
+
+
+def create_app(profile: dict, storage_dir: str, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Creative Studio emulator")
+    fakes = Fakes(profile, seed)
+    store = ObjectStore(storage_dir)
+    operations = {} # Video operation name -> state
+    uploads = {} # Resumable upload id -> {"bucket", "name", "content_type", "data"}
+    files = {} # Gemini API files
+
+    async def call(kind: str, can_fail: bool = True) -> bool:
+        """Waits out one call of this kind. Returns False when the call should fail."""
+        delay, fail = fakes.draw(kind, can_fail)
+        if delay:
+            await asyncio.sleep(delay)
+        return not fail
+
+    def unavailable(kind: str) -> JSONResponse:
+        return _error(503, f"Emulated {kind} call failed", "UNAVAILABLE")
+
+    def object_response(metadata: dict, request: Request, disposition: Optional[str] = None) -> Response:
+        headers = {
+            "x-goog-hash": f"crc32c={metadata['crc32c']},md5={metadata['md5Hash']}",
+            "x-goog-generation": metadata["generation"],
+        }
+        if disposition:
+            headers["content-disposition"] = disposition
+        return FileResponse(
+            store.path(metadata["bucket"], metadata["name"]), media_type=metadata["contentType"], headers=headers,
+        )
+
+    # --- OAuth (service account JWT grant) ---
+
+    @app.post("/token")
+    async def token():
+        return {"access_token": f"emulator-{uuid.uuid4().hex}", "expires_in": 3600, "token_type": "Bearer"}
+
+    @app.get("/emulator/stats")
+    async def stats():
+        return {
+            "calls": dict(fakes.calls), "failures": dict(fakes.failures), "objects": len(store.objects),
+            "operations": {"running": sum(1 for op in operations.values() if time.monotonic() < op["done_at"]), "total": len(operations)},
+        }
+
+    # --- Cloud Storage JSON API ---
+
+    @app.post("/upload/storage/v1/b/{bucket}/o")
+    async def upload(bucket: str, request: Request):
+        upload_type = request.query_params.get("uploadType")
+        body = await request.body()
+        if upload_type == "resumable":
+            metadata = json.loads(body or b"{}")
+            upload_id = uuid.uuid4().hex
+            uploads[upload_id] = {
+                "bucket": bucket, "name": metadata.get("name") or request.query_params.get("name"),
+                "content_type": metadata.get("contentType") or request.headers.get("x-upload-content-type"), "data": bytearray(),
+            }
+            location = f"{str(request.base_url).rstrip('/')}/upload/storage/v1/b/{bucket}/o?uploadType=resumable&upload_id={upload_id}"
+            return Response(headers={"location": location})
+
+        await call("storage_write", can_fail=False)
+        if upload_type == "multipart":
+            metadata, data = _split_multipart(body, request.headers["content-type"])
+            name, content_type = metadata["name"], metadata.get("contentType")
+        else:
+            name, content_type, data = request.query_params["name"], request.headers.get("content-type"), body
+        return await asyncio.to_thread(store.put, bucket, name, data, content_type)
+
+    @app.put("/upload/storage/v1/b/{bucket}/o")
+    async def upload_chunk(bucket: str, request: Request):
+        state = uploads.get(request.query_params.get("upload_id", ""))
+        if state is None:
+            return _error(404, "No such upload", "NOT_FOUND")
+        state["data"] += await request.body()
+        # "bytes 0-99/*" for a chunk of an upload of unknown size, "bytes 0-99/100" or "bytes */100" for the last one
+        total = request.headers.get("content-range", "").rpartition("/")[2]
+        if total == "*":
+            return Response(status_code=308, headers={"range": f"bytes=0-{len(state['data']) - 1}"})
+        await call("storage_write", can_fail=False)
+        uploads.pop(request.query_params["upload_id"], None)
+        return await asyncio.to_thread(store.put, state["bucket"], state["name"], bytes(state["data"]), state["content_type"])
+
+    @app.get("/download/storage/v1/b/{bucket}/o/{name:path}")
+    async def download(bucket: str, name: str, request: Request):
+        metadata = store.get(bucket, name)
+        if metadata is None:
+            return _error(404, f"No such object: {bucket}/{name}", "NOT_FOUND")
+        await call("storage_read", can_fail=False)
+        return object_response(metadata, request)
+
+    @app.get("/storage/v1/b/{bucket}/o")
+    async def list_objects(bucket: str, request: Request):
+        params = request.query_params
+        items = store.list(bucket, params.get("prefix", ""), params.get("startOffset", ""))
+        start = int(params.get("pageToken") or 0)
+        page_size = int(params.get("maxResults") or 1000)
+        page = {"kind": "storage#objects", "items": items[start:start + page_size]}
+        if start + page_size < len(items):
+            page["nextPageToken"] = str(start + page_size)
+        return page
+
+    @app.post("/storage/v1/b/{bucket}/o/{name:path}/copyTo/b/{destination_bucket}/o/{destination_name:path}")
+    async def copy(bucket: str, name: str, destination_bucket: str, destination_name: str):
+        metadata = store.get(bucket, name)
+        if metadata is None:
+            return _error(404, f"No such object: {bucket}/{name}", "NOT_FOUND")
+        await call("storage_write", can_fail=False)
+        data = await asyncio.to_thread(store.read, bucket, name)
+        return await asyncio.to_thread(store.put, destination_bucket, destination_name, data, metadata["contentType"])
+
+    @app.get("/storage/v1/b/{bucket}/o/{name:path}")
+    async def get_object(bucket: str, name: str, request: Request):
+        metadata = store.get(bucket, name)
+        if metadata is None:
+            return _error(404, f"No such object: {bucket}/{name}", "NOT_FOUND")
+        if request.query_params.get("alt") == "media":
+            await call("storage_read", can_fail=False)
+            return object_response(metadata, request)
+        return metadata
+
+    @app.patch("/storage/v1/b/{bucket}/o/{name:path}")
+    async def patch_object(bucket: str, name: str, request: Request):
+        metadata = store.get(bucket, name)
+        if metadata is None:
+            return _error(404, f"No such object: {bucket}/{name}", "NOT_FOUND")
+        changes = await request.json()
+        if changes.get("contentType"):
+            metadata["contentType"] = changes["contentType"]
+        metadata["metageneration"] = str(int(metadata["metageneration"]) + 1)
+        metadata["updated"] = _timestamp(time.time())
+        return metadata
+
+    @app.delete("/storage/v1/b/{bucket}/o/{name:path}")
+    async def delete_object(bucket: str, name: str):
+        await call("storage_write", can_fail=False)
+        if not store.delete(bucket, name):
+            return _error(404, f"No such object: {bucket}/{name}", "NOT_FOUND")
+        return Response(status_code=204)
+
+    # --- Gemini API files (upload protocol of google-genai) ---
+
+    @app.post("/upload/{version}/files")
+    async def start_file_upload(version: str, request: Request):
+        metadata = (await request.json()).get("file", {})
+        upload_id = uuid.uuid4().hex
+        uploads[upload_id] = {"name": f"files/{upload_id[:12]}", "content_type": metadata.get("mimeType"), "data": bytearray()}
+        return Response(headers={
+            "x-goog-upload-url": f"{str(request.base_url).rstrip('/')}/upload/{version}/files/{upload_id}",
+            "x-goog-upload-status": "active",
+        })
+
+    @app.post("/upload/{version}/files/{upload_id}")
+    async def file_upload_chunk(version: str, upload_id: str, request: Request):
+        state = uploads.get(upload_id)
+        if state is None:
+            return _error(404, "No such upload", "NOT_FOUND")
+        state["data"] += await request.body()
+        if "finalize" not in request.headers.get("x-goog-upload-command", ""):
+            return Response(headers={"x-goog-upload-status": "active"})
+        if not await call("upload"):
+            return unavailable("upload")
+        uploads.pop(upload_id)
+        file = {
+            "name": state["name"], "mimeType": state["content_type"], "sizeBytes": str(len(state["data"])), "state": "ACTIVE",
+            "uri": f"{str(request.base_url).rstrip('/')}/{version}/{state['name']}",
+        }
+        files[state["name"]] = file
+        return Response(json.dumps({"file": file}), media_type="application/json", headers={"x-goog-upload-status": "final"})
+
+    # --- Model API ---
+
+    def content_response(model: str, parts: list, prompt_chars: int, output_chars: int) -> dict:
+        return {
+            "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {
+                "promptTokenCount": prompt_chars // 4, "candidatesTokenCount": output_chars // 4,
+                "totalTokenCount": (prompt_chars + output_chars) // 4,
+            },
+            "modelVersion": model.rsplit("/", 1)[-1],
+        }
+
+    async def generate_content(model: str, body: dict):
+        generation_config = body.get("generationConfig", {})
+        prompt_chars = len(json.dumps(body.get("contents", [])))
+        if "IMAGE" in [modality.upper() for modality in generation_config.get("responseModalities", [])]:
+            if not await call("image"):
+                return unavailable("image")
+            image = await asyncio.to_thread(fakes.image)
+            part = {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode()}}
+            return content_response(model, [part], prompt_chars, 0)
+
+        if not await call("text"):
+            return unavailable("text")
+        schema = generation_config.get("responseSchema") or generation_config.get("responseJsonSchema")
+        if schema:
+            text = json.dumps(fakes.sample(schema))
+        elif generation_config.get("responseMimeType") == "application/json":
+            text = json.dumps({"text": fakes.words(profile["text_chars"])})
+        else:
+            text = fakes.words(profile["text_chars"])
+        return content_response(model, [{"text": text}], prompt_chars, len(text))
+
+    def start_video_operation(parent: str, body: dict, vertex: bool) -> dict:
+        delay, fail = fakes.draw("video")
+        name = f"{parent}/operations/{uuid.uuid4()}"
+        parameters = body.get("parameters", {})
+        operations[name] = {
+            "done_at": time.monotonic() + delay, "fail": fail, "vertex": vertex, "result": None,
+            "storage_uri": parameters.get("storageUri"), "samples": int(parameters.get("sampleCount") or 1),
+        }
+        return {"name": name}
+
+    async def video_operation(name: str, request: Request):
+        op = operations.get(name)
+        if op is None:
+            return _error(404, f"Operation {name} not found", "NOT_FOUND")
+        if time.monotonic() < op["done_at"]:
+            return {"name": name, "done": False}
+        if op["fail"]:
+            return {"name": name, "done": True, "error": {"code": 13, "message": "Emulated video generation failure"}}
+        if op["result"] is None:
+            video = await asyncio.to_thread(fakes.video)
+            if op["vertex"] and op["storage_uri"]:
+                # Veo writes each clip to <output_gcs_uri>/<run id>/sample_<n>.mp4
+                bucket, _, prefix = op["storage_uri"][len("gs://"):].partition("/")
+                run_id = str(time.time_ns())
+                videos = []
+                for n in range(op["samples"]):
+                    blob_name = f"{prefix.rstrip('/')}/{run_id}/sample_{n}.mp4"
+                    await asyncio.to_thread(store.put, bucket, blob_name, video, "video/mp4")
+                    videos.append({"gcsUri": f"gs://{bucket}/{blob_name}", "mimeType": "video/mp4"})
+                op["result"] = {"videos": videos}
+            elif op["vertex"]:
+                op["result"] = {"videos": [{"bytesBase64Encoded": base64.b64encode(video).decode(), "mimeType": "video/mp4"}] * op["samples"]}
+            else:
+                base_url = str(request.base_url).rstrip("/")
+                samples = []
+                for _ in range(op["samples"]):
+                    file_id = uuid.uuid4().hex[:12]
+                    files[f"files/{file_id}"] = {"name": f"files/{file_id}", "mimeType": "video/mp4", "video": True}
+                    samples.append({"video": {"uri": f"{base_url}/v1beta/files/{file_id}:download?alt=media"}})
+                op["result"] = {"generateVideoResponse": {"generatedSamples": samples}}
+        return {"name": name, "done": True, "response": op["result"]}
+
+    async def recontext_image(body: dict):
+        if not await call("tryon"):
+            return unavailable("tryon")
+        image = base64.b64encode(await asyncio.to_thread(fakes.image)).decode()
+        samples = int(body.get("parameters", {}).get("sampleCount") or 1)
+        return {"predictions": [{"bytesBase64Encoded": image, "mimeType": "image/png"}] * samples}
+
+    async def create_cache(parent: str, body: dict):
+        if not await call("cache"):
+            return unavailable("cache")
+        name = f"{parent + '/' if parent else ''}cachedContents/{uuid.uuid4().hex[:16]}"
+        now = time.time()
+        ttl = float(str(body.get("ttl", "3600s")).rstrip("s"))
+        return {"name": name, "model": body.get("model"), "createTime": _timestamp(now), "expireTime": _timestamp(now + ttl)}
+
+    async def model_api(version: str, path: str, request: Request):
+        if request.method == "DELETE" and "/cachedContents/" in f"/{path}":
+            return {}
+        if request.method == "GET":
+            if "/operations/" in path:
+                return await video_operation(path, request)
+            if path.startswith("files/") and path.endswith(":download"):
+                if not files.get(path[:-len(":download")], {}).get("video"):
+                    return _error(404, f"File {path} not found", "NOT_FOUND")
+                return Response(await asyncio.to_thread(fakes.video), media_type="video/mp4")
+            if path in files:
+                return files[path]
+            return _error(404, f"{path} not found", "NOT_FOUND")
+
+        body = await request.json() if await request.body() else {}
+        if path.endswith("cachedContents"):
+            return await create_cache(path[:-len("cachedContents")].rstrip("/"), body)
+        match = MODEL_METHOD.match(path)
+        if match is None:
+            return _error(404, f"Method {path} is not emulated", "NOT_FOUND")
+        parent, method = match.group("parent"), match.group("method")
+        vertex = path.startswith("projects/")
+        if method in ("generateContent", "streamGenerateContent"):
+            return await generate_content(parent, body)
+        if method == "predictLongRunning":
+            return start_video_operation(parent, body, vertex)
+        if method == "fetchPredictOperation":
+            return await video_operation(body["operationName"], request)
+        if method == "predict":
+            return await recontext_image(body)
+        if method == "countTokens":
+            return {"totalTokens": len(json.dumps(body)) // 4}
+        return _error(404, f"Method {method} is not emulated", "NOT_FOUND")
+
+    for version in API_VERSIONS:
+        app.add_api_route(f"/{version}/{{path:path}}", _bind(model_api, version), methods=["GET", "POST", "DELETE", "PATCH"])
+
+    # --- Signed URLs (https://<endpoint>/<bucket>/<object>?X-Goog-Signature=...) ---
+
+    @app.get("/{bucket}/{name:path}")
+    async def signed_url(bucket: str, name: str, request: Request):
+        metadata = store.get(bucket, name)
+        if metadata is None:
+            return _error(404, f"No such object: {bucket}/{name}", "NOT_FOUND")
+        if "X-Goog-Signature" not in request.query_params:
+            return _error(403, "Missing signature", "PERMISSION_DENIED")
+        await call("storage_read", can_fail=False)
+        return object_response(metadata, request, request.query_params.get("response-content-disposition"))
+
+    return app
+
+
+def _bind(handler, version: str):
+    async def route(path: str, request: Request):
+        return await handler(version, path, request)
+    return route
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--profile", default="production", choices=list(PROFILES))
+    parser.add_argument("--storage-dir", help="Where object data is kept (default: a temporary folder)")
+    parser.add_argument("--write-credentials", metavar="PATH", help="Write a service account key for GOOGLE_APPLICATION_CREDENTIALS")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.write_credentials:
+        write_credentials(args.write_credentials, base_url)
+    storage_dir = args.storage_dir or tempfile.mkdtemp(prefix="creative-studio-emulator-")
+    print(f"Emulating the model API and Cloud Storage at {base_url} (profile {args.profile}, objects in {storage_dir})")
+    uvicorn.run(create_app(PROFILES[args.profile], storage_dir, args.seed), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,278 @@
+"""
+In-process fakes for the model client (google.genai.Client) and Cloud Storage, so benchmarks
+can drive the real routers and services offline.
+
+A profile (see PROFILES) sets the median latency of each kind of call, the spread around it
+(lognormal, so there is a tail like real model calls), the share of model calls that fail
+with a 503 and the size of generated payloads. Responses are real google.genai types, built
+to satisfy the request: images for IMAGE modalities, JSON that follows response_schema, a
+finished video operation whose URI is a data: URL (downloaded by the services with urllib
+as usual).
+
+install() must run after the environment is set up but before the backend is imported, as
+some modules build their client at import time (services/virtual_tryon.py).
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import base64
+import random
+import threading
+from collections import Counter
+
+from google import genai
+from google.genai import errors, types
+
+from backend.services.local_storage import LocalBlob, LocalBucket, LocalStorageClient
+
+_FAST_LATENCY_MS = {
+    "text": 20, "image": 60, "video": 150, "tryon": 60, "cache": 20, "upload": 10,
+    "storage_write": 5, "storage_read": 3, "storage_sign": 0.5,
+}
+
+PROFILES = {
+    # No waiting: only the app's own overhead is measured
+    "instant": {"latency_ms": {}, "jitter": 0.0, "failure_rate": 0.0, "image_bytes": 64 * 1024, "video_bytes": 256 * 1024, "text_chars": 600},
+    # Model calls in tens of milliseconds, the default
+    "fast": {"latency_ms": _FAST_LATENCY_MS, "jitter": 0.4, "failure_rate": 0.0, "image_bytes": 256 * 1024, "video_bytes": 1024 * 1024, "text_chars": 600},
+    # Heavier tail: p99 model calls several times the median
+    "slow_tail": {"latency_ms": {kind: ms * 3 for kind, ms in _FAST_LATENCY_MS.items()}, "jitter": 1.0, "failure_rate": 0.0, "image_bytes": 256 * 1024, "video_bytes": 1024 * 1024, "text_chars": 600},
+    # One in ten model calls fails with a 503
+    "flaky": {"latency_ms": _FAST_LATENCY_MS, "jitter": 0.4, "failure_rate": 0.1, "image_bytes": 256 * 1024, "video_bytes": 1024 * 1024, "text_chars": 600},
+    # High-resolution images, long clips, long text
+    "large_payloads": {"latency_ms": _FAST_LATENCY_MS, "jitter": 0.4, "failure_rate": 0.0, "image_bytes": 4 * 1024 * 1024, "video_bytes": 16 * 1024 * 1024, "text_chars": 8000},
+    # Roughly what production sees: seconds per model call, about a minute per Veo clip
+    "production": {
+        "latency_ms": {"text": 2500, "image": 9000, "video": 60000, "tryon": 12000, "cache": 800, "upload": 400,
+                       "storage_write": 60, "storage_read": 40, "storage_sign": 0},
+        "jitter": 0.5, "failure_rate": 0.01, "image_bytes": 1536 * 1024, "video_bytes": 8 * 1024 * 1024, "text_chars": 1200,
+    },
+}
+
+WORDS = "neon teal orange sneaker street rain cinematic moody lighting close-up palette brand reflection night portrait".split()
+
+
+class Fakes:
+    """Profile, randomness and call counters shared by the fake clients."""
+
+    def __init__(self, profile: dict, seed: int = 0):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+        self.failures = Counter()
+        self._lock = threading.Lock()
+        self._images = {}
+        self._video = None
+        self._video_uri = None
+
+    def draw(self, kind: str, can_fail: bool = True):
+        """Counts one call of this kind. Returns (delay in seconds, whether it fails)."""
+        median_ms = self.profile["latency_ms"].get(kind, 0)
+        with self._lock:
+            self.calls[kind] += 1
+            delay = self.rng.lognormvariate(math.log(median_ms), self.profile["jitter"]) if median_ms else 0
+            fail = can_fail and self.rng.random() < self.profile["failure_rate"]
+            if fail:
+                self.failures[kind] += 1
+        return delay / 1000, fail
+
+    def wait(self, kind: str, can_fail: bool = True):
+        """Sleeps for one call of this kind (blocking, like the real clients) and maybe fails it."""
+        delay, fail = self.draw(kind, can_fail)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise errors.ServerError(503, {"error": {"code": 503, "message": f"Fake {kind} call failed", "status": "UNAVAILABLE"}})
+
+    def words(self, chars: int) -> str:
+        text = []
+        while sum(len(word) + 1 for word in text) < chars:
+            text.append(self.rng.choice(WORDS))
+        return " ".join(text)
+
+    def image(self) -> bytes:
+        """A PNG of about image_bytes (noise doesn't compress), rendered once per size."""
+        size = self.profile["image_bytes"]
+        if size not in self._images:
+            from PIL import Image
+            side = max(8, int(math.sqrt(size / 3)))
+            buffer = io.BytesIO()
+            Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(buffer, format="PNG", compress_level=0)
+            self._images[size] = buffer.getvalue()
+        return self._images[size]
+
+    def video(self) -> bytes:
+        if self._video is None:
+            self._video = os.urandom(self.profile["video_bytes"])
+        return self._video
+
+    def video_uri(self) -> str:
+        if self._video_uri is None:
+            self._video_uri = "data:video/mp4;base64," + base64.b64encode(self.video()).decode()
+        return self._video_uri
+
+    def sample(self, schema):
+        """A value that satisfies a response_schema (types.Schema or its dict form)."""
+        if isinstance(schema, dict):
+            schema = types.Schema.model_validate(schema)
+        kind = getattr(schema.type, "value", schema.type) or "STRING"
+        if schema.enum:
+            return schema.enum[0]
+        if kind == "OBJECT":
+            return {name: self.sample(field) for name, field in (schema.properties or {}).items()}
+        if kind == "ARRAY":
+            return [self.sample(schema.items) for _ in range(4)]
+        if kind == "INTEGER":
+            return 0
+        if kind == "NUMBER":
+            return 0.5
+        if kind == "BOOLEAN":
+            return True
+        return self.words(max(20, self.profile["text_chars"] // 10))
+
+
+def _content_response(parts, prompt_chars: int, output_chars: int) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts), finish_reason="STOP")],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_chars // 4, candidates_token_count=output_chars // 4
+        ),
+    )
+
+
+class FakeModels:
+    def __init__(self, fakes: Fakes):
+        self.fakes = fakes
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        if isinstance(config, dict):
+            config = types.GenerateContentConfig.model_validate(config)
+        prompt_chars = len(str(contents))
+        if config is not None and "IMAGE" in (config.response_modalities or []):
+            self.fakes.wait("image")
+            image = self.fakes.image()
+            return _content_response([types.Part(inline_data=types.Blob(data=image, mime_type="image/png"))], prompt_chars, 0)
+
+        self.fakes.wait("text")
+        if config is not None and config.response_schema is not None:
+            text = json.dumps(self.fakes.sample(config.response_schema))
+        elif config is not None and config.response_mime_type == "application/json":
+            text = json.dumps({"text": self.fakes.words(self.fakes.profile["text_chars"])})
+        else:
+            text = self.fakes.words(self.fakes.profile["text_chars"])
+        return _content_response([types.Part(text=text)], prompt_chars, len(text))
+
+    def generate_videos(self, model, prompt=None, image=None, video=None, config=None, **kwargs):
+        self.fakes.wait("video")
+        videos = types.GenerateVideosResponse(generated_videos=[types.GeneratedVideo(video=types.Video(uri=self.fakes.video_uri()))])
+        # Returned finished, so callers never sit in their polling sleep
+        return types.GenerateVideosOperation(name=f"operations/{self.fakes.rng.getrandbits(32)}", done=True, response=videos, result=videos)
+
+    def recontext_image(self, model, source, config=None, **kwargs):
+        self.fakes.wait("tryon")
+        return types.RecontextImageResponse(generated_images=[types.GeneratedImage(image=types.Image(image_bytes=self.fakes.image()))])
+
+
+class FakeOperations:
+    def get(self, operation, **kwargs):
+        return operation
+
+
+class FakeFiles:
+    def __init__(self, fakes: Fakes):
+        self.fakes = fakes
+
+    def upload(self, file=None, config=None, **kwargs):
+        self.fakes.wait("upload")
+        name = f"files/{self.fakes.rng.getrandbits(32)}"
+        if isinstance(config, dict):
+            config = types.UploadFileConfig.model_validate(config)
+        mime_type = config.mime_type if config is not None else None
+        return types.File(name=name, uri=f"https://generativelanguage.googleapis.com/v1beta/{name}", mime_type=mime_type, state="ACTIVE")
+
+    def get(self, name, **kwargs):
+        return types.File(name=name, uri=f"https://generativelanguage.googleapis.com/v1beta/{name}", state="ACTIVE")
+
+
+class FakeCaches:
+    def __init__(self, fakes: Fakes):
+        self.fakes = fakes
+
+    def create(self, model, config=None, **kwargs):
+        self.fakes.wait("cache")
+        return types.CachedContent(name=f"cachedContents/{self.fakes.rng.getrandbits(32)}", model=model)
+
+    def delete(self, name, **kwargs):
+        return None
+
+
+class FakeGenaiClient:
+    """Stands in for google.genai.Client, whatever it is constructed with (API key or Vertex AI)."""
+    fakes: Fakes = None
+
+    def __init__(self, *args, **kwargs):
+        self.models = FakeModels(self.fakes)
+        self.operations = FakeOperations()
+        self.files = FakeFiles(self.fakes)
+        self.caches = FakeCaches(self.fakes)
+
+
+class FakeBlob(LocalBlob):
+    def upload_from_file(self, file_obj, content_type: str = None, **kwargs):
+        self.bucket.client.fakes.wait("storage_write", can_fail=False)
+        super().upload_from_file(file_obj, content_type=content_type, **kwargs)
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        self.bucket.client.fakes.wait("storage_read", can_fail=False)
+        return super().download_as_bytes(**kwargs)
+
+    def download_to_file(self, file_obj, **kwargs):
+        self.bucket.client.fakes.wait("storage_read", can_fail=False)
+        super().download_to_file(file_obj, **kwargs)
+
+    def download_to_filename(self, filename: str, **kwargs):
+        self.bucket.client.fakes.wait("storage_read", can_fail=False)
+        super().download_to_filename(filename, **kwargs)
+
+    def generate_signed_url(self, **kwargs) -> str:
+        self.bucket.client.fakes.wait("storage_sign", can_fail=False)
+        return super().generate_signed_url(**kwargs)
+
+
+class FakeBucket(LocalBucket):
+    def blob(self, blob_name: str) -> FakeBlob:
+        return FakeBlob(self, blob_name)
+
+    def delete_blob(self, blob_name: str, **kwargs):
+        self.client.fakes.wait("storage_write", can_fail=False)
+        super().delete_blob(blob_name, **kwargs)
+
+
+class FakeStorageClient(LocalStorageClient):
+    """The local storage stand-in with the profile's storage latencies."""
+
+    def __init__(self, root: str, fakes: Fakes):
+        super().__init__(root)
+        self.fakes = fakes
+
+    def bucket(self, bucket_name: str) -> FakeBucket:
+        return FakeBucket(self, bucket_name)
+
+
+def install(profile: dict, storage_dir: str, seed: int = 0) -> Fakes:
+    """Swaps the fakes in for this process. Returns the shared Fakes (call counters)."""
+    fakes = Fakes(profile, seed)
+    FakeGenaiClient.fakes = fakes
+    genai.Client = FakeGenaiClient
+
+    from backend.services import storage
+    original = storage.storage_client
+    storage_client = FakeStorageClient(storage_dir, fakes)
+    # Modules imported so far may hold the client under their own name
+    for name, module in list(sys.modules.items()):
+        if name.startswith("backend") and getattr(module, "storage_client", None) is original:
+            module.storage_client = storage_client
+    return fakes
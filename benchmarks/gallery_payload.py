@@ -0,0 +1,98 @@
+"""
+Gallery payload benchmark: bytes a project gallery downloads to render its grid tiles,
+using full-resolution originals (before) vs. renditions (after).
+
+Usage:
+    python -m benchmarks.gallery_payload [--images 24] [--videos 4]
+
+Video renditions need ffmpeg (set FFMPEG_BINARY if it is not on PATH).
+"""
+import io
+import os
+import json
+import random
+import argparse
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from backend.config import config
+from backend.services.renditions import render_thumbnails, render_video_renditions
+
+GRID_RENDITION = "thumb_512"
+
+
+def synthetic_photo(size: int, seed: int) -> bytes:
+    """Photo-like PNG (gradients, shapes and sensor noise) so compression ratios are realistic."""
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size), rng.randrange(size)
+        r = rng.randrange(size // 20, size // 4)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    image = image.filter(ImageFilter.GaussianBlur(size / 200))
+    noise = Image.effect_noise((size, size), 24).convert("RGB")
+    image = Image.blend(image, noise, 0.12)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def synthetic_clip(path: str, seconds: int = 8):
+    subprocess.run(
+        [config.FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=24:duration={seconds}",
+         "-c:v", "libx264", "-pix_fmt", "yuv420p", path],
+        check=True,
+    )
+
+
+def run(num_images: int, num_videos: int) -> dict:
+    results = {"images": {}, "videos": {}}
+
+    before = after = 0
+    for i in range(num_images):
+        original = synthetic_photo(1024 if i % 2 == 0 else 2048, seed=i)
+        thumbs = render_thumbnails(original)
+        before += len(original)
+        after += len(thumbs[GRID_RENDITION])
+    results["images"] = {
+        "count": num_images,
+        "original_bytes": before,
+        "rendition_bytes": after,
+        "reduction": round(1 - after / before, 4) if before else None,
+    }
+
+    if num_videos and shutil.which(config.FFMPEG_BINARY):
+        before = poster_bytes = preview_bytes = 0
+        with tempfile.TemporaryDirectory() as work_dir:
+            for i in range(num_videos):
+                clip = os.path.join(work_dir, f"clip_{i}.mp4")
+                synthetic_clip(clip)
+                renditions = render_video_renditions(clip)
+                before += os.path.getsize(clip)
+                poster_bytes += len(renditions["poster"])
+                preview_bytes += len(renditions["preview"])
+        results["videos"] = {
+            "count": num_videos,
+            "original_bytes": before,
+            "poster_bytes": poster_bytes,
+            "preview_bytes": preview_bytes,
+            # Grid tiles load only the poster (preload="none"); the preview plays on demand
+            "reduction": round(1 - poster_bytes / before, 4) if before else None,
+        }
+    else:
+        results["videos"] = {"skipped": "ffmpeg not available"}
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--videos", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(run(args.images, args.videos), indent=2))
@@ -0,0 +1,358 @@
+"""
+Load test of a running backend over real sockets, with a production-like mix of requests:
+project browsing, image generation (followed by a save from the signed URL, as the UI does),
+image edits and video jobs (generate, then save).
+
+Virtual users run concurrently for --duration seconds. Each picks its next operation from the
+mix by weight and waits an exponential --think-time between operations. Projects with assets
+are seeded through the API first. Every HTTP request is timed. The report has, per endpoint,
+p50/p95/p99 latency, throughput and status counts, plus the emulator's model call counts.
+
+Usage:
+    python -m benchmarks.load --launch [--profile production] [--users 32] [--duration 300] [--workers 2]
+    python -m benchmarks.load --target http://127.0.0.1:8888 --emulator http://127.0.0.1:9100
+    python -m benchmarks.load --launch --mix generate_video=0 --mix browse_project=40
+    python -m benchmarks.load --launch --output baseline.json
+    python -m benchmarks.load --launch --compare baseline.json [--tolerance 0.2]
+
+--launch starts benchmarks/emulator.py and uvicorn (backend.main with --workers processes,
+a fresh SQLite database unless --database-url is given) pointed at the emulator, and stops
+them at the end. With --target, the backend must already be configured for an emulator (see
+benchmarks/emulator.py). --compare exits with status 1 on regressions, as in
+benchmarks/suite.py.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+from benchmarks.suite import SCRIPT, upload_image, percentile, compare
+
+# Operation -> weight. Browsing dominates; a video job holds its request open for minutes
+MIX = {
+    "list_projects": 15,
+    "project_summary": 10,
+    "browse_project": 25,
+    "search": 5,
+    "generate_image": 20,
+    "edit_image": 12,
+    "generate_video": 5,
+    "script": 8,
+}
+
+PROMPTS = [
+    "Sneaker on a rain-soaked street at night, neon reflections",
+    "Flat lay of a running outfit on concrete, hard morning light",
+    "Close-up of a laced shoe mid-stride, motion blur, teal and orange",
+    "Product shot on a mirrored floor, moody studio lighting",
+]
+
+
+class Recorder:
+    """Latency and status per endpoint, for requests finished inside the measured window."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.measuring = False
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        if self.measuring:
+            self.latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+            statuses = self.statuses.setdefault(name, {})
+            statuses[status] = statuses.get(status, 0) + 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        results = {}
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            statuses = self.statuses[name]
+            results[name] = {
+                "requests": len(latencies),
+                "errors": sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400),
+                "statuses": dict(sorted(statuses.items())),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": percentile(latencies, 0.50),
+                "p95_ms": percentile(latencies, 0.95),
+                "p99_ms": percentile(latencies, 0.99),
+            }
+        return results
+
+
+# Each operation: async (client, recorder, state, rng) -> None, issuing one or more timed requests
+
+async def list_projects(client, recorder, state, rng):
+    await recorder.request(client, "GET /projects/", "GET", "/projects/")
+
+
+async def project_summary(client, recorder, state, rng):
+    await recorder.request(client, "GET /projects/summary", "GET", "/projects/summary")
+
+
+async def browse_project(client, recorder, state, rng):
+    await recorder.request(client, "GET /projects/{id}", "GET", f"/projects/{rng.choice(state['project_ids'])}")
+
+
+async def search(client, recorder, state, rng):
+    await recorder.request(client, "GET /search/", "GET", "/search/", params={"q": rng.choice(["sneaker", "neon street", "studio lighting"])})
+
+
+async def generate_image(client, recorder, state, rng):
+    project_id = rng.choice(state["project_ids"])
+    prompt = rng.choice(PROMPTS)
+    response = await recorder.request(client, "POST /image-creation/generate", "POST", "/image-creation/generate",
+                                      data={"prompt": prompt, "project_id": project_id})
+    if response is None or response.status_code != 200:
+        return
+    # The UI saves a keeper by handing back its signed URL
+    await recorder.request(client, "POST /image-creation/save", "POST", "/image-creation/save", json={
+        "image_url": response.json()["images"][0], "project_id": project_id, "prompt": prompt,
+    })
+
+
+async def edit_image(client, recorder, state, rng):
+    await recorder.request(client, "POST /image-creation/edit", "POST", "/image-creation/edit",
+                           files={"image": ("frame.png", state["image"], "image/png")},
+                           data={"instruction": "Make the lighting warmer and add rain"})
+
+
+async def generate_video(client, recorder, state, rng):
+    prompt = f"Slow dolly past: {rng.choice(PROMPTS)}"
+    response = await recorder.request(client, "POST /video-creation/generate", "POST", "/video-creation/generate", data={"prompt": prompt})
+    if response is None or response.status_code != 200:
+        return
+    await recorder.request(client, "POST /video-creation/save", "POST", "/video-creation/save", data={
+        "project_id": rng.choice(state["project_ids"]), "blob_name": response.json()["videos"][0]["blob_name"], "prompt": prompt,
+    })
+
+
+async def script(client, recorder, state, rng):
+    if rng.random() < 0.5:
+        await recorder.request(client, "POST /video-magic/script/generate", "POST", "/video-magic/script/generate",
+                               data={"prompt": f"A 24 second spot: {rng.choice(PROMPTS)}"})
+    else:
+        await recorder.request(client, "POST /video-magic/script/edit", "POST", "/video-magic/script/edit",
+                               data={"current_script": json.dumps(SCRIPT), "instructions": "Make the second scene brighter"})
+
+
+OPERATIONS = {
+    "list_projects": list_projects,
+    "project_summary": project_summary,
+    "browse_project": browse_project,
+    "search": search,
+    "generate_image": generate_image,
+    "edit_image": edit_image,
+    "generate_video": generate_video,
+    "script": script,
+}
+
+
+async def seed(client: httpx.AsyncClient, projects: int, assets: int, image: bytes) -> list:
+    """Projects with saved image assets, created through the API (uploads go to the emulator)."""
+    image_data = base64.b64encode(image).decode()
+    project_ids = []
+    for i in range(projects):
+        response = await client.post("/projects/", json={"name": f"Load test campaign {i}", "description": "Spring drop"})
+        response.raise_for_status()
+        project_id = response.json()["id"]
+        project_ids.append(project_id)
+        for start in range(0, assets, 50):
+            response = await client.post("/image-creation/save/batch", json={"items": [
+                {"image_data": image_data, "project_id": project_id, "prompt": f"{PROMPTS[n % len(PROMPTS)]} ({n})"}
+                for n in range(start, min(assets, start + 50))
+            ]})
+            response.raise_for_status()
+    return project_ids
+
+
+async def drive(target: str, mix: dict, users: int, duration: float, warmup: float, think_time: float,
+                projects: int, assets: int, seed_value: int) -> dict:
+    recorder = Recorder()
+    operations, weights = zip(*[(name, weight) for name, weight in mix.items() if weight > 0])
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=target, timeout=httpx.Timeout(900, connect=10), limits=limits) as client:
+        image = upload_image()
+        state = {"project_ids": await seed(client, projects, assets, image), "image": image}
+        loop = asyncio.get_running_loop()
+        measure_from = loop.time() + warmup
+        stop_at = measure_from + duration
+
+        async def user(index: int):
+            rng = random.Random(seed_value * 1000 + index)
+            # Staggered starts, so users don't arrive in lockstep
+            await asyncio.sleep(rng.uniform(0, max(think_time, 0.1)))
+            while loop.time() < stop_at:
+                await OPERATIONS[rng.choices(operations, weights)[0]](client, recorder, state, rng)
+                if think_time:
+                    await asyncio.sleep(rng.expovariate(1 / think_time))
+
+        async def window():
+            await asyncio.sleep(max(0.0, measure_from - loop.time()))
+            recorder.measuring = True
+            await asyncio.sleep(duration)
+            recorder.measuring = False
+
+        # Requests still running at the end of the window are neither waited for nor counted
+        users_done = asyncio.gather(*(user(i) for i in range(users)))
+        await window()
+        users_done.cancel()
+        try:
+            await users_done
+        except asyncio.CancelledError:
+            pass
+    return recorder.report(duration)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def launch(work_dir: str, profile: str, workers: int, database_url: str, verbose: bool):
+    """Starts the emulator and the backend. Returns (backend URL, emulator URL, processes)."""
+    emulator_url = f"http://127.0.0.1:{free_port()}"
+    backend_port = free_port()
+    credentials = os.path.join(work_dir, "emulator-key.json")
+    log = None if verbose else open(os.path.join(work_dir, "servers.log"), "w")
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    emulator = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.emulator", "--port", emulator_url.rsplit(":", 1)[1], "--profile", profile,
+        "--storage-dir", os.path.join(work_dir, "objects"), "--write-credentials", credentials,
+    ], cwd=repo_root, stdout=log, stderr=log)
+    processes = [emulator]
+    wait_until_up(f"{emulator_url}/emulator/stats", emulator)
+
+    env = {
+        **os.environ,
+        "MODEL_API_BASE_URL": emulator_url,
+        "STORAGE_API_ENDPOINT": emulator_url,
+        "STORAGE_BACKEND": "gcs",
+        "GOOGLE_APPLICATION_CREDENTIALS": credentials,
+        "GOOGLE_CLOUD_PROJECT": "emulator",
+        "GOOGLE_CLOUD_LOCATION": "us-central1",
+        "GOOGLE_GENAI_USE_VERTEXAI": "True",
+        "DATABASE_URL": database_url or f"sqlite:///{os.path.join(work_dir, 'load.db')}",
+    }
+    backend = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(backend_port),
+        "--workers", str(workers), "--log-level", "warning",
+    ], cwd=repo_root, env=env, stdout=log, stderr=log)
+    processes.append(backend)
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    wait_until_up(f"{backend_url}/projects/", backend)
+    return backend_url, emulator_url, processes
+
+
+def run(args, mix: dict) -> dict:
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="creative-studio-load-") as work_dir:
+        try:
+            target, emulator_url = args.target, args.emulator
+            if args.launch:
+                target, emulator_url, processes = launch(work_dir, args.profile, args.workers, args.database_url, args.verbose)
+            results = asyncio.run(drive(target, mix, args.users, args.duration, args.warmup, args.think_time,
+                                        args.projects, args.assets, args.seed))
+            report = {
+                "profile": args.profile if args.launch else None,
+                "users": args.users,
+                "duration_s": args.duration,
+                "workers": args.workers if args.launch else None,
+                "mix": mix,
+                "total_requests": sum(result["requests"] for result in results.values()),
+                "results": results,
+            }
+            if emulator_url:
+                report["emulator"] = httpx.get(f"{emulator_url}/emulator/stats").json()
+            # Lag and blocking stacks of whichever worker answers (each monitors its own loop);
+            # stacks are only included with the server's PROFILING_TOKEN
+            token = os.getenv("PROFILING_TOKEN")
+            loop_stats = httpx.get(f"{target}/metrics/event-loop", headers={"X-Profile-Token": token} if token else None)
+            if loop_stats.status_code == 200:
+                loop_stats = loop_stats.json()
+                report["event_loop"] = {"lag_ms": loop_stats["lag_ms"], "blocks": loop_stats["blocks"],
+                                        "shed_requests": loop_stats["shed_requests"],
+                                        "recent_blocks": loop_stats["recent_blocks"][-5:]}
+            return report
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+if __name__ == "__main__":
+    from benchmarks.fakes import PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--launch", action="store_true", help="Start the emulator and a backend for this run")
+    where.add_argument("--target", help="Base URL of a backend that is already running")
+    parser.add_argument("--emulator", help="With --target: the emulator's URL, to include its call counts")
+    parser.add_argument("--profile", default="production", choices=list(PROFILES), help="Emulator profile (--launch)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (--launch)")
+    parser.add_argument("--database-url", help="DATABASE_URL for the launched backend (default: a fresh SQLite file)")
+    parser.add_argument("--users", type=int, default=32, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=300, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=30, help="Seconds of load before measuring")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between a user's operations")
+    parser.add_argument("--mix", action="append", default=[], metavar="OPERATION=WEIGHT", help=f"Override a weight; operations: {', '.join(MIX)}")
+    parser.add_argument("--projects", type=int, default=10, help="Projects seeded before the run")
+    parser.add_argument("--assets", type=int, default=100, help="Image assets per seeded project")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this file (use it as a later --compare baseline)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change before a metric counts as regressed")
+    parser.add_argument("--verbose", action="store_true", help="Show the servers' output")
+    args = parser.parse_args()
+
+    mix = dict(MIX)
+    for override in args.mix:
+        operation, _, weight = override.partition("=")
+        if operation not in OPERATIONS:
+            parser.error(f"Unknown operation {operation}; choose from {', '.join(OPERATIONS)}")
+        mix[operation] = float(weight)
+
+    report = run(args, mix)
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance, settings=("profile", "users", "duration_s", "workers", "mix"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if args.compare and report["comparison"]["regressions"]:
+        sys.exit(1)
@@ -0,0 +1,147 @@
+"""
+Project payload benchmark: GET /projects/{id} for projects with 1k and 10k assets.
+
+Serialization of the loaded project is timed per encoder: FastAPI's generic path
+(jsonable_encoder + json.dumps), orjson over model_dump, and the precompiled pydantic model
+dumping straight to JSON bytes (what read_project does). Then the whole request is timed
+through CompressionMiddleware for identity, gzip and br clients, with the bytes on the wire
+and the time a client on a --mbps link would wait for the whole body.
+
+Usage:
+    python -m benchmarks.project_payload [--assets 1000 --assets 10000] [--repeat 5] [--mbps 50]
+
+URL signing is replaced by a local stand-in that returns signature-length URLs.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import datetime
+import tempfile
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload
+
+from backend import models, schemas, database
+from backend.compression import CompressionMiddleware
+from backend.services import storage, renditions, context_snapshots
+from backend.routers import projects
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONTEXTS = [f"Brand vibe: campaign {i}, moody neon-lit streets. Palette: teal and orange. " * 20 for i in range(5)]
+
+
+def fake_signed_url(blob_name: str) -> str:
+    # Same shape and length as a V4 signed URL: a 512 hex digit signature plus credential params
+    signature = os.urandom(256).hex()
+    return (f"https://storage.googleapis.com/creative-studio/{blob_name}?X-Goog-Algorithm=GOOG4-RSA-SHA256"
+            f"&X-Goog-Credential=studio%40project.iam.gserviceaccount.com%2F20250101%2Fauto%2Fstorage%2Fgoog4_request"
+            f"&X-Goog-Date=20250101T000000Z&X-Goog-Expires=3600&X-Goog-SignedHeaders=host&X-Goog-Signature={signature}")
+
+
+def seed(engine, num_assets: int) -> int:
+    now = datetime.datetime.utcnow()
+    with engine.begin() as connection:
+        project_id = connection.execute(models.Project.__table__.insert().values(name="Campaign", created_at=now)).inserted_primary_key[0]
+        connection.execute(models.Asset.__table__.insert(), [
+            {
+                "project_id": project_id, "type": "video" if i % 10 == 0 else "image",
+                "url": f"images/{i}.png", "model_type": "imagen-4.0", "context_version": f"v{i % 5}",
+                "prompt": f"Sneaker {i} on a rain-soaked street at night, neon reflections, low angle, 35mm",
+                "context_hash": context_snapshots.snapshot_hash(CONTEXTS[i % len(CONTEXTS)]),
+                "renditions": json.dumps({size: f"renditions/{i}/{size}.webp" for size in ("thumb_256", "thumb_512", "thumb_1024")}),
+                "created_at": now,
+            }
+            for i in range(num_assets)
+        ])
+    return project_id
+
+
+def best_ms(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 1)
+
+
+def serialization(project_id: int, repeat: int) -> dict:
+    db = database.SessionLocal()
+    try:
+        project = db.query(models.Project).options(joinedload(models.Project.assets)).filter(models.Project.id == project_id).one()
+        project.context_snapshots = context_snapshots.load_snapshots(db, (asset.context_hash for asset in project.assets))
+        model = schemas.Project.model_validate(project)
+        results = {
+            "validate_ms": best_ms(lambda: schemas.Project.model_validate(project), repeat),
+            "jsonable_encoder_json_dumps_ms": best_ms(lambda: json.dumps(jsonable_encoder(model)).encode(), repeat),
+            "pydantic_dump_json_ms": best_ms(model.model_dump_json, repeat),
+        }
+        if orjson is not None:
+            results["orjson_model_dump_ms"] = best_ms(lambda: orjson.dumps(model.model_dump()), repeat)
+        return results
+    finally:
+        db.close()
+
+
+async def requests(app: FastAPI, project_id: int, repeat: int, mbps: float) -> dict:
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for accept_encoding in ("identity", "gzip", "br"):
+            timings, wire_bytes = [], 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                async with client.stream("GET", f"/projects/{project_id}", headers={"accept-encoding": accept_encoding}) as response:
+                    body = b"".join([chunk async for chunk in response.aiter_raw()])
+                timings.append((time.perf_counter() - started) * 1000)
+                wire_bytes = len(body)
+            results[accept_encoding] = {
+                "encoding": response.headers.get("content-encoding", "identity"),
+                "bytes": wire_bytes,
+                "request_ms": round(min(timings), 1),
+                "with_transfer_ms": round(min(timings) + wire_bytes * 8 / (mbps * 1000), 1),
+            }
+    return results
+
+
+def run(asset_counts, repeat: int, mbps: float) -> dict:
+    storage.generate_signed_url = renditions.generate_signed_url = fake_signed_url
+    app = FastAPI()
+    app.include_router(projects.router)
+    app.add_middleware(CompressionMiddleware)
+
+    results = {"mbps": mbps}
+    with tempfile.TemporaryDirectory() as work_dir:
+        url = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+        engine = create_engine(url, **database.engine_options(url))
+        models.Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(models.ContextSnapshot.__table__.insert(), [
+                {"hash": context_snapshots.snapshot_hash(content), "content": content} for content in CONTEXTS
+            ])
+        database.SessionLocal.configure(bind=engine)
+        for num_assets in asset_counts:
+            project_id = seed(engine, num_assets)
+            results[num_assets] = {
+                "serialization": serialization(project_id, repeat),
+                "requests": asyncio.run(requests(app, project_id, repeat, mbps)),
+            }
+        engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, action="append", help="Assets per project; repeatable (default 1000 and 10000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mbps", type=float, default=50, help="Client link speed for with_transfer_ms")
+    args = parser.parse_args()
+    print(json.dumps(run(args.assets or [1000, 10000], args.repeat, args.mbps), indent=2))
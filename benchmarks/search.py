@@ -0,0 +1,136 @@
+"""
+Search benchmark: ranked FTS5 search vs. a LIKE scan (the pre-index way to find an asset by
+its prompt) over a synthetic library, plus the cost of keeping the index in sync on writes.
+
+Usage:
+    python -m benchmarks.search [--assets 100000] [--projects 500] [--repeat 20]
+"""
+import os
+import json
+import time
+import random
+import argparse
+import datetime
+import statistics
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.services import search as search_service
+
+SUBJECTS = ["sneaker", "handbag", "watch", "perfume bottle", "sofa", "espresso machine", "jacket", "sunglasses", "bicycle", "lamp"]
+MOODS = ["moody", "bright", "minimal", "vintage", "neon", "pastel", "cinematic", "playful", "luxurious", "rustic"]
+SETTINGS = ["on wet asphalt at night", "in a sunlit studio", "on a marble counter", "at the beach", "in a forest clearing",
+            "on a rooftop at dusk", "in a concrete loft", "against a seamless backdrop", "in the rain", "in a desert"]
+QUERIES = ["moody sneaker", "vintage watch desert", "neon jacket rain", "espresso", "luxurious perfume marble"]
+
+
+def synthetic_prompt(rng: random.Random) -> str:
+    return (
+        f"A {rng.choice(MOODS)} product shot of a {rng.choice(SUBJECTS)} {rng.choice(SETTINGS)}, "
+        f"{rng.choice(['35mm', '85mm', 'macro', 'wide-angle'])} lens, {rng.choice(['soft', 'hard', 'rim', 'natural'])} light"
+    )
+
+
+def populate(engine, num_assets: int, num_projects: int, seed: int = 7):
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO projects (id, name, description, created_at) VALUES (:id, :name, :description, :created_at)"), [
+            {"id": i, "name": f"Campaign {i} {rng.choice(SUBJECTS)}", "description": f"{rng.choice(MOODS)} campaign", "created_at": now}
+            for i in range(1, num_projects + 1)
+        ])
+        assets = [
+            {
+                "id": i,
+                "project_id": rng.randint(1, num_projects),
+                "type": rng.choice(["image", "image", "image", "video"]),
+                "url": f"generated_images/{i}.png",
+                "prompt": synthetic_prompt(rng),
+                "model_type": rng.choice(["gemini-2.5-flash-image", "imagen", "veo"]),
+                "context_version": f"v{rng.randint(1, 5)}",
+                "context_data": f"Brand palette {rng.choice(MOODS)}",
+                "created_at": now - datetime.timedelta(minutes=i),
+            }
+            for i in range(1, num_assets + 1)
+        ]
+        connection.execute(text(
+            "INSERT INTO assets (id, project_id, type, url, prompt, model_type, context_version, context_data, created_at) "
+            "VALUES (:id, :project_id, :type, :url, :prompt, :model_type, :context_version, :context_data, :created_at)"
+        ), assets)
+
+
+def timed(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {"p50_ms": round(statistics.median(timings), 2), "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2)}
+
+
+def like_scan(db, query: str, limit: int = 20, offset: int = 0):
+    terms = search_service.query_terms(query)
+    conditions = " AND ".join(f"LOWER(prompt) LIKE :t{i}" for i in range(len(terms)))
+    params = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
+    return db.execute(text(f"SELECT id FROM assets WHERE {conditions} ORDER BY id LIMIT {limit} OFFSET {offset}"), params).all()
+
+
+def run(num_assets: int, num_projects: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as work_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(work_dir, 'bench.db')}")
+        models.Base.metadata.create_all(engine)
+        populate(engine, num_assets, num_projects)
+
+        started = time.perf_counter()
+        search_service.ensure_search_index(engine)
+        build_seconds = time.perf_counter() - started
+
+        db = sessionmaker(bind=engine)()
+        results = {"assets": num_assets, "index_build_seconds": round(build_seconds, 2), "queries": {}}
+        for query in QUERIES:
+            matches = search_service.search(db, query, kinds=["asset"], limit=100000)["results"]
+            page = search_service.search(db, query, limit=20)
+            deep_cursor = page["next_cursor"]
+            for _ in range(49):
+                if deep_cursor is None:
+                    break
+                deep_cursor = search_service.search(db, query, limit=20, cursor=deep_cursor)["next_cursor"]
+            results["queries"][query] = {
+                "matches": len(matches),
+                "fts_first_page": timed(lambda: search_service.search(db, query, limit=20), repeat),
+                "fts_page_50": timed(lambda: search_service.search(db, query, limit=20, cursor=deep_cursor), repeat) if deep_cursor else None,
+                "fts_filtered": timed(lambda: search_service.search(db, query, type="video", model_type="veo", limit=20), repeat),
+                "like_first_page": timed(lambda: like_scan(db, query), repeat),
+                "like_page_50": timed(lambda: like_scan(db, query, offset=49 * 20), repeat),
+            }
+
+        # Write overhead of the sync triggers
+        rows = [{"project_id": 1, "type": "image", "url": f"x/{i}.png", "prompt": synthetic_prompt(random.Random(i))} for i in range(5000)]
+        insert = text("INSERT INTO assets (project_id, type, url, prompt) VALUES (:project_id, :type, :url, :prompt)")
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(insert, rows)
+        with_index = time.perf_counter() - started
+        with engine.begin() as connection:
+            connection.execute(text("DROP TRIGGER assets_fts_ai"))
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(insert, rows)
+        without_index = time.perf_counter() - started
+        results["insert_5000_ms"] = {"with_index": round(with_index * 1000, 1), "without_index": round(without_index * 1000, 1)}
+        db.close()
+        engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=100000)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.assets, args.projects, args.repeat), indent=2))
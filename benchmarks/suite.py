@@ -0,0 +1,310 @@
+"""
+Offline benchmark suite: drives each router of the app (backend.main, with its middleware)
+in-process over httpx, with the model client and Cloud Storage replaced by the fakes in
+benchmarks/fakes.py. Every scenario runs in a fresh process against its own SQLite file and
+storage folder, and records latency percentiles, throughput and peak RSS.
+
+Usage:
+    python -m benchmarks.suite [--profile fast] [--requests 200] [--concurrency 16] [--output results.json]
+    python -m benchmarks.suite --scenario context --scenario projects
+    python -m benchmarks.suite --compare baseline.json [--tolerance 0.2]
+
+Profiles: instant, fast, slow_tail, flaky, large_payloads (see benchmarks/fakes.py).
+--compare runs the suite and exits with status 1 if any scenario's p50/p95/p99 latency or
+peak RSS grew, or its throughput fell, by more than --tolerance against the baseline (the
+JSON written by an earlier --output). Renditions are background work and not measured here
+(see benchmarks/gallery_payload.py).
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import base64
+import shutil
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT = {
+    "global_elements": {"character": "A courier in a yellow raincoat", "visual_style": "Neon noir", "color_palette": "Teal and orange"},
+    "scenes": [
+        {"visual": "Wide shot of a rain-soaked street at night", "audio": "Rain, distant traffic"},
+        {"visual": "Close-up of sneakers splashing through a puddle", "audio": "Footsteps"},
+        {"visual": "The courier looks up at a flickering sign", "audio": "Electric hum"},
+    ],
+}
+
+# Metrics compared in --compare mode, and whether higher is worse
+COMPARED_METRICS = {"p50_ms": True, "p95_ms": True, "p99_ms": True, "peak_rss_mb": True, "throughput_rps": False}
+# Latency changes smaller than this are noise, whatever the ratio
+MIN_LATENCY_DELTA_MS = 1.0
+
+
+def upload_image() -> bytes:
+    """A small photo-sized PNG for person/garment/reference uploads."""
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (512, 512), (40, 60, 90))
+    ImageDraw.Draw(image).ellipse((128, 96, 384, 480), fill=(220, 140, 60))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def seed_project(client, assets: int = 0) -> int:
+    project_id = (await client.post("/projects/", json={"name": "Benchmark campaign"})).json()["id"]
+    if assets:
+        from backend import models
+        from backend.database import SessionLocal
+        with SessionLocal() as db:
+            db.add_all([
+                models.Asset(project_id=project_id, type="image", url=f"images/{i}.png", prompt=f"Sneaker {i} on a neon street",
+                             context_data="Brand vibe: moody, neon-lit streets. Palette: teal and orange.")
+                for i in range(assets)
+            ])
+            db.commit()
+    return project_id
+
+
+# Each scenario: async setup(client) -> state, and request(client, i, state) -> response
+
+async def setup_projects(client):
+    return {"project_id": await seed_project(client, assets=200)}
+
+
+async def request_projects(client, i, state):
+    if i % 4 == 0:
+        return await client.post("/projects/", json={"name": f"Campaign {i}", "description": "Spring drop"})
+    if i % 4 == 1:
+        return await client.get("/projects/")
+    if i % 4 == 2:
+        return await client.get("/projects/summary")
+    return await client.get(f"/projects/{state['project_id']}")
+
+
+async def setup_context(client):
+    return {"project_id": await seed_project(client)}
+
+
+async def request_context(client, i, state):
+    if i % 4 == 0:
+        return await client.post("/context/generate", json={"goal": f"Launch campaign {i} for a running shoe"})
+    if i % 4 == 1:
+        return await client.post("/context/enhance-field", json={"field_name": "brand_vibe", "current_value": f"Moody and urban {i}"})
+    if i % 4 == 2:
+        return await client.post("/context/versions", json={"project_id": state["project_id"], "name": f"v{i}", "context": "Neon noir"})
+    return await client.get(f"/context/versions/{state['project_id']}")
+
+
+async def setup_image_creation(client):
+    return {"project_id": await seed_project(client), "image_data": base64.b64encode(upload_image()).decode()}
+
+
+async def request_image_creation(client, i, state):
+    if i % 3 == 0:
+        return await client.post("/image-creation/generate", data={"prompt": f"Sneaker {i} on a rain-soaked street"})
+    if i % 3 == 1:
+        return await client.post("/image-creation/save", json={
+            "image_data": state["image_data"], "project_id": state["project_id"], "prompt": f"Sneaker {i}",
+        })
+    return await client.post("/image-creation/optimize", json={"prompt": f"sneaker {i} street night"})
+
+
+async def setup_video_creation(client):
+    return {"project_id": await seed_project(client)}
+
+
+async def request_video_creation(client, i, state):
+    if i % 2 == 0:
+        return await client.post("/video-creation/generate", data={"prompt": f"Slow dolly past sneaker {i}"})
+    return await client.post("/video-creation/save", data={
+        "project_id": state["project_id"], "blob_name": f"generated_videos/{i}.mp4", "prompt": f"Slow dolly past sneaker {i}",
+    })
+
+
+async def setup_video_magic(client):
+    return {"image": upload_image()}
+
+
+async def request_video_magic(client, i, state):
+    if i % 5 == 0:
+        return await client.post("/video-magic/script/generate", data={"prompt": f"A 24 second spot for sneaker {i}"})
+    if i % 5 == 1:
+        return await client.post("/video-magic/scripts", json={"prompt": f"A 24 second spot for sneaker {i}"})
+    if i % 5 == 2:
+        return await client.post("/video-magic/script/edit", data={"current_script": json.dumps(SCRIPT), "instructions": f"Make scene {i % 3 + 1} brighter"})
+    if i % 5 == 3:
+        return await client.post("/video-magic/optimize-prompt", files={"image": ("frame.png", state["image"], "image/png")}, data={"instructions": "Slow push in"})
+    # Server-sent events: the response only completes once every scene has rendered
+    script = {**SCRIPT, "scenes": [{**scene, "visual": f"{scene['visual']} ({i})"} for scene in SCRIPT["scenes"]]}
+    return await client.post("/video-magic/storyboard", json={"script": script, "mode": "keyframe"})
+
+
+async def setup_virtual_try_on(client):
+    return {"project_id": await seed_project(client), "image": upload_image()}
+
+
+async def request_virtual_try_on(client, i, state):
+    return await client.post("/virtual-try-on/", data={"project_id": state["project_id"]}, files=[
+        ("person_image", ("person.png", state["image"], "image/png")),
+        ("clothing_images", ("jacket.png", state["image"], "image/png")),
+    ])
+
+
+SCENARIOS = {
+    "projects": (setup_projects, request_projects),
+    "context": (setup_context, request_context),
+    "image-creation": (setup_image_creation, request_image_creation),
+    "video-creation": (setup_video_creation, request_video_creation),
+    "video-magic": (setup_video_magic, request_video_magic),
+    "virtual-try-on": (setup_virtual_try_on, request_virtual_try_on),
+}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values, q: float) -> float:
+    return round(sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)], 2)
+
+
+async def drive(app, scenario: str, total: int, concurrency: int) -> dict:
+    import httpx
+    setup, request = SCENARIOS[scenario]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        state = await setup(client)
+        setup_rss_mb = peak_rss_mb()
+        latencies, statuses = [], {}
+        next_index = iter(range(total))
+
+        async def worker():
+            for i in next_index:
+                started = time.perf_counter()
+                response = await request(client, i, state)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "setup_rss_mb": setup_rss_mb,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_scenario(scenario: str, profile_name: str, total: int, concurrency: int, seed: int, verbose: bool = False) -> dict:
+    """Runs in its own process: the app, database and fakes are set up from scratch."""
+    work_dir = tempfile.mkdtemp(prefix="creative-studio-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'bench.db')}",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(work_dir, "storage"),
+        "GOOGLE_GENAI_USE_VERTEXAI": "False", # Gemini API paths: generated videos arrive by URI
+    })
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark")
+
+    # The app's DEBUG output would interleave with the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        try:
+            from benchmarks import fakes
+            model = fakes.install(fakes.PROFILES[profile_name], os.environ["LOCAL_STORAGE_DIR"], seed)
+
+            from backend.main import app
+            from backend.services import renditions
+            scheduled = renditions.schedule_renditions
+            for name, module in list(sys.modules.items()):
+                if name.startswith("backend") and getattr(module, "schedule_renditions", None) is scheduled:
+                    module.schedule_renditions = lambda asset_id: None
+
+            result = asyncio.run(drive(app, scenario, total, concurrency))
+            result["model_calls"] = dict(model.calls)
+            result["model_failures"] = dict(model.failures)
+            return result
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run(scenarios, profile: str, total: int, concurrency: int, seed: int, verbose: bool = False) -> dict:
+    results = {}
+    for scenario in scenarios:
+        # A fresh interpreter per scenario, so peak RSS and caches belong to that scenario alone
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[scenario] = executor.submit(run_scenario, scenario, profile, total, concurrency, seed, verbose).result()
+    return {"profile": profile, "requests": total, "concurrency": concurrency, "seed": seed, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float, settings=("profile", "requests", "concurrency")) -> dict:
+    """
+    Per scenario and metric: baseline, current, relative change and whether it regressed.
+    Differences in the run settings are listed as notes.
+    """
+    comparison, regressions = {}, []
+    for scenario, result in current["results"].items():
+        before = baseline.get("results", {}).get(scenario)
+        if before is None:
+            continue
+        comparison[scenario] = {}
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            if metric not in before or metric not in result:
+                continue
+            old, new = before[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            if metric.endswith("_ms") and abs(new - old) < MIN_LATENCY_DELTA_MS:
+                worse = False
+            comparison[scenario][metric] = {"baseline": old, "current": new, "change": round(change, 3), "regressed": worse}
+            if worse:
+                regressions.append(f"{scenario}.{metric}")
+        if result["errors"] > before.get("errors", 0):
+            regressions.append(f"{scenario}.errors")
+    notes = []
+    for key in settings:
+        if baseline.get(key) != current.get(key):
+            notes.append(f"Baseline {key} was {baseline.get(key)}, this run used {current.get(key)}")
+    return {"tolerance": tolerance, "scenarios": comparison, "regressions": regressions, "notes": notes}
+
+
+if __name__ == "__main__":
+    from benchmarks.fakes import PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run; repeatable (default: all)")
+    parser.add_argument("--profile", default="fast", choices=list(PROFILES))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this file (use it as a later --compare baseline)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change before a metric counts as regressed")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own output")
+    args = parser.parse_args()
+
+    report = run(args.scenario or list(SCENARIOS), args.profile, args.requests, args.concurrency, args.seed, args.verbose)
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if args.compare and report["comparison"]["regressions"]:
+        sys.exit(1)
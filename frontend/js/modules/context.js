@@ -4,6 +4,12 @@ import { showAlert } from '../utils.js';
 
 export let activeContextVersionName = null;
 let currentVersionId = null;
+
+// Id of the version loaded in the editor; the server only uses it (for model-side context
+// caching) when the applied context is exactly that version's text
+export function activeContextVersionId() {
+    return currentVersionId;
+}
 let isEditingMetadata = false;
 let currentEnhanceTargetId = null;
 
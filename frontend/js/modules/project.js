@@ -1,10 +1,12 @@
 
-import { showAlert, setLoading } from '../utils.js';
+import { showAlert, setLoading, idempotencyKey, settleIdempotencyKey } from '../utils.js';
 import { activateSection } from '../navigation.js';
 
 export let currentProjectId = null;
 export let projects = [];
 export let currentProjectAssets = [];
+// Asset context texts by hash; assets carry context_hash
+let currentContextSnapshots = {};
 
 // UI Elements (Lazy loaded or selected on demand to avoid nulls if module loads before DOM)
 const getSidebarElements = () => ({
@@ -490,10 +492,14 @@ export async function saveVideoToProject(blobName, videoUrl, prompt, modelType,
         if (contextData) formData.append('context_data', contextData);
         if (contextVersion) formData.append('context_version', contextVersion);
 
+        const action = JSON.stringify(['video-save', currentProjectId, blobName, prompt, modelType, contextData || '', contextVersion || '']);
+        const key = idempotencyKey(action);
         const response = await fetch('/video-creation/save', {
             method: 'POST',
+            headers: key ? { 'Idempotency-Key': key } : {},
             body: formData
         });
+        settleIdempotencyKey(action);
 
         if (response.ok) {
             showAlert('Video saved to project successfully!');
@@ -631,11 +637,17 @@ export async function saveImageToProject(imageSrc, btnElement = null) {
             return;
         }
 
+        const body = JSON.stringify(payload);
+        const action = 'image-save\n' + body;
+        const key = idempotencyKey(action);
+        const headers = { 'Content-Type': 'application/json' };
+        if (key) headers['Idempotency-Key'] = key;
         const response = await fetch('/image-creation/save', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
+            headers,
+            body
         });
+        settleIdempotencyKey(action);
 
         if (response.ok) {
             showAlert('Image saved to project successfully!');
@@ -702,6 +714,7 @@ async function loadProjectAssets(projectId) {
         if (!response.ok) throw new Error('Failed to fetch project');
 
         const project = await response.json();
+        currentContextSnapshots = project.context_snapshots || {};
 
         if (!project.assets || project.assets.length === 0) {
             Object.values(containers).forEach(el => {
@@ -730,13 +743,18 @@ async function loadProjectAssets(projectId) {
 
             // Asset Content (Image or Video)
             let mediaContent = '';
+            // Prefer lightweight renditions for grid tiles; the lightbox still uses the original
+            const renditions = asset.renditions || {};
             if (asset.type === 'video') {
+                const previewSrc = renditions.preview || getImageUrl(asset.url);
+                const poster = renditions.poster ? ` poster="${renditions.poster}" preload="none"` : '';
                 mediaContent = `
-                    <video src="${getImageUrl(asset.url)}"></video>
+                    <video src="${previewSrc}"${poster}></video>
                     <div class="play-icon"><i class="fa-solid fa-play"></i></div>
                 `;
             } else {
-                mediaContent = `<img src="${getImageUrl(asset.url)}" alt="Asset ${asset.id}">`;
+                const thumbSrc = renditions.thumb_512 || renditions.thumb_256 || getImageUrl(asset.url);
+                mediaContent = `<img src="${thumbSrc}" loading="lazy" alt="Asset ${asset.id}">`;
             }
 
             // Action Buttons
@@ -886,7 +904,7 @@ window.openAssetDetails = (assetId) => {
     document.getElementById('asset-details-prompt').textContent = asset.prompt || 'No prompt saved.';
     document.getElementById('asset-details-model').textContent = asset.model_type || '-';
     document.getElementById('asset-details-version').textContent = asset.context_version || '-';
-    document.getElementById('asset-details-context').textContent = asset.context_data || 'No context data saved.';
+    document.getElementById('asset-details-context').textContent = asset.context_data || currentContextSnapshots[asset.context_hash] || 'No context data saved.';
 
     modal.hidden = false;
 };
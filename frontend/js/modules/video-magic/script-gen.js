@@ -1,8 +1,9 @@
 
-import { setupContextAccordion } from '../context.js';
+import { setupContextAccordion, activeContextVersionId } from '../context.js';
 import { showAlert, setLoading } from '../../utils.js';
 
 let currentScriptData = null;
+let currentScriptId = null; // Scripts are stored server-side; edits send only the instructions
 
 export function initScriptGen() {
     setupContextAccordion('btn-context-accordion-vm-script', 'context-content-vm-script', 'context-checkboxes-vm-script', 'btn-apply-context-vm-script', 'vm-script-context', 'vm-script-context-checkbox', 'btn-clear-context-vm-script');
@@ -43,6 +44,7 @@ export function initScriptGen() {
                 </div>`;
             if (btnEditScript) btnEditScript.hidden = true;
             currentScriptData = null;
+            currentScriptId = null;
         });
     }
 
@@ -62,18 +64,20 @@ export function initScriptGen() {
             `;
 
             try {
-                const formData = new FormData();
-                formData.append('prompt', vmScriptPrompt.value);
-                if (vmScriptContext.value) formData.append('context', vmScriptContext.value);
-
-                const response = await fetch('/video-magic/script/generate', {
+                const response = await fetch('/video-magic/scripts', {
                     method: 'POST',
-                    body: formData
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        prompt: vmScriptPrompt.value,
+                        context: vmScriptContext.value || null,
+                        context_version_id: activeContextVersionId()
+                    })
                 });
 
                 if (response.ok) {
                     const data = await response.json();
                     currentScriptData = data.script;
+                    currentScriptId = data.script_id;
                     renderScript(data.script);
                     if (btnEditScript) btnEditScript.hidden = false;
                 } else {
@@ -111,14 +115,10 @@ export function initScriptGen() {
 
                     setLoading(newBtn, true);
                     try {
-                        const formData = new FormData();
-                        // Backend expects 'current_script' as a JSON string
-                        formData.append('current_script', JSON.stringify(currentScriptData));
-                        formData.append('instructions', instructions.value);
-
-                        const response = await fetch('/video-magic/script/edit', {
+                        const response = await fetch(`/video-magic/scripts/${currentScriptId}/edit`, {
                             method: 'POST',
-                            body: formData
+                            headers: { 'Content-Type': 'application/json' },
+                            body: JSON.stringify({ instructions: instructions.value })
                         });
 
                         if (response.ok) {
@@ -92,6 +92,22 @@ export function downloadImage(dataUrl, filename) {
     link.click();
     document.body.removeChild(link);
 }
+// Idempotency-Key for a user action: a fresh random key per save, reused only when the same
+// save is repeated (double clicks, retries after a network error) before the server has
+// answered it. Null where randomUUID is unavailable (insecure contexts).
+const pendingIdempotencyKeys = new Map();
+
+export function idempotencyKey(action) {
+    if (!window.crypto || !window.crypto.randomUUID) return null;
+    if (!pendingIdempotencyKeys.has(action)) pendingIdempotencyKeys.set(action, window.crypto.randomUUID());
+    return pendingIdempotencyKeys.get(action);
+}
+
+// The server answered the action: the next save is a new action with a new key
+export function settleIdempotencyKey(action) {
+    pendingIdempotencyKeys.delete(action);
+}
+
 // Expose for inline handlers
 window.downloadImage = downloadImage;
 window.switchTab = switchTab;
@@ -1,18 +1,33 @@
-import sqlite3
-import os
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
 
-DB_FILE = "app.db"
+from backend import models
+from backend.database import engine
+from backend.services.context_snapshots import ensure_context_hash_column
+
+def add_missing_columns(table, columns):
+    print(f"Checking {table} table...")
+    existing_columns = [column["name"] for column in inspect(engine).get_columns(table)]
+
+    for col_name, col_type in columns:
+        if col_name not in existing_columns:
+            print(f"Adding column to {table}: {col_name}")
+            try:
+                with engine.begin() as connection:
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}"))
+            except SQLAlchemyError as e:
+                print(f"Error adding column {col_name}: {e}")
+        else:
+            print(f"Column {col_name} already exists in {table}.")
 
 def migrate():
-    if not os.path.exists(DB_FILE):
-        print(f"Database file {DB_FILE} not found.")
-        return
+    print(f"Migrating {engine.url.render_as_string(hide_password=True)}")
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    # New tables (and everything on a fresh database)
+    models.Base.metadata.create_all(bind=engine)
 
     # Projects Table Migration
-    project_columns = [
+    add_missing_columns("projects", [
         ("brand_vibe", "VARCHAR"),
         ("brand_lighting", "VARCHAR"),
         ("brand_colors", "VARCHAR"),
@@ -21,44 +36,16 @@ def migrate():
         ("project_lighting", "VARCHAR"),
         ("project_colors", "VARCHAR"),
         ("project_subject", "VARCHAR")
-    ]
-
-    print("Checking projects table...")
-    cursor.execute("PRAGMA table_info(projects)")
-    existing_project_columns = [row[1] for row in cursor.fetchall()]
-
-    for col_name, col_type in project_columns:
-        if col_name not in existing_project_columns:
-            print(f"Adding column to projects: {col_name}")
-            try:
-                cursor.execute(f"ALTER TABLE projects ADD COLUMN {col_name} {col_type}")
-            except sqlite3.OperationalError as e:
-                print(f"Error adding column {col_name}: {e}")
-        else:
-            print(f"Column {col_name} already exists in projects.")
+    ])
 
     # Assets Table Migration
-    asset_columns = [
+    add_missing_columns("assets", [
         ("model_type", "VARCHAR"),
-        ("context_version", "VARCHAR")
-    ]
-
-    print("Checking assets table...")
-    cursor.execute("PRAGMA table_info(assets)")
-    existing_asset_columns = [row[1] for row in cursor.fetchall()]
-
-    for col_name, col_type in asset_columns:
-        if col_name not in existing_asset_columns:
-            print(f"Adding column to assets: {col_name}")
-            try:
-                cursor.execute(f"ALTER TABLE assets ADD COLUMN {col_name} {col_type}")
-            except sqlite3.OperationalError as e:
-                print(f"Error adding column {col_name}: {e}")
-        else:
-            print(f"Column {col_name} already exists in assets.")
+        ("context_version", "VARCHAR"),
+        ("renditions", "TEXT")
+    ])
+    ensure_context_hash_column(engine)
 
-    conn.commit()
-    conn.close()
     print("Migration complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+# Run the backend against the local storage stand-in; never touch real GCS from tests
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="creative-studio-storage-"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine, text
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """
+    Database for tests that need one: a SQLite file per test by default. Set TEST_DATABASE_URL
+    (e.g. a local PostgreSQL) to run the same tests against a server database; its schema is
+    reset for every test.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        return f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def db_engine(database_url):
+    from backend import models
+    from backend.database import engine_options
+
+    engine = create_engine(database_url, **engine_options(database_url))
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import database
+from backend.routers import context, projects, video_creation
+
+
+@pytest.fixture
+def app(monkeypatch, database_url, db_engine):
+    # Sync (def) and async endpoints share one database, as in the app
+    bind, async_bind = database.SessionLocal.kw["bind"], database.AsyncSessionLocal.kw["bind"]
+    database.SessionLocal.configure(bind=db_engine)
+    database.AsyncSessionLocal.configure(bind=create_async_engine(database.async_database_url(database_url), poolclass=NullPool))
+    monkeypatch.setattr(video_creation, "schedule_renditions", lambda asset_id: None)
+
+    app = FastAPI()
+    app.include_router(projects.router)
+    app.include_router(context.router)
+    app.include_router(video_creation.router)
+    yield app
+    database.SessionLocal.configure(bind=bind)
+    database.AsyncSessionLocal.configure(bind=async_bind)
+
+
+def test_concurrent_reads_and_writes(app):
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            project_id = (await client.post("/projects/", json={"name": "Campaign"})).json()["id"]
+            versions = [client.post("/context/versions", json={"project_id": project_id, "name": f"v{i}"}) for i in range(15)]
+            saves = [
+                client.post("/video-creation/save", data={"project_id": project_id, "blob_name": f"clips/{i}.mp4", "prompt": "Spin"})
+                for i in range(15)
+            ]
+            reads = [client.get(f"/context/versions/{project_id}") for _ in range(15)]
+            summaries = [client.get("/projects/summary") for _ in range(5)]
+            responses = await asyncio.gather(*versions, *saves, *reads, *summaries)
+            final = await client.get(f"/context/versions/{project_id}")
+            project = await client.get(f"/projects/{project_id}")
+            summary = await client.get("/projects/summary")
+            return responses, final.json(), project.json(), summary.json()
+
+    responses, final_versions, project, summary = asyncio.run(scenario())
+
+    assert [response.status_code for response in responses] == [200] * len(responses), [r.text for r in responses if r.status_code != 200][:2]
+    assert sorted(version["name"] for version in final_versions) == sorted(f"v{i}" for i in range(15))
+    assert sorted(asset["url"].rsplit("/", 1)[-1] for asset in project["assets"]) == sorted(f"{i}.mp4" for i in range(15))
+    # Summary counters are maintained by a flush hook, which runs for async sessions too
+    assert summary[0]["asset_count"] == summary[0]["video_count"] == 15
@@ -0,0 +1,95 @@
+import json
+import base64
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import database, models
+from backend.config import config
+from backend.routers import assets, image_creation
+from backend.services import renditions
+from backend.services.storage import download_bytes
+from backend.upload_limits import UploadLimitMiddleware
+
+
+def blob_exists(blob_name: str) -> bool:
+    try:
+        download_bytes(blob_name)
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def client(monkeypatch, database_url, db_engine):
+    bind, async_bind = database.SessionLocal.kw["bind"], database.AsyncSessionLocal.kw["bind"]
+    database.SessionLocal.configure(bind=db_engine)
+    database.AsyncSessionLocal.configure(bind=create_async_engine(database.async_database_url(database_url), poolclass=NullPool))
+    monkeypatch.setattr(renditions, "schedule_renditions", lambda asset_id: None)
+
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware)
+    app.include_router(assets.router)
+    app.include_router(image_creation.router)
+    yield TestClient(app)
+    database.SessionLocal.configure(bind=bind)
+    database.AsyncSessionLocal.configure(bind=async_bind)
+
+
+@pytest.fixture
+def project_assets():
+    with database.SessionLocal() as db:
+        project = models.Project(name="Sneakers")
+        db.add(project)
+        db.commit()
+        db.add_all([
+            models.Asset(project_id=project.id, type="image", url="shots/a_1.png",
+                         renditions=json.dumps({"thumb_256": "shots/a_1.thumb_256.webp"})),
+            models.Asset(project_id=project.id, type="image", url="shots/b.png"),
+        ])
+        db.commit()
+        return project.id, [asset.id for asset in db.query(models.Asset).order_by(models.Asset.id)]
+
+
+def test_sign_only_asset_blobs(client, project_assets):
+    names = [
+        "shots/a_1.png", "shots/a_1.thumb_256.webp", "shots/b.png",
+        "profiles/abc.speedscope.json", "shots/b.thumb_256.webp", "shots/aX1.thumb_256.webp",
+    ]
+    results = client.post("/assets/batch/sign", json={"blob_names": names}).json()["results"]
+    assert [result["status"] for result in results] == ["signed"] * 3 + ["not_found"] * 3
+    assert all(result["url"] for result in results[:3])
+    assert all(result["url"] is None for result in results[3:])
+
+
+def test_batch_limits(client, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_ITEMS", 2)
+    assert client.post("/assets/batch/sign", json={"blob_names": ["a", "b", "c"]}).status_code == 400
+    assert client.post("/assets/batch/delete", json={"asset_ids": []}).status_code == 400
+    # A full save batch of ~2.5 MB images must fit the route's body limit
+    assert config.BATCH_SAVE_MAX_ITEMS * 5 * 1024 * 1024 // 2 <= config.UPLOAD_LIMIT_IMAGE_BYTES
+    monkeypatch.setattr(config, "BATCH_SAVE_MAX_ITEMS", 1)
+    item = {"project_id": 1, "image_data": base64.b64encode(b"png").decode()}
+    assert client.post("/image-creation/save/batch", json={"items": [item, item]}).status_code == 400
+
+
+def test_batch_save_then_delete(client, project_assets):
+    project_id, existing = project_assets
+    items = [{"project_id": project_id, "image_data": base64.b64encode(f"png {i}".encode()).decode(), "prompt": f"Shot {i}"} for i in range(3)]
+    items.append({"project_id": project_id})
+    results = client.post("/image-creation/save/batch", json={"items": items}).json()["results"]
+    assert [result["status"] for result in results] == ["saved"] * 3 + ["error"]
+    saved = [result["asset_id"] for result in results[:3]]
+
+    with database.SessionLocal() as db:
+        blobs = [db.get(models.Asset, asset_id).url for asset_id in saved]
+    assert all(blob_exists(blob) for blob in blobs)
+
+    results = client.post("/assets/batch/delete", json={"asset_ids": saved + [9999]}).json()["results"]
+    assert [result["status"] for result in results] == ["deleted"] * 3 + ["not_found"]
+    assert not any(blob_exists(blob) for blob in blobs)
+    with database.SessionLocal() as db:
+        assert sorted(asset.id for asset in db.query(models.Asset)) == existing
@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+
+import pytest
+
+from backend import database, models
+from backend.config import config
+from backend.services import batch_jobs, renditions
+
+
+@pytest.fixture
+def generated(monkeypatch, db_engine):
+    """Prompts sent to the (fake) image model, in call order."""
+    bind = database.SessionLocal.kw["bind"]
+    database.SessionLocal.configure(bind=db_engine)
+    monkeypatch.setattr(renditions, "schedule_renditions", lambda asset_id: None)
+    monkeypatch.setattr(batch_jobs, "_retry_delay", lambda attempts: 0)
+    prompts = []
+
+    def generate(contents, model_name):
+        prompts.append(contents[0])
+        if contents[0].startswith("bad"):
+            raise RuntimeError("model error")
+        return b"png"
+
+    monkeypatch.setattr(batch_jobs, "generate_image_bytes", generate)
+    yield prompts
+    database.SessionLocal.configure(bind=bind)
+
+
+def make_job(statuses, prompts=None, **job_fields):
+    """A job with one item per status; done items already have their asset."""
+    with database.SessionLocal() as db:
+        project = models.Project(name="Sneakers")
+        db.add(project)
+        db.commit()
+        job = models.BatchJob(
+            project_id=project.id, model_name=config.MODEL_IMAGE_FAST, references="{}", concurrency=1,
+            total=len(statuses), completed=statuses.count("done"), **job_fields,
+        )
+        db.add(job)
+        db.flush()
+        for position, status in enumerate(statuses):
+            prompt = prompts[position] if prompts else f"{status} {position}"
+            asset_id = None
+            if status == "done":
+                asset = models.Asset(project_id=project.id, type="image", url=f"{position}.png", prompt=prompt)
+                db.add(asset)
+                db.flush()
+                asset_id = asset.id
+            db.add(models.BatchJobItem(job_id=job.id, position=position, prompt=prompt, status=status, asset_id=asset_id))
+        db.commit()
+        return job.id
+
+
+def job_state(job_id):
+    with database.SessionLocal() as db:
+        job = db.get(models.BatchJob, job_id)
+        items = db.query(models.BatchJobItem).filter(models.BatchJobItem.job_id == job_id).order_by(models.BatchJobItem.position)
+        return job, [(item.status, item.attempts) for item in items]
+
+
+def expired_lease():
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+
+
+def test_resume_continues_from_the_checkpoint(generated):
+    # Left behind by a process that died mid-item
+    job_id = make_job(["done", "running", "pending", "done", "pending"],
+                      status="running", worker_id="dead", lease_expires_at=expired_lease())
+    assert job_id in batch_jobs._claimable_job_ids()
+
+    asyncio.run(batch_jobs.run_job(job_id))
+    assert generated == ["running 1", "pending 2", "pending 4"]
+    job, items = job_state(job_id)
+    assert (job.status, job.completed, job.failed) == ("completed", 5, 0)
+    assert [status for status, _ in items] == ["done"] * 5
+    assert job.worker_id is None and job.lease_expires_at is None
+
+
+def test_a_live_lease_is_not_taken_over(generated):
+    job_id = make_job(["pending", "pending"], status="running", worker_id="other",
+                      lease_expires_at=datetime.datetime.utcnow() + datetime.timedelta(minutes=1))
+    assert job_id not in batch_jobs._claimable_job_ids()
+    asyncio.run(batch_jobs.run_job(job_id))
+    assert generated == []
+    job, _ = job_state(job_id)
+    assert (job.status, job.worker_id) == ("running", "other")
+
+    # Of two instances racing for an unheld job, exactly one claims it
+    job_id = make_job(["pending"], status="pending")
+    assert batch_jobs._claim_job(job_id, worker_id="first") is not None
+    assert batch_jobs._claim_job(job_id, worker_id="second") is None
+
+
+def test_cancel_stops_pending_items(generated, monkeypatch):
+    job_id = make_job(["pending"] * 4, status="pending")
+    generate = batch_jobs.generate_image_bytes
+
+    def generate_then_cancel(contents, model_name):
+        with database.SessionLocal() as db:
+            db.get(models.BatchJob, job_id).status = "cancelled"
+            db.commit()
+        return generate(contents, model_name)
+
+    monkeypatch.setattr(batch_jobs, "generate_image_bytes", generate_then_cancel)
+    asyncio.run(batch_jobs.run_job(job_id))
+    assert generated == ["pending 0"]
+    job, items = job_state(job_id)
+    # The item already generating still lands; the rest wait for a resume
+    assert (job.status, job.completed) == ("cancelled", 1)
+    assert [status for status, _ in items] == ["done", "pending", "pending", "pending"]
+    assert job.worker_id is None
+
+
+def test_failing_item_stops_at_the_attempt_limit(generated):
+    job_id = make_job(["pending"] * 3, prompts=["good", "bad", "good"], status="pending")
+    asyncio.run(batch_jobs.run_job(job_id))
+    assert generated.count("bad") == config.BATCH_JOB_MAX_ATTEMPTS
+    job, items = job_state(job_id)
+    assert (job.status, job.completed, job.failed) == ("completed", 2, 1)
+    assert items == [("done", 1), ("failed", config.BATCH_JOB_MAX_ATTEMPTS), ("done", 1)]
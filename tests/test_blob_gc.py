@@ -0,0 +1,105 @@
+import os
+import json
+import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.services.storage import storage_client, BUCKET_NAME, upload_bytes
+from backend.services.blob_gc import collect_orphans
+
+
+@pytest.fixture
+def db(db_engine):
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    # Fresh bucket per test inside the local storage stand-in
+    bucket = storage_client.bucket(f"{BUCKET_NAME}-{tmp_path.name}")
+    return bucket
+
+
+def put(bucket, name, size=10, age_hours=48):
+    blob = bucket.blob(name)
+    blob.upload_from_string(b"x" * size)
+    mtime = (datetime.datetime.now() - datetime.timedelta(hours=age_hours)).timestamp()
+    os.utime(blob.path, (mtime, mtime))
+
+
+def names(bucket):
+    return sorted(b.name for b in bucket.list_blobs())
+
+
+def test_deletes_only_old_unreferenced_blobs(db, bucket, tmp_path):
+    project = models.Project(name="p")
+    db.add(project)
+    db.commit()
+    db.add(models.Asset(project_id=project.id, type="image", url="kept.png",
+                        renditions=json.dumps({"thumb_256": "kept.thumb_256.webp"})))
+    db.commit()
+
+    put(bucket, "kept.png")
+    put(bucket, "kept.thumb_256.webp")
+    put(bucket, "unsaved.png", size=100)
+    put(bucket, "temp_inputs/a_first.png", size=50)
+    put(bucket, "generated_videos/x.mp4/123/sample_0.mp4", size=1000)
+    put(bucket, "fresh.png", age_hours=1)
+
+    report = collect_orphans(db, work_dir=str(tmp_path / "gc"), grace_hours=24, batch_size=2, bucket=bucket)
+
+    assert names(bucket) == ["fresh.png", "kept.png", "kept.thumb_256.webp"]
+    assert report["deleted"] == 3
+    assert report["bytes_reclaimed"] == 1150
+    assert report["kept_recent"] == 1
+    assert report["by_prefix"]["temp_inputs/"] == {"deleted": 1, "bytes": 50}
+    assert report["completed_cycle"]
+
+
+def test_dry_run_deletes_nothing(db, bucket, tmp_path):
+    put(bucket, "orphan.png")
+    report = collect_orphans(db, work_dir=str(tmp_path / "gc"), dry_run=True, bucket=bucket)
+    assert report["orphans"] == 1
+    assert names(bucket) == ["orphan.png"]
+
+
+def test_incremental_runs_resume_from_checkpoint(db, bucket, tmp_path):
+    for i in range(5):
+        put(bucket, f"orphan_{i}.png")
+    work_dir = str(tmp_path / "gc")
+
+    first = collect_orphans(db, work_dir=work_dir, max_blobs=2, batch_size=10, bucket=bucket)
+    assert first["scanned"] == 2 and not first["completed_cycle"]
+    assert names(bucket) == ["orphan_2.png", "orphan_3.png", "orphan_4.png"]
+
+    second = collect_orphans(db, work_dir=work_dir, batch_size=10, bucket=bucket)
+    assert second["resumed_from"] == "orphan_1.png"
+    assert second["scanned"] == 3 and second["completed_cycle"]
+    assert names(bucket) == []
+    assert not os.path.exists(os.path.join(work_dir, "checkpoint.json"))
+
+
+def test_asset_saved_during_run_is_protected(db, bucket, tmp_path, monkeypatch):
+    project = models.Project(name="p")
+    db.add(project)
+    db.commit()
+    put(bucket, "late_save.mp4")
+
+    from backend.services import blob_gc
+    original_build = blob_gc.ReferenceIndex.build
+
+    def build_then_save(self, names):
+        count = original_build(self, names)
+        # A video saved after the index snapshot still points at an old blob
+        db.add(models.Asset(project_id=project.id, type="video", url="late_save.mp4"))
+        db.commit()
+        return count
+
+    monkeypatch.setattr(blob_gc.ReferenceIndex, "build", build_then_save)
+    report = collect_orphans(db, work_dir=str(tmp_path / "gc"), bucket=bucket)
+    assert report["deleted"] == 0
+    assert names(bucket) == ["late_save.mp4"]
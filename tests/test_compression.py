@@ -0,0 +1,73 @@
+import gzip
+import json
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.compression import CompressionMiddleware
+
+PAYLOAD = {"assets": [{"id": i, "prompt": "A sneaker on a neon-lit street", "url": f"images/{i}.png"} for i in range(200)]}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_size=1024)
+
+    @app.get("/project")
+    def project():
+        return PAYLOAD
+
+    @app.get("/small")
+    def small():
+        return {"status": "ok"}
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse((f"data: {i}\n\n" * 200 for i in range(3)), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def get(client, path, accept_encoding):
+    # Raw bytes, so the test sees what went over the wire
+    with client.stream("GET", path, headers={"accept-encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("accept_encoding, encoding, decode", [
+    ("gzip, deflate, br", "br", brotli.decompress),
+    ("gzip", "gzip", gzip.decompress),
+    ("br;q=0, gzip;q=0.5", "gzip", gzip.decompress),
+])
+def test_negotiates_encoding(client, accept_encoding, encoding, decode):
+    response, body = get(client, "/project", accept_encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body)
+    assert json.loads(decode(body)) == PAYLOAD
+
+
+def test_identity_when_not_accepted_or_small(client):
+    response, body = get(client, "/project", "identity")
+    assert "content-encoding" not in response.headers
+    assert json.loads(body) == PAYLOAD
+
+    response, body = get(client, "/small", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert json.loads(body) == {"status": "ok"}
+
+
+def test_event_streams_pass_through(client):
+    response, body = get(client, "/events", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert body.decode().count("data:") == 600
+
+
+def test_refused_identity_encodes_small_bodies(client):
+    response, body = get(client, "/small", "identity;q=0, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == {"status": "ok"}
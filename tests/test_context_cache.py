@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from google.genai import types
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import database, models
+from backend.config import config
+from backend.routers import context
+from backend.services.context_cache import (
+    ContextCacheManager, context_key, text_digest, version_context_key, version_context_text, matching_version_id,
+)
+
+CONTEXT = "Warm, natural light. Earthy palette. " * 200
+
+
+class FakeClient:
+    def __init__(self, fail_create=False):
+        self.fail_create = fail_create
+        self.created = []
+        self.deleted = []
+        self.requests = []
+        self.caches = SimpleNamespace(create=self._create, delete=self._delete)
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _create(self, model, config):
+        if self.fail_create:
+            raise ValueError("Cached content is too small")
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    def _delete(self, name):
+        self.deleted.append(name)
+
+    def _generate(self, model, contents, config):
+        self.requests.append((contents, config))
+        cached = 1000 if config.cached_content else 0
+        return SimpleNamespace(
+            text="{}",
+            usage_metadata=SimpleNamespace(prompt_token_count=1050, cached_content_token_count=cached, candidates_token_count=20),
+        )
+
+
+def generate(manager, client, prompt="Write a script"):
+    return manager.generate_content(
+        client,
+        "gemini-2.5-flash",
+        [types.Part(text=CONTEXT)],
+        [prompt],
+        key=context_key("gemini-2.5-flash", text_digest(CONTEXT)),
+    )
+
+
+def test_reuses_cached_content_by_reference():
+    manager, client = ContextCacheManager(), FakeClient()
+    generate(manager, client)
+    generate(manager, client, "Another script")
+
+    assert len(client.created) == 1
+    assert all(request_config.cached_content == "cachedContents/1" for _, request_config in client.requests)
+    # The context itself is not re-sent with cached calls
+    assert client.requests[1][0] == ["Another script"]
+
+    stats = manager.stats()
+    assert stats["cached_calls"] == 2 and stats["fallback_calls"] == 0
+    assert stats["cached_tokens"] == 2000
+
+
+def test_falls_back_inline_when_caching_fails():
+    manager, client = ContextCacheManager(), FakeClient(fail_create=True)
+    generate(manager, client)
+    generate(manager, client)
+
+    (contents, request_config), _ = client.requests
+    assert request_config.cached_content is None
+    assert contents[0].parts[0].text == CONTEXT
+    stats = manager.stats()
+    assert stats["fallback_calls"] == 2
+    # Not retried on every call after a failed create
+    assert stats["cache_create_errors"] == 1
+
+
+def test_version_context_is_built_and_keyed_server_side():
+    version = SimpleNamespace(id=7, brand_vibe="Bold", brand_lighting="", brand_colors=None, brand_subject="Runners",
+                              project_vibe=None, project_lighting=None, project_colors="Red, white", project_subject=None,
+                              context="Summer launch")
+    text = version_context_text(version)
+    # Same text the context accordion applies with every field selected
+    assert text == "Brand Vibe: Bold.\nBrand Subject: Runners.\nProject Colors: Red, white.\nOverall Context: Summer launch."
+    assert matching_version_id(version, text + "\n") == 7
+    assert matching_version_id(version, "Brand Vibe: Bold.") is None
+    assert matching_version_id(None, text) is None
+
+    manager, client = ContextCacheManager(), FakeClient()
+    for version_id in (7, 8):
+        manager.generate_content(client, "gemini-2.5-flash", [types.Part(text=CONTEXT)], ["Script"],
+                                 key=version_context_key("gemini-2.5-flash", version_id, CONTEXT))
+    manager.invalidate_version(7, lambda: client)
+    assert client.deleted == ["cachedContents/1"]
+    assert manager.stats()["active_caches"] == 1
+
+
+def test_invalidate_only_builds_a_client_when_needed():
+    def no_client():
+        raise ValueError("GEMINI_API_KEY environment variable not set")
+
+    manager, client = ContextCacheManager(), FakeClient()
+    manager.invalidate_version(7, no_client) # Nothing cached: no client needed
+    manager.generate_content(client, "gemini-2.5-flash", [types.Part(text=CONTEXT)], ["Script"],
+                             key=version_context_key("gemini-2.5-flash", 7, CONTEXT))
+    manager.invalidate_version(7, no_client) # Logged, not raised
+    assert manager.stats()["active_caches"] == 0
+
+
+def test_version_edits_work_without_model_credentials(monkeypatch, database_url, db_engine):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.setenv("GOOGLE_GENAI_USE_VERTEXAI", "False")
+    async_bind = database.AsyncSessionLocal.kw["bind"]
+    database.AsyncSessionLocal.configure(bind=create_async_engine(database.async_database_url(database_url), poolclass=NullPool))
+    with sessionmaker(bind=db_engine)() as db:
+        project = models.Project(name="Sneakers")
+        db.add(project)
+        db.commit()
+        project_id = project.id
+    app = FastAPI()
+    app.include_router(context.router)
+    try:
+        with TestClient(app) as client:
+            version = client.post("/context/versions", json={"project_id": project_id, "name": "v1", "brand_vibe": "Bold"}).json()
+            assert client.put(f"/context/versions/{version['id']}", json={"brand_vibe": "Calm"}).status_code == 200
+            assert client.delete(f"/context/versions/{version['id']}").status_code == 200
+    finally:
+        database.AsyncSessionLocal.configure(bind=async_bind)
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(config, "CONTEXT_CACHE_ENABLED", False)
+    manager, client = ContextCacheManager(), FakeClient()
+    generate(manager, client)
+    assert client.created == []
+    assert manager.stats()["fallback_calls"] == 1
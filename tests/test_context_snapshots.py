@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.services.context_snapshots import backfill_context_snapshots, load_snapshots, snapshot_hash
+from backend.services.search import ensure_search_index, search
+
+CONTEXT = "Brand vibe: moody, neon-lit streets. Palette: teal and orange."
+
+
+@pytest.fixture
+def db(db_engine):
+    ensure_search_index(db_engine)
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
+
+
+def test_identical_context_stored_once(db):
+    project = models.Project(name="Campaign")
+    db.add(project)
+    db.commit()
+    db.add_all([
+        models.Asset(project_id=project.id, type="image", url=f"{index}.png", prompt="Sneaker", context_data=CONTEXT)
+        for index in range(3)
+    ])
+    db.commit()
+
+    assert db.query(func.count(models.ContextSnapshot.hash)).scalar() == 1
+    assets = db.query(models.Asset).all()
+    assert {asset.context_hash for asset in assets} == {snapshot_hash(CONTEXT)}
+    assert all(asset.context_data is None for asset in assets)
+    assert load_snapshots(db, [asset.context_hash for asset in assets]) == {snapshot_hash(CONTEXT): CONTEXT}
+    # The search index still sees the context text
+    assert {result["id"] for result in search(db, "neon teal", kinds=["asset"])["results"]} == {asset.id for asset in assets}
+
+
+def test_backfill_moves_inline_context(db_engine, db):
+    assets = models.Asset.__table__
+    with db_engine.begin() as connection:
+        # Rows written before snapshots existed (Core inserts bypass the flush hook)
+        connection.execute(assets.insert(), [
+            {"type": "image", "url": f"{index}.png", "prompt": "Beach towel", "context_data": CONTEXT if index % 2 else "Sunny"}
+            for index in range(5)
+        ])
+        connection.execute(assets.insert(), [{"type": "image", "url": "none.png", "prompt": "No context"}])
+
+    report = backfill_context_snapshots(db_engine, batch_size=2)
+
+    assert report["assets"] == 5
+    assert report["snapshots_created"] == 2
+    rows = db.query(models.Asset).order_by(models.Asset.id).all()
+    assert [row.context_hash for row in rows] == [snapshot_hash("Sunny"), snapshot_hash(CONTEXT)] * 2 + [snapshot_hash("Sunny"), None]
+    assert all(row.context_data is None for row in rows)
+    assert len(search(db, "neon", kinds=["asset"])["results"]) == 2
+    # Nothing left to move
+    assert backfill_context_snapshots(db_engine)["assets"] == 0
@@ -0,0 +1,109 @@
+import asyncio
+import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, File, Form, UploadFile
+
+from backend import models, database, idempotency
+from backend.config import config
+from backend.idempotency import IdempotencyMiddleware
+
+
+@pytest.fixture
+def app(monkeypatch, db_engine):
+    # A database file or server: concurrent requests use separate connections, as in the app
+    bind = database.SessionLocal.kw["bind"]
+    database.SessionLocal.configure(bind=db_engine)
+    monkeypatch.setattr(config, "IDEMPOTENCY_POLL_SECONDS", 0.05)
+
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware)
+    app.state.calls = 0
+
+    @app.post("/video-magic/render")
+    async def render(payload: dict):
+        app.state.calls += 1
+        await asyncio.sleep(0.2)
+        if payload.get("fail") and app.state.calls == 1:
+            raise HTTPException(status_code=503, detail="Model unavailable")
+        return {"call": app.state.calls, "prompt": payload["prompt"]}
+
+    @app.post("/video-magic/save")
+    async def save(prompt: str = Form(...), file: UploadFile = File(...)):
+        app.state.calls += 1
+        return {"call": app.state.calls, "size": len(await file.read())}
+
+    yield app
+    database.SessionLocal.configure(bind=bind)
+
+
+def run(app, *requests):
+    async def send_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/video-magic/render", json=body, headers={"Idempotency-Key": key})
+                for key, body in requests
+            ))
+    return asyncio.run(send_all())
+
+
+def test_concurrent_and_later_repeats_share_one_execution(app):
+    first, second = run(app, ("k1", {"prompt": "a cat"}), ("k1", {"prompt": "a cat"}))
+    (third,) = run(app, ("k1", {"prompt": "a cat"}))
+
+    assert app.state.calls == 1
+    assert first.json() == second.json() == third.json() == {"call": 1, "prompt": "a cat"}
+    # Exactly one of the concurrent requests ran; the other attached to it
+    assert sorted(r.headers.get("idempotent-replayed", "") for r in (first, second)) == ["", "true"]
+    assert third.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reused_for_different_request(app):
+    run(app, ("k2", {"prompt": "a cat"}))
+    (response,) = run(app, ("k2", {"prompt": "a dog"}))
+    assert response.status_code == 422
+    assert app.state.calls == 1
+
+
+def test_failed_request_releases_key(app):
+    (failed,) = run(app, ("k3", {"prompt": "a cat", "fail": True}))
+    (retried,) = run(app, ("k3", {"prompt": "a cat", "fail": True}))
+
+    assert failed.status_code == 503
+    assert retried.status_code == 200 and retried.json()["call"] == 2
+
+
+def test_expired_key_executes_again(app, monkeypatch):
+    run(app, ("k4", {"prompt": "a cat"}))
+    later = datetime.datetime.utcnow() + datetime.timedelta(days=2)
+    monkeypatch.setattr(idempotency, "_now", lambda: later)
+    (response,) = run(app, ("k4", {"prompt": "a cat"}))
+    assert response.json()["call"] == 2
+
+
+def test_replay_ends_before_signed_urls_expire(app, monkeypatch):
+    monkeypatch.setattr(config, "IDEMPOTENCY_TTL_SECONDS", 24 * 3600)
+    run(app, ("k6", {"prompt": "a cat"}))
+    later = datetime.datetime.utcnow() + datetime.timedelta(seconds=config.SIGNED_URL_TTL_SECONDS // 2 + 60)
+    monkeypatch.setattr(idempotency, "_now", lambda: later)
+    (response,) = run(app, ("k6", {"prompt": "a cat"}))
+    assert response.json()["call"] == 2 and "idempotent-replayed" not in response.headers
+
+
+def test_repeated_form_upload_matches_despite_new_boundary(app):
+    async def save_twice():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return [
+                await client.post(
+                    "/video-magic/save",
+                    data={"prompt": "a cat"},
+                    files={"file": ("clip.mp4", b"x" * 200_000)},
+                    headers={"Idempotency-Key": "k5"},
+                )
+                for _ in range(2)
+            ]
+
+    first, second = asyncio.run(save_twice())
+    assert second.status_code == 200 and second.headers["idempotent-replayed"] == "true"
+    assert first.json() == second.json() and app.state.calls == 1
@@ -0,0 +1,84 @@
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.loop_monitor import LoopMonitor, LoopLagMiddleware
+
+
+def build_app(monitor: LoopMonitor, shed_ms: float = 0) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(LoopLagMiddleware, monitor=monitor, shed_ms=shed_ms)
+
+    @app.on_event("startup")
+    async def start():
+        monitor.start()
+
+    @app.on_event("shutdown")
+    async def stop():
+        monitor.stop()
+
+    @app.get("/blocking")
+    async def blocking_handler():
+        time.sleep(0.4) # Sync call on the loop, the kind of regression the monitor is for
+        return {"ok": True}
+
+    @app.get("/work")
+    async def work():
+        return {"ok": True}
+
+    @app.get("/metrics/event-loop")
+    async def stats(details: bool = False):
+        return monitor.stats(include_stacks=details)
+
+    return app
+
+
+def test_blocking_call_reported_with_stack_and_request():
+    monitor = LoopMonitor(interval_ms=20, threshold_ms=100)
+    with TestClient(build_app(monitor)) as client:
+        time.sleep(0.1)
+        assert client.get("/blocking").status_code == 200
+        time.sleep(0.1) # Let the heartbeat come back and close the episode
+        stats = client.get("/metrics/event-loop", params={"details": True}).json()
+        public = client.get("/metrics/event-loop").json()
+
+    # Stacks and request paths only for callers allowed to see them
+    assert public["recent_blocks"] and not any("stack" in block or "request" in block for block in public["recent_blocks"])
+    assert stats["blocks"] >= 1
+    block = next(block for block in stats["recent_blocks"] if block["stack"])
+    assert block["request"] == "GET /blocking"
+    assert any("blocking_handler" in line for line in block["stack"])
+    assert block["blocked_ms"] >= 300
+    assert stats["lag_ms"]["max"] >= 300
+    assert stats["lag_ms"]["buckets"]["+Inf"] == stats["lag_ms"]["count"] > 0
+    assert stats["lag_ms"]["buckets"]["250"] < stats["lag_ms"]["count"]
+
+
+def test_sheds_new_requests_while_lagging():
+    monitor = LoopMonitor(interval_ms=20, threshold_ms=100)
+    with TestClient(build_app(monitor, shed_ms=200)) as client:
+        assert client.get("/work").status_code == 200
+
+        monitor.observe(500)
+        response = client.get("/work")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        # Metrics stay reachable while shedding
+        assert client.get("/metrics/event-loop").json()["shed_requests"] == 1
+
+        for _ in range(5):
+            monitor.observe(0)
+        assert client.get("/work").status_code == 200
+
+
+def test_prometheus_export():
+    monitor = LoopMonitor(interval_ms=20, threshold_ms=100)
+    for lag_ms in (0.5, 3, 40, 700):
+        monitor.observe(lag_ms)
+    text = monitor.prometheus()
+    assert 'event_loop_lag_seconds_bucket{le="0.001"} 1' in text
+    assert 'event_loop_lag_seconds_bucket{le="0.05"} 3' in text
+    assert 'event_loop_lag_seconds_bucket{le="+Inf"} 4' in text
+    assert "event_loop_lag_seconds_count 4" in text
+    assert monitor.percentile_ms(0.5) == 5.0
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.config import config
+from backend.services.model_router import ModelRouter, AUTO, IMAGE_HIGH_QUALITY_ALIAS, run_blocking
+
+FAST = config.MODEL_IMAGE_FAST
+HQ = IMAGE_HIGH_QUALITY_ALIAS
+
+
+def recording(failing=(), slow=(), delay=1.0):
+    calls = []
+
+    async def call(model):
+        calls.append(model)
+        if model in failing:
+            raise RuntimeError(f"{model} unavailable")
+        if model in slow:
+            await asyncio.sleep(delay)
+        return f"image from {model}"
+
+    return call, calls
+
+
+def test_pinned_model_is_used_without_fallback():
+    router = ModelRouter()
+    call, calls = recording(failing=(HQ,))
+    with pytest.raises(RuntimeError):
+        asyncio.run(router.call("image", call, model=HQ))
+    assert calls == [HQ]
+    assert router.stats()["decisions"] == [{"kind": "image", "policy": "pinned", "model": HQ, "reason": "pinned", "count": 1}]
+
+
+def test_auto_prefers_high_quality_and_falls_back_on_failure():
+    router = ModelRouter()
+    call, calls = recording()
+    assert asyncio.run(router.call("image", call, model=AUTO)) == (f"image from {HQ}", HQ)
+
+    call, calls = recording(failing=(HQ,))
+    assert asyncio.run(router.call("image", call, model=AUTO)) == (f"image from {FAST}", FAST)
+    assert calls == [HQ, FAST]
+    assert router.stats()["fallbacks"] == [{"kind": "image", "from": HQ, "to": FAST, "cause": "error", "count": 1}]
+
+
+def test_auto_skips_a_failing_high_quality_model(monkeypatch):
+    monkeypatch.setattr(config, "ROUTER_MIN_SAMPLES", 3)
+    router = ModelRouter()
+    call, _ = recording(failing=(HQ,))
+    for _ in range(3):
+        asyncio.run(router.call("image", call, model=AUTO))
+
+    call, calls = recording()
+    assert asyncio.run(router.call("image", call, model=AUTO))[1] == FAST
+    assert calls == [FAST]
+    assert any(decision["reason"] == "high_quality_degraded" for decision in router.stats()["decisions"])
+
+
+def test_latency_budget_uses_live_latency_and_queue_depth():
+    router = ModelRouter()
+    call, _ = recording()
+    # Priors: fast ~10 s, high quality ~30 s
+    assert asyncio.run(router.call("image", call, latency_budget_ms=20000))[1] == FAST
+    assert asyncio.run(router.call("image", call, latency_budget_ms=60000))[1] == HQ
+
+    # A backed-up high-quality model no longer fits the same budget
+    router._stats("image", HQ).in_flight = 3 * config.ROUTER_QUEUE_CAPACITY
+    assert asyncio.run(router.call("image", call, latency_budget_ms=60000))[1] == FAST
+
+    # An explicit model wins over the budget
+    assert asyncio.run(router.call("image", call, model=HQ, latency_budget_ms=20000))[1] == HQ
+
+
+def test_slow_attempt_times_out_and_falls_back():
+    router = ModelRouter()
+    router._stats("image", HQ).prior_ms = 50 # Times out after ROUTER_TIMEOUT_FACTOR x 50 ms
+    call, calls = recording(slow=(HQ,))
+    assert asyncio.run(router.call("image", call, model=AUTO)) == (f"image from {FAST}", FAST)
+    assert calls == [HQ, FAST]
+    models = {model["model"]: model for model in router.stats()["models"]}
+    assert models[HQ]["in_flight"] == 0 and models[HQ]["error_rate"] == 0.0 # One timeout, below MIN_SAMPLES
+    assert router.stats()["fallbacks"][0]["cause"] == "timeout"
+
+
+def test_abandoned_attempt_stays_in_flight_until_it_finishes():
+    router = ModelRouter()
+    router._stats("image", HQ).prior_ms = 50
+    release = threading.Event()
+
+    def slow_model_call(model):
+        if model == HQ:
+            release.wait(5)
+        return f"image from {model}"
+
+    async def main():
+        result = await router.call("image", lambda model: run_blocking(slow_model_call, model), model=AUTO)
+        abandoned = router._stats("image", HQ).in_flight
+        release.set()
+        for _ in range(100):
+            if router._stats("image", HQ).in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        return result, abandoned, router._stats("image", HQ).in_flight
+
+    result, abandoned, finished = asyncio.run(main())
+    assert result == (f"image from {FAST}", FAST)
+    assert (abandoned, finished) == (1, 0)
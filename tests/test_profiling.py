@@ -0,0 +1,71 @@
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.config import config
+from backend.profiling import ProfilingMiddleware
+from backend.routers import profiles
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_TOKEN", "secret")
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(profiles.router)
+
+    @app.get("/sync-work")
+    def sync_work():
+        spin(0.1)
+        return {"ok": True}
+
+    @app.get("/async-work")
+    async def async_work():
+        spin(0.1)
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def profiled_frames(client, profile_id: str) -> dict:
+    """Frame name -> sampled milliseconds, over every thread of the stored profile."""
+    profile = client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile-Token": "secret"}).json()
+    frames = profile["shared"]["frames"]
+    totals = {}
+    for thread in profile["profiles"]:
+        for stack, weight in zip(thread["samples"], thread["weights"]):
+            for index in set(stack):
+                totals[frames[index]["name"]] = totals.get(frames[index]["name"], 0) + weight
+    return totals
+
+
+def test_unprofiled_without_token(client):
+    assert "x-profile-id" not in client.get("/sync-work").headers
+    assert "x-profile-id" not in client.get("/sync-work", headers={"X-Profile-Token": "wrong"}).headers
+
+
+@pytest.mark.parametrize("path", ["/sync-work", "/async-work"])
+def test_profile_by_request_id(client, path):
+    response = client.get(path, headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    frames = profiled_frames(client, profile_id)
+    assert frames.get("spin", 0) >= 50
+
+    folded = client.get(f"/debug/profiles/{profile_id}", params={"format": "collapsed", "profile_token": "secret"})
+    assert ";spin " in folded.text
+
+
+def test_profiles_need_the_token(client):
+    profile_id = client.get("/sync-work", params={"profile_token": "secret"}).headers["x-profile-id"]
+    assert client.get(f"/debug/profiles/{profile_id}").status_code == 403
+    assert client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile-Token": "wrong"}).status_code == 403
+    assert client.get("/debug/profiles/0123abcd", headers={"X-Profile-Token": "secret"}).status_code == 404
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.services.project_summary import rebuild_project_summary
+
+
+@pytest.fixture
+def db(db_engine):
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
+
+
+def summary(db, project_id):
+    db.expire_all()
+    row = db.get(models.ProjectSummary, project_id)
+    return {
+        "assets": row.asset_count, "images": row.image_count, "videos": row.video_count,
+        "tryons": row.tryon_count, "cover": (row.cover_asset_id, row.cover_asset_url),
+    }
+
+
+def matches_rebuild(db, project_id):
+    maintained = summary(db, project_id)
+    rebuild_project_summary(db.connection(), project_id)
+    return maintained == summary(db, project_id)
+
+
+def test_counts_and_cover_follow_inserts_and_deletes(db):
+    project = models.Project(name="Sneakers")
+    db.add(project)
+    db.commit()
+    assert summary(db, project.id)["assets"] == 0
+
+    first = models.Asset(project_id=project.id, type="image", url="a.png")
+    video = models.Asset(project_id=project.id, type="video", url="b.mp4")
+    db.add_all([first, video])
+    db.commit()
+    second = models.Asset(project_id=project.id, type="tryon", url="c.png")
+    db.add(second)
+    db.commit()
+    assert summary(db, project.id) == {"assets": 3, "images": 1, "videos": 1, "tryons": 1, "cover": (second.id, "c.png")}
+
+    db.delete(second)
+    db.commit()
+    assert summary(db, project.id) == {"assets": 2, "images": 1, "videos": 1, "tryons": 0, "cover": (first.id, "a.png")}
+
+    db.delete(first)
+    db.commit()
+    assert summary(db, project.id)["cover"] == (None, None)
+    assert matches_rebuild(db, project.id)
+
+
+def test_cover_follows_url_changes_and_moves(db):
+    source, target = models.Project(name="Source"), models.Project(name="Target")
+    db.add_all([source, target])
+    db.commit()
+    older = models.Asset(project_id=source.id, type="image", url="old.png")
+    db.add(older)
+    db.commit()
+    newer = models.Asset(project_id=source.id, type="image", url="new.png")
+    db.add(newer)
+    db.commit()
+
+    newer.url = "renamed.png"
+    db.commit()
+    assert summary(db, source.id)["cover"] == (newer.id, "renamed.png")
+
+    # Non-cover url changes leave the cover alone
+    older.url = "older-renamed.png"
+    db.commit()
+    assert summary(db, source.id)["cover"] == (newer.id, "renamed.png")
+
+    newer.project_id = target.id
+    db.commit()
+    assert summary(db, source.id) == {"assets": 1, "images": 1, "videos": 0, "tryons": 0, "cover": (older.id, "older-renamed.png")}
+    assert summary(db, target.id) == {"assets": 1, "images": 1, "videos": 0, "tryons": 0, "cover": (newer.id, "renamed.png")}
+
+    older.type = "video"
+    db.commit()
+    assert summary(db, source.id) == {"assets": 1, "images": 0, "videos": 1, "tryons": 0, "cover": (None, None)}
+    assert matches_rebuild(db, source.id) and matches_rebuild(db, target.id)
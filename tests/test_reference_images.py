@@ -0,0 +1,66 @@
+import os
+import time
+
+import pytest
+
+from backend.services import reference_images
+from backend.services.reference_images import ReferenceCache, cache_blob_name, prepare_reference
+from backend.services.storage import storage_client, BUCKET_NAME
+
+
+@pytest.fixture
+def normalized(monkeypatch):
+    """Digests that went through normalize_image (a cache miss everywhere)."""
+    monkeypatch.setattr(reference_images, "cache", ReferenceCache(1024 * 1024))
+    calls = []
+
+    def normalize(data, mime_type=None):
+        calls.append(data)
+        return b"compact " + data, "image/jpeg"
+
+    monkeypatch.setattr(reference_images, "normalize_image", normalize)
+    return calls
+
+
+def stored_blob(digest):
+    return storage_client.bucket(BUCKET_NAME).blob(cache_blob_name(digest, "image/jpeg"))
+
+
+def test_same_upload_is_prepared_once(normalized, monkeypatch):
+    digest, compact, mime_type = prepare_reference(b"sneaker photo", "image/png")
+    assert (compact, mime_type) == (b"compact sneaker photo", "image/jpeg")
+    assert prepare_reference(b"sneaker photo", "image/png") == (digest, compact, mime_type)
+    assert normalized == [b"sneaker photo"]
+    assert reference_images.cache.hits == 1
+
+    # Another instance (empty memory cache) reuses the stored blob
+    monkeypatch.setattr(reference_images, "cache", ReferenceCache(1024 * 1024))
+    assert prepare_reference(b"sneaker photo") == (digest, compact, mime_type)
+    assert normalized == [b"sneaker photo"]
+
+    assert prepare_reference(b"other photo")[0] != digest
+    assert len(normalized) == 2
+
+
+def test_expired_entries_are_reloaded_and_stored_blobs_touched_in_place(normalized, monkeypatch):
+    digest = prepare_reference(b"scene photo")[0]
+    data, mime_type, _ = reference_images.cache.entries[digest]
+    reference_images.cache.entries[digest] = (data, mime_type, time.monotonic() - reference_images.CACHE_TTL_SECONDS - 1)
+    blob = stored_blob(digest)
+    past = time.time() - 2 * reference_images.CACHE_TTL_SECONDS
+    os.utime(blob.path, (past, past))
+    uploads = []
+    monkeypatch.setattr(reference_images, "upload_bytes", lambda *args, **kwargs: uploads.append(args))
+
+    assert prepare_reference(b"scene photo")[1] == b"compact scene photo"
+    assert reference_images.cache.misses == 2
+    # Refreshed for the orphan collector without normalizing or uploading again
+    assert normalized == [b"scene photo"] and uploads == []
+    assert time.time() - os.path.getmtime(blob.path) < 60
+
+    # A blob within the TTL is left alone
+    recent = os.path.getmtime(blob.path) - 10
+    os.utime(blob.path, (recent, recent))
+    reference_images.cache.entries.clear()
+    prepare_reference(b"scene photo")
+    assert os.path.getmtime(blob.path) == recent
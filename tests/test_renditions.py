@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.database import get_db
+from backend.routers import projects
+from backend.services.renditions import ensure_renditions_column, rendition_blob_name
+
+
+def test_startup_adds_missing_renditions_column(database_url):
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        # assets as created before renditions existed
+        connection.execute(text("CREATE TABLE assets (id INTEGER PRIMARY KEY, project_id INTEGER, type VARCHAR, url VARCHAR)"))
+    ensure_renditions_column(engine)
+    ensure_renditions_column(engine) # Idempotent on every later boot
+    assert "renditions" in {column["name"] for column in inspect(engine).get_columns("assets")}
+    engine.dispose()
+
+
+def test_read_project_signs_a_copy_not_the_stored_asset(db_engine):
+    Session = sessionmaker(bind=db_engine)
+    with Session() as db:
+        project = models.Project(name="Sneakers")
+        db.add(project)
+        db.commit()
+        renditions = {"thumb_256": rendition_blob_name("a.png", "thumb_256", "webp")}
+        db.add(models.Asset(project_id=project.id, type="image", url="a.png", renditions=json.dumps(renditions)))
+        db.commit()
+        project_id = project.id
+
+    def session():
+        db = Session()
+        try:
+            yield db
+            db.commit() # Would persist any signed URL written onto the ORM objects
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(projects.router)
+    app.dependency_overrides[get_db] = session
+    asset = TestClient(app).get(f"/projects/{project_id}").json()["assets"][0]
+    assert asset["url"] != "a.png" and "a.png" in asset["url"]
+    assert "a.thumb_256.webp" in asset["renditions"]["thumb_256"] and asset["renditions"]["thumb_256"] != "a.thumb_256.webp"
+
+    with Session() as db:
+        stored = db.query(models.Asset).one()
+        assert stored.url == "a.png"
+        assert json.loads(stored.renditions) == renditions
@@ -0,0 +1,79 @@
+import json
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services.video_magic import script as script_module
+from backend.services.video_magic.script import apply_script_patch, edit_script
+
+SCRIPT = {
+    "global_elements": {"character": "A chef", "visual_style": "Warm film"},
+    "scenes": [{"visual": f"Scene {i}", "audio": f"Line {i}"} for i in range(4)],
+}
+
+
+def test_patch_only_touches_targeted_scenes():
+    patch = {
+        "global_elements": {"visual_style": "Cool neon"},
+        "scenes": [
+            {"op": "update", "index": 1, "audio": "New line"},
+            {"op": "delete", "index": 2},
+            {"op": "insert", "index": 0, "visual": "Cold open", "audio": ""},
+            {"op": "insert", "index": 4, "visual": "Outro"},
+        ],
+    }
+
+    script, changed = apply_script_patch(SCRIPT, patch)
+
+    assert [scene["visual"] for scene in script["scenes"]] == ["Cold open", "Scene 0", "Scene 1", "Scene 3", "Outro"]
+    assert script["scenes"][2] == {"visual": "Scene 1", "audio": "New line"}
+    assert changed == [0, 2, 4]
+    assert script["global_elements"] == {"character": "A chef", "visual_style": "Cool neon"}
+    # Untouched scenes are carried over as-is
+    assert script["scenes"][1] is SCRIPT["scenes"][0]
+
+
+def test_patch_rejects_out_of_range_index():
+    with pytest.raises(ValueError):
+        apply_script_patch(SCRIPT, {"scenes": [{"op": "update", "index": 4, "visual": "x"}]})
+
+
+def test_edit_calls_the_model_off_the_event_loop(monkeypatch):
+    loop_thread = threading.get_ident()
+    calls = []
+
+    def generate_content(model, contents, config):
+        assert threading.get_ident() != loop_thread, "model called on the event loop"
+        calls.append(config.response_schema)
+        time.sleep(0.05)
+        if len(calls) == 1:
+            return SimpleNamespace(text="not a patch", usage_metadata=None)
+        scenes = [dict(scene) for scene in SCRIPT["scenes"]]
+        scenes[1]["audio"] = "New line"
+        return SimpleNamespace(text=json.dumps(scenes), usage_metadata=None)
+
+    client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    monkeypatch.setattr(script_module, "get_client", lambda: client)
+
+    async def edit_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        result = await edit_script(SCRIPT, "New line for scene 2")
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(edit_while_ticking())
+    # An unusable patch falls back to a full rewrite; the loop kept running through both calls
+    assert len(calls) == 2 and ticks >= 5
+    assert result["changed_scenes"] == [1] and result["metrics"]["mode"] == "full"
+    assert result["metrics"]["latency_ms"] >= 100
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend import models, database
+from backend.services.video_magic import script_store, storyboard
+
+SCRIPT = {
+    "global_elements": {"character": "A chef"},
+    "scenes": [{"visual": f"Scene {i}", "audio": f"Line {i}"} for i in range(3)],
+}
+
+
+@pytest.fixture
+def db(db_engine):
+    # Not in-memory: renders are recorded from worker threads
+    bind = database.SessionLocal.kw["bind"]
+    database.SessionLocal.configure(bind=db_engine)
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
+    database.SessionLocal.configure(bind=bind)
+
+
+@pytest.fixture
+def in_session(database_url, db):
+    """Runs call(session) with an AsyncSession on the test database, like the endpoints do."""
+    engine = create_async_engine(database.async_database_url(database_url), poolclass=NullPool)
+
+    def run(call):
+        async def main():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                return await call(session)
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def stored(in_session, monkeypatch):
+    async def fake_generate(prompt, context=None, context_version_id=None):
+        return SCRIPT
+
+    async def fake_edit(current_script, instructions, mode="patch"):
+        scenes = list(current_script["scenes"])
+        scenes[1] = {"visual": "Scene 1, at night", "audio": scenes[1]["audio"]}
+        script = {"global_elements": current_script["global_elements"], "scenes": scenes}
+        return {"script": script, "changed_scenes": [1], "metrics": {"mode": mode}}
+
+    monkeypatch.setattr(script_store, "generate_script", fake_generate)
+    monkeypatch.setattr(script_store, "edit_script", fake_edit)
+    return in_session(lambda session: script_store.create_script(session, "A cooking ad"))
+
+
+def test_edit_stores_new_version(db, in_session, stored):
+    edited = in_session(lambda session: script_store.edit_stored_script(session, stored["script_id"], "Make scene 2 a night shot"))
+
+    assert edited["version"] == 2 and edited["current_version"] == 2
+    assert edited["scene_hashes"][0] == stored["scene_hashes"][0]
+    assert edited["scene_hashes"][1] != stored["scene_hashes"][1]
+
+    first = script_store.get_version(db, stored["script_id"], 1)
+    assert script_store.version_script(first) == SCRIPT
+    assert script_store.get_version(db, stored["script_id"]).instructions == "Make scene 2 a night shot"
+
+
+def test_storyboard_only_renders_changed_scenes(in_session, stored, monkeypatch):
+    rendered = []
+
+    async def fake_render_scene(client, index, scene, global_elements, **kwargs):
+        rendered.append(scene["visual"])
+        return {"index": index, "status": "done", "attempts": 1, "blob_name": f"clips/{scene['visual']}.mp4"}
+
+    monkeypatch.setattr(storyboard, "render_scene", fake_render_scene)
+    monkeypatch.setattr(storyboard, "get_client", lambda: None)
+
+    async def render(script):
+        return [result async for result in storyboard.render_storyboard(script, mode="direct")]
+
+    asyncio.run(render(stored["script"]))
+    edited = in_session(lambda session: script_store.edit_stored_script(session, stored["script_id"], "Make scene 2 a night shot"))
+    results = asyncio.run(render(edited["script"]))
+
+    assert rendered == ["Scene 0", "Scene 1", "Scene 2", "Scene 1, at night"]
+    assert sorted(result["index"] for result in results if result.get("cached")) == [0, 2]
+
+
+def test_concurrent_edits_are_both_applied(db, database_url, stored, monkeypatch):
+    engine = create_async_engine(database.async_database_url(database_url), poolclass=NullPool)
+    other_stored = asyncio.Event()
+    applied = []
+
+    async def append_edit(current_script, instructions, mode="patch"):
+        applied.append((instructions, current_script["scenes"][1]["visual"]))
+        if instructions == "at night" and not other_stored.is_set():
+            # Still with the model when the other edit is saved
+            await other_stored.wait()
+        scenes = list(current_script["scenes"])
+        scenes[1] = {"visual": f"{scenes[1]['visual']}, {instructions}", "audio": scenes[1]["audio"]}
+        script = {"global_elements": current_script["global_elements"], "scenes": scenes}
+        return {"script": script, "changed_scenes": [1], "metrics": {"mode": mode}}
+
+    async def edit(instructions):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            edited = await script_store.edit_stored_script(session, stored["script_id"], instructions)
+        if instructions == "in the rain":
+            other_stored.set()
+        return edited
+
+    async def main():
+        return await asyncio.gather(edit("at night"), edit("in the rain"))
+
+    monkeypatch.setattr(script_store, "edit_script", append_edit)
+    night, rain = asyncio.run(main())
+
+    assert rain["version"] == 2 and night["version"] == 3
+    # The edit that lost the race was applied again on top of the one that won
+    assert sorted(applied) == [("at night", "Scene 1"), ("at night", "Scene 1, in the rain"), ("in the rain", "Scene 1")]
+    final = script_store.version_script(script_store.get_version(db, stored["script_id"]))
+    assert final["scenes"][1]["visual"] == "Scene 1, in the rain, at night"
+
+
+def test_edit_gives_up_on_a_script_that_keeps_changing(db, db_engine, in_session, stored, monkeypatch):
+    add_version = script_store.add_version
+
+    def add_after_a_concurrent_edit(session, script, content, version, *args):
+        # Another edit always stores the same version number between our read and our insert
+        with sessionmaker(bind=db_engine)() as other:
+            add_version(other, other.get(models.Script, script.id), content, version, "Concurrent edit", "patch")
+        return add_version(session, script, content, version, *args)
+
+    monkeypatch.setattr(script_store, "add_version", add_after_a_concurrent_edit)
+    with pytest.raises(script_store.ScriptEditConflict):
+        in_session(lambda session: script_store.edit_stored_script(session, stored["script_id"], "Make scene 2 a night shot"))
+    versions = db.query(models.ScriptVersion).filter(models.ScriptVersion.script_id == stored["script_id"])
+    assert sorted(version.version for version in versions) == list(range(1, script_store.STORE_EDIT_ATTEMPTS + 2))
+
+
+def test_startup_adds_missing_version_index(database_url):
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        # script_versions as created before the unique constraint existed
+        connection.execute(text("CREATE TABLE script_versions (id INTEGER PRIMARY KEY, script_id INTEGER, version INTEGER)"))
+        connection.execute(text("INSERT INTO script_versions (id, script_id, version) VALUES (1, 1, 1)"))
+    script_store.ensure_script_version_unique(engine)
+    script_store.ensure_script_version_unique(engine) # Idempotent on every later boot
+    with pytest.raises(IntegrityError):
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO script_versions (id, script_id, version) VALUES (2, 1, 1)"))
+    engine.dispose()
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.services.search import ensure_search_index, search, uses_fts
+
+
+@pytest.fixture
+def db(db_engine):
+    ensure_search_index(db_engine)
+    session = sessionmaker(bind=db_engine)()
+    project = models.Project(name="Spring sneakers", description="Moody street campaign")
+    session.add(project)
+    session.commit()
+    session.add_all([
+        models.Asset(project_id=project.id, type="image", url="a.png", prompt="Moody sneaker shot on wet asphalt at night", model_type="gemini"),
+        models.Asset(project_id=project.id, type="video", url="b.mp4", prompt="Sneaker spinning on a turntable", model_type="veo"),
+        models.Asset(project_id=project.id, type="image", url="c.png", prompt="Bright beach towel flat lay", model_type="gemini"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_ranked_across_kinds(db):
+    if not uses_fts(db.get_bind()):
+        pytest.skip("Ranking and snippets need FTS5")
+    page = search(db, "moody sneaker")
+    kinds_ids = [(result["kind"], result["id"]) for result in page["results"]]
+    # Both words in the asset prompt outrank the project that matches across fields
+    assert kinds_ids[0] == ("asset", 1)
+    assert ("project", 1) in kinds_ids
+    assert "[Moody]" in page["results"][0]["snippet"]
+
+
+def test_filters_and_stemming(db):
+    if not uses_fts(db.get_bind()):
+        pytest.skip("Stemming needs FTS5")
+    page = search(db, "sneakers", type="video")
+    assert [result["id"] for result in page["results"]] == [2]
+
+
+def test_index_follows_updates_and_deletes(db):
+    towel = db.get(models.Asset, 3)
+    towel.prompt = "Sneaker on a beach towel"
+    db.commit()
+    assert 3 in [result["id"] for result in search(db, "sneaker", kinds=["asset"])["results"]]
+
+    db.delete(towel)
+    db.commit()
+    assert 3 not in [result["id"] for result in search(db, "sneaker", kinds=["asset"])["results"]]
+
+
+def test_keyset_pages_cover_all_results_once(db):
+    seen, cursor = [], None
+    while True:
+        page = search(db, "sneaker", limit=1, cursor=cursor)
+        seen += [(result["kind"], result["id"]) for result in page["results"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted((r["kind"], r["id"]) for r in search(db, "sneaker", limit=50)["results"])
+    assert len(seen) == len(set(seen)) == 3
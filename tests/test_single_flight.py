@@ -0,0 +1,81 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+
+from backend.routers import image_creation
+from backend.services import image_creation as image_service
+from backend.services.single_flight import SingleFlight, flight_key, single_flight
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _generate(self, model, contents, config):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return SimpleNamespace(text=f"Optimized: {contents}")
+
+
+def test_fifty_identical_concurrent_requests_make_one_upstream_call(monkeypatch):
+    client = CountingClient()
+    monkeypatch.setattr(image_service, "get_client", lambda: client)
+    app = FastAPI()
+    app.include_router(image_creation.router)
+    before = single_flight.stats()["operations"].get("image_optimize", {}).get("coalesced", 0)
+
+    async def send_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/image-creation/optimize", json={"prompt": "a red chair"}) for _ in range(50)
+            ))
+
+    responses = asyncio.run(send_all())
+
+    assert client.calls == 1
+    assert {r.json()["optimized_prompt"] for r in responses} == {"Optimized: a red chair"}
+    assert single_flight.stats()["operations"]["image_optimize"]["coalesced"] - before == 49
+
+
+def test_different_inputs_and_sequential_calls_are_not_shared():
+    flights, calls = SingleFlight(), []
+
+    async def call(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def scenario():
+        a, b = await asyncio.gather(
+            flights.run(flight_key("/x", "m", "p", "hash-a"), lambda: call("a")),
+            flights.run(flight_key("/x", "m", "p", "hash-b"), lambda: call("b")),
+        )
+        c = await flights.run(flight_key("/x", "m", "p", "hash-a"), lambda: call("a"))
+        return a, b, c
+
+    assert asyncio.run(scenario()) == ("a", "b", "a")
+    assert calls == ["a", "b", "a"]
+
+
+def test_errors_are_shared_and_not_retained():
+    flights = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.run("k", failing) for _ in range(3)), return_exceptions=True)
+        return results, flights.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert stats["in_flight"] == 0
+    assert stats["operations"]["default"] == {"requests": 3, "upstream_calls": 1, "coalesced": 2, "errors": 1, "coalesced_ratio": 0.667}
@@ -0,0 +1,78 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.static_assets import FrontendAssets, StaticAssetManifest, negotiate_encoding, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+
+# Big enough to be pre-compressed
+FILLER = "// " + "padding " * 200 + "\n"
+
+
+def write_frontend(root, leaf_body="export const leaf = 1;\n"):
+    (root / "js" / "modules").mkdir(parents=True, exist_ok=True)
+    (root / "index.html").write_text('<link href="style.css"><script type="module" src="/js/app.js?v=1"></script>\n')
+    (root / "style.css").write_text("body { color: red; }\n" + "/* pad */\n" * 200)
+    (root / "js" / "app.js").write_text("import { leaf } from './modules/leaf.js';\nimport('./modules/leaf.js');\n" + FILLER)
+    (root / "js" / "modules" / "leaf.js").write_text(leaf_body)
+
+
+def test_manifest_rewrites_references_to_fingerprints(tmp_path):
+    write_frontend(tmp_path)
+    manifest = StaticAssetManifest(str(tmp_path))
+    app_name = manifest.fingerprints["js/app.js"]
+    leaf_name = manifest.fingerprints["js/modules/leaf.js"]
+
+    html = manifest.lookup("/").encodings["identity"].decode()
+    assert f'src="/{app_name}"' in html
+    assert f'href="{manifest.fingerprints["style.css"]}"' in html
+
+    app_source = manifest.lookup(app_name).encodings["identity"].decode()
+    leaf_relative = "./" + leaf_name.removeprefix("js/")
+    assert f"from '{leaf_relative}'" in app_source and f"import('{leaf_relative}')" in app_source
+
+    assert manifest.lookup(app_name).cache_control == IMMUTABLE_CACHE_CONTROL
+    assert manifest.lookup("js/app.js").cache_control == REVALIDATE_CACHE_CONTROL
+    assert manifest.lookup("index.html").cache_control == REVALIDATE_CACHE_CONTROL
+
+
+def test_changing_a_module_renames_its_importers(tmp_path):
+    write_frontend(tmp_path)
+    before = StaticAssetManifest(str(tmp_path)).fingerprints
+    write_frontend(tmp_path, leaf_body="export const leaf = 2;\n")
+    after = StaticAssetManifest(str(tmp_path)).fingerprints
+    assert after["js/modules/leaf.js"] != before["js/modules/leaf.js"]
+    assert after["js/app.js"] != before["js/app.js"]
+    assert after["style.css"] == before["style.css"]
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("", "identity"),
+    ("deflate", "identity"),
+    ("gzip;q=0, *;q=0.5", "br"),
+    ("identity;q=0, gzip", "gzip"),
+    ("identity;q=0", None),
+    ("*;q=0", None),
+    ("*;q=0, identity", "identity"),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding, ("identity", "gzip", "br")) == expected
+
+
+def test_frontend_serving_validators_and_refused_identity(tmp_path):
+    write_frontend(tmp_path)
+    client = TestClient(FrontendAssets(str(tmp_path)))
+
+    response = client.get("/style.css", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+    assert etag.endswith('-gzip"')
+    assert client.get("/style.css", headers={"accept-encoding": "gzip", "if-none-match": etag}).status_code == 304
+
+    # identity;q=0 without any other acceptable coding can't be served
+    assert client.get("/style.css", headers={"accept-encoding": "identity;q=0"}).status_code == 406
+    with client.stream("GET", "/style.css", headers={"accept-encoding": "identity;q=0, gzip"}) as raw:
+        assert gzip.decompress(b"".join(raw.iter_raw())).startswith(b"body { color: red; }")
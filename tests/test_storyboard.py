@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services.video_magic import storyboard
+
+SCRIPT = {
+    "global_elements": {"character": "A chef"},
+    "scenes": [{"visual": f"Scene {index}", "audio": ""} for index in range(4)],
+}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Scenes rendered (and their render keys saved), with signing checked to stay off the loop."""
+    loop_thread = threading.get_ident()
+    rendered, saved = [], []
+
+    def sign(blob_name, download_name=None):
+        assert threading.get_ident() != loop_thread, "signed on the event loop"
+        return f"https://signed/{blob_name}"
+
+    monkeypatch.setattr(storyboard, "generate_signed_url", sign)
+    monkeypatch.setattr(storyboard, "get_client", lambda: object())
+    monkeypatch.setattr(storyboard, "save_render", lambda key, content_hash, blob_name, keyframe_blob_name=None: saved.append(blob_name))
+    return SimpleNamespace(rendered=rendered, saved=saved)
+
+
+def fake_render_scene(delays, rendered, cancelled=None):
+    async def render_scene(client, index, scene, global_elements, **settings):
+        rendered.append(index)
+        try:
+            await asyncio.sleep(delays[index])
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(index)
+            raise
+        return {"index": index, "status": "done", "attempts": 1, "error": None,
+                **await asyncio.to_thread(storyboard._clip_urls, index, f"clip{index}.mp4")}
+
+    return render_scene
+
+
+async def collect(results, limit=None):
+    collected = []
+    async for result in results:
+        collected.append(result)
+        if len(collected) == limit:
+            break
+    return collected
+
+
+def test_cached_scenes_first_then_completion_order(renders, monkeypatch):
+    keys = {}
+
+    def cached_renders(render_keys):
+        keys["all"] = list(render_keys)
+        return {render_keys[1]: SimpleNamespace(blob_name="cached1.mp4", keyframe_blob_name="cached1.png")}
+
+    monkeypatch.setattr(storyboard, "cached_renders", cached_renders)
+    monkeypatch.setattr(storyboard, "render_scene", fake_render_scene({0: 0.06, 2: 0, 3: 0.03}, renders.rendered))
+
+    results = asyncio.run(collect(storyboard.render_storyboard(SCRIPT)))
+    assert [result["index"] for result in results] == [1, 2, 3, 0]
+    assert results[0]["cached"] and results[0]["keyframe_url"] == "https://signed/cached1.png"
+    assert results[0]["download_url"] == "https://signed/cached1.mp4"
+    assert sorted(renders.rendered) == [0, 2, 3]
+    assert sorted(renders.saved) == ["clip0.mp4", "clip2.mp4", "clip3.mp4"]
+
+
+def test_stopping_the_consumer_cancels_remaining_scenes(renders, monkeypatch):
+    cancelled = []
+    monkeypatch.setattr(storyboard, "render_scene", fake_render_scene({0: 0, 1: 10, 2: 10, 3: 10}, renders.rendered, cancelled))
+
+    async def first_then_stop():
+        results = storyboard.render_storyboard(SCRIPT, use_cache=False)
+        first = await collect(results, limit=1)
+        await results.aclose()
+        await asyncio.sleep(0) # Let the cancellations land
+        return first
+
+    first = asyncio.run(first_then_stop())
+    assert [result["index"] for result in first] == [0]
+    assert sorted(cancelled) == [1, 2, 3]
+    assert renders.saved == ["clip0.mp4"]
+
+
+def test_keyframes_stay_under_their_own_cap(renders, monkeypatch):
+    monkeypatch.setattr(storyboard, "_keyframe_slots", asyncio.Semaphore(2))
+    lock = threading.Lock()
+    generating = {"now": 0, "max": 0}
+
+    def generate_image_bytes(contents, model_name):
+        with lock:
+            generating["now"] += 1
+            generating["max"] = max(generating["max"], generating["now"])
+        time.sleep(0.05)
+        with lock:
+            generating["now"] -= 1
+        return b"png"
+
+    async def generate_clip(client, prompt, model_name, aspect_ratio="16:9", image=None):
+        return f"clip-{prompt}.mp4"
+
+    monkeypatch.setattr(storyboard, "generate_image_bytes", generate_image_bytes)
+    monkeypatch.setattr(storyboard, "upload_bytes", lambda data, blob_name, content_type: blob_name)
+    monkeypatch.setattr(storyboard, "generate_clip", generate_clip)
+    script = {"global_elements": SCRIPT["global_elements"], "scenes": [{"visual": f"Scene {index}", "audio": ""} for index in range(8)]}
+
+    results = asyncio.run(collect(storyboard.render_storyboard(script, mode="keyframe", use_cache=False)))
+    assert sorted(result["index"] for result in results if result["status"] == "done") == list(range(8))
+    assert generating["max"] == 2
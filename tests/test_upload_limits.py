@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from backend import upload_limits
+from backend.upload_limits import UploadLimitMiddleware
+from backend.services.uploads import spool_to_storage
+from backend.services.storage import download_bytes
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(upload_limits, "ENDPOINT_LIMITS", [("/small/", 1024), ("/big/", 64 * 1024)])
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware)
+
+    @app.post("/small/upload")
+    async def small(file: UploadFile = File(...)):
+        return {"size": file.size}
+
+    @app.post("/big/upload")
+    async def big(file: UploadFile = File(...)):
+        blob_name = await spool_to_storage(file, "temp_inputs/test-upload.bin")
+        return {"size": file.size, "blob_name": blob_name}
+
+    return TestClient(app)
+
+
+def test_within_limit(client):
+    response = client.post("/small/upload", files={"file": ("a.bin", b"x" * 512)})
+    assert response.status_code == 200
+    assert response.json()["size"] == 512
+
+
+def test_rejects_declared_length_over_limit(client):
+    response = client.post("/small/upload", files={"file": ("a.bin", b"x" * 4096)})
+    assert response.status_code == 413
+
+
+def test_cuts_off_streamed_body_over_limit(client):
+    def chunks():
+        for _ in range(8):
+            yield b"x" * 512
+
+    response = client.post(
+        "/small/upload",
+        content=chunks(),
+        headers={"content-type": "multipart/form-data; boundary=b"},
+    )
+    assert response.status_code == 413
+
+
+def test_per_endpoint_limits_and_spool_to_storage(client):
+    data = bytes(range(256)) * 128  # 32 KB: too large for /small/, fine for /big/
+    assert client.post("/small/upload", files={"file": ("a.bin", data)}).status_code == 413
+
+    response = client.post("/big/upload", files={"file": ("a.bin", data)})
+    assert response.status_code == 200
+    assert download_bytes(response.json()["blob_name"]) == data
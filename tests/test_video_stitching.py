@@ -0,0 +1,58 @@
+import shutil
+import subprocess
+
+import pytest
+
+from backend.config import config
+from backend.services.storage import upload_file, download_to_filename
+from backend.services.video_stitching import stitch_clips, probe_clip
+
+pytestmark = pytest.mark.skipif(shutil.which(config.FFMPEG_BINARY) is None, reason="ffmpeg not installed")
+
+
+def make_clip(path, size="320x240", rate=24, seconds=1, audio=True, source="testsrc"):
+    args = [config.FFMPEG_BINARY, "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"{source}=size={size}:rate={rate}"]
+    if audio:
+        args += ["-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100"]
+    args += ["-t", str(seconds), "-c:v", "libx264", "-pix_fmt", "yuv420p"]
+    args += ["-c:a", "aac"] if audio else ["-an"]
+    subprocess.run(args + [str(path)], check=True)
+    return path
+
+
+def store(tmp_path, name, **kwargs):
+    path = make_clip(tmp_path / f"{name}.mp4", **kwargs)
+    blob_name = f"test_clips/{tmp_path.name}/{name}.mp4"
+    with open(path, "rb") as f:
+        upload_file(f, blob_name, content_type="video/mp4")
+    return blob_name
+
+
+def stitched_info(tmp_path, report):
+    local_path = tmp_path / "stitched.mp4"
+    download_to_filename(report["blob_name"], str(local_path))
+    return probe_clip(str(local_path))
+
+
+def test_matching_clips_are_stream_copied(tmp_path):
+    clips = [store(tmp_path, "a"), store(tmp_path, "b", source="testsrc2"), store(tmp_path, "c")]
+
+    report = stitch_clips(clips)
+
+    assert report["stream_copied"] == 3 and report["reencoded"] == 0
+    info = stitched_info(tmp_path, report)
+    assert info["duration"] == pytest.approx(3, abs=0.2)
+    assert (info["video"]["width"], info["video"]["height"]) == (320, 240)
+    assert info["audio"] is not None
+
+
+def test_mismatched_clip_is_normalized_to_first(tmp_path):
+    clips = [store(tmp_path, "a"), store(tmp_path, "wide", size="640x360", rate=30, audio=False), store(tmp_path, "b")]
+
+    report = stitch_clips(clips)
+
+    assert report["reencoded"] >= 1
+    info = stitched_info(tmp_path, report)
+    assert info["duration"] == pytest.approx(3, abs=0.2)
+    assert (info["video"]["width"], info["video"]["height"]) == (320, 240)
+    assert info["audio"] is not None